@@ -13,11 +13,10 @@ import asyncio
 import json
 import logging
 import os
-from datetime import datetime, timedelta, timezone
-from pathlib import Path
+import time
+from datetime import date, datetime, timedelta, timezone
 from typing import Optional, List
 
-import yaml
 
 from aiogram import Bot, Dispatcher, Router, F, BaseMiddleware
 from aiogram.types import (
@@ -37,7 +36,10 @@ import asyncpg
 
 from locales import t, detect_language, get_language_name, SUPPORTED_LANGUAGES
 from core.intent import detect_intent, IntentType
-from engines.shared import handle_question, ProcessingStage
+from engines.shared import handle_question, ProcessingStage, get_corpus_stats, get_expansion_stats
+from clients.accounting import get_accounting, call_scope
+from clients.llm_limiter import get_llm_limiter
+from clients.context_gather import gather_lesson_context
 
 # ============= КОНФИГУРАЦИЯ =============
 
@@ -140,37 +142,16 @@ MARATHON_DAYS = 14  # длительность марафона
 
 # ============= ОНТОЛОГИЧЕСКИЕ ИНВАРИАНТЫ =============
 # Импортируем из config — единый источник истины
-from config import ONTOLOGY_RULES
+from config import (ONTOLOGY_RULES, CLAUDE_MODEL, ACCOUNTING_FLUSH_INTERVAL, GUIDES_MIRROR_ENABLED,
+                    MCP_HEALTH_CHECK_INTERVAL, FEED_PREFETCH_ENABLED, FEED_TRENDING_REFRESH_HOURS,
+                    RERANK_IDF_SAVE_INTERVAL, EXPANSION_STATS_SAVE_INTERVAL)
 
 # ============= ЗАГРУЗКА МЕТАДАННЫХ ТЕМ =============
-
-TOPICS_DIR = Path(__file__).parent / "topics"
-
-def load_topic_metadata(topic_id: str) -> Optional[dict]:
-    """Загружает метаданные темы из YAML файла
-
-    Args:
-        topic_id: ID темы (например, "1-1-three-states")
-
-    Returns:
-        Словарь с метаданными или None если файл не найден
-    """
-    if not TOPICS_DIR.exists():
-        return None
-
-    # Пробуем найти файл по ID
-    for yaml_file in TOPICS_DIR.glob("*.yaml"):
-        if yaml_file.name.startswith("_"):  # Пропускаем служебные файлы
-            continue
-        try:
-            with open(yaml_file, 'r', encoding='utf-8') as f:
-                data = yaml.safe_load(f)
-                if data and data.get('id') == topic_id:
-                    return data
-        except Exception as e:
-            logger.error(f"Ошибка загрузки метаданных {yaml_file}: {e}")
-
-    return None
+# Темы читаются один раз в реестр (core/topics.py), поиск — по индексу
+from core.helpers import load_topic_metadata, get_personalization_prompt
+from core.prompts import register_template, lang_instruction, lang_reminder
+from core.keyboards import cached_keyboard
+from core.topics import get_topic_registry
 
 def get_bloom_questions(metadata: dict, bloom_level: int, study_duration: int) -> dict:
     """Получает настройки вопросов для заданного уровня Блума и времени
@@ -420,6 +401,10 @@ async def init_db():
             )
         ''')
 
+    # Таблицы модульной архитектуры (qa_history, llm_calls и др.)
+    from db.models import create_tables
+    await create_tables(db_pool)
+
     logger.info("✅ База данных инициализирована")
 
 
@@ -605,93 +590,167 @@ def get_topics_today(intern: dict) -> int:
     # Иначе — новый день, счётчик обнуляется
     return 0
 
-# Шаблоны форматов примеров для ротации
-EXAMPLE_TEMPLATES = [
-    ("аналогия", "Используй аналогию — перенеси структуру или принцип из одной области в другую"),
-    ("мини-кейс", "Используй мини-кейс — опиши ситуацию → выбор → последствия"),
-    ("контрпример", "Используй контрпример — покажи как НЕ работает, чтобы подчеркнуть как работает правильно"),
-    ("сравнение", "Используй сравнение двух подходов — правильный vs неправильный"),
-    ("ошибка-мастерство", "Покажи типичную ошибку новичка и приём мастера"),
-    ("наблюдение", "Предложи наблюдательный эксперимент — что можно заметить в повседневной жизни"),
-]
-
-# Источники примеров для ротации
-EXAMPLE_SOURCES = ["работа", "близкая профессиональная сфера", "интерес/хобби", "далёкая сфера для контраста"]
-
-
-def get_example_rules(intern: dict, marathon_day: int) -> str:
-    """Генерирует правила для примеров с ротацией по дню марафона"""
-    interests = intern.get('interests', [])
-    occupation = intern.get('occupation', '') or 'работа'
-
-    # Выбираем интерес по дню (циклически)
-    if interests:
-        interest_idx = (marathon_day - 1) % len(interests)
-        today_interest = interests[interest_idx]
-        other_interests = [i for idx, i in enumerate(interests) if idx != interest_idx]
-    else:
-        today_interest = None
-        other_interests = []
+# ============= ШАБЛОНЫ ПРОМПТОВ =============
+# Шаблоны разбираются один раз (core/prompts.py), персонализация кэшируется по хэшу профиля
 
-    # Выбираем шаблон формата по дню
-    template_idx = (marathon_day - 1) % len(EXAMPLE_TEMPLATES)
-    template_name, template_instruction = EXAMPLE_TEMPLATES[template_idx]
+LESSON_SYSTEM = register_template('lesson_system', """Ты — персональный наставник по системному мышлению и личному развитию.
+{personalization}
+{lang_instruction}
 
-    # Ротация порядка источников по дню
-    shift = (marathon_day - 1) % len(EXAMPLE_SOURCES)
-    rotated_sources = EXAMPLE_SOURCES[shift:] + EXAMPLE_SOURCES[:shift]
+Создай текст на {study_duration} минут чтения (~{words} слов). Без заголовков, только абзацы.
+Текст должен быть вовлекающим, с примерами из жизни читателя.
 
-    # Формируем правила
-    sources_text = "\n".join([f"  {i+1}. {src}" for i, src in enumerate(rotated_sources)])
+СТРОГО ЗАПРЕЩЕНО:
+- Добавлять вопросы в любом месте текста
+- Использовать заголовки типа "Вопрос:", "Вопрос для размышления:", "Вопрос для проверки:" и т.п.
+- Заканчивать текст вопросом
+Вопрос будет задан отдельно после текста.
+{context_instruction}
 
-    interest_text = f'"{today_interest}"' if today_interest else "не указан"
-    other_interests_text = f" (другие интересы для разнообразия: {', '.join(other_interests)})" if other_interests else ""
+{ontology_rules}
 
-    return f"""
-ПРАВИЛА ДЛЯ ПРИМЕРОВ (День {marathon_day}):
+{lang_reminder}""")
 
-Формат примеров сегодня: **{template_name}**
-{template_instruction}
+LESSON_USER = register_template('lesson_user', """{topic_label}: {title}
+{concept_label}: {main_concept}
+{related_label}: {related_concepts}
 
-Порядок источников для примеров (от первого к последнему):
-{sources_text}
+{pain}
+{insight}
+{source}
 
-Детали источников:
-- Работа/профессия: "{occupation}"
-- Интерес дня: {interest_text}{other_interests_text}
-- Близкая сфера: смежная с работой "{occupation}" область
-- Далёкая сфера: что-то неожиданное для контраста (спорт, искусство, природа, история)
+{content_instruction}
 
-ВАЖНО: Используй интерес дня ({interest_text}), а НЕ всегда первый из списка!
-"""
+{context}
+
+{start_with}
+{use_context}""")
+
+# Подписи пользовательского промпта урока по языкам
+LESSON_LABELS = {
+    'ru': {
+        'topic': 'Тема',
+        'concept': 'Основное понятие',
+        'related': 'Связанные понятия',
+        'pain': 'Боль читателя',
+        'insight': 'Ключевой инсайт',
+        'source': 'Источник',
+        'content_instruction': 'ИНСТРУКЦИЯ ПО КОНТЕНТУ',
+        'context_label': 'КОНТЕКСТ ИЗ МАТЕРИАЛОВ AISYSTANT',
+        'start_with': 'Начни с признания боли читателя, затем раскрой тему и подведи к ключевому инсайту.',
+        'use_context': 'Опирайся на контекст, но адаптируй под профиль стажера. Актуальные посты важнее.'
+    },
+    'en': {
+        'topic': 'Topic',
+        'concept': 'Main concept',
+        'related': 'Related concepts',
+        'pain': 'Reader pain point',
+        'insight': 'Key insight',
+        'source': 'Source',
+        'content_instruction': 'CONTENT INSTRUCTION',
+        'context_label': 'CONTEXT FROM AISYSTANT MATERIALS',
+        'start_with': 'Start by acknowledging the reader\'s pain, then cover the topic and lead to the key insight.',
+        'use_context': 'Use the context but adapt to the learner\'s profile. Recent posts take priority.'
+    },
+    'es': {
+        'topic': 'Tema',
+        'concept': 'Concepto principal',
+        'related': 'Conceptos relacionados',
+        'pain': 'Punto de dolor del lector',
+        'insight': 'Idea clave',
+        'source': 'Fuente',
+        'content_instruction': 'INSTRUCCIÓN DE CONTENIDO',
+        'context_label': 'CONTEXTO DE MATERIALES DE AISYSTANT',
+        'start_with': 'Comienza reconociendo el dolor del lector, luego desarrolla el tema y lleva a la idea clave.',
+        'use_context': 'Usa el contexto pero adapta al perfil del estudiante. Las publicaciones recientes tienen prioridad.'
+    }
+}
+
+PRACTICE_INTRO_SYSTEM = register_template('practice_intro_system', """Ты — персональный наставник по системному мышлению.
+{personalization}
+{lang_instruction}
+
+Напиши краткое (3-5 предложений) введение к практическому заданию.
+Объясни, зачем это задание и как оно связано с темой дня.
+
+{ontology_rules}
+
+{lang_reminder}""")
+
+PRACTICE_INTRO_USER = {
+    'ru': register_template('practice_intro_user.ru', """Практическое задание: {title}
+Основное понятие: {main_concept}
+
+Задание: {task}
+Рабочий продукт: {work_product}
+
+ВАЖНО: Рабочий продукт — это конкретный артефакт (существительное), а не действие.
+
+Напиши краткое введение, которое мотивирует выполнить задание."""),
+    'en': register_template('practice_intro_user.en', """Practical task: {title}
+Main concept: {main_concept}
+
+Task: {task}
+Work product: {work_product}
+
+IMPORTANT: The work product is a concrete artifact (noun), not an action.
+
+Write a brief introduction that motivates completing the task."""),
+    'es': register_template('practice_intro_user.es', """Tarea práctica: {title}
+Concepto principal: {main_concept}
+
+Tarea: {task}
+Producto de trabajo: {work_product}
 
+IMPORTANTE: El producto de trabajo es un artefacto concreto (sustantivo), no una acción.
+
+Escribe una breve introducción que motive a completar la tarea."""),
+}
+
+QUESTION_SYSTEM = register_template('question_system', """Ты генерируешь ТОЛЬКО ОДИН КОРОТКИЙ ВОПРОС. Ничего больше.
+{lang_instruction}
+
+СТРОГО ЗАПРЕЩЕНО:
+- Писать введение, объяснения, контекст или любой текст перед вопросом
+- Писать заголовки типа "Вопрос:", "Вопрос для размышления:" и т.п.
+- Писать примеры, истории, мотивацию
+- Писать что-либо после вопроса
+
+Выдай ТОЛЬКО сам вопрос — 1-3 предложения максимум.
 
-def get_personalization_prompt(intern: dict, marathon_day: int = 1) -> str:
-    """Генерирует промпт для персонализации на основе упрощённого профиля"""
-    duration = STUDY_DURATIONS.get(str(intern['study_duration']), {"words": 1500})
+КОНТЕКСТ ВОПРОСА (День {day}): {question_context}
+Уровень сложности: {bloom_name} — {bloom_desc}
+{question_type_hint}
+{templates_hint}
 
-    interests = ', '.join(intern['interests']) if intern['interests'] else 'не указаны'
-    occupation = intern.get('occupation', '') or 'не указано'
-    motivation = intern.get('motivation', '') or 'не указано'
-    goals = intern.get('goals', '') or 'не указаны'
+{ontology_rules}
 
-    example_rules = get_example_rules(intern, marathon_day)
+{lang_reminder}""")
 
-    return f"""
-ПРОФИЛЬ СТАЖЕРА:
-- Имя: {intern['name']}
-- Занятие: {occupation}
-- Интересы/хобби: {interests}
-- Что важно в жизни: {motivation}
-- Что хочет изменить: {goals}
-- Время на изучение: {intern['study_duration']} минут (~{duration.get('words', 1500)} слов)
+QUESTION_USER = {
+    'ru': register_template('question_user.ru', """Тема: {title}
+Понятие: {main_concept}
+Контекст: {question_context}
 
-ИНСТРУКЦИИ ПО ПЕРСОНАЛИЗАЦИИ:
-1. Показывай, как тема помогает достичь того, что стажер хочет изменить: "{goals}"
-2. Добавляй мотивационный блок, опираясь на ценности стажера: "{motivation}"
-3. Объём текста должен быть рассчитан на {intern['study_duration']} минут чтения (~{duration.get('words', 1500)} слов)
-4. Пиши простым языком, избегай академического стиля
-{example_rules}"""
+Выдай ТОЛЬКО вопрос (1-3 предложения), без введения и пояснений."""),
+    'en': register_template('question_user.en', """Topic: {title}
+Concept: {main_concept}
+Context: {question_context}
+
+Output ONLY the question (1-3 sentences), without introduction or explanations."""),
+    'es': register_template('question_user.es', """Tema: {title}
+Concepto: {main_concept}
+Contexto: {question_context}
+
+Genera SOLO la pregunta (1-3 oraciones), sin introducción ni explicaciones."""),
+}
+
+# Тип вопроса по уровню Блума
+QUESTION_TYPE_HINTS = {
+    1: "Задай вопрос на РАЗЛИЧЕНИЕ понятий (\"В чём разница между...\", \"Чем отличается...\").",
+    2: "Задай ОТКРЫТЫЙ вопрос на понимание (\"Почему...\", \"Как вы понимаете...\", \"Объясните связь...\").",
+    3: "Задай вопрос на ПРИМЕНЕНИЕ и АНАЛИЗ (\"Приведите пример из жизни\", \"Проанализируйте ситуацию\", \"Как бы вы объяснили коллеге...\")."
+}
 
 # ============= CLAUDE API =============
 
@@ -701,6 +760,15 @@ class ClaudeClient:
         self.base_url = "https://api.anthropic.com/v1/messages"
 
     async def generate(self, system_prompt: str, user_prompt: str) -> str:
+        # Общий лимит LLM_CONCURRENCY с clients.claude, интерактивные — вне очереди фоновых
+        async with get_llm_limiter().slot():
+            return await self._request(system_prompt, user_prompt)
+
+    async def _request(self, system_prompt: str, user_prompt: str) -> str:
+        started = time.perf_counter()
+        outcome = "ok"
+        usage = None
+
         async with aiohttp.ClientSession() as session:
             headers = {
                 "Content-Type": "application/json",
@@ -709,7 +777,7 @@ class ClaudeClient:
             }
             
             payload = {
-                "model": "claude-sonnet-4-20250514",
+                "model": CLAUDE_MODEL,
                 "max_tokens": 4000,
                 "system": system_prompt,
                 "messages": [{"role": "user", "content": user_prompt}]
@@ -719,14 +787,23 @@ class ClaudeClient:
                 async with session.post(self.base_url, headers=headers, json=payload) as resp:
                     if resp.status == 200:
                         data = await resp.json()
+                        usage = data.get("usage")
                         return data["content"][0]["text"]
                     else:
+                        outcome = f"http_{resp.status}"
                         error = await resp.text()
                         logger.error(f"Claude API error: {error}")
                         return None
             except Exception as e:
+                outcome = "error"
                 logger.error(f"Claude API exception: {e}")
                 return None
+            finally:
+                get_accounting().record(
+                    "llm", CLAUDE_MODEL,
+                    latency_ms=(time.perf_counter() - started) * 1000,
+                    outcome=outcome, usage=usage,
+                )
 
     async def generate_content(self, topic: dict, intern: dict, marathon_day: int = 1, mcp_client=None, knowledge_client=None) -> str:
         """Генерирует контент для теоретической темы марафона
@@ -756,61 +833,10 @@ class ClaudeClient:
             guides_search_keys = [default_query]
             knowledge_search_keys = [default_query]
 
-        # Получаем контекст из MCP руководств (используем все ключи поиска)
-        guides_context = ""
-        if mcp_client:
-            try:
-                context_parts = []
-                seen_texts = set()  # Для дедупликации
-                for search_query in guides_search_keys[:3]:  # Максимум 3 запроса
-                    search_results = await mcp_client.semantic_search(search_query, lang="ru", limit=2)
-                    if search_results:
-                        for item in search_results:
-                            if isinstance(item, dict):
-                                text = item.get('text', item.get('content', ''))
-                            elif isinstance(item, str):
-                                text = item
-                            else:
-                                continue
-                            if text and text[:100] not in seen_texts:
-                                seen_texts.add(text[:100])
-                                context_parts.append(text[:1500])
-                if context_parts:
-                    guides_context = "\n\n".join(context_parts[:5])  # Максимум 5 фрагментов
-                    logger.info(f"{mcp_client.name}: найдено {len(context_parts)} фрагментов контекста")
-            except Exception as e:
-                logger.error(f"{mcp_client.name} search error: {e}")
-
-        # Получаем контекст из MCP базы знаний (knowledge MCP использует инструмент 'search')
-        knowledge_context = ""
-        if knowledge_client:
-            try:
-                context_parts = []
-                seen_texts = set()
-                for search_query in knowledge_search_keys[:3]:  # Максимум 3 запроса
-                    # Сортируем по дате создания (сначала новые)
-                    search_results = await knowledge_client.semantic_search(
-                        search_query, lang="ru", limit=2, sort_by="created_at:desc"
-                    )
-                    if search_results:
-                        for item in search_results:
-                            if isinstance(item, dict):
-                                text = item.get('text', item.get('content', ''))
-                                date_info = item.get('created_at', item.get('date', ''))
-                                if date_info:
-                                    text = f"[{date_info}] {text}"
-                            elif isinstance(item, str):
-                                text = item
-                            else:
-                                continue
-                            if text and text[:100] not in seen_texts:
-                                seen_texts.add(text[:100])
-                                context_parts.append(text[:1500])
-                if context_parts:
-                    knowledge_context = "\n\n".join(context_parts[:5])  # Максимум 5 фрагментов
-                    logger.info(f"{knowledge_client.name}: найдено {len(context_parts)} фрагментов (свежие посты)")
-            except Exception as e:
-                logger.error(f"{knowledge_client.name} search error: {e}")
+        # Контекст из руководств и базы знаний: все запросы параллельно, общий дедлайн
+        guides_context, knowledge_context = await gather_lesson_context(
+            mcp_client, knowledge_client, guides_search_keys, knowledge_search_keys
+        )
 
         # Объединяем контексты (knowledge имеет приоритет, поэтому идёт первым)
         mcp_context = ""
@@ -832,164 +858,58 @@ class ClaudeClient:
         elif mcp_context:
             context_instruction = "Используй предоставленный контекст из материалов Aisystant как основу."
 
-        # Определяем язык пользователя
         lang = intern.get('language', 'ru')
-        lang_instruction = {
-            'ru': "ВАЖНО: Пиши ВСЁ на русском языке.",
-            'en': "IMPORTANT: Write EVERYTHING in English.",
-            'es': "IMPORTANTE: Escribe TODO en español."
-        }.get(lang, "ВАЖНО: Пиши ВСЁ на русском языке.")
-
-        lang_reminder = {
-            'ru': "НАПОМИНАНИЕ: Весь текст должен быть на РУССКОМ языке!",
-            'en': "REMINDER: All text must be in ENGLISH!",
-            'es': "RECORDATORIO: ¡Todo el texto debe estar en ESPAÑOL!"
-        }.get(lang, "НАПОМИНАНИЕ: Весь текст должен быть на РУССКОМ языке!")
-
-        system_prompt = f"""Ты — персональный наставник по системному мышлению и личному развитию.
-{get_personalization_prompt(intern, marathon_day)}
-{lang_instruction}
-
-Создай текст на {intern['study_duration']} минут чтения (~{words} слов). Без заголовков, только абзацы.
-Текст должен быть вовлекающим, с примерами из жизни читателя.
-
-СТРОГО ЗАПРЕЩЕНО:
-- Добавлять вопросы в любом месте текста
-- Использовать заголовки типа "Вопрос:", "Вопрос для размышления:", "Вопрос для проверки:" и т.п.
-- Заканчивать текст вопросом
-Вопрос будет задан отдельно после текста.
-{context_instruction}
-
-{ONTOLOGY_RULES}
-
-{lang_reminder}"""
+        system_prompt = LESSON_SYSTEM.render(
+            personalization=get_personalization_prompt(intern, marathon_day),
+            lang_instruction=lang_instruction('write', lang),
+            study_duration=intern['study_duration'],
+            words=words,
+            context_instruction=context_instruction,
+            ontology_rules=ONTOLOGY_RULES,
+            lang_reminder=lang_reminder('write', lang),
+        )
 
         pain_point = topic.get('pain_point', '')
         key_insight = topic.get('key_insight', '')
         source = topic.get('source', '')
 
-        # Локализуем промпт
-        prompt_templates = {
-            'ru': {
-                'topic': 'Тема',
-                'concept': 'Основное понятие',
-                'related': 'Связанные понятия',
-                'pain': 'Боль читателя',
-                'insight': 'Ключевой инсайт',
-                'source': 'Источник',
-                'content_instruction': 'ИНСТРУКЦИЯ ПО КОНТЕНТУ',
-                'context_label': 'КОНТЕКСТ ИЗ МАТЕРИАЛОВ AISYSTANT',
-                'start_with': 'Начни с признания боли читателя, затем раскрой тему и подведи к ключевому инсайту.',
-                'use_context': 'Опирайся на контекст, но адаптируй под профиль стажера. Актуальные посты важнее.'
-            },
-            'en': {
-                'topic': 'Topic',
-                'concept': 'Main concept',
-                'related': 'Related concepts',
-                'pain': 'Reader pain point',
-                'insight': 'Key insight',
-                'source': 'Source',
-                'content_instruction': 'CONTENT INSTRUCTION',
-                'context_label': 'CONTEXT FROM AISYSTANT MATERIALS',
-                'start_with': 'Start by acknowledging the reader\'s pain, then cover the topic and lead to the key insight.',
-                'use_context': 'Use the context but adapt to the learner\'s profile. Recent posts take priority.'
-            },
-            'es': {
-                'topic': 'Tema',
-                'concept': 'Concepto principal',
-                'related': 'Conceptos relacionados',
-                'pain': 'Punto de dolor del lector',
-                'insight': 'Idea clave',
-                'source': 'Fuente',
-                'content_instruction': 'INSTRUCCIÓN DE CONTENIDO',
-                'context_label': 'CONTEXTO DE MATERIALES DE AISYSTANT',
-                'start_with': 'Comienza reconociendo el dolor del lector, luego desarrolla el tema y lleva a la idea clave.',
-                'use_context': 'Usa el contexto pero adapta al perfil del estudiante. Las publicaciones recientes tienen prioridad.'
-            }
-        }
-        pt = prompt_templates.get(lang, prompt_templates['ru'])
-
-        user_prompt = f"""{pt['topic']}: {topic.get('title')}
-{pt['concept']}: {topic.get('main_concept')}
-{pt['related']}: {', '.join(topic.get('related_concepts', []))}
-
-{pt['pain'] + ': ' + pain_point if pain_point else ''}
-{pt['insight'] + ': ' + key_insight if key_insight else ''}
-{pt['source'] + ': ' + source if source else ''}
-
-{f"{pt['content_instruction']}:{chr(10)}{content_prompt}" if content_prompt else ""}
-
-{f"{pt['context_label']}:{chr(10)}{mcp_context}" if mcp_context else ""}
-
-{pt['start_with']}
-{pt['use_context'] if mcp_context else ""}"""
+        pt = LESSON_LABELS.get(lang, LESSON_LABELS['ru'])
+        user_prompt = LESSON_USER.render(
+            topic_label=pt['topic'], title=topic.get('title'),
+            concept_label=pt['concept'], main_concept=topic.get('main_concept'),
+            related_label=pt['related'], related_concepts=', '.join(topic.get('related_concepts', [])),
+            pain=pt['pain'] + ': ' + pain_point if pain_point else '',
+            insight=pt['insight'] + ': ' + key_insight if key_insight else '',
+            source=pt['source'] + ': ' + source if source else '',
+            content_instruction=f"{pt['content_instruction']}:\n{content_prompt}" if content_prompt else "",
+            context=f"{pt['context_label']}:\n{mcp_context}" if mcp_context else "",
+            start_with=pt['start_with'],
+            use_context=pt['use_context'] if mcp_context else "",
+        )
 
-        result = await self.generate(system_prompt, user_prompt)
+        with call_scope(call_site="marathon.content"):
+            result = await self.generate(system_prompt, user_prompt)
         return result or "Не удалось сгенерировать контент. Попробуйте /learn ещё раз."
 
     async def generate_practice_intro(self, topic: dict, intern: dict, marathon_day: int = 1) -> str:
         """Генерирует вводный текст для практического задания"""
-        # Определяем язык пользователя
         lang = intern.get('language', 'ru')
-        lang_instruction = {
-            'ru': "ВАЖНО: Пиши ВСЁ на русском языке.",
-            'en': "IMPORTANT: Write EVERYTHING in English.",
-            'es': "IMPORTANTE: Escribe TODO en español."
-        }.get(lang, "ВАЖНО: Пиши ВСЁ на русском языке.")
-
-        lang_reminder = {
-            'ru': "НАПОМИНАНИЕ: Весь текст должен быть на РУССКОМ языке!",
-            'en': "REMINDER: All text must be in ENGLISH!",
-            'es': "RECORDATORIO: ¡Todo el texto debe estar en ESPAÑOL!"
-        }.get(lang, "НАПОМИНАНИЕ: Весь текст должен быть на РУССКОМ языке!")
-
-        system_prompt = f"""Ты — персональный наставник по системному мышлению.
-{get_personalization_prompt(intern, marathon_day)}
-{lang_instruction}
-
-Напиши краткое (3-5 предложений) введение к практическому заданию.
-Объясни, зачем это задание и как оно связано с темой дня.
-
-{ONTOLOGY_RULES}
-
-{lang_reminder}"""
-
-        task = topic.get('task', '')
-        work_product = topic.get('work_product', '')
-
-        # Локализуем промпт
-        user_prompts = {
-            'ru': f"""Практическое задание: {topic.get('title')}
-Основное понятие: {topic.get('main_concept')}
-
-Задание: {task}
-Рабочий продукт: {work_product}
-
-ВАЖНО: Рабочий продукт — это конкретный артефакт (существительное), а не действие.
-
-Напиши краткое введение, которое мотивирует выполнить задание.""",
-            'en': f"""Practical task: {topic.get('title')}
-Main concept: {topic.get('main_concept')}
-
-Task: {task}
-Work product: {work_product}
-
-IMPORTANT: The work product is a concrete artifact (noun), not an action.
-
-Write a brief introduction that motivates completing the task.""",
-            'es': f"""Tarea práctica: {topic.get('title')}
-Concepto principal: {topic.get('main_concept')}
-
-Tarea: {task}
-Producto de trabajo: {work_product}
-
-IMPORTANTE: El producto de trabajo es un artefacto concreto (sustantivo), no una acción.
+        system_prompt = PRACTICE_INTRO_SYSTEM.render(
+            personalization=get_personalization_prompt(intern, marathon_day),
+            lang_instruction=lang_instruction('write', lang),
+            ontology_rules=ONTOLOGY_RULES,
+            lang_reminder=lang_reminder('write', lang),
+        )
 
-Escribe una breve introducción que motive a completar la tarea."""
-        }
-        user_prompt = user_prompts.get(lang, user_prompts['ru'])
+        user_prompt = PRACTICE_INTRO_USER.get(lang, PRACTICE_INTRO_USER['ru']).render(
+            title=topic.get('title'),
+            main_concept=topic.get('main_concept'),
+            task=topic.get('task', ''),
+            work_product=topic.get('work_product', ''),
+        )
 
-        result = await self.generate(system_prompt, user_prompt)
+        with call_scope(call_site="marathon.practice_intro"):
+            result = await self.generate(system_prompt, user_prompt)
         return result or ""
 
     async def generate_question(self, topic: dict, intern: dict, marathon_day: int = 1, bloom_level: int = None) -> str:
@@ -1032,260 +952,67 @@ Escribe una breve introducción que motive a completar la tarea."""
             question_templates = question_config.get('question_templates', [])
             logger.info(f"Загружены шаблоны вопросов для {topic_id}: bloom_{level}, {study_duration}мин, {len(question_templates)} шаблонов")
 
-        # Определяем тип вопроса по уровню Блума
-        question_type_hints = {
-            1: "Задай вопрос на РАЗЛИЧЕНИЕ понятий (\"В чём разница между...\", \"Чем отличается...\").",
-            2: "Задай ОТКРЫТЫЙ вопрос на понимание (\"Почему...\", \"Как вы понимаете...\", \"Объясните связь...\").",
-            3: "Задай вопрос на ПРИМЕНЕНИЕ и АНАЛИЗ (\"Приведите пример из жизни\", \"Проанализируйте ситуацию\", \"Как бы вы объяснили коллеге...\")."
-        }
-        question_type_hint = question_type_hints.get(level, question_type_hints[1])
-
         # Формируем подсказки по шаблонам
         templates_hint = ""
         if question_templates:
             templates_hint = f"\nПРИМЕРЫ ВОПРОСОВ (используй как образец стиля):\n- " + "\n- ".join(question_templates[:3])
 
-        # Определяем язык пользователя
         lang = intern.get('language', 'ru')
-        lang_instruction = {
-            'ru': "ВАЖНО: Пиши вопрос на русском языке.",
-            'en': "IMPORTANT: Write the question in English.",
-            'es': "IMPORTANTE: Escribe la pregunta en español."
-        }.get(lang, "ВАЖНО: Пиши вопрос на русском языке.")
-
-        lang_reminder = {
-            'ru': "НАПОМИНАНИЕ: Вопрос должен быть на РУССКОМ языке!",
-            'en': "REMINDER: The question must be in ENGLISH!",
-            'es': "RECORDATORIO: ¡La pregunta debe estar en ESPAÑOL!"
-        }.get(lang, "НАПОМИНАНИЕ: Вопрос должен быть на РУССКОМ языке!")
-
-        system_prompt = f"""Ты генерируешь ТОЛЬКО ОДИН КОРОТКИЙ ВОПРОС. Ничего больше.
-{lang_instruction}
-
-СТРОГО ЗАПРЕЩЕНО:
-- Писать введение, объяснения, контекст или любой текст перед вопросом
-- Писать заголовки типа "Вопрос:", "Вопрос для размышления:" и т.п.
-- Писать примеры, истории, мотивацию
-- Писать что-либо после вопроса
-
-Выдай ТОЛЬКО сам вопрос — 1-3 предложения максимум.
-
-КОНТЕКСТ ВОПРОСА (День {marathon_day}): {question_context}
-Уровень сложности: {bloom['short_name']} — {bloom['desc']}
-{question_type_hint}
-{templates_hint}
-
-{ONTOLOGY_RULES}
-
-{lang_reminder}"""
-
-        # Локализуем промпт
-        user_prompts = {
-            'ru': f"""Тема: {topic.get('title')}
-Понятие: {topic.get('main_concept')}
-Контекст: {question_context}
-
-Выдай ТОЛЬКО вопрос (1-3 предложения), без введения и пояснений.""",
-            'en': f"""Topic: {topic.get('title')}
-Concept: {topic.get('main_concept')}
-Context: {question_context}
-
-Output ONLY the question (1-3 sentences), without introduction or explanations.""",
-            'es': f"""Tema: {topic.get('title')}
-Concepto: {topic.get('main_concept')}
-Contexto: {question_context}
+        system_prompt = QUESTION_SYSTEM.render(
+            lang_instruction=lang_instruction('question', lang),
+            day=marathon_day,
+            question_context=question_context,
+            bloom_name=bloom['short_name'],
+            bloom_desc=bloom['desc'],
+            question_type_hint=QUESTION_TYPE_HINTS.get(level, QUESTION_TYPE_HINTS[1]),
+            templates_hint=templates_hint,
+            ontology_rules=ONTOLOGY_RULES,
+            lang_reminder=lang_reminder('question', lang),
+        )
 
-Genera SOLO la pregunta (1-3 oraciones), sin introducción ni explicaciones."""
-        }
-        user_prompt = user_prompts.get(lang, user_prompts['ru'])
+        user_prompt = QUESTION_USER.get(lang, QUESTION_USER['ru']).render(
+            title=topic.get('title'),
+            main_concept=topic.get('main_concept'),
+            question_context=question_context,
+        )
 
-        result = await self.generate(system_prompt, user_prompt)
+        with call_scope(call_site="marathon.question"):
+            result = await self.generate(system_prompt, user_prompt)
         return result or bloom['question_type'].format(concept=topic.get('main_concept', 'эту тему'))
 
 claude = ClaudeClient()
 
 # ============= MCP CLIENT =============
 
-class MCPClient:
-    """Универсальный клиент для работы с MCP серверами Aisystant"""
-
-    def __init__(self, url: str, name: str = "MCP", search_tool: str = "semantic_search"):
-        self.base_url = url
-        self.name = name
-        self.search_tool = search_tool  # "semantic_search" для guides, "search" для knowledge
-        self._request_id = 0
-
-    def _next_id(self) -> int:
-        self._request_id += 1
-        return self._request_id
-
-    async def _call(self, tool_name: str, arguments: dict) -> Optional[dict]:
-        """Вызов инструмента MCP через JSON-RPC"""
-        payload = {
-            "jsonrpc": "2.0",
-            "method": "tools/call",
-            "params": {
-                "name": tool_name,
-                "arguments": arguments
-            },
-            "id": self._next_id()
-        }
-
-        try:
-            async with aiohttp.ClientSession() as session:
-                async with session.post(
-                    self.base_url,
-                    headers={"Content-Type": "application/json"},
-                    json=payload,
-                    timeout=aiohttp.ClientTimeout(total=30)
-                ) as resp:
-                    if resp.status == 200:
-                        data = await resp.json()
-                        if "result" in data:
-                            return data["result"]
-                        if "error" in data:
-                            logger.error(f"{self.name} error: {data['error']}")
-                            return None
-                    else:
-                        error = await resp.text()
-                        logger.error(f"{self.name} HTTP error {resp.status}: {error}")
-                        return None
-        except asyncio.TimeoutError:
-            logger.error(f"{self.name} request timeout")
-            return None
-        except Exception as e:
-            logger.error(f"{self.name} exception: {e}")
-            return None
-
-    async def get_guides_list(self, lang: str = "ru", category: str = None) -> List[dict]:
-        """Получить список всех руководств"""
-        args = {"lang": lang}
-        if category:
-            args["category"] = category
-
-        result = await self._call("get_guides_list", args)
-        if result and "content" in result:
-            # Парсим JSON из content
-            for item in result.get("content", []):
-                if item.get("type") == "text":
-                    try:
-                        return json.loads(item.get("text", "[]"))
-                    except json.JSONDecodeError:
-                        pass
-        return []
-
-    async def get_guide_sections(self, guide_slug: str, lang: str = "ru") -> List[dict]:
-        """Получить разделы конкретного руководства"""
-        result = await self._call("get_guide_sections", {
-            "guide_slug": guide_slug,
-            "lang": lang
-        })
-        if result and "content" in result:
-            for item in result.get("content", []):
-                if item.get("type") == "text":
-                    try:
-                        return json.loads(item.get("text", "[]"))
-                    except json.JSONDecodeError:
-                        pass
-        return []
-
-    async def get_section_content(self, guide_slug: str, section_slug: str, lang: str = "ru") -> str:
-        """Получить содержимое раздела"""
-        result = await self._call("get_section_content", {
-            "guide_slug": guide_slug,
-            "section_slug": section_slug,
-            "lang": lang
-        })
-        if result and "content" in result:
-            for item in result.get("content", []):
-                if item.get("type") == "text":
-                    return item.get("text", "")
-        return ""
-
-    async def semantic_search(self, query: str, lang: str = "ru", limit: int = 5, sort_by: str = None) -> List[dict]:
-        """Семантический поиск по руководствам или базе знаний
-
-        Args:
-            query: поисковый запрос
-            lang: язык (ru/en) — только для MCP-Guides
-            limit: максимальное количество результатов
-            sort_by: сортировка (например, "created_at:desc" для свежих постов)
-        """
-        args = {
-            "query": query,
-            "limit": limit
-        }
-        # Параметр lang только для semantic_search (MCP-Guides)
-        if self.search_tool == "semantic_search":
-            args["lang"] = lang
-        if sort_by:
-            args["sort"] = sort_by
-
-        result = await self._call(self.search_tool, args)
-        if result and "content" in result:
-            for item in result.get("content", []):
-                if item.get("type") == "text":
-                    try:
-                        data = json.loads(item.get("text", "[]"))
-                        # Если sort_by указан и данные содержат дату, сортируем на клиенте
-                        if sort_by and "desc" in sort_by and isinstance(data, list):
-                            data.sort(key=lambda x: x.get('created_at', x.get('date', '')), reverse=True)
-                        return data
-                    except json.JSONDecodeError:
-                        # Если не JSON, возвращаем как текст
-                        return [{"text": item.get("text", "")}]
-        return []
-
-    async def search(self, query: str, limit: int = 5) -> List[dict]:
-        """Поиск по базе знаний (knowledge MCP)
-
-        Args:
-            query: поисковый запрос
-            limit: максимальное количество результатов
-        """
-        args = {
-            "query": query,
-            "limit": limit
-        }
-
-        result = await self._call("search", args)
-        if result and "content" in result:
-            for item in result.get("content", []):
-                if item.get("type") == "text":
-                    try:
-                        data = json.loads(item.get("text", "[]"))
-                        return data if isinstance(data, list) else [data]
-                    except json.JSONDecodeError:
-                        # Если не JSON, возвращаем как текст
-                        return [{"text": item.get("text", "")}]
-        return []
-
-# Создаём клиенты для двух MCP серверов
-mcp_guides = MCPClient(MCP_URL, "MCP-Guides")
-mcp_knowledge = MCPClient(KNOWLEDGE_MCP_URL, "MCP-Knowledge", search_tool="search")
-
-# Для обратной совместимости
-mcp = mcp_guides
+# Единый клиент из clients/mcp.py: пул соединений, batch-запросы, кеш результатов
+from clients.mcp import mcp_guides, mcp_knowledge, close_mcp_clients
+from clients.guides_mirror import get_guides_mirror, sync_guides_mirror
+from clients.mcp_health import check_mcp_health
 
 # ============= СТРУКТУРА ЗНАНИЙ =============
+# Собранный пакет (python -m core.content build) или YAML, если пакет устарел
+from core.content import get_knowledge_structure, get_content_indexes
+from core.curriculum import MarathonCurriculum, lowest_bit, marathon_order
 
 def load_knowledge_structure() -> tuple:
-    """Загружает структуру знаний из YAML файла для марафона"""
-    yaml_path = Path(__file__).parent / "knowledge_structure.yaml"
+    """Загружает структуру знаний для марафона (пакет контента или YAML)"""
+    data = get_knowledge_structure()
 
-    if not yaml_path.exists():
-        logger.warning(f"Файл {yaml_path} не найден, используем пустую структуру")
+    if not data:
+        logger.warning("knowledge_structure.yaml не найден, используем пустую структуру")
         return [], {}
 
-    with open(yaml_path, 'r', encoding='utf-8') as f:
-        data = yaml.safe_load(f)
-
     meta = data.get('meta', {})
     sections = {s['id']: s for s in data.get('sections', [])}
 
-    # Загружаем темы для марафона
+    # Загружаем темы для марафона: по дню, теория перед практикой
+    # (порядок из пакета контента или считаем по структуре)
+    structure_topics = data.get('topics', [])
+    order = get_content_indexes().get('marathon_order')
+    if not order or len(order) != len(structure_topics):
+        order = marathon_order(structure_topics)
     topics = []
-    for topic in data.get('topics', []):
+    for topic in (structure_topics[i] for i in order):
         day = topic.get('day', 1)
         topic_type = topic.get('type', 'theory')
 
@@ -1312,18 +1039,12 @@ def load_knowledge_structure() -> tuple:
             'work_product_examples': topic.get('work_product_examples', [])
         })
 
-    # Сортируем по дню, затем theory перед practice
-    def sort_key(t):
-        type_order = 0 if t['type'] == 'theory' else 1
-        return (t['day'], type_order)
-
-    topics.sort(key=sort_key)
-
     logger.info(f"✅ Загружено {len(topics)} тем марафона ({meta.get('total_days', 14)} дней)")
     return topics, meta
 
 # Загружаем темы при старте
 TOPICS, MARATHON_META = load_knowledge_structure()
+CURRICULUM = MarathonCurriculum(TOPICS, masks=get_content_indexes().get('curriculum'))
 
 def get_topic(index: int) -> Optional[dict]:
     """Получить тему по индексу"""
@@ -1349,93 +1070,34 @@ def get_marathon_day(intern: dict) -> int:
 
 def get_topics_for_day(day: int) -> List[dict]:
     """Получить темы для конкретного дня марафона"""
-    return [t for t in TOPICS if t['day'] == day]
+    return [t for _, t in CURRICULUM.items(CURRICULUM.day_mask(day))]
 
 def get_available_topics(intern: dict) -> List[dict]:
     """Получить доступные темы с учётом правил марафона"""
     marathon_day = get_marathon_day(intern)
-    completed = set(intern.get('completed_topics', []))
     topics_today = get_topics_today(intern)
 
     # Нельзя изучать больше MAX_TOPICS_PER_DAY в день
     if topics_today >= MAX_TOPICS_PER_DAY:
         return []
 
-    # Собираем все темы до текущего дня марафона
-    available = []
-    for i, topic in enumerate(TOPICS):
-        if i in completed:
-            continue
-        if topic['day'] > marathon_day:
-            continue  # Нельзя идти вперёд
-        available.append((i, topic))
-
-    return available
+    # Все непройденные темы до текущего дня марафона (вперёд идти нельзя)
+    done = CURRICULUM.mask(intern.get('completed_topics', []))
+    return CURRICULUM.items(CURRICULUM.available(done, marathon_day))
 
 def get_sections_progress(completed_topics: list) -> list:
     """Получить прогресс по неделям марафона"""
-    weeks = {
-        'week-1': {'total': 0, 'completed': 0, 'name': 'Неделя 1: От диагностики к практике'},
-        'week-2': {'total': 0, 'completed': 0, 'name': 'Неделя 2: От практики к системе'}
-    }
-
-    # Собираем темы по неделям
-    for i, topic in enumerate(TOPICS):
-        week_id = 'week-1' if topic['day'] <= 7 else 'week-2'
-        weeks[week_id]['total'] += 1
-        if i in completed_topics:
-            weeks[week_id]['completed'] += 1
-
-    return [weeks['week-1'], weeks['week-2']]
+    return CURRICULUM.sections_progress(CURRICULUM.mask(completed_topics))
 
 
 def get_lessons_tasks_progress(completed_topics: list) -> dict:
     """Получить прогресс по Урокам и Заданиям отдельно"""
-    result = {
-        'lessons': {'total': 0, 'completed': 0},
-        'tasks': {'total': 0, 'completed': 0}
-    }
-
-    for i, topic in enumerate(TOPICS):
-        topic_type = topic.get('type', 'theory')
-        if topic_type == 'theory':
-            result['lessons']['total'] += 1
-            if i in completed_topics:
-                result['lessons']['completed'] += 1
-        else:  # practice
-            result['tasks']['total'] += 1
-            if i in completed_topics:
-                result['tasks']['completed'] += 1
-
-    return result
+    return CURRICULUM.lessons_tasks_progress(CURRICULUM.mask(completed_topics))
 
 
 def get_days_progress(completed_topics: list, marathon_day: int) -> list:
     """Получить прогресс по дням марафона"""
-    days = []
-    completed_set = set(completed_topics)
-
-    for day in range(1, MARATHON_DAYS + 1):
-        day_topics = [(i, t) for i, t in enumerate(TOPICS) if t['day'] == day]
-        completed_count = sum(1 for i, _ in day_topics if i in completed_set)
-
-        status = 'locked'
-        if day <= marathon_day:
-            if completed_count == len(day_topics):
-                status = 'completed'
-            elif completed_count > 0:
-                status = 'in_progress'
-            else:
-                status = 'available'
-
-        days.append({
-            'day': day,
-            'total': len(day_topics),
-            'completed': completed_count,
-            'status': status
-        })
-
-    return days
+    return CURRICULUM.days_progress(CURRICULUM.mask(completed_topics), marathon_day)
 
 def score_topic_by_interests(topic: dict, interests: list) -> int:
     """Оценка темы по совпадению с интересами пользователя"""
@@ -1466,13 +1128,12 @@ def score_topic_by_interests(topic: dict, interests: list) -> int:
 
 def get_next_topic_index(intern: dict) -> Optional[int]:
     """Получить индекс следующей темы с учётом правил марафона"""
-    available = get_available_topics(intern)
-
-    if not available:
+    if get_topics_today(intern) >= MAX_TOPICS_PER_DAY:
         return None
 
-    # Возвращаем первую доступную тему (они уже отсортированы по дню и типу)
-    return available[0][0]
+    # Первая доступная тема — младший бит (темы отсортированы по дню и типу)
+    done = CURRICULUM.mask(intern.get('completed_topics', []))
+    return lowest_bit(CURRICULUM.available(done, get_marathon_day(intern)))
 
 
 def get_practice_for_day(intern: dict, day: int) -> Optional[tuple]:
@@ -1481,13 +1142,9 @@ def get_practice_for_day(intern: dict, day: int) -> Optional[tuple]:
     Returns:
         (index, topic) если есть незавершённая практика, иначе None
     """
-    completed = set(intern.get('completed_topics', []))
-
-    for i, topic in enumerate(TOPICS):
-        if topic['day'] == day and topic.get('type') == 'practice':
-            if i not in completed:
-                return (i, topic)
-    return None
+    done = CURRICULUM.mask(intern.get('completed_topics', []))
+    index = CURRICULUM.pending(done, day, 'practice')
+    return (index, TOPICS[index]) if index is not None else None
 
 
 def has_pending_practice(intern: dict) -> Optional[tuple]:
@@ -1506,13 +1163,9 @@ def get_theory_for_day(intern: dict, day: int) -> Optional[tuple]:
     Returns:
         (index, topic) если есть незавершённый урок, иначе None
     """
-    completed = set(intern.get('completed_topics', []))
-
-    for i, topic in enumerate(TOPICS):
-        if topic['day'] == day and topic.get('type') == 'theory':
-            if i not in completed:
-                return (i, topic)
-    return None
+    done = CURRICULUM.mask(intern.get('completed_topics', []))
+    index = CURRICULUM.pending(done, day, 'theory')
+    return (index, TOPICS[index]) if index is not None else None
 
 
 def has_pending_theory(intern: dict) -> Optional[tuple]:
@@ -1544,7 +1197,9 @@ def was_theory_sent_today(intern: dict) -> bool:
     return False
 
 # ============= КЛАВИАТУРЫ =============
+# Статические клавиатуры строятся один раз на язык (core/keyboards.py)
 
+@cached_keyboard
 def kb_experience(lang: str = 'ru') -> InlineKeyboardMarkup:
     emojis = {'student': '🎓', 'junior': '🌱', 'middle': '💼', 'senior': '⭐', 'switching': '🔄'}
     keys = ['student', 'junior', 'middle', 'senior', 'switching']
@@ -1553,6 +1208,7 @@ def kb_experience(lang: str = 'ru') -> InlineKeyboardMarkup:
         for k in keys
     ])
 
+@cached_keyboard
 def kb_difficulty(lang: str = 'ru') -> InlineKeyboardMarkup:
     emojis = {'easy': '🌱', 'medium': '🌿', 'hard': '🌳'}
     keys = ['easy', 'medium', 'hard']
@@ -1561,6 +1217,7 @@ def kb_difficulty(lang: str = 'ru') -> InlineKeyboardMarkup:
         for k in keys
     ])
 
+@cached_keyboard
 def kb_learning_style(lang: str = 'ru') -> InlineKeyboardMarkup:
     emojis = {'theoretical': '📚', 'practical': '🔧', 'mixed': '⚖️'}
     keys = ['theoretical', 'practical', 'mixed']
@@ -1569,12 +1226,14 @@ def kb_learning_style(lang: str = 'ru') -> InlineKeyboardMarkup:
         for k in keys
     ])
 
+@cached_keyboard
 def kb_study_duration(lang: str = 'ru') -> InlineKeyboardMarkup:
     return InlineKeyboardMarkup(inline_keyboard=[
         [InlineKeyboardButton(text=t(f'duration.minutes_{k}', lang), callback_data=f"duration_{k}")]
         for k in [5, 15, 25]
     ])
 
+@cached_keyboard
 def kb_confirm(lang: str = 'ru') -> InlineKeyboardMarkup:
     return InlineKeyboardMarkup(inline_keyboard=[
         [
@@ -1583,12 +1242,14 @@ def kb_confirm(lang: str = 'ru') -> InlineKeyboardMarkup:
         ]
     ])
 
+@cached_keyboard
 def kb_learn(lang: str = 'ru') -> InlineKeyboardMarkup:
     return InlineKeyboardMarkup(inline_keyboard=[
         [InlineKeyboardButton(text=t('buttons.start_now', lang), callback_data="learn")],
         [InlineKeyboardButton(text=t('buttons.start_scheduled', lang), callback_data="later")]
     ])
 
+@cached_keyboard
 def kb_update_profile(lang: str = 'ru') -> InlineKeyboardMarkup:
     return InlineKeyboardMarkup(inline_keyboard=[
         [InlineKeyboardButton(text="👤 " + t('buttons.name', lang), callback_data="upd_name"),
@@ -1602,6 +1263,7 @@ def kb_update_profile(lang: str = 'ru') -> InlineKeyboardMarkup:
         [InlineKeyboardButton(text="🌐 Language (en, es, ru)", callback_data="upd_language")]
     ])
 
+@cached_keyboard
 def kb_bloom_level(lang: str = 'ru') -> InlineKeyboardMarkup:
     """Клавиатура для выбора уровня сложности"""
     emojis = {1: '🔵', 2: '🟡', 3: '🔴'}
@@ -1613,6 +1275,7 @@ def kb_bloom_level(lang: str = 'ru') -> InlineKeyboardMarkup:
         for k in [1, 2, 3]
     ])
 
+@cached_keyboard
 def kb_bonus_question(lang: str = 'ru') -> InlineKeyboardMarkup:
     """Клавиатура для предложения дополнительного вопроса"""
     return InlineKeyboardMarkup(inline_keyboard=[
@@ -1620,6 +1283,7 @@ def kb_bonus_question(lang: str = 'ru') -> InlineKeyboardMarkup:
         [InlineKeyboardButton(text=t('buttons.bonus_no', lang), callback_data="bonus_no")]
     ])
 
+@cached_keyboard
 def kb_skip_topic(lang: str = 'ru') -> InlineKeyboardMarkup:
     """Клавиатура с кнопкой пропуска темы"""
     return InlineKeyboardMarkup(inline_keyboard=[
@@ -1628,7 +1292,10 @@ def kb_skip_topic(lang: str = 'ru') -> InlineKeyboardMarkup:
 
 def kb_marathon_start(lang: str = 'ru') -> InlineKeyboardMarkup:
     """Клавиатура для выбора даты старта марафона"""
-    today = moscow_today()
+    return _kb_marathon_start(lang, moscow_today())
+
+@cached_keyboard
+def _kb_marathon_start(lang: str, today: date) -> InlineKeyboardMarkup:
     tomorrow = today + timedelta(days=1)
     day_after = today + timedelta(days=2)
 
@@ -1646,12 +1313,14 @@ def kb_marathon_start(lang: str = 'ru') -> InlineKeyboardMarkup:
         [InlineKeyboardButton(text=f"📅 {names[2]} ({day_after.strftime('%d.%m')})", callback_data="start_day_after")]
     ])
 
+@cached_keyboard
 def kb_submit_work_product(lang: str = 'ru') -> InlineKeyboardMarkup:
     """Клавиатура для практического задания"""
     return InlineKeyboardMarkup(inline_keyboard=[
         [InlineKeyboardButton(text=t('buttons.skip_practice', lang), callback_data="skip_practice")]
     ])
 
+@cached_keyboard
 def kb_language_select() -> InlineKeyboardMarkup:
     """Клавиатура для выбора языка интерфейса"""
     return InlineKeyboardMarkup(inline_keyboard=[
@@ -2810,7 +2479,8 @@ async def on_bonus_yes(callback: CallbackQuery, state: FSMContext):
         marathon_day = get_marathon_day(intern)
         next_level = min(intern['bloom_level'] + 1, 3)
         logger.info(f"[BONUS] Генерируем вопрос уровня {next_level} для темы {topic_index}")
-        question = await claude.generate_question(topic, intern, marathon_day=marathon_day, bloom_level=next_level)
+        with call_scope(chat_id=chat_id, profile="marathon"):
+            question = await claude.generate_question(topic, intern, marathon_day=marathon_day, bloom_level=next_level)
 
         # ВАЖНО: Устанавливаем состояние СРАЗУ после генерации вопроса, ДО отправки
         await state.update_data(topic_index=topic_index, next_command=next_command, bonus_level=next_level)
@@ -3042,7 +2712,7 @@ async def on_work_product(message: Message, state: FSMContext):
 
     # Проверяем, завершён ли день
     day_topics = get_topics_for_day(marathon_day)
-    day_completed = sum(1 for i, _ in enumerate(TOPICS) if TOPICS[i]['day'] == marathon_day and i in completed)
+    day_completed = CURRICULUM.day_completed(CURRICULUM.mask(completed), marathon_day)
 
     if day_completed >= len(day_topics):
         # День полностью завершён
@@ -3221,8 +2891,9 @@ async def send_theory_topic(chat_id: int, topic: dict, intern: dict, state: Opti
     await bot.send_chat_action(chat_id=chat_id, action="typing")
     await bot.send_message(chat_id, f"⏳ {t('marathon.generating_material', lang)}")
 
-    content = await claude.generate_content(topic, intern, marathon_day=marathon_day, mcp_client=mcp_guides, knowledge_client=mcp_knowledge)
-    question = await claude.generate_question(topic, intern, marathon_day=marathon_day)
+    with call_scope(chat_id=chat_id, profile="marathon"):
+        content = await claude.generate_content(topic, intern, marathon_day=marathon_day, mcp_client=mcp_guides, knowledge_client=mcp_knowledge)
+        question = await claude.generate_question(topic, intern, marathon_day=marathon_day)
 
     # Используем день из темы, а не текущий день марафона
     header = (
@@ -3268,7 +2939,8 @@ async def send_practice_topic(chat_id: int, topic: dict, intern: dict, state: Op
     await bot.send_message(chat_id, f"⏳ {t('marathon.preparing_practice', lang)}")
 
     # Генерируем краткое введение
-    intro = await claude.generate_practice_intro(topic, intern, marathon_day=marathon_day)
+    with call_scope(chat_id=chat_id, profile="marathon"):
+        intro = await claude.generate_practice_intro(topic, intern, marathon_day=marathon_day)
 
     task = topic.get('task', '')
     work_product = topic.get('work_product', '')
@@ -3691,11 +3363,8 @@ async def on_unknown_message(message: Message, state: FSMContext):
             if text and not text.startswith('/') and len(text.strip()) >= 3:
                 # Проверяем, прошла ли теория этого дня
                 marathon_day = get_marathon_day(intern)
-                day_topics = [(i, t) for i, t in enumerate(TOPICS) if t['day'] == marathon_day]
-                theory_done = any(
-                    i in intern['completed_topics']
-                    for i, t in day_topics if t.get('type') == 'theory'
-                )
+                day_theory = CURRICULUM.day_mask(marathon_day) & CURRICULUM.lessons
+                theory_done = bool(day_theory & CURRICULUM.mask(intern['completed_topics']))
 
                 if theory_done:
                     # Теория пройдена, практика ждёт ответа — принимаем как рабочий продукт
@@ -3807,6 +3476,9 @@ async def main():
     # Инициализация БД
     await init_db()
 
+    # Темы разбираются при старте, а не на первом уроке
+    get_topic_registry()
+
     bot = Bot(token=BOT_TOKEN)
     dp = Dispatcher(storage=PostgresStorage())
 
@@ -3866,10 +3538,37 @@ async def main():
 
     # Запуск планировщика
     scheduler.add_job(scheduled_check, 'cron', minute='*')
+    scheduler.add_job(get_accounting().flush, 'interval', seconds=ACCOUNTING_FLUSH_INTERVAL)
+    # Проверка MCP серверов: больной источник пропускается, пока не ответит на пинг
+    scheduler.add_job(check_mcp_health, 'interval', seconds=MCP_HEALTH_CHECK_INTERVAL)
+    # Статистика корпуса для IDF пишется на диск в фоне, не на пути запроса
+    scheduler.add_job(get_corpus_stats().flush, 'interval', seconds=RERANK_IDF_SAVE_INTERVAL)
+    scheduler.add_job(get_expansion_stats().flush, 'interval', seconds=EXPANSION_STATS_SAVE_INTERVAL)
+    if GUIDES_MIRROR_ENABLED:
+        # Ночная инкрементальная синхронизация локального зеркала руководств
+        scheduler.add_job(sync_guides_mirror, 'cron', hour=4, minute=30)
+    if FEED_PREFETCH_ENABLED:
+        # Дайджест Ленты готовим заранее, к напоминанию пользователя
+        from engines.feed.prefetch import get_digest_prefetcher
+        scheduler.add_job(get_digest_prefetcher().prepare_due, 'cron', minute='*')
+    # Актуальные темы для предложений Ленты — один снимок на всех
+    from engines.feed.planner import get_trending_snapshot
+    scheduler.add_job(get_trending_snapshot().refresh, 'interval', hours=FEED_TRENDING_REFRESH_HOURS)
     scheduler.start()
 
+    # Пустое зеркало (первый запуск, новый контейнер) наполняем в фоне
+    if GUIDES_MIRROR_ENABLED and not get_guides_mirror().is_ready("ru"):
+        asyncio.create_task(sync_guides_mirror())
+
     logger.info("🚀 Бот запущен с PostgreSQL!")
-    await dp.start_polling(bot)
+    try:
+        await dp.start_polling(bot)
+    finally:
+        # Закрываем долгоживущие HTTP-сессии MCP, сбрасываем учёт вызовов и статистику поиска
+        await close_mcp_clients()
+        await get_accounting().flush()
+        get_corpus_stats().save()
+        get_expansion_stats().save()
 
 if __name__ == "__main__":
     asyncio.run(main())
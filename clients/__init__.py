@@ -4,10 +4,17 @@
 Содержит:
 - claude.py: ClaudeClient для работы с Claude API
 - mcp.py: MCPClient для работы с MCP серверами
+- mcp_health.py: здоровье MCP серверов (адаптивные таймауты, circuit breaker)
+- llm_limiter.py: лимит одновременных вызовов LLM с очередью по приоритету
 """
 
 from .claude import ClaudeClient, claude
-from .mcp import MCPClient, mcp_guides, mcp_knowledge, mcp
+from .mcp import MCPClient, mcp_guides, mcp_knowledge, mcp, close_mcp_clients
+from .mcp_health import get_health_snapshot, check_mcp_health
+from .llm_limiter import (
+    PriorityLimiter, get_llm_limiter, llm_priority,
+    PRIORITY_INTERACTIVE, PRIORITY_BACKGROUND,
+)
 
 __all__ = [
     'ClaudeClient',
@@ -16,4 +23,12 @@ __all__ = [
     'mcp_guides',
     'mcp_knowledge',
     'mcp',
+    'close_mcp_clients',
+    'get_health_snapshot',
+    'check_mcp_health',
+    'PriorityLimiter',
+    'get_llm_limiter',
+    'llm_priority',
+    'PRIORITY_INTERACTIVE',
+    'PRIORITY_BACKGROUND',
 ]
@@ -0,0 +1,306 @@
+"""
+Учёт вызовов LLM и MCP: токены, латентность, стоимость.
+
+Каждый вызов Claude API и инструмента MCP записывается:
+- в скользящий агрегат в памяти (по call site) — для быстрых оценок p50/p95;
+- в буфер, который пачками сбрасывается в таблицу llm_calls.
+
+Контекст вызова (call site, chat_id, профиль) передаётся через call_scope,
+чтобы не прокидывать его через все сигнатуры:
+
+    with call_scope("feed.digest", chat_id=chat_id, profile="feed"):
+        await generate_multi_topic_digest(...)
+
+Отчёт из БД:
+    python -m clients.accounting --days 7
+"""
+
+import asyncio
+import hashlib
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field, asdict
+from datetime import datetime
+from typing import Optional, Dict, List, Deque
+
+from config import (
+    get_logger,
+    LLM_PRICING,
+    ACCOUNTING_SALT,
+    ACCOUNTING_BATCH_SIZE,
+    ACCOUNTING_WINDOW,
+)
+
+logger = get_logger(__name__)
+
+# Максимум записей в буфере, если БД недоступна (старые отбрасываются)
+MAX_PENDING_BATCHES = 20
+
+
+# =============================================================================
+# КОНТЕКСТ ВЫЗОВА
+# =============================================================================
+
+_scope: ContextVar[dict] = ContextVar("llm_call_scope", default={})
+
+
+@contextmanager
+def call_scope(call_site: str = None, chat_id: int = None, profile: str = None):
+    """Задаёт контекст для всех вызовов LLM/MCP внутри блока
+
+    Вложенные scope наследуют незаданные поля от внешнего.
+    """
+    scope = dict(_scope.get())
+    if call_site is not None:
+        scope["call_site"] = call_site
+    if chat_id is not None:
+        scope["chat_id"] = chat_id
+    if profile is not None:
+        scope["profile"] = profile
+
+    token = _scope.set(scope)
+    try:
+        yield scope
+    finally:
+        _scope.reset(token)
+
+
+def current_scope() -> dict:
+    """Текущий контекст вызова"""
+    return _scope.get()
+
+
+def hash_chat_id(chat_id: Optional[int]) -> Optional[str]:
+    """Необратимый хеш chat_id для хранения в статистике"""
+    if chat_id is None:
+        return None
+    raw = f"{ACCOUNTING_SALT}:{chat_id}".encode()
+    return hashlib.sha256(raw).hexdigest()[:16]
+
+
+def estimate_cost(model: str, input_tokens: int = 0, output_tokens: int = 0,
+                  cache_creation_tokens: int = 0, cache_read_tokens: int = 0) -> float:
+    """Оценка стоимости вызова в USD по таблице LLM_PRICING"""
+    prices = LLM_PRICING.get(model)
+    if not prices:
+        return 0.0
+    total = (
+        input_tokens * prices["input"]
+        + output_tokens * prices["output"]
+        + cache_creation_tokens * prices["cache_write"]
+        + cache_read_tokens * prices["cache_read"]
+    )
+    return round(total / 1_000_000, 6)
+
+
+# =============================================================================
+# ЗАПИСИ И АГРЕГАТЫ
+# =============================================================================
+
+@dataclass
+class CallRecord:
+    """Один вызов LLM или MCP"""
+    kind: str                      # "llm" | "mcp"
+    call_site: str
+    target: str                    # модель или "<сервер>:<инструмент>"
+    chat_hash: Optional[str] = None
+    profile: Optional[str] = None
+    input_tokens: int = 0
+    output_tokens: int = 0
+    cache_creation_tokens: int = 0
+    cache_read_tokens: int = 0
+    cost_usd: float = 0.0
+    latency_ms: int = 0
+    outcome: str = "ok"
+    created_at: datetime = field(default_factory=datetime.utcnow)
+
+
+@dataclass
+class SiteStats:
+    """Скользящий агрегат по одному call site"""
+    calls: int = 0
+    errors: int = 0
+    input_tokens: int = 0
+    output_tokens: int = 0
+    cache_read_tokens: int = 0
+    cost_usd: float = 0.0
+    latencies: Deque[int] = field(default_factory=lambda: deque(maxlen=ACCOUNTING_WINDOW))
+
+    def add(self, record: CallRecord):
+        self.calls += 1
+        if record.outcome != "ok":
+            self.errors += 1
+        self.input_tokens += record.input_tokens
+        self.output_tokens += record.output_tokens
+        self.cache_read_tokens += record.cache_read_tokens
+        self.cost_usd += record.cost_usd
+        self.latencies.append(record.latency_ms)
+
+    def percentile(self, q: float) -> int:
+        """Перцентиль латентности по окну (q от 0 до 1)"""
+        if not self.latencies:
+            return 0
+        ordered = sorted(self.latencies)
+        index = min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))
+        return ordered[index]
+
+    def to_dict(self) -> dict:
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "input_tokens": self.input_tokens,
+            "output_tokens": self.output_tokens,
+            "cache_read_tokens": self.cache_read_tokens,
+            "cost_usd": round(self.cost_usd, 4),
+            "p50_ms": self.percentile(0.5),
+            "p95_ms": self.percentile(0.95),
+        }
+
+
+# =============================================================================
+# УЧЁТ
+# =============================================================================
+
+class CallAccounting:
+    """Сбор статистики вызовов: агрегат в памяти + пакетная запись в БД"""
+
+    def __init__(self, batch_size: int = ACCOUNTING_BATCH_SIZE):
+        self.batch_size = batch_size
+        self._buffer: List[CallRecord] = []
+        self._stats: Dict[str, SiteStats] = {}
+        self._flush_lock = asyncio.Lock()
+
+    def record(self, kind: str, target: str, default_site: str = "unknown",
+               latency_ms: int = 0, outcome: str = "ok",
+               usage: dict = None) -> CallRecord:
+        """Записать вызов
+
+        Args:
+            kind: "llm" или "mcp"
+            target: модель или "<сервер>:<инструмент>"
+            default_site: call site, если не задан через call_scope
+            latency_ms: время вызова
+            outcome: "ok", "timeout", "http_<код>", "error", ...
+            usage: блок usage из ответа Claude API
+        """
+        scope = _scope.get()
+        usage = usage or {}
+
+        record = CallRecord(
+            kind=kind,
+            call_site=scope.get("call_site") or default_site,
+            target=target,
+            chat_hash=hash_chat_id(scope.get("chat_id")),
+            profile=scope.get("profile"),
+            input_tokens=usage.get("input_tokens") or 0,
+            output_tokens=usage.get("output_tokens") or 0,
+            cache_creation_tokens=usage.get("cache_creation_input_tokens") or 0,
+            cache_read_tokens=usage.get("cache_read_input_tokens") or 0,
+            latency_ms=int(latency_ms),
+            outcome=outcome,
+        )
+        if kind == "llm":
+            record.cost_usd = estimate_cost(
+                target, record.input_tokens, record.output_tokens,
+                record.cache_creation_tokens, record.cache_read_tokens
+            )
+
+        key = f"{kind}:{record.call_site}"
+        self._stats.setdefault(key, SiteStats()).add(record)
+        self._buffer.append(record)
+
+        if len(self._buffer) >= self.batch_size:
+            try:
+                asyncio.get_running_loop().create_task(self.flush())
+            except RuntimeError:
+                pass  # нет event loop — сбросим при следующем flush
+
+        return record
+
+    async def flush(self) -> int:
+        """Сбросить буфер в таблицу llm_calls
+
+        Returns:
+            Количество записанных строк
+        """
+        async with self._flush_lock:
+            if not self._buffer:
+                return 0
+            batch, self._buffer = self._buffer, []
+
+            try:
+                from db.queries.llm_calls import save_llm_calls
+                await save_llm_calls([asdict(r) for r in batch])
+                return len(batch)
+            except Exception as e:
+                logger.warning(f"Учёт вызовов: не удалось записать {len(batch)} строк: {e}")
+                # Возвращаем в буфер, но не копим бесконечно
+                limit = self.batch_size * MAX_PENDING_BATCHES
+                self._buffer = (batch + self._buffer)[-limit:]
+                return 0
+
+    def get_stats(self) -> Dict[str, dict]:
+        """Скользящий агрегат по call site (для мониторинга)"""
+        return {key: stats.to_dict() for key, stats in self._stats.items()}
+
+    def reset(self):
+        """Очистить агрегат и буфер"""
+        self._stats.clear()
+        self._buffer.clear()
+
+
+# Singleton
+_accounting: Optional[CallAccounting] = None
+
+
+def get_accounting() -> CallAccounting:
+    """Получить глобальный экземпляр учёта вызовов"""
+    global _accounting
+    if _accounting is None:
+        _accounting = CallAccounting()
+    return _accounting
+
+
+# =============================================================================
+# CLI-ОТЧЁТ
+# =============================================================================
+
+def format_report(rows: List[dict]) -> str:
+    """Форматирует строки отчёта в текстовую таблицу"""
+    header = f"{'kind':<4} {'call_site':<32} {'calls':>6} {'err':>4} " \
+             f"{'in_tok':>9} {'out_tok':>9} {'cache_rd':>9} {'cost$':>8} {'p50':>6} {'p95':>6}"
+    lines = [header, "-" * len(header)]
+    total_cost = 0.0
+    for row in rows:
+        total_cost += float(row["cost_usd"] or 0)
+        lines.append(
+            f"{row['kind']:<4} {str(row['call_site'])[:32]:<32} {row['calls']:>6} {row['errors']:>4} "
+            f"{row['input_tokens']:>9} {row['output_tokens']:>9} {row['cache_read_tokens']:>9} "
+            f"{float(row['cost_usd'] or 0):>8.3f} {int(row['p50_ms'] or 0):>6} {int(row['p95_ms'] or 0):>6}"
+        )
+    lines.append("-" * len(header))
+    lines.append(f"Итого: {sum(r['calls'] for r in rows)} вызовов, ${total_cost:.2f}")
+    return "\n".join(lines)
+
+
+async def _print_report(days: int):
+    from db.connection import close_pool
+    from db.queries.llm_calls import get_llm_calls_report
+
+    try:
+        rows = await get_llm_calls_report(days)
+        print(f"Вызовы LLM/MCP за {days} дн.\n")
+        print(format_report(rows))
+    finally:
+        await close_pool()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Отчёт по вызовам LLM и MCP")
+    parser.add_argument("--days", type=int, default=7, help="период в днях")
+    args = parser.parse_args()
+
+    asyncio.run(_print_report(args.days))
@@ -9,6 +9,7 @@ ClaudeClient - асинхронный клиент для генерации к
 - Интеграцию с MCP для получения контекста
 """
 
+import time
 from typing import Optional
 
 import aiohttp
@@ -16,6 +17,7 @@ import aiohttp
 from config import (
     get_logger,
     ANTHROPIC_API_KEY,
+    CLAUDE_MODEL,
     STUDY_DURATIONS,
     BLOOM_LEVELS,
     COMPLEXITY_LEVELS,
@@ -27,6 +29,10 @@ from core.helpers import (
     get_search_keys,
     get_bloom_questions,
 )
+from core import prompts
+from clients.accounting import get_accounting, call_scope
+from clients.llm_limiter import get_llm_limiter
+from clients.context_gather import gather_lesson_context
 
 logger = get_logger(__name__)
 
@@ -41,6 +47,10 @@ class ClaudeClient:
     async def generate(self, system_prompt: str, user_prompt: str) -> Optional[str]:
         """Базовый метод генерации текста через Claude API
 
+        Каждый вызов учитывается в clients.accounting (токены, латентность, исход).
+        Call site задаёт вызывающий код через call_scope, иначе — "unknown". Одновременных вызовов
+        не больше LLM_CONCURRENCY, очередь — по приоритету (clients.llm_limiter).
+
         Args:
             system_prompt: системный промпт
             user_prompt: пользовательский промпт
@@ -48,6 +58,15 @@ class ClaudeClient:
         Returns:
             Сгенерированный текст или None при ошибке
         """
+        async with get_llm_limiter().slot():
+            return await self._request(system_prompt, user_prompt)
+
+    async def _request(self, system_prompt: str, user_prompt: str) -> Optional[str]:
+        """Один запрос к Claude API (латентность — без ожидания в очереди)"""
+        started = time.perf_counter()
+        outcome = "ok"
+        usage = None
+
         async with aiohttp.ClientSession() as session:
             headers = {
                 "Content-Type": "application/json",
@@ -56,7 +75,7 @@ class ClaudeClient:
             }
 
             payload = {
-                "model": "claude-sonnet-4-20250514",
+                "model": CLAUDE_MODEL,
                 "max_tokens": 4000,
                 "system": system_prompt,
                 "messages": [{"role": "user", "content": user_prompt}]
@@ -66,14 +85,23 @@ class ClaudeClient:
                 async with session.post(self.base_url, headers=headers, json=payload) as resp:
                     if resp.status == 200:
                         data = await resp.json()
+                        usage = data.get("usage")
                         return data["content"][0]["text"]
                     else:
+                        outcome = f"http_{resp.status}"
                         error = await resp.text()
                         logger.error(f"Claude API error: {error}")
                         return None
             except Exception as e:
+                outcome = "error"
                 logger.error(f"Claude API exception: {e}")
                 return None
+            finally:
+                get_accounting().record(
+                    "llm", CLAUDE_MODEL,
+                    latency_ms=(time.perf_counter() - started) * 1000,
+                    outcome=outcome, usage=usage,
+                )
 
     async def generate_content(self, topic: dict, intern: dict, mcp_client=None, knowledge_client=None) -> str:
         """Генерирует контент для теоретической темы марафона
@@ -105,61 +133,10 @@ class ClaudeClient:
             guides_search_keys = [default_query]
             knowledge_search_keys = [default_query]
 
-        # Получаем контекст из MCP руководств (используем все ключи поиска)
-        guides_context = ""
-        if mcp_client:
-            try:
-                context_parts = []
-                seen_texts = set()  # Для дедупликации
-                for search_query in guides_search_keys[:3]:  # Максимум 3 запроса
-                    search_results = await mcp_client.semantic_search(search_query, lang="ru", limit=2)
-                    if search_results:
-                        for item in search_results:
-                            if isinstance(item, dict):
-                                text = item.get('text', item.get('content', ''))
-                            elif isinstance(item, str):
-                                text = item
-                            else:
-                                continue
-                            if text and text[:100] not in seen_texts:
-                                seen_texts.add(text[:100])
-                                context_parts.append(text[:1500])
-                if context_parts:
-                    guides_context = "\n\n".join(context_parts[:5])  # Максимум 5 фрагментов
-                    logger.info(f"{mcp_client.name}: найдено {len(context_parts)} фрагментов контекста")
-            except Exception as e:
-                logger.error(f"{mcp_client.name} search error: {e}")
-
-        # Получаем контекст из MCP базы знаний (knowledge MCP использует инструмент 'search')
-        knowledge_context = ""
-        if knowledge_client:
-            try:
-                context_parts = []
-                seen_texts = set()
-                for search_query in knowledge_search_keys[:3]:  # Максимум 3 запроса
-                    # Сортируем по дате создания (сначала новые)
-                    search_results = await knowledge_client.semantic_search(
-                        search_query, lang="ru", limit=2, sort_by="created_at:desc"
-                    )
-                    if search_results:
-                        for item in search_results:
-                            if isinstance(item, dict):
-                                text = item.get('text', item.get('content', ''))
-                                date_info = item.get('created_at', item.get('date', ''))
-                                if date_info:
-                                    text = f"[{date_info}] {text}"
-                            elif isinstance(item, str):
-                                text = item
-                            else:
-                                continue
-                            if text and text[:100] not in seen_texts:
-                                seen_texts.add(text[:100])
-                                context_parts.append(text[:1500])
-                if context_parts:
-                    knowledge_context = "\n\n".join(context_parts[:5])  # Максимум 5 фрагментов
-                    logger.info(f"{knowledge_client.name}: найдено {len(context_parts)} фрагментов (свежие посты)")
-            except Exception as e:
-                logger.error(f"{knowledge_client.name} search error: {e}")
+        # Контекст из руководств и базы знаний: все запросы параллельно, общий дедлайн
+        guides_context, knowledge_context = await gather_lesson_context(
+            mcp_client, knowledge_client, guides_search_keys, knowledge_search_keys
+        )
 
         # Объединяем контексты (knowledge имеет приоритет, поэтому идёт первым)
         mcp_context = ""
@@ -183,11 +160,7 @@ class ClaudeClient:
 
         # Определяем язык ответа
         lang = intern.get('language', 'ru')
-        lang_instruction = {
-            'ru': "ВАЖНО: Пиши ВСЁ на русском языке.",
-            'en': "IMPORTANT: Write EVERYTHING in English.",
-            'es': "IMPORTANTE: Escribe TODO en español."
-        }.get(lang, "ВАЖНО: Пиши ВСЁ на русском языке.")
+        lang_instruction = prompts.lang_instruction('write', lang)
 
         system_prompt = f"""Ты — персональный наставник по системному мышлению и личному развитию.
 {get_personalization_prompt(intern)}
@@ -225,7 +198,8 @@ class ClaudeClient:
 Начни с признания боли читателя, затем раскрой тему и подведи к ключевому инсайту.
 {"Опирайся на контекст, но адаптируй под профиль стажера. Актуальные посты важнее." if mcp_context else ""}"""
 
-        result = await self.generate(system_prompt, user_prompt)
+        with call_scope(call_site="lesson.content"):
+            result = await self.generate(system_prompt, user_prompt)
         return result or "Не удалось сгенерировать контент. Попробуйте /learn ещё раз."
 
     async def generate_practice_intro(self, topic: dict, intern: dict) -> str:
@@ -240,11 +214,7 @@ class ClaudeClient:
         """
         # Определяем язык ответа
         lang = intern.get('language', 'ru')
-        lang_instruction = {
-            'ru': "ВАЖНО: Пиши ВСЁ на русском языке.",
-            'en': "IMPORTANT: Write EVERYTHING in English.",
-            'es': "IMPORTANTE: Escribe TODO en español."
-        }.get(lang, "ВАЖНО: Пиши ВСЁ на русском языке.")
+        lang_instruction = prompts.lang_instruction('write', lang)
 
         system_prompt = f"""Ты — персональный наставник по системному мышлению.
 {get_personalization_prompt(intern)}
@@ -267,7 +237,8 @@ class ClaudeClient:
 
 Напиши краткое введение, которое мотивирует выполнить задание."""
 
-        result = await self.generate(system_prompt, user_prompt)
+        with call_scope(call_site="lesson.practice_intro"):
+            result = await self.generate(system_prompt, user_prompt)
         return result or ""
 
     async def generate_question(self, topic: dict, intern: dict, bloom_level: int = None) -> str:
@@ -320,11 +291,7 @@ class ClaudeClient:
 
         # Определяем язык ответа
         lang = intern.get('language', 'ru')
-        lang_instruction = {
-            'ru': "ВАЖНО: Задай вопрос на русском языке.",
-            'en': "IMPORTANT: Ask the question in English.",
-            'es': "IMPORTANTE: Haz la pregunta en español."
-        }.get(lang, "ВАЖНО: Задай вопрос на русском языке.")
+        lang_instruction = prompts.lang_instruction('ask', lang)
 
         system_prompt = f"""Ты генерируешь ТОЛЬКО ОДИН КОРОТКИЙ ВОПРОС. Ничего больше.
 
@@ -349,7 +316,8 @@ class ClaudeClient:
 
 Выдай ТОЛЬКО вопрос (1-3 предложения), без введения и пояснений."""
 
-        result = await self.generate(system_prompt, user_prompt)
+        with call_scope(call_site="lesson.question"):
+            result = await self.generate(system_prompt, user_prompt)
         return result or bloom['question_type'].format(concept=topic.get('main_concept', 'эту тему'))
 
 
@@ -0,0 +1,197 @@
+"""
+Параллельный сбор контекста из MCP с общим дедлайном.
+
+Все поисковые запросы урока/дайджеста запускаются одновременно.
+По истечении дедлайна (MCP_CONTEXT_DEADLINE) берём то, что успело прийти;
+опоздавшие запросы не отменяются на уровне MCPClient и прогревают кеш
+для следующих уроков.
+
+Фрагменты обрезаются по границе предложения, а итоговый контекст
+упаковывается в бюджет токенов профиля (core/context_packer.py).
+
+Используется:
+- ClaudeClient.generate_content (clients/claude.py и bot.py)
+- generate_multi_topic_digest и generate_topic_content (engines/feed/planner.py)
+"""
+
+import asyncio
+import time
+from dataclasses import dataclass, field
+from typing import Optional, List, Dict, Tuple
+
+from config import get_logger, MCP_CONTEXT_DEADLINE
+from core.context_packer import PackItem, PackedContext, pack, trim_to_chars, get_context_budget
+
+logger = get_logger(__name__)
+
+
+@dataclass
+class SearchRequest:
+    """Один поисковый запрос к MCP"""
+    client: object                 # MCPClient
+    query: str
+    source: str                    # метка источника: "guides" / "knowledge"
+    limit: int = 2
+    lang: str = "ru"
+    sort_by: Optional[str] = None
+    tag: Optional[str] = None      # например, тема дайджеста
+
+
+@dataclass
+class Fragment:
+    """Фрагмент контекста"""
+    text: str
+    source: str
+    query: str
+    tag: Optional[str] = None
+    date: Optional[str] = None
+
+
+@dataclass
+class GatheredContext:
+    """Результат сбора контекста"""
+    fragments: List[Fragment] = field(default_factory=list)
+    timings: Dict[str, int] = field(default_factory=dict)     # source → мс до последнего ответа
+    completed: Dict[str, int] = field(default_factory=dict)   # source → успевших запросов
+    timed_out: Dict[str, int] = field(default_factory=dict)   # source → опоздавших запросов
+    elapsed_ms: int = 0
+
+    def texts(self, source: str, max_parts: int = 5, with_date: bool = False) -> List[str]:
+        """Тексты фрагментов одного источника"""
+        result = []
+        for fragment in self.fragments:
+            if fragment.source != source:
+                continue
+            text = fragment.text
+            if with_date and fragment.date:
+                text = f"[{fragment.date}] {text}"
+            result.append(text)
+        return result[:max_parts]
+
+    def pack(self, budget: int, max_parts: int = 5, date_sources: Tuple[str, ...] = (),
+             with_tag: bool = False) -> PackedContext:
+        """Упаковка фрагментов в бюджет токенов
+
+        Args:
+            budget: бюджет токенов
+            max_parts: не больше фрагментов на источник
+            date_sources: источники, у которых фрагмент предваряется датой
+            with_tag: предварять фрагмент меткой запроса ("[тема]: ")
+        """
+        items, per_source = [], {}
+        for fragment in self.fragments:
+            rank = per_source.get(fragment.source, 0)
+            if rank >= max_parts:
+                continue
+            per_source[fragment.source] = rank + 1
+            prefix = f"[{fragment.tag}]: " if with_tag and fragment.tag else ""
+            if fragment.source in date_sources and fragment.date:
+                prefix += f"[{fragment.date}] "
+            items.append(PackItem(text=fragment.text, source=fragment.source, group=fragment.source,
+                                  score=1.0 / (rank + 1), prefix=prefix))
+        return pack(items, budget)
+
+
+def _item_text(item) -> Tuple[str, Optional[str]]:
+    if isinstance(item, dict):
+        text = item.get('text', item.get('content', ''))
+        date = item.get('created_at', item.get('date'))
+        return text or '', date
+    if isinstance(item, str):
+        return item, None
+    return '', None
+
+
+async def gather_context(requests: List[SearchRequest],
+                         deadline: float = MCP_CONTEXT_DEADLINE,
+                         max_chars: int = 1500) -> GatheredContext:
+    """Запускает все запросы параллельно и собирает то, что пришло к дедлайну
+
+    Args:
+        requests: поисковые запросы
+        deadline: общий бюджет времени (сек)
+        max_chars: обрезка каждого фрагмента
+
+    Returns:
+        GatheredContext: дедуплицированные фрагменты в порядке запросов + тайминги
+    """
+    gathered = GatheredContext()
+    if not requests:
+        return gathered
+
+    started = time.perf_counter()
+    finished_at: Dict[int, int] = {}
+
+    async def run(index: int, request: SearchRequest):
+        try:
+            return await request.client.semantic_search(
+                request.query, lang=request.lang, limit=request.limit, sort_by=request.sort_by
+            )
+        finally:
+            finished_at[index] = int((time.perf_counter() - started) * 1000)
+
+    tasks = [asyncio.ensure_future(run(i, r)) for i, r in enumerate(requests)]
+    done, pending = await asyncio.wait(tasks, timeout=deadline)
+    for task in pending:
+        task.cancel()
+
+    seen = set()
+    for index, (request, task) in enumerate(zip(requests, tasks)):
+        if task not in done:
+            gathered.timed_out[request.source] = gathered.timed_out.get(request.source, 0) + 1
+            continue
+        gathered.completed[request.source] = gathered.completed.get(request.source, 0) + 1
+        gathered.timings[request.source] = max(gathered.timings.get(request.source, 0),
+                                               finished_at.get(index, 0))
+        if task.exception():
+            logger.error(f"ContextGather: ошибка запроса {request.source} '{request.query[:50]}': "
+                         f"{task.exception()}")
+            continue
+
+        for item in task.result() or []:
+            text, date = _item_text(item)
+            if not text or text[:100] in seen:
+                continue
+            seen.add(text[:100])
+            gathered.fragments.append(Fragment(
+                text=trim_to_chars(text, max_chars), source=request.source,
+                query=request.query, tag=request.tag, date=date,
+            ))
+
+    gathered.elapsed_ms = int((time.perf_counter() - started) * 1000)
+
+    summary = ", ".join(
+        f"{source} {gathered.completed.get(source, 0)}/"
+        f"{gathered.completed.get(source, 0) + gathered.timed_out.get(source, 0)} "
+        f"за {gathered.timings.get(source, 0)}мс"
+        for source in dict.fromkeys(r.source for r in requests)
+    )
+    log = logger.warning if gathered.timed_out else logger.info
+    log(f"ContextGather: {summary}; {len(gathered.fragments)} фрагментов, "
+        f"всего {gathered.elapsed_ms}мс (дедлайн {deadline}с)")
+
+    return gathered
+
+
+async def gather_lesson_context(guides_client, knowledge_client,
+                                guides_keys: List[str],
+                                knowledge_keys: List[str]) -> Tuple[str, str]:
+    """Контекст для урока марафона: руководства + свежие посты
+
+    Returns:
+        (guides_context, knowledge_context) — до 5 фрагментов каждый,
+        вместе не больше бюджета профиля "lesson"
+    """
+    requests = []
+    if guides_client:
+        requests += [SearchRequest(guides_client, q, "guides", limit=2) for q in guides_keys[:3]]
+    if knowledge_client:
+        # Сортируем по дате создания (сначала новые)
+        requests += [SearchRequest(knowledge_client, q, "knowledge", limit=2, sort_by="created_at:desc")
+                     for q in knowledge_keys[:3]]
+
+    gathered = await gather_context(requests)
+    packed = gathered.pack(get_context_budget("lesson"), date_sources=("knowledge",))
+    guides_context = "\n\n".join(packed.texts("guides"))
+    knowledge_context = "\n\n".join(packed.texts("knowledge"))
+    return guides_context, knowledge_context
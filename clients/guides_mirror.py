@@ -0,0 +1,342 @@
+"""
+Локальное зеркало руководств (MCP-Guides) с полнотекстовым индексом.
+
+Синхронизация: get_guides_list → get_guide_sections → get_section_content,
+разделы режутся на фрагменты и кладутся в SQLite FTS5. Обновление
+инкрементальное: руководство перекачивается, только если изменился
+список его разделов или истёк GUIDES_MIRROR_MAX_AGE_DAYS. Обход идёт
+мимо кеша MCP: он не вытесняет горячие записи поиска, а изменения видны
+сразу, а не через TTL списков. Если часть разделов не скачалась, прежние
+фрагменты этих разделов остаются, а отметка синхронизации не обновляется —
+следующий запуск докачает руководство.
+
+Поиск: BM25 (встроенный в FTS5) с префиксным сопоставлением слов —
+грубая замена стемминга для русской морфологии. Формат результатов
+совместим с semantic_search MCP-Guides, поэтому зеркало подключается
+к MCPClient как local_backend; удалённый MCP остаётся fallback.
+
+Запуск синхронизации вручную:
+    python -m clients.guides_mirror
+"""
+
+import asyncio
+import hashlib
+import json
+import re
+import sqlite3
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Optional, List, Dict, Set
+
+from config import (
+    get_logger,
+    GUIDES_MIRROR_PATH,
+    GUIDES_MIRROR_LANGS,
+    GUIDES_MIRROR_MAX_AGE_DAYS,
+    GUIDES_SYNC_CONCURRENCY,
+)
+
+logger = get_logger(__name__)
+
+# Размер фрагмента раздела (символов)
+CHUNK_SIZE = 1500
+
+_WORD = re.compile(r'\w+', re.UNICODE)
+
+SCHEMA = [
+    '''
+    CREATE TABLE IF NOT EXISTS guides (
+        guide_slug TEXT,
+        lang TEXT,
+        title TEXT,
+        listing_hash TEXT,
+        synced_at TEXT,
+        PRIMARY KEY (guide_slug, lang)
+    )
+    ''',
+    '''
+    CREATE VIRTUAL TABLE IF NOT EXISTS chunks USING fts5(
+        guide_slug UNINDEXED,
+        section_slug UNINDEXED,
+        lang UNINDEXED,
+        guide_title,
+        section_title,
+        text,
+        tokenize = 'unicode61 remove_diacritics 2'
+    )
+    ''',
+]
+
+
+def _hash(value) -> str:
+    return hashlib.md5(json.dumps(value, sort_keys=True, ensure_ascii=False).encode()).hexdigest()
+
+
+def _slug(item: dict) -> Optional[str]:
+    return item.get('slug') or item.get('id') or item.get('guide_slug') or item.get('section_slug')
+
+
+def _title(item: dict) -> str:
+    return item.get('title') or item.get('name') or _slug(item) or ''
+
+
+def split_chunks(text: str, size: int = CHUNK_SIZE) -> List[str]:
+    """Режет текст на фрагменты по абзацам, не длиннее size"""
+    chunks, current = [], ''
+    for paragraph in re.split(r'\n\s*\n', text or ''):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        if current and len(current) + len(paragraph) + 2 > size:
+            chunks.append(current)
+            current = ''
+        while len(paragraph) > size:
+            chunks.append(paragraph[:size])
+            paragraph = paragraph[size:]
+        current = f"{current}\n\n{paragraph}" if current else paragraph
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def build_match_query(query: str) -> Optional[str]:
+    """Запрос FTS5: слова через OR, длинные слова — по префиксу (≈ основа)"""
+    terms = []
+    for word in _WORD.findall((query or '').lower()):
+        if len(word) < 3:
+            continue
+        if len(word) <= 3:
+            terms.append(f'"{word}"')
+            continue
+        # Отрезаем окончание: 4–5 букв — одну, длиннее — около трети
+        stem_length = len(word) - 1 if len(word) <= 5 else max(4, int(len(word) * 0.7))
+        terms.append(f'"{word[:stem_length]}"*')
+    return ' OR '.join(dict.fromkeys(terms)) or None
+
+
+class GuidesMirror:
+    """Локальное зеркало руководств в SQLite FTS5"""
+
+    def __init__(self, path: Path = GUIDES_MIRROR_PATH):
+        self.path = Path(path)
+        self._ready_langs: Optional[Set[str]] = None
+        self._schema_ready = False
+
+    @contextmanager
+    def _connect(self):
+        """Соединение с SQLite: commit при успехе, закрытие всегда"""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(self.path)
+        try:
+            if not self._schema_ready:
+                for statement in SCHEMA:
+                    conn.execute(statement)
+                self._schema_ready = True
+            yield conn
+            conn.commit()
+        finally:
+            conn.close()
+
+    def is_ready(self, lang: str = "ru") -> bool:
+        """Есть ли в зеркале данные для языка"""
+        if self._ready_langs is None:
+            self._ready_langs = set()
+            if self.path.exists():
+                try:
+                    with self._connect() as conn:
+                        rows = conn.execute('SELECT DISTINCT lang FROM guides').fetchall()
+                    self._ready_langs = {row[0] for row in rows}
+                except sqlite3.Error as e:
+                    logger.warning(f"GuidesMirror: не удалось открыть {self.path}: {e}")
+        return lang in self._ready_langs
+
+    # ==================== ПОИСК ====================
+
+    def search(self, query: str, lang: str = "ru", limit: int = 5) -> List[dict]:
+        """BM25-поиск по зеркалу (формат как у semantic_search)
+
+        Returns:
+            Список результатов или [] (если зеркало пустое или ничего не нашлось)
+        """
+        if not self.is_ready(lang):
+            return []
+        match = build_match_query(query)
+        if not match:
+            return []
+
+        try:
+            with self._connect() as conn:
+                rows = conn.execute('''
+                    SELECT guide_slug, section_slug, guide_title, section_title, text,
+                           bm25(chunks, 0, 0, 0, 2.0, 3.0, 1.0) AS score
+                    FROM chunks
+                    WHERE chunks MATCH ? AND lang = ?
+                    ORDER BY score
+                    LIMIT ?
+                ''', (match, lang, limit)).fetchall()
+        except sqlite3.Error as e:
+            logger.warning(f"GuidesMirror: ошибка поиска '{query[:50]}': {e}")
+            return []
+
+        return [{
+            'text': text,
+            'guide': guide_title,
+            'guide_slug': guide_slug,
+            'section': section_title,
+            'section_slug': section_slug,
+            'source': f"{guide_title} — {section_title}" if section_title else guide_title,
+            'score': round(-score, 4),  # bm25() в FTS5 отрицательный: меньше — лучше
+        } for guide_slug, section_slug, guide_title, section_title, text, score in rows]
+
+    # ==================== СИНХРОНИЗАЦИЯ ====================
+
+    async def sync(self, client, lang: str = "ru", force: bool = False) -> Dict[str, int]:
+        """Инкрементальная синхронизация зеркала с MCP-Guides
+
+        Args:
+            client: MCPClient для MCP-Guides
+            lang: язык
+            force: перекачать все руководства
+
+        Returns:
+            Статистика: guides, skipped, sections, removed
+        """
+        stats = {'guides': 0, 'skipped': 0, 'sections': 0, 'removed': 0}
+
+        guides = await client.get_guides_list(lang=lang, use_cache=False)
+        if not guides:
+            logger.warning(f"GuidesMirror: пустой список руководств ({lang}), синхронизация пропущена")
+            return stats
+
+        with self._connect() as conn:
+            known = {
+                row[0]: (row[1], row[2])
+                for row in conn.execute(
+                    'SELECT guide_slug, listing_hash, synced_at FROM guides WHERE lang = ?', (lang,)
+                )
+            }
+
+        semaphore = asyncio.Semaphore(GUIDES_SYNC_CONCURRENCY)
+        max_age = timedelta(days=GUIDES_MIRROR_MAX_AGE_DAYS)
+        current_slugs = set()
+
+        async def fetch_section(guide_slug: str, section: dict):
+            async with semaphore:
+                content = await client.get_section_content(guide_slug, _slug(section), lang=lang,
+                                                           use_cache=False)
+            return section, content
+
+        for guide in guides:
+            guide_slug = _slug(guide)
+            if not guide_slug:
+                continue
+            current_slugs.add(guide_slug)
+
+            sections = await client.get_guide_sections(guide_slug, lang=lang, use_cache=False)
+            sections = [s for s in sections if isinstance(s, dict) and _slug(s)]
+            listing_hash = _hash([guide, sections])
+
+            previous = known.get(guide_slug)
+            if previous and not force:
+                previous_hash, synced_at = previous
+                fresh = synced_at and datetime.fromisoformat(synced_at) > datetime.utcnow() - max_age
+                if previous_hash == listing_hash and fresh:
+                    stats['skipped'] += 1
+                    continue
+
+            fetched = await asyncio.gather(*[fetch_section(guide_slug, s) for s in sections])
+
+            # Если ни один раздел не скачался — не затираем старую копию
+            if sections and not any(content for _, content in fetched):
+                logger.warning(f"GuidesMirror: не удалось скачать разделы {guide_slug}, оставляем старую копию")
+                continue
+
+            # Не скачавшиеся разделы: оставляем их прежние фрагменты и старую
+            # отметку синхронизации, чтобы следующий запуск повторил попытку
+            missing = [_slug(section) for section, content in fetched if not content]
+            if missing:
+                logger.warning(f"GuidesMirror: {guide_slug}: не скачались разделы {missing}, "
+                               f"руководство будет докачано при следующей синхронизации")
+                listing_hash, synced_at = previous or (None, None)
+            else:
+                synced_at = datetime.utcnow().isoformat()
+
+            with self._connect() as conn:
+                conn.execute(
+                    'DELETE FROM chunks WHERE guide_slug = ? AND lang = ? AND section_slug NOT IN (%s)'
+                    % ', '.join('?' * len(missing)),
+                    (guide_slug, lang, *missing)
+                )
+                for section, content in fetched:
+                    if not content:
+                        continue
+                    for chunk in split_chunks(content):
+                        conn.execute(
+                            'INSERT INTO chunks (guide_slug, section_slug, lang, guide_title, section_title, text) '
+                            'VALUES (?, ?, ?, ?, ?, ?)',
+                            (guide_slug, _slug(section), lang, _title(guide), _title(section), chunk)
+                        )
+                    stats['sections'] += 1
+                conn.execute(
+                    'INSERT OR REPLACE INTO guides (guide_slug, lang, title, listing_hash, synced_at) '
+                    'VALUES (?, ?, ?, ?, ?)',
+                    (guide_slug, lang, _title(guide), listing_hash, synced_at)
+                )
+            stats['guides'] += 1
+
+        # Руководства, которых больше нет на сервере
+        removed = set(known) - current_slugs
+        if removed:
+            with self._connect() as conn:
+                for guide_slug in removed:
+                    conn.execute('DELETE FROM chunks WHERE guide_slug = ? AND lang = ?', (guide_slug, lang))
+                    conn.execute('DELETE FROM guides WHERE guide_slug = ? AND lang = ?', (guide_slug, lang))
+            stats['removed'] = len(removed)
+
+        self._ready_langs = None
+        logger.info(f"GuidesMirror ({lang}): обновлено {stats['guides']} руководств "
+                    f"({stats['sections']} разделов), без изменений {stats['skipped']}, "
+                    f"удалено {stats['removed']}")
+        return stats
+
+
+# Singleton
+_mirror: Optional[GuidesMirror] = None
+
+
+def get_guides_mirror() -> GuidesMirror:
+    """Получить глобальное зеркало руководств"""
+    global _mirror
+    if _mirror is None:
+        _mirror = GuidesMirror()
+    return _mirror
+
+
+async def sync_guides_mirror(force: bool = False):
+    """Синхронизировать зеркало по всем языкам (задача планировщика)"""
+    from clients.mcp import mcp_guides
+
+    mirror = get_guides_mirror()
+    for lang in GUIDES_MIRROR_LANGS:
+        try:
+            await mirror.sync(mcp_guides, lang=lang, force=force)
+        except Exception as e:
+            logger.error(f"GuidesMirror: ошибка синхронизации ({lang}): {e}", exc_info=True)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Синхронизация локального зеркала руководств")
+    parser.add_argument("--force", action="store_true", help="перекачать все руководства")
+    args = parser.parse_args()
+
+    async def _run():
+        from clients.mcp import close_mcp_clients
+        try:
+            await sync_guides_mirror(force=args.force)
+        finally:
+            await close_mcp_clients()
+
+    asyncio.run(_run())
@@ -0,0 +1,124 @@
+"""
+Ограничение одновременных запросов к LLM с приоритетами.
+
+Не больше LLM_CONCURRENCY вызовов Claude API идут одновременно, остальные
+ждут в очереди. Из очереди первым выходит вызов с меньшим номером
+приоритета, при равном — пришедший раньше. Так параллельные секции
+дайджеста и ответы пользователю не стоят за фоновой предгенерацией.
+
+Приоритет задаётся для блока кода, как call_scope:
+
+    with llm_priority(PRIORITY_BACKGROUND):
+        await engine.prepare_next_session()
+"""
+
+import asyncio
+import heapq
+import itertools
+import time
+from contextlib import contextmanager, asynccontextmanager
+from contextvars import ContextVar
+from typing import Optional, List, Tuple
+
+from config import get_logger, LLM_CONCURRENCY
+
+logger = get_logger(__name__)
+
+PRIORITY_INTERACTIVE = 0   # пользователь ждёт ответа
+PRIORITY_BACKGROUND = 10   # предгенерация, обслуживание
+
+_priority: ContextVar[int] = ContextVar("llm_priority", default=PRIORITY_INTERACTIVE)
+
+
+@contextmanager
+def llm_priority(priority: int):
+    """Задаёт приоритет всех вызовов LLM внутри блока"""
+    token = _priority.set(priority)
+    try:
+        yield priority
+    finally:
+        _priority.reset(token)
+
+
+def current_priority() -> int:
+    return _priority.get()
+
+
+class PriorityLimiter:
+    """Семафор с очередью по приоритету"""
+
+    def __init__(self, concurrency: int = LLM_CONCURRENCY):
+        self.concurrency = concurrency
+        self.active = 0
+        self._waiters: List[Tuple[int, int, asyncio.Future]] = []
+        self._seq = itertools.count()
+
+        self.acquired = 0
+        self.queued = 0
+        self.max_queue = 0
+        self.total_wait_ms = 0.0
+
+    async def acquire(self, priority: Optional[int] = None):
+        """Занять слот (ждёт в очереди, если все заняты)"""
+        if priority is None:
+            priority = current_priority()
+        self.acquired += 1
+
+        if self.active < self.concurrency and not self._waiters:
+            self.active += 1
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._seq), future))
+        self.queued += 1
+        self.max_queue = max(self.max_queue, len(self._waiters))
+        started = time.perf_counter()
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # Слот уже передан нам — отдаём следующему
+                self.release()
+            raise
+        finally:
+            self.total_wait_ms += (time.perf_counter() - started) * 1000
+
+    def release(self):
+        """Освободить слот: передать его первому в очереди или вернуть"""
+        while self._waiters:
+            _, _, future = heapq.heappop(self._waiters)
+            if not future.done():
+                future.set_result(None)
+                return
+        self.active -= 1
+
+    @asynccontextmanager
+    async def slot(self, priority: Optional[int] = None):
+        await self.acquire(priority)
+        try:
+            yield
+        finally:
+            self.release()
+
+    def get_stats(self) -> dict:
+        return {
+            'concurrency': self.concurrency,
+            'active': self.active,
+            'waiting': len(self._waiters),
+            'acquired': self.acquired,
+            'queued': self.queued,
+            'max_queue': self.max_queue,
+            'avg_wait_ms': round(self.total_wait_ms / self.queued, 1) if self.queued else 0.0,
+        }
+
+
+# Singleton
+_limiter: Optional[PriorityLimiter] = None
+
+
+def get_llm_limiter() -> PriorityLimiter:
+    """Получить глобальный лимитер вызовов LLM"""
+    global _limiter
+    if _limiter is None:
+        _limiter = PriorityLimiter()
+    return _limiter
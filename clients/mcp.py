@@ -5,15 +5,43 @@ MCPClient - универсальный клиент для JSON-RPC взаимо
 Поддерживает:
 - MCP-Guides (руководства): semantic_search, get_guides_list, get_guide_sections
 - MCP-Knowledge (база знаний): search
+
+Соединения: одна долгоживущая aiohttp-сессия с keep-alive на каждый сервер.
+Несколько поисковых запросов можно отправить одним HTTP-запросом
+(JSON-RPC 2.0 batch): semantic_search_many / search_many.
+
+Результаты кешируются (clients/mcp_cache.py): TTL по инструментам,
+stale-while-revalidate, короткий кеш пустых ответов.
+
+Для MCP-Guides поиск сначала идёт в локальное зеркало
+(clients/guides_mirror.py), удалённый сервер — fallback.
+
+Здоровье серверов (clients/mcp_health.py): таймаут запроса подстраивается
+под наблюдаемый p99, а больной сервер (circuit breaker открыт)
+пропускается сразу — вызов возвращает None без ожидания таймаута.
 """
 
 import json
+import time
 import asyncio
-from typing import Optional, List
+from typing import Optional, List, Tuple
 
 import aiohttp
 
-from config import get_logger, MCP_URL, KNOWLEDGE_MCP_URL
+from config import (
+    get_logger,
+    MCP_URL,
+    KNOWLEDGE_MCP_URL,
+    MCP_TIMEOUT,
+    MCP_POOL_SIZE,
+    MCP_KEEPALIVE_TIMEOUT,
+    MCP_TIMEOUT_MIN,
+    GUIDES_MIRROR_ENABLED,
+)
+from clients.accounting import get_accounting
+from clients.mcp_cache import MCPCache, get_mcp_cache, make_cache_key
+from clients.guides_mirror import get_guides_mirror
+from clients.mcp_health import get_endpoint_health
 
 logger = get_logger(__name__)
 
@@ -21,33 +49,66 @@ logger = get_logger(__name__)
 class MCPClient:
     """Универсальный клиент для работы с MCP серверами Aisystant"""
 
-    def __init__(self, url: str, name: str = "MCP", search_tool: str = "semantic_search"):
+    def __init__(self, url: str, name: str = "MCP", search_tool: str = "semantic_search",
+                 cache: MCPCache = None, use_cache: bool = True, local_backend=None):
         """
         Args:
             url: URL MCP сервера
-            name: имя клиента для логов
+            name: имя клиента для логов (и часть ключа кеша)
             search_tool: инструмент поиска ("semantic_search" для guides, "search" для knowledge)
+            cache: кеш результатов (по умолчанию общий)
+            use_cache: использовать кеш
+            local_backend: локальный индекс с методами is_ready(lang) и search(query, lang, limit)
+                (например, GuidesMirror); удалённый сервер тогда — fallback
         """
         self.base_url = url
         self.name = name
         self.search_tool = search_tool
         self._request_id = 0
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._session_loop = None
+        self._batch_supported = True
+        self.cache = cache or get_mcp_cache()
+        self.use_cache = use_cache
+        self.local_backend = local_backend
+        self._inflight = {}
+        self._refreshing = set()
+        self._refresh_tasks = set()  # ссылки на фоновые обновления, чтобы их не собрал GC
+        self.health = get_endpoint_health(name)
 
     def _next_id(self) -> int:
         self._request_id += 1
         return self._request_id
 
-    async def _call(self, tool_name: str, arguments: dict) -> Optional[dict]:
-        """Вызов инструмента MCP через JSON-RPC
-
-        Args:
-            tool_name: имя инструмента
-            arguments: аргументы вызова
+    def _get_session(self) -> aiohttp.ClientSession:
+        """Долгоживущая сессия с пулом keep-alive соединений
 
-        Returns:
-            Результат вызова или None при ошибке
+        Пересоздаётся, если закрыта или создана в другом event loop.
         """
-        payload = {
+        loop = asyncio.get_running_loop()
+        if self._session is None or self._session.closed or self._session_loop is not loop:
+            connector = aiohttp.TCPConnector(
+                limit=MCP_POOL_SIZE,
+                keepalive_timeout=MCP_KEEPALIVE_TIMEOUT,
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                headers={"Content-Type": "application/json"},
+                timeout=aiohttp.ClientTimeout(total=MCP_TIMEOUT),
+            )
+            self._session_loop = loop
+        return self._session
+
+    async def close(self):
+        """Закрыть сессию (при остановке бота)"""
+        if self._session and not self._session.closed:
+            await self._session.close()
+        self._session = None
+        self._session_loop = None
+
+    def _make_request(self, tool_name: str, arguments: dict) -> dict:
+        """JSON-RPC запрос tools/call"""
+        return {
             "jsonrpc": "2.0",
             "method": "tools/call",
             "params": {
@@ -57,48 +118,338 @@ class MCPClient:
             "id": self._next_id()
         }
 
+    def _cache_key(self, tool_name: str, arguments: dict):
+        """Ключ кеша или None, если вызов не кешируется"""
+        if self.use_cache and self.cache.is_cacheable(tool_name):
+            return make_cache_key(self.name, tool_name, arguments)
+        return None
+
+    async def _call(self, tool_name: str, arguments: dict, use_cache: bool = True) -> Optional[dict]:
+        """Вызов инструмента MCP с учётом кеша
+
+        Свежая запись отдаётся из кеша, устаревшая — тоже, но с фоновым
+        обновлением. Одновременные одинаковые промахи делят один запрос.
+        use_cache=False — мимо кеша (массовый обход, нужен свежий ответ).
+        """
+        key = self._cache_key(tool_name, arguments) if use_cache else None
+        if key is None:
+            return await self._call_remote(tool_name, arguments)
+
+        value, stale = self.cache.get(key)
+        if value is not None:
+            if stale:
+                self._schedule_refresh(key, tool_name, arguments)
+            return value
+
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._call_remote(tool_name, arguments))
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._store_inflight(key, done))
+        # shield: если вызывающий отменён по дедлайну, запрос всё равно
+        # завершится и положит результат в кеш
+        return await asyncio.shield(task)
+
+    def _store_inflight(self, key, task: asyncio.Future):
+        """Завершение запроса: убрать из in-flight и сохранить в кеш"""
+        self._inflight.pop(key, None)
+        if not task.cancelled() and task.exception() is None:
+            self.cache.put(key, task.result())
+
+    def _schedule_refresh(self, key, tool_name: str, arguments: dict):
+        """Фоновое обновление устаревшей записи (не больше одного на ключ)"""
+        if key in self._refreshing:
+            return
+
+        async def refresh():
+            try:
+                result = await self._call_remote(tool_name, arguments)
+                if result is not None:
+                    self.cache.put(key, result)
+                    self.cache.mark_refresh(tool_name)
+            except Exception as e:
+                logger.warning(f"{self.name}: фоновое обновление {tool_name} не удалось: {e}")
+            finally:
+                self._refreshing.discard(key)
+
+        self._refreshing.add(key)
+        task = asyncio.ensure_future(refresh())
+        self._refresh_tasks.add(task)
+        task.add_done_callback(self._refresh_tasks.discard)
+
+    async def _call_remote(self, tool_name: str, arguments: dict) -> Optional[dict]:
+        """Вызов инструмента MCP через JSON-RPC (без кеша)
+
+        Args:
+            tool_name: имя инструмента
+            arguments: аргументы вызова
+
+        Returns:
+            Результат вызова или None при ошибке
+        """
+        if not self.health.allow_request():
+            logger.debug(f"{self.name}: источник недоступен (circuit breaker), {tool_name} пропущен")
+            get_accounting().record(
+                "mcp", f"{self.name}:{tool_name}", default_site=tool_name,
+                latency_ms=0, outcome="circuit_open",
+            )
+            return None
+
+        payload = self._make_request(tool_name, arguments)
+        timeout = self.health.timeout()
+
         logger.debug(f"{self.name}: вызов {tool_name} с аргументами {arguments}")
 
+        started = time.perf_counter()
+        outcome = "ok"
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.post(
-                    self.base_url,
-                    headers={"Content-Type": "application/json"},
-                    json=payload,
-                    timeout=aiohttp.ClientTimeout(total=30)
-                ) as resp:
-                    if resp.status == 200:
-                        data = await resp.json()
-                        if "result" in data:
-                            result = data["result"]
-                            # Логируем структуру ответа для отладки
-                            if result and "content" in result:
-                                content_items = result.get("content", [])
-                                logger.debug(f"{self.name}: ответ содержит {len(content_items)} content items")
-                            return result
-                        if "error" in data:
-                            logger.error(f"{self.name} JSON-RPC error: {data['error']}")
-                            return None
-                        # Нет ни result, ни error
-                        logger.warning(f"{self.name}: неожиданный ответ (нет result/error): {list(data.keys())}")
-                        return None
-                    else:
-                        error = await resp.text()
-                        logger.error(f"{self.name} HTTP error {resp.status}: {error[:500]}")
+            session = self._get_session()
+            async with session.post(self.base_url, json=payload,
+                                    timeout=aiohttp.ClientTimeout(total=timeout)) as resp:
+                if resp.status == 200:
+                    data = await resp.json()
+                    if "result" in data:
+                        result = data["result"]
+                        # Логируем структуру ответа для отладки
+                        if result and "content" in result:
+                            content_items = result.get("content", [])
+                            logger.debug(f"{self.name}: ответ содержит {len(content_items)} content items")
+                        return result
+                    if "error" in data:
+                        outcome = "rpc_error"
+                        logger.error(f"{self.name} JSON-RPC error: {data['error']}")
                         return None
+                    # Нет ни result, ни error
+                    outcome = "bad_response"
+                    logger.warning(f"{self.name}: неожиданный ответ (нет result/error): {list(data.keys())}")
+                    return None
+                else:
+                    outcome = f"http_{resp.status}"
+                    error = await resp.text()
+                    logger.error(f"{self.name} HTTP error {resp.status}: {error[:500]}")
+                    return None
+        except asyncio.CancelledError:
+            outcome = "cancelled"
+            raise
         except asyncio.TimeoutError:
-            logger.error(f"{self.name} request timeout (30s)")
+            outcome = "timeout"
+            logger.error(f"{self.name} request timeout ({timeout}s)")
             return None
         except Exception as e:
+            outcome = "error"
             logger.error(f"{self.name} exception: {e}", exc_info=True)
             return None
+        finally:
+            latency_ms = (time.perf_counter() - started) * 1000
+            self._record_health(outcome, latency_ms)
+            get_accounting().record(
+                "mcp", f"{self.name}:{tool_name}", default_site=tool_name,
+                latency_ms=latency_ms,
+                outcome=outcome,
+            )
+
+    def _record_health(self, outcome: str, latency_ms: float):
+        """Учесть исход запроса в здоровье эндпоинта
+
+        Сбой сервера — таймаут, обрыв соединения, HTTP 5xx. Ошибка JSON-RPC
+        или 4xx означает, что сервер жив и отвечает.
+        """
+        if outcome == "cancelled":
+            return
+        if outcome == "timeout":
+            self.health.record_failure(outcome, latency_ms)
+        elif outcome == "error" or outcome.startswith("http_5"):
+            self.health.record_failure(outcome)
+        else:
+            self.health.record_success(latency_ms)
+
+    async def ping(self) -> bool:
+        """Проверка доступности сервера (tools/list, без кеша)
+
+        Результат учитывается в здоровье эндпоинта; латентность в окно
+        не попадает — пинг легче поисковых запросов. Успех только закрывает
+        открытый breaker: живой tools/list не должен скрывать сбои поиска.
+        """
+        payload = {"jsonrpc": "2.0", "method": "tools/list", "params": {}, "id": self._next_id()}
+        try:
+            session = self._get_session()
+            async with session.post(self.base_url, json=payload,
+                                    timeout=aiohttp.ClientTimeout(total=MCP_TIMEOUT_MIN)) as resp:
+                if resp.status >= 500:
+                    self.health.record_failure(f"http_{resp.status}")
+                    return False
+        except asyncio.TimeoutError:
+            self.health.record_failure("timeout")
+            return False
+        except Exception as e:
+            logger.warning(f"{self.name}: проверка доступности не прошла: {e}")
+            self.health.record_failure("error")
+            return False
+        self.health.record_probe_success()
+        return True
+
+    async def _call_batch(self, calls: List[Tuple[str, dict]]) -> List[Optional[dict]]:
+        """Несколько вызовов с учётом кеша: в batch уходят только промахи
+
+        Args:
+            calls: список (tool_name, arguments)
+
+        Returns:
+            Результаты в том же порядке, что и calls (None при ошибке)
+        """
+        results: List[Optional[dict]] = [None] * len(calls)
+        pending = []
+        for index, (tool_name, arguments) in enumerate(calls):
+            key = self._cache_key(tool_name, arguments)
+            if key is not None:
+                value, stale = self.cache.get(key)
+                if value is not None:
+                    if stale:
+                        self._schedule_refresh(key, tool_name, arguments)
+                    results[index] = value
+                    continue
+            pending.append((index, key, tool_name, arguments))
+
+        if pending:
+            fetched = await self._call_batch_remote([(tool, args) for _, _, tool, args in pending])
+            for (index, key, _, _), result in zip(pending, fetched):
+                results[index] = result
+                if key is not None:
+                    self.cache.put(key, result)
+
+        return results
+
+    async def _call_batch_remote(self, calls: List[Tuple[str, dict]]) -> List[Optional[dict]]:
+        """Несколько вызовов инструментов одним HTTP-запросом (JSON-RPC batch)
+
+        Если сервер не поддерживает batch, вызовы выполняются параллельно
+        по одному, и больше batch для этого сервера не пробуем.
+
+        Args:
+            calls: список (tool_name, arguments)
+
+        Returns:
+            Результаты в том же порядке, что и calls (None при ошибке)
+        """
+        if not calls:
+            return []
+        if len(calls) == 1 or not self._batch_supported:
+            return list(await asyncio.gather(*[self._call_remote(tool, args) for tool, args in calls]))
+
+        if not self.health.allow_request():
+            logger.debug(f"{self.name}: источник недоступен (circuit breaker), batch пропущен")
+            return [None] * len(calls)
+
+        payload = [self._make_request(tool, args) for tool, args in calls]
+        ids = [request["id"] for request in payload]
+        timeout = self.health.timeout()
+
+        logger.debug(f"{self.name}: batch из {len(calls)} вызовов")
+
+        started = time.perf_counter()
+        outcome = "ok"
+        data = None
+        try:
+            session = self._get_session()
+            async with session.post(self.base_url, json=payload,
+                                    timeout=aiohttp.ClientTimeout(total=timeout)) as resp:
+                if resp.status == 200:
+                    data = await resp.json()
+                else:
+                    outcome = f"http_{resp.status}"
+                    error = await resp.text()
+                    logger.warning(f"{self.name} batch HTTP error {resp.status}: {error[:200]}")
+        except asyncio.TimeoutError:
+            outcome = "timeout"
+            logger.error(f"{self.name} batch timeout ({timeout}s)")
+            return [None] * len(calls)
+        except Exception as e:
+            outcome = "error"
+            logger.error(f"{self.name} batch exception: {e}", exc_info=True)
+            return [None] * len(calls)
+        finally:
+            latency_ms = (time.perf_counter() - started) * 1000
+            self._record_health(outcome, latency_ms)
+            get_accounting().record(
+                "mcp", f"{self.name}:batch", default_site="batch",
+                latency_ms=latency_ms,
+                outcome=outcome,
+            )
+
+        if not isinstance(data, list):
+            # Ответ 200 без массива или 4xx — сервер не понял batch, дальше шлём по одному.
+            # На 5xx просто повторяем одиночными вызовами.
+            if outcome == "ok" or outcome.startswith("http_4"):
+                logger.warning(f"{self.name}: batch не поддерживается, переключаемся на одиночные вызовы")
+                self._batch_supported = False
+            return list(await asyncio.gather(*[self._call_remote(tool, args) for tool, args in calls]))
+
+        # Ответы в batch могут прийти в любом порядке — сопоставляем по id
+        by_id = {item.get("id"): item for item in data if isinstance(item, dict)}
+        results = []
+        for request_id, (tool_name, _) in zip(ids, calls):
+            item = by_id.get(request_id)
+            if item is None:
+                logger.warning(f"{self.name}: нет ответа на {tool_name} (id={request_id}) в batch")
+                results.append(None)
+            elif "error" in item:
+                logger.error(f"{self.name} JSON-RPC error ({tool_name}): {item['error']}")
+                results.append(None)
+            else:
+                results.append(item.get("result"))
+        return results
+
+    def _parse_search_result(self, result: Optional[dict], sort_by: str = None) -> List[dict]:
+        """Извлекает список результатов поиска из ответа MCP
+
+        Args:
+            result: результат tools/call
+            sort_by: сортировка (если "desc" — сортируем по дате на клиенте)
+
+        Returns:
+            Список результатов поиска
+        """
+        if result and "content" in result:
+            for item in result.get("content", []):
+                if item.get("type") == "text":
+                    raw_text = item.get("text", "[]")
+                    try:
+                        data = json.loads(raw_text)
+                    except json.JSONDecodeError as e:
+                        logger.warning(f"{self.name}: JSON parse error: {e}, returning as text")
+                        # Если не JSON, возвращаем как текст
+                        return [{"text": raw_text}]
+                    if not isinstance(data, list):
+                        data = [data]
+                    # Если sort_by указан и данные содержат дату, сортируем на клиенте
+                    if sort_by and "desc" in sort_by:
+                        data.sort(key=lambda x: x.get('created_at', x.get('date', '')) if isinstance(x, dict) else '',
+                                  reverse=True)
+                    logger.debug(f"{self.name}: parsed {len(data)} items")
+                    return data
+        return []
+
+    def _search_args(self, query: str, lang: str, limit: int, sort_by: str = None) -> dict:
+        """Аргументы для инструмента поиска этого сервера"""
+        args = {
+            "query": query,
+            "limit": limit
+        }
+        # Параметр lang только для semantic_search (MCP-Guides)
+        if self.search_tool == "semantic_search":
+            args["lang"] = lang
+        if sort_by:
+            args["sort"] = sort_by
+        return args
 
-    async def get_guides_list(self, lang: str = "ru", category: str = None) -> List[dict]:
+    async def get_guides_list(self, lang: str = "ru", category: str = None,
+                              use_cache: bool = True) -> List[dict]:
         """Получить список всех руководств
 
         Args:
             lang: язык (ru/en)
             category: категория для фильтрации
+            use_cache: False — свежий ответ мимо кеша (синхронизация зеркала)
 
         Returns:
             Список руководств
@@ -107,7 +458,7 @@ class MCPClient:
         if category:
             args["category"] = category
 
-        result = await self._call("get_guides_list", args)
+        result = await self._call("get_guides_list", args, use_cache=use_cache)
         if result and "content" in result:
             # Парсим JSON из content
             for item in result.get("content", []):
@@ -118,12 +469,14 @@ class MCPClient:
                         pass
         return []
 
-    async def get_guide_sections(self, guide_slug: str, lang: str = "ru") -> List[dict]:
+    async def get_guide_sections(self, guide_slug: str, lang: str = "ru",
+                                 use_cache: bool = True) -> List[dict]:
         """Получить разделы конкретного руководства
 
         Args:
             guide_slug: slug руководства
             lang: язык (ru/en)
+            use_cache: False — свежий ответ мимо кеша (синхронизация зеркала)
 
         Returns:
             Список разделов
@@ -131,7 +484,7 @@ class MCPClient:
         result = await self._call("get_guide_sections", {
             "guide_slug": guide_slug,
             "lang": lang
-        })
+        }, use_cache=use_cache)
         if result and "content" in result:
             for item in result.get("content", []):
                 if item.get("type") == "text":
@@ -141,13 +494,15 @@ class MCPClient:
                         pass
         return []
 
-    async def get_section_content(self, guide_slug: str, section_slug: str, lang: str = "ru") -> str:
+    async def get_section_content(self, guide_slug: str, section_slug: str, lang: str = "ru",
+                                  use_cache: bool = True) -> str:
         """Получить содержимое раздела
 
         Args:
             guide_slug: slug руководства
             section_slug: slug раздела
             lang: язык (ru/en)
+            use_cache: False — свежий ответ мимо кеша (синхронизация зеркала)
 
         Returns:
             Текст раздела
@@ -156,7 +511,7 @@ class MCPClient:
             "guide_slug": guide_slug,
             "section_slug": section_slug,
             "lang": lang
-        })
+        }, use_cache=use_cache)
         if result and "content" in result:
             for item in result.get("content", []):
                 if item.get("type") == "text":
@@ -175,30 +530,56 @@ class MCPClient:
         Returns:
             Список результатов поиска
         """
-        args = {
-            "query": query,
-            "limit": limit
-        }
-        # Параметр lang только для semantic_search (MCP-Guides)
-        if self.search_tool == "semantic_search":
-            args["lang"] = lang
-        if sort_by:
-            args["sort"] = sort_by
+        local = await self._search_local(query, lang, limit, sort_by)
+        if local:
+            return local
 
-        result = await self._call(self.search_tool, args)
-        if result and "content" in result:
-            for item in result.get("content", []):
-                if item.get("type") == "text":
-                    try:
-                        data = json.loads(item.get("text", "[]"))
-                        # Если sort_by указан и данные содержат дату, сортируем на клиенте
-                        if sort_by and "desc" in sort_by and isinstance(data, list):
-                            data.sort(key=lambda x: x.get('created_at', x.get('date', '')), reverse=True)
-                        return data
-                    except json.JSONDecodeError:
-                        # Если не JSON, возвращаем как текст
-                        return [{"text": item.get("text", "")}]
-        return []
+        result = await self._call(self.search_tool, self._search_args(query, lang, limit, sort_by))
+        return self._parse_search_result(result, sort_by)
+
+    async def semantic_search_many(self, queries: List[str], lang: str = "ru", limit: int = 5,
+                                   sort_by: str = None) -> List[List[dict]]:
+        """Несколько поисковых запросов одним HTTP-запросом
+
+        Запросы, найденные в локальном зеркале, на сервер не отправляются.
+
+        Returns:
+            Списки результатов в порядке queries
+        """
+        found = list(await asyncio.gather(*(self._search_local(q, lang, limit, sort_by) for q in queries)))
+        remote = [i for i, items in enumerate(found) if not items]
+        if remote:
+            calls = [(self.search_tool, self._search_args(queries[i], lang, limit, sort_by)) for i in remote]
+            results = await self._call_batch(calls)
+            for i, result in zip(remote, results):
+                found[i] = self._parse_search_result(result, sort_by)
+        return found
+
+    async def _search_local(self, query: str, lang: str, limit: int, sort_by: str = None) -> List[dict]:
+        """Поиск в локальном зеркале (если подключено и в нём есть данные)
+
+        Сортировку по дате зеркало не поддерживает — такие запросы идут на сервер.
+        Зеркало синхронное (SQLite), поэтому запрос выполняется в потоке.
+        """
+        if self.local_backend is None or sort_by:
+            return []
+        backend = self.local_backend
+
+        def search() -> Optional[List[dict]]:
+            if not backend.is_ready(lang):
+                return None
+            return backend.search(query, lang=lang, limit=limit)
+
+        started = time.perf_counter()
+        items = await asyncio.to_thread(search)
+        if items is None:
+            return []
+        get_accounting().record(
+            "local", f"{self.name}:mirror", default_site=self.search_tool,
+            latency_ms=(time.perf_counter() - started) * 1000,
+            outcome="ok" if items else "empty",
+        )
+        return items
 
     async def search(self, query: str, limit: int = 5) -> List[dict]:
         """Поиск по базе знаний (knowledge MCP)
@@ -210,33 +591,27 @@ class MCPClient:
         Returns:
             Список результатов поиска
         """
-        args = {
-            "query": query,
-            "limit": limit
-        }
+        result = await self._call("search", {"query": query, "limit": limit})
+        return self._parse_search_result(result)
 
-        result = await self._call("search", args)
-        if result and "content" in result:
-            for item in result.get("content", []):
-                if item.get("type") == "text":
-                    raw_text = item.get("text", "[]")
-                    logger.debug(f"{self.name} search: raw response length={len(raw_text)}")
-                    try:
-                        data = json.loads(raw_text)
-                        parsed_count = len(data) if isinstance(data, list) else 1
-                        logger.debug(f"{self.name} search: parsed {parsed_count} items")
-                        return data if isinstance(data, list) else [data]
-                    except json.JSONDecodeError as e:
-                        logger.warning(f"{self.name} search: JSON parse error: {e}, returning as text")
-                        # Если не JSON, возвращаем как текст
-                        return [{"text": raw_text}]
-        logger.debug(f"{self.name} search: no content in result")
-        return []
+    async def search_many(self, queries: List[str], limit: int = 5) -> List[List[dict]]:
+        """Несколько запросов к базе знаний одним HTTP-запросом"""
+        calls = [("search", {"query": q, "limit": limit}) for q in queries]
+        results = await self._call_batch(calls)
+        return [self._parse_search_result(r) for r in results]
 
 
 # Создаём клиенты для двух MCP серверов
-mcp_guides = MCPClient(MCP_URL, "MCP-Guides")
+mcp_guides = MCPClient(
+    MCP_URL, "MCP-Guides",
+    local_backend=get_guides_mirror() if GUIDES_MIRROR_ENABLED else None,
+)
 mcp_knowledge = MCPClient(KNOWLEDGE_MCP_URL, "MCP-Knowledge", search_tool="search")
 
 # Для обратной совместимости
 mcp = mcp_guides
+
+
+async def close_mcp_clients():
+    """Закрыть сессии всех MCP клиентов"""
+    await asyncio.gather(mcp_guides.close(), mcp_knowledge.close())
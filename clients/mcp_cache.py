@@ -0,0 +1,224 @@
+"""
+Кеш результатов MCP.
+
+Ключ: (сервер, инструмент, нормализованный запрос, lang, limit, sort).
+Одинаковые по смыслу запросы ("Системное  мышление?" и "системное мышление")
+попадают в одну запись.
+
+Политика:
+- TTL по инструментам (MCP_CACHE_TTL); свежая запись отдаётся сразу;
+- stale-while-revalidate: после TTL ещё MCP_CACHE_STALE_TTL секунд
+  отдаём устаревшую запись и обновляем её в фоне;
+- пустые результаты кешируются коротко (MCP_CACHE_NEGATIVE_TTL);
+- ошибки (None) не кешируются;
+- память ограничена числом записей и суммарным размером (LRU-вытеснение).
+"""
+
+import json
+import re
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional, Dict, Tuple, Any
+
+from config import (
+    get_logger,
+    MCP_CACHE_TTL,
+    MCP_CACHE_STALE_TTL,
+    MCP_CACHE_NEGATIVE_TTL,
+    MCP_CACHE_MAX_ENTRIES,
+    MCP_CACHE_MAX_BYTES,
+)
+
+logger = get_logger(__name__)
+
+CacheKey = Tuple[str, str, str, str, int, str]
+
+_PUNCTUATION = re.compile(r'[^\w\s-]+')
+_SPACES = re.compile(r'\s+')
+
+
+def normalize_query(query: str) -> str:
+    """Нормализует поисковый запрос для ключа кеша"""
+    query = (query or '').lower().replace('ё', 'е')
+    query = _PUNCTUATION.sub(' ', query)
+    return _SPACES.sub(' ', query).strip()
+
+
+def make_cache_key(server: str, tool_name: str, arguments: dict) -> CacheKey:
+    """Ключ кеша для вызова инструмента
+
+    Для поисковых инструментов — нормализованный запрос + параметры,
+    для остальных — канонический JSON аргументов.
+    """
+    if 'query' in arguments:
+        query = normalize_query(arguments['query'])
+    else:
+        query = json.dumps(arguments, sort_keys=True, ensure_ascii=False)
+    return (
+        server,
+        tool_name,
+        query,
+        arguments.get('lang', ''),
+        int(arguments.get('limit', 0) or 0),
+        arguments.get('sort', '') or '',
+    )
+
+
+def is_empty_result(result: Optional[dict]) -> bool:
+    """Пустой ли результат (нет контента или пустой JSON-список)"""
+    if not result:
+        return True
+    for item in result.get('content', []):
+        if item.get('type') == 'text':
+            text = (item.get('text') or '').strip()
+            if text and text not in ('[]', '{}', 'null'):
+                return False
+    return True
+
+
+@dataclass
+class CacheEntry:
+    """Запись кеша"""
+    value: dict
+    size: int
+    fresh_until: float
+    stale_until: float
+    negative: bool = False
+
+
+class MCPCache:
+    """LRU-кеш результатов MCP с TTL и stale-while-revalidate"""
+
+    def __init__(self,
+                 ttl: Dict[str, int] = None,
+                 stale_ttl: int = MCP_CACHE_STALE_TTL,
+                 negative_ttl: int = MCP_CACHE_NEGATIVE_TTL,
+                 max_entries: int = MCP_CACHE_MAX_ENTRIES,
+                 max_bytes: int = MCP_CACHE_MAX_BYTES,
+                 clock=time.monotonic):
+        self.ttl = ttl if ttl is not None else MCP_CACHE_TTL
+        self.stale_ttl = stale_ttl
+        self.negative_ttl = negative_ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._clock = clock
+        self._entries: "OrderedDict[CacheKey, CacheEntry]" = OrderedDict()
+        self._bytes = 0
+        self._stats: Dict[str, Dict[str, int]] = {}
+
+    def is_cacheable(self, tool_name: str) -> bool:
+        """Кешируется ли инструмент"""
+        return self.ttl.get(tool_name, 0) > 0
+
+    def _count(self, tool_name: str, event: str):
+        tool_stats = self._stats.setdefault(tool_name, {
+            'hits': 0, 'stale_hits': 0, 'negative_hits': 0, 'misses': 0,
+            'refreshes': 0, 'evictions': 0,
+        })
+        tool_stats[event] += 1
+
+    def get(self, key: CacheKey) -> Tuple[Optional[dict], bool]:
+        """Достаёт значение из кеша
+
+        Returns:
+            (value, is_stale). value=None — промах.
+            is_stale=True — значение устарело, нужно обновить в фоне.
+        """
+        tool_name = key[1]
+        entry = self._entries.get(key)
+        if entry is None:
+            self._count(tool_name, 'misses')
+            return None, False
+
+        now = self._clock()
+        if now >= entry.stale_until:
+            self._remove(key)
+            self._count(tool_name, 'misses')
+            return None, False
+
+        self._entries.move_to_end(key)
+        if now < entry.fresh_until:
+            self._count(tool_name, 'negative_hits' if entry.negative else 'hits')
+            return entry.value, False
+
+        self._count(tool_name, 'stale_hits')
+        return entry.value, True
+
+    def put(self, key: CacheKey, value: Optional[dict]):
+        """Сохраняет результат (ошибки не кешируются)"""
+        if value is None:
+            return
+        tool_name = key[1]
+        ttl = self.ttl.get(tool_name, 0)
+        if ttl <= 0:
+            return
+
+        negative = is_empty_result(value)
+        now = self._clock()
+        if negative:
+            fresh_until = stale_until = now + self.negative_ttl
+        else:
+            fresh_until = now + ttl
+            stale_until = fresh_until + self.stale_ttl
+
+        size = len(json.dumps(value, ensure_ascii=False))
+        if size > self.max_bytes:
+            return
+
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = CacheEntry(value, size, fresh_until, stale_until, negative)
+        self._bytes += size
+
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            evicted_key, _ = next(iter(self._entries.items()))
+            self._remove(evicted_key)
+            self._count(evicted_key[1], 'evictions')
+
+    def mark_refresh(self, tool_name: str):
+        """Учитывает фоновое обновление устаревшей записи"""
+        self._count(tool_name, 'refreshes')
+
+    def _remove(self, key: CacheKey):
+        entry = self._entries.pop(key, None)
+        if entry:
+            self._bytes -= entry.size
+
+    def clear(self):
+        """Очистить кеш и метрики"""
+        self._entries.clear()
+        self._bytes = 0
+        self._stats.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Метрики кеша: hit rate по инструментам и общий"""
+        tools = {}
+        total_hits = total_lookups = 0
+        for tool_name, counters in self._stats.items():
+            hits = counters['hits'] + counters['stale_hits'] + counters['negative_hits']
+            lookups = hits + counters['misses']
+            total_hits += hits
+            total_lookups += lookups
+            tools[tool_name] = {
+                **counters,
+                'hit_rate': round(hits / lookups, 3) if lookups else 0.0,
+            }
+        return {
+            'entries': len(self._entries),
+            'bytes': self._bytes,
+            'hit_rate': round(total_hits / total_lookups, 3) if total_lookups else 0.0,
+            'tools': tools,
+        }
+
+
+# Singleton
+_cache: Optional[MCPCache] = None
+
+
+def get_mcp_cache() -> MCPCache:
+    """Получить общий кеш MCP"""
+    global _cache
+    if _cache is None:
+        _cache = MCPCache()
+    return _cache
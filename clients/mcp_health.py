@@ -0,0 +1,195 @@
+"""
+Здоровье MCP эндпоинтов: адаптивные таймауты и circuit breaker.
+
+Для каждого сервера (по имени клиента) ведётся:
+- скользящее окно латентностей → p50/p95/p99;
+- таймаут запроса = p99 × MCP_TIMEOUT_P99_FACTOR в пределах
+  [MCP_TIMEOUT_MIN, MCP_TIMEOUT] (до накопления статистики — MCP_TIMEOUT).
+  Таймаут попадает в окно как замер, равный таймауту («не меньше»):
+  если сервер замедлился, таймаут растёт вслед за ним, а не режет
+  каждый запрос;
+- circuit breaker: после MCP_BREAKER_FAILURES сбоев подряд источник
+  считается больным (OPEN) и пропускается сразу, без ожидания таймаута.
+  Через MCP_BREAKER_COOLDOWN секунд пропускается один пробный запрос
+  (HALF_OPEN): успех закрывает breaker, сбой снова открывает.
+
+Фоновая проверка (check_mcp_health) пингует серверы через tools/list,
+чтобы замечать падение и восстановление без пользовательского трафика.
+Успешный пинг только закрывает открытый breaker: счётчик сбоев
+поисковых запросов в CLOSED он не сбрасывает.
+Состояние для мониторинга: get_health_snapshot().
+"""
+
+import time
+from collections import deque
+from typing import Optional, Dict, Deque
+
+from config import (
+    get_logger,
+    MCP_TIMEOUT,
+    MCP_TIMEOUT_MIN,
+    MCP_TIMEOUT_P99_FACTOR,
+    MCP_HEALTH_WINDOW,
+    MCP_HEALTH_MIN_SAMPLES,
+    MCP_BREAKER_FAILURES,
+    MCP_BREAKER_COOLDOWN,
+)
+
+logger = get_logger(__name__)
+
+
+class BreakerState:
+    """Состояния circuit breaker"""
+    CLOSED = "closed"        # всё хорошо
+    OPEN = "open"            # источник болен, запросы не отправляем
+    HALF_OPEN = "half_open"  # пробный запрос в полёте
+
+
+class EndpointHealth:
+    """Здоровье одного MCP эндпоинта"""
+
+    def __init__(self, name: str,
+                 window: int = MCP_HEALTH_WINDOW,
+                 failure_threshold: int = MCP_BREAKER_FAILURES,
+                 cooldown: float = MCP_BREAKER_COOLDOWN,
+                 clock=time.monotonic):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self._clock = clock
+        self.latencies: Deque[float] = deque(maxlen=window)
+        self.state = BreakerState.CLOSED
+        self.opened_at: Optional[float] = None
+        self.consecutive_failures = 0
+        self.total_successes = 0
+        self.total_failures = 0
+        self.skipped = 0
+        self.last_error: Optional[str] = None
+
+    # ==================== ТАЙМАУТ ====================
+
+    def percentile(self, q: float) -> Optional[float]:
+        """Перцентиль латентности (мс) по окну"""
+        if not self.latencies:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+    def timeout(self) -> float:
+        """Адаптивный таймаут запроса (сек)"""
+        if len(self.latencies) < MCP_HEALTH_MIN_SAMPLES:
+            return float(MCP_TIMEOUT)
+        p99 = self.percentile(0.99) / 1000
+        return round(min(float(MCP_TIMEOUT), max(float(MCP_TIMEOUT_MIN), p99 * MCP_TIMEOUT_P99_FACTOR)), 2)
+
+    # ==================== CIRCUIT BREAKER ====================
+
+    def allow_request(self) -> bool:
+        """Можно ли отправлять запрос сейчас"""
+        if self.state == BreakerState.CLOSED:
+            return True
+        if self.state == BreakerState.OPEN and self._clock() - self.opened_at >= self.cooldown:
+            self._transition(BreakerState.HALF_OPEN)
+            return True  # единственный пробный запрос
+        self.skipped += 1
+        return False
+
+    def record_success(self, latency_ms: float = None):
+        """Успешный ответ (latency_ms=None — без учёта в окне, например пинг)"""
+        if latency_ms is not None:
+            self.latencies.append(latency_ms)
+        self.total_successes += 1
+        self.consecutive_failures = 0
+        if self.state != BreakerState.CLOSED:
+            self._transition(BreakerState.CLOSED)
+
+    def record_probe_success(self):
+        """Успешный пинг: закрывает открытый breaker, счётчик сбоев в CLOSED не трогает"""
+        self.total_successes += 1
+        if self.state != BreakerState.CLOSED:
+            self.consecutive_failures = 0
+            self._transition(BreakerState.CLOSED)
+
+    def record_failure(self, error: str, latency_ms: float = None):
+        """Сбой: таймаут, 5xx, обрыв соединения
+
+        latency_ms — для таймаута: замер «не меньше таймаута» идёт в окно,
+        чтобы p99 (и таймаут) росли вместе с реальной латентностью.
+        """
+        if latency_ms is not None:
+            self.latencies.append(latency_ms)
+        self.total_failures += 1
+        self.consecutive_failures += 1
+        self.last_error = error
+        if self.state == BreakerState.HALF_OPEN or (
+            self.state == BreakerState.CLOSED and self.consecutive_failures >= self.failure_threshold
+        ):
+            self._transition(BreakerState.OPEN)
+
+    def _transition(self, state: str):
+        previous, self.state = self.state, state
+        if state == BreakerState.OPEN:
+            self.opened_at = self._clock()
+            logger.warning(f"{self.name}: circuit breaker OPEN "
+                           f"({self.consecutive_failures} сбоев подряд, последний: {self.last_error})")
+        elif state == BreakerState.CLOSED and previous != BreakerState.CLOSED:
+            self.opened_at = None
+            logger.info(f"{self.name}: источник восстановлен, circuit breaker CLOSED")
+        else:
+            logger.info(f"{self.name}: circuit breaker {previous} → {state}")
+
+    def needs_probe(self) -> bool:
+        """Пора ли пробовать больной источник (для фоновой проверки)"""
+        return self.state == BreakerState.OPEN and self._clock() - self.opened_at >= self.cooldown
+
+    def snapshot(self) -> dict:
+        """Состояние для мониторинга"""
+        def rounded(value):
+            return round(value) if value is not None else None
+
+        return {
+            "state": self.state,
+            "timeout_s": self.timeout(),
+            "p50_ms": rounded(self.percentile(0.5)),
+            "p95_ms": rounded(self.percentile(0.95)),
+            "p99_ms": rounded(self.percentile(0.99)),
+            "samples": len(self.latencies),
+            "consecutive_failures": self.consecutive_failures,
+            "successes": self.total_successes,
+            "failures": self.total_failures,
+            "skipped": self.skipped,
+            "last_error": self.last_error,
+        }
+
+
+# Реестр здоровья по имени эндпоинта
+_registry: Dict[str, EndpointHealth] = {}
+
+
+def get_endpoint_health(name: str) -> EndpointHealth:
+    """Получить (или создать) трекер здоровья эндпоинта"""
+    if name not in _registry:
+        _registry[name] = EndpointHealth(name)
+    return _registry[name]
+
+
+def get_health_snapshot() -> Dict[str, dict]:
+    """Состояние всех MCP эндпоинтов (для мониторинга)"""
+    return {name: health.snapshot() for name, health in _registry.items()}
+
+
+async def check_mcp_health(clients=None):
+    """Фоновая проверка MCP серверов (задача планировщика)
+
+    Пингует каждый сервер; для открытого breaker пинг выполняется только
+    после cooldown и служит пробным запросом.
+    """
+    if clients is None:
+        from clients.mcp import mcp_guides, mcp_knowledge
+        clients = [mcp_guides, mcp_knowledge]
+
+    for client in clients:
+        health = client.health
+        if health.state == BreakerState.OPEN and not health.needs_probe():
+            continue
+        await client.ping()
@@ -23,7 +23,10 @@ from .settings import (
     # Пути
     BASE_DIR,
     TOPICS_DIR,
+    TOPICS_RELOAD_INTERVAL,
     KNOWLEDGE_STRUCTURE_PATH,
+    CONTENT_BUNDLE_PATH,
+    CONTENT_BUNDLE_ENABLED,
 
     # Режимы и статусы
     Mode,
@@ -53,6 +56,14 @@ from .settings import (
     FEED_SESSION_DURATION_MIN,
     FEED_SESSION_DURATION_MAX,
     FEED_TOPICS_TO_SUGGEST,
+    FEED_PREFETCH_ENABLED,
+    FEED_PREFETCH_LEAD_MINUTES,
+    FEED_PREFETCH_CONCURRENCY,
+    FEED_DIGEST_PARALLEL,
+    FEED_BASE_DIGEST_ENABLED,
+    FEED_BASE_DIGEST_TTL_DAYS,
+    FEED_BASE_DIGEST_BUCKETS,
+    FEED_TRENDING_REFRESH_HOURS,
 
     # Интенты
     QUESTION_WORDS,
@@ -65,6 +76,68 @@ from .settings import (
     # Онтологические правила
     ONTOLOGY_RULES,
     ONTOLOGY_RULES_TOPICS,
+
+    # Учёт вызовов LLM/MCP
+    CLAUDE_MODEL,
+    LLM_PRICING,
+    ACCOUNTING_SALT,
+    ACCOUNTING_BATCH_SIZE,
+    ACCOUNTING_FLUSH_INTERVAL,
+    ACCOUNTING_WINDOW,
+    LLM_CONCURRENCY,
+
+    # MCP
+    MCP_TIMEOUT,
+    MCP_POOL_SIZE,
+    MCP_KEEPALIVE_TIMEOUT,
+    MCP_CACHE_TTL,
+    MCP_CACHE_STALE_TTL,
+    MCP_CACHE_NEGATIVE_TTL,
+    MCP_CACHE_MAX_ENTRIES,
+    MCP_CACHE_MAX_BYTES,
+    MCP_TIMEOUT_MIN,
+    MCP_TIMEOUT_P99_FACTOR,
+    MCP_HEALTH_WINDOW,
+    MCP_HEALTH_MIN_SAMPLES,
+    MCP_BREAKER_FAILURES,
+    MCP_BREAKER_COOLDOWN,
+    MCP_HEALTH_CHECK_INTERVAL,
+
+    # Локальное зеркало руководств
+    GUIDES_MIRROR_PATH,
+    GUIDES_MIRROR_ENABLED,
+    GUIDES_MIRROR_LANGS,
+    GUIDES_MIRROR_MAX_AGE_DAYS,
+    GUIDES_SYNC_CONCURRENCY,
+
+    # Ранжирование результатов
+    RERANK_IDF_ENABLED,
+    RERANK_IDF_PATH,
+    RERANK_IDF_MAX_DOCS,
+    RERANK_IDF_SAVE_INTERVAL,
+    EXPANSION_STATS_PATH,
+    EXPANSION_MIN_ATTEMPTS,
+    EXPANSION_MIN_USEFULNESS,
+    EXPANSION_STATS_SAVE_INTERVAL,
+
+    # Сбор контекста
+    MCP_CONTEXT_DEADLINE,
+    CONTEXT_TOKEN_BUDGET,
+
+    # Память диалога
+    CONVERSATION_MEMORY_MAX_CHATS,
+    CONVERSATION_MEMORY_MAX_BYTES,
+    CONVERSATION_MEMORY_TTL,
+    QA_SUMMARY_ENABLED,
+    QA_RECENT_TURNS,
+    QA_SUMMARY_BATCH,
+    QA_SUMMARY_MAX_CHARS,
+
+    # Шаблоны промптов
+    PROMPT_SEGMENT_CACHE_SIZE,
+
+    # Клавиатуры
+    KEYBOARD_CACHE_SIZE,
 )
 
 __all__ = [
@@ -78,7 +151,10 @@ __all__ = [
     'MOSCOW_TZ',
     'BASE_DIR',
     'TOPICS_DIR',
+    'TOPICS_RELOAD_INTERVAL',
     'KNOWLEDGE_STRUCTURE_PATH',
+    'CONTENT_BUNDLE_PATH',
+    'CONTENT_BUNDLE_ENABLED',
     'Mode',
     'MarathonStatus',
     'FeedStatus',
@@ -98,10 +174,64 @@ __all__ = [
     'FEED_SESSION_DURATION_MIN',
     'FEED_SESSION_DURATION_MAX',
     'FEED_TOPICS_TO_SUGGEST',
+    'FEED_PREFETCH_ENABLED',
+    'FEED_PREFETCH_LEAD_MINUTES',
+    'FEED_PREFETCH_CONCURRENCY',
+    'FEED_DIGEST_PARALLEL',
+    'FEED_BASE_DIGEST_ENABLED',
+    'FEED_BASE_DIGEST_TTL_DAYS',
+    'FEED_BASE_DIGEST_BUCKETS',
+    'FEED_TRENDING_REFRESH_HOURS',
     'QUESTION_WORDS',
     'TOPIC_REQUEST_PATTERNS',
     'COMMAND_WORDS',
     'WORK_PRODUCT_CATEGORIES',
     'ONTOLOGY_RULES',
     'ONTOLOGY_RULES_TOPICS',
+    'CLAUDE_MODEL',
+    'LLM_PRICING',
+    'ACCOUNTING_SALT',
+    'ACCOUNTING_BATCH_SIZE',
+    'ACCOUNTING_FLUSH_INTERVAL',
+    'ACCOUNTING_WINDOW',
+    'LLM_CONCURRENCY',
+    'MCP_TIMEOUT',
+    'MCP_POOL_SIZE',
+    'MCP_KEEPALIVE_TIMEOUT',
+    'MCP_CACHE_TTL',
+    'MCP_CACHE_STALE_TTL',
+    'MCP_CACHE_NEGATIVE_TTL',
+    'MCP_CACHE_MAX_ENTRIES',
+    'MCP_CACHE_MAX_BYTES',
+    'MCP_TIMEOUT_MIN',
+    'MCP_TIMEOUT_P99_FACTOR',
+    'MCP_HEALTH_WINDOW',
+    'MCP_HEALTH_MIN_SAMPLES',
+    'MCP_BREAKER_FAILURES',
+    'MCP_BREAKER_COOLDOWN',
+    'MCP_HEALTH_CHECK_INTERVAL',
+    'GUIDES_MIRROR_PATH',
+    'GUIDES_MIRROR_ENABLED',
+    'GUIDES_MIRROR_LANGS',
+    'GUIDES_MIRROR_MAX_AGE_DAYS',
+    'GUIDES_SYNC_CONCURRENCY',
+    'RERANK_IDF_ENABLED',
+    'RERANK_IDF_PATH',
+    'RERANK_IDF_MAX_DOCS',
+    'RERANK_IDF_SAVE_INTERVAL',
+    'EXPANSION_STATS_PATH',
+    'EXPANSION_MIN_ATTEMPTS',
+    'EXPANSION_MIN_USEFULNESS',
+    'EXPANSION_STATS_SAVE_INTERVAL',
+    'MCP_CONTEXT_DEADLINE',
+    'CONTEXT_TOKEN_BUDGET',
+    'CONVERSATION_MEMORY_MAX_CHATS',
+    'CONVERSATION_MEMORY_MAX_BYTES',
+    'CONVERSATION_MEMORY_TTL',
+    'QA_SUMMARY_ENABLED',
+    'QA_RECENT_TURNS',
+    'QA_SUMMARY_BATCH',
+    'QA_SUMMARY_MAX_CHARS',
+    'PROMPT_SEGMENT_CACHE_SIZE',
+    'KEYBOARD_CACHE_SIZE',
 ]
@@ -45,8 +45,13 @@ MOSCOW_TZ = timezone(timedelta(hours=3))
 
 BASE_DIR = Path(__file__).parent.parent
 TOPICS_DIR = BASE_DIR / "topics"
+TOPICS_RELOAD_INTERVAL = 5  # как часто сверять mtime файлов тем (сек)
 KNOWLEDGE_STRUCTURE_PATH = BASE_DIR / "knowledge_structure.yaml"
 
+# Скомпилированный пакет контента (python -m core.content build)
+CONTENT_BUNDLE_PATH = Path(os.getenv("CONTENT_BUNDLE_PATH", str(BASE_DIR / "build" / "content.bundle")))
+CONTENT_BUNDLE_ENABLED = os.getenv("CONTENT_BUNDLE_ENABLED", "1") == "1"
+
 # ============= РЕЖИМЫ РАБОТЫ =============
 
 class Mode:
@@ -159,6 +164,26 @@ FEED_SESSION_DURATION_MIN = 5  # минимальная длительность
 FEED_SESSION_DURATION_MAX = 12  # максимальная длительность сессии (мин)
 FEED_TOPICS_TO_SUGGEST = 5  # сколько тем предлагать на выбор
 
+# Предгенерация следующего дайджеста: после фиксации и за N минут до schedule_time
+FEED_PREFETCH_ENABLED = True
+FEED_PREFETCH_LEAD_MINUTES = 60  # за сколько минут до напоминания готовить дайджест
+FEED_PREFETCH_CONCURRENCY = 2  # одновременных фоновых генераций
+
+# Дайджест из нескольких тем: каждая тема — отдельный параллельный вызов LLM
+# (плюс короткое введение и вопрос для рефлексии), а не один длинный
+FEED_DIGEST_PARALLEL = True
+
+# Двухслойный дайджест: базовый текст темы общий для всех (кэш по теме, глубине,
+# языку и длительности), поверх — короткий персональный проход с примерами
+FEED_BASE_DIGEST_ENABLED = True
+FEED_BASE_DIGEST_TTL_DAYS = 14  # через сколько дней базовый текст генерируется заново
+FEED_BASE_DIGEST_BUCKETS = (2, 3, 4, 6, 8, 12)  # минут на тему; длительность округляется до ближайшей
+
+# Предложения тем: актуальные темы из материалов — общий снимок по расписанию;
+# сами предложения кэшируются на пользователя по ISO-неделе и профилю
+# (заново — только по кнопке «Сгенерировать заново»)
+FEED_TRENDING_REFRESH_HOURS = 6
+
 # ============= НАСТРОЙКИ ИНТЕНТОВ =============
 
 # Вопросительные слова для всех поддерживаемых языков
@@ -254,3 +279,108 @@ WORK_PRODUCT_CATEGORIES = {
     'plan': 'план',
     'fixation': 'фиксация',
 }
+
+# ============= УЧЁТ ВЫЗОВОВ LLM/MCP =============
+
+CLAUDE_MODEL = "claude-sonnet-4-20250514"
+
+# Стоимость токенов, USD за 1M (input, output, cache write, cache read)
+LLM_PRICING = {
+    "claude-sonnet-4-20250514": {
+        "input": 3.0,
+        "output": 15.0,
+        "cache_write": 3.75,
+        "cache_read": 0.30,
+    },
+}
+
+ACCOUNTING_SALT = os.getenv("ACCOUNTING_SALT", "aist_track_bot")  # соль для хеша chat_id
+ACCOUNTING_BATCH_SIZE = 50  # записей в одной пачке INSERT
+ACCOUNTING_FLUSH_INTERVAL = 30  # период сброса буфера в БД (сек)
+ACCOUNTING_WINDOW = 500  # размер скользящего окна латентности на call site
+
+# Одновременных запросов к Claude API; сверх лимита ждут в очереди по приоритету
+# (ответ пользователю раньше фоновой предгенерации)
+LLM_CONCURRENCY = 8
+
+# ============= MCP =============
+
+MCP_TIMEOUT = 30  # таймаут запроса к MCP (сек)
+MCP_POOL_SIZE = 10  # максимум соединений на один MCP сервер
+MCP_KEEPALIVE_TIMEOUT = 60  # сколько держать idle-соединение (сек)
+
+# TTL кеша результатов MCP по инструментам (сек); 0 — не кешировать
+MCP_CACHE_TTL = {
+    "semantic_search": 6 * 3600,  # руководства меняются редко
+    "search": 30 * 60,  # база знаний: свежие посты
+    "get_guides_list": 24 * 3600,
+    "get_guide_sections": 24 * 3600,
+    "get_section_content": 24 * 3600,
+}
+MCP_CACHE_STALE_TTL = 3600  # сколько отдавать устаревшее, обновляя в фоне (сек)
+MCP_CACHE_NEGATIVE_TTL = 60  # TTL пустых результатов (сек)
+MCP_CACHE_MAX_ENTRIES = 2000
+MCP_CACHE_MAX_BYTES = 32 * 1024 * 1024
+
+# Здоровье эндпоинтов: адаптивный таймаут и circuit breaker
+MCP_TIMEOUT_MIN = 3  # нижняя граница адаптивного таймаута (сек)
+MCP_TIMEOUT_P99_FACTOR = 2.0  # таймаут = p99 латентности × множитель (не больше MCP_TIMEOUT)
+MCP_HEALTH_WINDOW = 200  # размер окна латентностей на эндпоинт
+MCP_HEALTH_MIN_SAMPLES = 20  # до стольких замеров таймаут = MCP_TIMEOUT
+MCP_BREAKER_FAILURES = 5  # сбоев подряд до открытия breaker
+MCP_BREAKER_COOLDOWN = 30  # через сколько секунд пробовать больной источник
+MCP_HEALTH_CHECK_INTERVAL = 30  # период фоновой проверки серверов (сек)
+
+# ============= ЛОКАЛЬНОЕ ЗЕРКАЛО РУКОВОДСТВ =============
+
+GUIDES_MIRROR_PATH = Path(os.getenv("GUIDES_MIRROR_PATH", str(BASE_DIR / "data" / "guides_mirror.sqlite3")))
+GUIDES_MIRROR_ENABLED = os.getenv("GUIDES_MIRROR_ENABLED", "1") == "1"
+GUIDES_MIRROR_LANGS = ["ru", "en"]
+GUIDES_MIRROR_MAX_AGE_DAYS = 7  # полная перекачка руководства не реже раза в N дней
+GUIDES_SYNC_CONCURRENCY = 4  # параллельных запросов разделов при синхронизации
+
+# ============= РАНЖИРОВАНИЕ РЕЗУЛЬТАТОВ =============
+
+RERANK_IDF_ENABLED = os.getenv("RERANK_IDF_ENABLED", "1") == "1"  # IDF по накопленному корпусу
+RERANK_IDF_PATH = Path(os.getenv("RERANK_IDF_PATH", str(BASE_DIR / "data" / "retrieval_idf.json")))
+RERANK_IDF_MAX_DOCS = 20000  # сколько уникальных фрагментов учитывать в статистике
+RERANK_IDF_SAVE_INTERVAL = 300  # период сохранения статистики корпуса на диск (сек)
+
+# Адаптивное расширение запросов
+EXPANSION_STATS_PATH = Path(os.getenv("EXPANSION_STATS_PATH", str(BASE_DIR / "data" / "expansion_stats.json")))
+EXPANSION_MIN_ATTEMPTS = 10  # после скольких попыток можно признать расширение бесполезным
+EXPANSION_MIN_USEFULNESS = 0.15  # порог сглаженной полезности расширения
+EXPANSION_STATS_SAVE_INTERVAL = 300  # период сохранения статистики расширений на диск (сек)
+
+# ============= СБОР КОНТЕКСТА =============
+
+MCP_CONTEXT_DEADLINE = 3.0  # общий бюджет на параллельный поиск контекста для урока/дайджеста (сек)
+
+# Бюджет токенов контекста из MCP в промпте по профилям
+CONTEXT_TOKEN_BUDGET = {
+    Mode.MARATHON: 1800,  # ответ на вопрос в марафоне
+    Mode.FEED: 1500,  # ответ на вопрос в ленте
+    "lesson": 1200,  # урок марафона (руководства + посты)
+    "digest": 800,  # дайджест ленты
+    "default": 1500,
+}
+
+# ============= ПАМЯТЬ ДИАЛОГА =============
+
+CONVERSATION_MEMORY_MAX_CHATS = 5000  # сколько историй чатов держать в памяти (LRU)
+CONVERSATION_MEMORY_MAX_BYTES = 8 * 1024 * 1024  # суммарный размер историй (оценка по тексту)
+CONVERSATION_MEMORY_TTL = 3600  # через сколько секунд без обращений история вытесняется
+
+# Скользящий конспект вопросов: в промпт идут конспект + последние ходы
+QA_SUMMARY_ENABLED = os.getenv("QA_SUMMARY_ENABLED", "1") == "1"
+QA_RECENT_TURNS = 2  # сколько последних вопросов-ответов передавать как есть
+QA_SUMMARY_BATCH = 2  # сворачивать в конспект не реже, чем по N ходов
+QA_SUMMARY_MAX_CHARS = 1200  # предельный размер конспекта
+
+# ============= ШАБЛОНЫ ПРОМПТОВ =============
+
+PROMPT_SEGMENT_CACHE_SIZE = 2048  # сколько собранных профильных сегментов держать в памяти (LRU)
+
+# ============= КЛАВИАТУРЫ =============
+
+KEYBOARD_CACHE_SIZE = 256  # готовых клавиатур на один построитель (по языку и флагам состояния)
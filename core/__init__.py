@@ -4,6 +4,12 @@
 Содержит:
 - helpers.py: вспомогательные функции для генерации контента
 - intent.py: распознавание намерений пользователя
+- context_packer.py: упаковка контекста из MCP в бюджет токенов
+- topics.py: реестр тем марафона (индексы по id и дню, горячая перезагрузка)
+- content.py: скомпилированный пакет контента (knowledge_structure + темы)
+- curriculum.py: индекс программы марафона (битовые маски прогресса)
+- prompts.py: версионированные шаблоны промптов и кэш профильных сегментов
+- keyboards.py: кэш inline-клавиатур
 - router.py: маршрутизация по режимам (Марафон/Лента) - TODO
 - states.py: FSM состояния - TODO
 - scheduler.py: настройка APScheduler - TODO
@@ -14,6 +20,39 @@ from .helpers import (
     get_search_keys,
     get_bloom_questions,
     get_personalization_prompt,
+    get_example_rules,
+)
+
+from .prompts import (
+    PromptTemplate,
+    PromptRegistry,
+    get_prompt_registry,
+    register_template,
+    lang_instruction,
+    lang_reminder,
+    profile_hash,
+)
+
+from .keyboards import (
+    cached_keyboard,
+    get_keyboard_cache_stats,
+    clear_keyboard_cache,
+)
+
+from .topics import (
+    TopicRegistry,
+    get_topic_registry,
+)
+
+from .content import (
+    build_bundle,
+    load_bundle,
+    get_content,
+    get_knowledge_structure,
+)
+
+from .curriculum import (
+    MarathonCurriculum,
 )
 
 from .intent import (
@@ -27,12 +66,46 @@ from .intent import (
     get_question_keywords,
 )
 
+from .context_packer import (
+    PackItem,
+    PackedContext,
+    pack,
+    pack_texts,
+    estimate_tokens,
+    trim_to_tokens,
+    trim_to_chars,
+    get_context_budget,
+)
+
 __all__ = [
     # helpers
     'load_topic_metadata',
     'get_search_keys',
     'get_bloom_questions',
     'get_personalization_prompt',
+    'get_example_rules',
+    # prompts
+    'PromptTemplate',
+    'PromptRegistry',
+    'get_prompt_registry',
+    'register_template',
+    'lang_instruction',
+    'lang_reminder',
+    'profile_hash',
+    # keyboards
+    'cached_keyboard',
+    'get_keyboard_cache_stats',
+    'clear_keyboard_cache',
+    # topics
+    'TopicRegistry',
+    'get_topic_registry',
+    # content
+    'build_bundle',
+    'load_bundle',
+    'get_content',
+    'get_knowledge_structure',
+    # curriculum
+    'MarathonCurriculum',
     # intent
     'IntentType',
     'Intent',
@@ -42,4 +115,13 @@ __all__ = [
     'is_clear_question',
     'question_likelihood',
     'get_question_keywords',
+    # context_packer
+    'PackItem',
+    'PackedContext',
+    'pack',
+    'pack_texts',
+    'estimate_tokens',
+    'trim_to_tokens',
+    'trim_to_chars',
+    'get_context_budget',
 ]
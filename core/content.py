@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+"""
+Скомпилированный пакет контента: knowledge_structure.yaml + topics/*.yaml.
+
+Сборка (шаг Dockerfile) разбирает и проверяет все YAML один раз и
+сохраняет результат вместе с индексами в один файл marshal: темы по id
+и дню для TopicRegistry, порядок тем и битовые маски для MarathonCurriculum. При старте
+пакет читается за миллисекунды; если пакета нет, он другой версии или
+не совпадает с исходниками (хеши файлов), контент читается из YAML.
+
+Использование:
+    python -m core.content build     # собрать пакет
+    python -m core.content check     # проверить, что пакет актуален
+
+Формат: MAGIC + marshal(dict). marshal зависит от версии Python,
+поэтому версия интерпретатора входит в заголовок пакета.
+"""
+
+import argparse
+import hashlib
+import marshal
+import sys
+import time
+from pathlib import Path
+from typing import Optional, List, Dict, Any
+
+from config import (
+    get_logger,
+    BASE_DIR,
+    TOPICS_DIR,
+    KNOWLEDGE_STRUCTURE_PATH,
+    CONTENT_BUNDLE_PATH,
+    CONTENT_BUNDLE_ENABLED,
+)
+from .topics import load_yaml, validate_topic, SCHEMA_FILE
+from .curriculum import marathon_order, curriculum_masks
+
+logger = get_logger(__name__)
+
+MAGIC = b"AISTCONTENT\n"
+BUNDLE_VERSION = 3
+
+
+def _python_tag() -> str:
+    return f"{sys.version_info[0]}.{sys.version_info[1]}/{marshal.version}"
+
+
+def source_files(structure_path: Path = KNOWLEDGE_STRUCTURE_PATH,
+                 topics_dir: Path = TOPICS_DIR) -> List[Path]:
+    """Исходники пакета"""
+    files = [structure_path] if structure_path.exists() else []
+    if topics_dir.exists():
+        files += sorted(topics_dir.glob("*.yaml"))
+    return files
+
+
+def fingerprint(files: List[Path]) -> Dict[str, str]:
+    """Хеши содержимого исходников (путь относительно BASE_DIR → blake2b)"""
+    result = {}
+    for path in files:
+        try:
+            name = str(path.relative_to(BASE_DIR))
+        except ValueError:
+            name = str(path)
+        result[name] = hashlib.blake2b(path.read_bytes(), digest_size=16).hexdigest()
+    return result
+
+
+def validate_structure(data: Any) -> List[str]:
+    """Проверка knowledge_structure.yaml: темы с id, title, day и типом"""
+    if not isinstance(data, dict):
+        return ["файл не содержит словарь"]
+    errors, seen = [], set()
+    for i, topic in enumerate(data.get('topics') or []):
+        where = f"topics[{i}]"
+        if not isinstance(topic, dict):
+            errors.append(f"{where}: ожидался словарь")
+            continue
+        for name in ('id', 'title'):
+            if not topic.get(name):
+                errors.append(f"{where}: нет поля {name}")
+        if not isinstance(topic.get('day', 1), int):
+            errors.append(f"{where}: day должен быть числом")
+        if topic.get('type', 'theory') not in ('theory', 'practice'):
+            errors.append(f"{where}: type '{topic.get('type')}' не из theory|practice")
+        if topic.get('id') in seen:
+            errors.append(f"{where}: повтор id '{topic['id']}'")
+        seen.add(topic.get('id'))
+    return errors
+
+
+# =============================================================================
+# СБОРКА
+# =============================================================================
+
+def compile_content(structure_path: Path = KNOWLEDGE_STRUCTURE_PATH,
+                    topics_dir: Path = TOPICS_DIR) -> dict:
+    """Разбор, проверка и индексация всего контента
+
+    Темы, не прошедшие проверку, в пакет не попадают (причина — в topic_errors).
+
+    Raises:
+        ValueError: knowledge_structure.yaml не разбирается или не проходит проверку
+    """
+    structure = load_yaml(structure_path) if structure_path.exists() else {}
+    problems = validate_structure(structure or {})
+    if problems:
+        raise ValueError(f"{structure_path.name}: " + "; ".join(problems[:10]))
+
+    schema_path = topics_dir / SCHEMA_FILE
+    schema = (load_yaml(schema_path) or {}).get('schema', {}) if schema_path.exists() else {}
+
+    topics: Dict[str, dict] = {}
+    topic_errors: Dict[str, str] = {}
+    for path in sorted(topics_dir.glob("*.yaml")) if topics_dir.exists() else []:
+        if path.name.startswith('_'):
+            continue
+        try:
+            data = load_yaml(path)
+        except Exception as e:
+            topic_errors[path.name] = f"ошибка разбора: {e}"
+            continue
+        problems = validate_topic(data, schema)
+        if problems:
+            topic_errors[path.name] = "; ".join(problems[:5])
+            continue
+        topics[path.name] = data
+
+    files_by_day: Dict[int, List[str]] = {}
+    for name, topic in sorted(topics.items(), key=lambda item: (item[1].get('day', 0), item[1].get('order', 0))):
+        files_by_day.setdefault(topic.get('day', 0), []).append(name)
+
+    structure_topics = (structure or {}).get('topics') or []
+    order = marathon_order(structure_topics)
+
+    return {
+        'version': BUNDLE_VERSION,
+        'python': _python_tag(),
+        'built_at': time.time(),
+        'sources': fingerprint(source_files(structure_path, topics_dir)),
+        'knowledge_structure': structure or {},
+        'topics': topics,
+        'topic_errors': topic_errors,
+        'indexes': {
+            'topic_file_by_id': {topic['id']: name for name, topic in topics.items()},
+            'topic_files_by_day': files_by_day,
+            'marathon_order': order,
+            'curriculum': curriculum_masks([structure_topics[i] for i in order]),
+        },
+    }
+
+
+def build_bundle(path: Path = CONTENT_BUNDLE_PATH, **sources) -> dict:
+    """Собрать пакет и записать в path"""
+    content = compile_content(**sources)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix('.tmp')
+    tmp.write_bytes(MAGIC + marshal.dumps(content))
+    tmp.replace(path)
+    return content
+
+
+# =============================================================================
+# ЗАГРУЗКА
+# =============================================================================
+
+def load_bundle(path: Path = CONTENT_BUNDLE_PATH,
+                structure_path: Path = KNOWLEDGE_STRUCTURE_PATH,
+                topics_dir: Path = TOPICS_DIR) -> Optional[dict]:
+    """Пакет, если он есть и совпадает с исходниками; иначе None"""
+    if not path.exists():
+        return None
+    try:
+        raw = path.read_bytes()
+        if not raw.startswith(MAGIC):
+            logger.warning(f"ContentBundle: {path} — неизвестный формат")
+            return None
+        content = marshal.loads(raw[len(MAGIC):])
+    except Exception as e:
+        logger.warning(f"ContentBundle: не удалось прочитать {path}: {e}")
+        return None
+
+    if content.get('version') != BUNDLE_VERSION or content.get('python') != _python_tag():
+        logger.warning(f"ContentBundle: {path} другой версии, читаем YAML")
+        return None
+    if content.get('sources') != fingerprint(source_files(structure_path, topics_dir)):
+        logger.warning(f"ContentBundle: {path} устарел, читаем YAML")
+        return None
+    return content
+
+
+_content: Optional[dict] = None
+
+
+def get_content() -> dict:
+    """Контент из пакета или, если пакет недоступен, из YAML (без тем)"""
+    global _content
+    if _content is not None:
+        return _content
+
+    started = time.perf_counter()
+    content = load_bundle() if CONTENT_BUNDLE_ENABLED else None
+    if content is not None:
+        logger.info(f"ContentBundle: загружен пакет, {len(content['topics'])} тем "
+                    f"за {(time.perf_counter() - started) * 1000:.1f}мс")
+    else:
+        structure = {}
+        if KNOWLEDGE_STRUCTURE_PATH.exists():
+            try:
+                structure = load_yaml(KNOWLEDGE_STRUCTURE_PATH) or {}
+            except Exception as e:
+                logger.error(f"ContentBundle: ошибка разбора {KNOWLEDGE_STRUCTURE_PATH}: {e}")
+        content = {'knowledge_structure': structure, 'topics': {}, 'indexes': {}}
+    _content = content
+    return content
+
+
+def get_knowledge_structure() -> dict:
+    """Содержимое knowledge_structure.yaml"""
+    return get_content()['knowledge_structure']
+
+
+def get_bundled_topics() -> Dict[str, dict]:
+    """Проверенные темы из пакета (имя файла → тема); пусто без пакета"""
+    return get_content()['topics']
+
+
+def get_content_indexes() -> Dict[str, Any]:
+    """Индексы из пакета (темы по id и дню, порядок и маски марафона); пусто без пакета"""
+    return get_content()['indexes']
+
+
+def main():
+    """Точка входа."""
+    parser = argparse.ArgumentParser(description='Сборка пакета контента')
+    parser.add_argument('command', choices=['build', 'check'], help='build — собрать, check — проверить актуальность')
+    parser.add_argument('--output', '-o', type=Path, default=CONTENT_BUNDLE_PATH, help='Путь к пакету')
+    args = parser.parse_args()
+
+    if args.command == 'check':
+        ok = load_bundle(args.output) is not None
+        print(f"{'✅' if ok else '❌'} {args.output}")
+        sys.exit(0 if ok else 1)
+
+    try:
+        content = build_bundle(args.output)
+    except ValueError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+
+    print(f"✅ {args.output}: {len(content['topics'])} тем, "
+          f"{len(content['knowledge_structure'].get('topics', []))} тем в структуре, "
+          f"{args.output.stat().st_size} байт")
+    for name, error in content['topic_errors'].items():
+        print(f"⚠️ {name}: {error}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,157 @@
+"""
+Упаковка контекста из MCP в бюджет токенов промпта.
+
+Фрагменты отбираются жадно по релевантности на токен, не влезающий
+фрагмент обрезается по границе предложения, у каждого фрагмента
+сохраняется источник. Размер контекста ограничен бюджетом профиля
+(CONTEXT_TOKEN_BUDGET), а значит ограничены промпт и латентность.
+
+Токены оцениваются эвристически: кириллица ≈ 2.7 символа на токен,
+латиница и прочее ≈ 4.
+"""
+
+import re
+from dataclasses import dataclass, field
+from typing import Optional, List
+
+from config import get_logger, CONTEXT_TOKEN_BUDGET
+
+logger = get_logger(__name__)
+
+CHARS_PER_TOKEN_CYRILLIC = 2.7
+CHARS_PER_TOKEN_OTHER = 4.0
+
+# Меньше этого остаток бюджета не заполняем обрезками
+MIN_TRIMMED_TOKENS = 60
+
+_CYRILLIC = re.compile(r'[а-яёА-ЯЁ]')
+_SENTENCE_END = re.compile(r'(?<=[.!?…])\s+')
+
+
+def estimate_tokens(text: str) -> int:
+    """Оценка числа токенов текста"""
+    if not text:
+        return 0
+    cyrillic = len(_CYRILLIC.findall(text))
+    return int(cyrillic / CHARS_PER_TOKEN_CYRILLIC + (len(text) - cyrillic) / CHARS_PER_TOKEN_OTHER) + 1
+
+
+def get_context_budget(profile: Optional[str]) -> int:
+    """Бюджет токенов контекста для профиля (режим/тип промпта)"""
+    return CONTEXT_TOKEN_BUDGET.get(profile or 'default', CONTEXT_TOKEN_BUDGET['default'])
+
+
+def trim_to_tokens(text: str, max_tokens: int) -> str:
+    """Обрезает текст по границе предложения, чтобы уложиться в max_tokens
+
+    Если не влезает даже первое предложение — режет по слову и ставит «…».
+    """
+    if estimate_tokens(text) <= max_tokens:
+        return text
+
+    kept, used = [], 0
+    for sentence in _SENTENCE_END.split(text):
+        cost = estimate_tokens(sentence) + 1
+        if used + cost > max_tokens:
+            break
+        kept.append(sentence)
+        used += cost
+    if kept:
+        return ' '.join(kept)
+
+    words, used = [], 1
+    for word in text.split():
+        cost = estimate_tokens(word)
+        if used + cost > max_tokens:
+            break
+        words.append(word)
+        used += cost
+    return ' '.join(words) + '…' if words else ''
+
+
+def trim_to_chars(text: str, max_chars: int) -> str:
+    """Обрезает текст до max_chars по концу предложения (или по слову с «…»)"""
+    if len(text) <= max_chars:
+        return text
+    cut = text[:max_chars]
+    ends = [m.end() for m in re.finditer(r'[.!?…](?=\s|$)', cut)]
+    if ends and ends[-1] >= max_chars // 3:
+        return cut[:ends[-1]]
+    space = cut.rfind(' ')
+    return (cut[:space] if space > 0 else cut).rstrip(' ,;:—-') + '…'
+
+
+@dataclass
+class PackItem:
+    """Фрагмент-кандидат для контекста"""
+    text: str
+    source: str = ''
+    score: float = 1.0
+    group: str = ''                  # например, "guides" / "knowledge"
+    prefix: str = ''                 # например, дата "[2026-01-01] "
+    tokens: int = field(init=False)
+    trimmed: bool = False
+
+    def __post_init__(self):
+        self.tokens = estimate_tokens(self.prefix + self.text)
+
+
+@dataclass
+class PackedContext:
+    """Результат упаковки"""
+    items: List[PackItem] = field(default_factory=list)   # в исходном порядке
+    tokens: int = 0
+    budget: int = 0
+    dropped: int = 0
+
+    def texts(self, group: Optional[str] = None) -> List[str]:
+        return [i.prefix + i.text for i in self.items if group is None or i.group == group]
+
+
+def pack(items: List[PackItem], budget: int) -> PackedContext:
+    """Отбирает фрагменты в бюджет токенов
+
+    Жадно по score/токен; первый не влезающий фрагмент с хорошей
+    релевантностью обрезается по предложениям под остаток бюджета.
+
+    Args:
+        items: кандидаты (порядок — приоритет при равной плотности)
+        budget: бюджет токенов
+
+    Returns:
+        PackedContext: выбранные фрагменты в исходном порядке
+    """
+    packed = PackedContext(budget=budget)
+    order = sorted(range(len(items)),
+                   key=lambda i: (-(items[i].score / max(items[i].tokens, 1)), i))
+
+    chosen = {}
+    remaining = budget
+    for index in order:
+        item = items[index]
+        if not item.text:
+            continue
+        if item.tokens <= remaining:
+            chosen[index] = item
+            remaining -= item.tokens
+        elif remaining >= MIN_TRIMMED_TOKENS:
+            text = trim_to_tokens(item.text, remaining - estimate_tokens(item.prefix))
+            if text:
+                trimmed = PackItem(text=text, source=item.source, score=item.score,
+                                   group=item.group, prefix=item.prefix, trimmed=True)
+                if trimmed.tokens <= remaining:
+                    chosen[index] = trimmed
+                    remaining -= trimmed.tokens
+
+    packed.items = [chosen[i] for i in sorted(chosen)]
+    packed.tokens = budget - remaining
+    packed.dropped = len(items) - len(chosen)
+    logger.debug(f"ContextPacker: {len(packed.items)}/{len(items)} фрагментов, "
+                 f"{packed.tokens}/{budget} токенов")
+    return packed
+
+
+def pack_texts(texts: List[str], budget: int) -> List[str]:
+    """Упаковка списка текстов, упорядоченных по убыванию релевантности"""
+    items = [PackItem(text=t, score=1.0 / (rank + 1)) for rank, t in enumerate(texts)]
+    return pack(items, budget).texts()
@@ -0,0 +1,170 @@
+"""
+Индекс программы марафона.
+
+MarathonCurriculum строится один раз по списку тем (TOPICS) и хранит
+битовые маски тем по дням, типам (теория/практика) и неделям, а также
+маски «открыто к дню N». Прогресс участника (completed_topics) переводится
+в целое число-битсет, после чего доступность, следующая тема и счётчики
+прогресса — это операции &, ~ и int.bit_count() без прохода по TOPICS.
+
+Бит i соответствует теме TOPICS[i]. Порядок тем и маски собираются
+заранее в пакет контента (core.content), при старте их не пересчитываем.
+"""
+
+from bisect import bisect_right
+from typing import Optional, List, Dict, Iterable, Iterator, Tuple
+
+from config import get_logger, MARATHON_DAYS
+
+logger = get_logger(__name__)
+
+WEEK_NAMES = ('Неделя 1: От диагностики к практике', 'Неделя 2: От практики к системе')
+
+
+def lowest_bit(mask: int) -> Optional[int]:
+    """Номер младшего установленного бита (None для пустой маски)"""
+    return (mask & -mask).bit_length() - 1 if mask else None
+
+
+def iter_bits(mask: int) -> Iterator[int]:
+    """Номера установленных битов по возрастанию"""
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+def marathon_order(structure_topics: List[dict]) -> List[int]:
+    """Порядок тем knowledge_structure в марафоне: по дню, теория перед практикой"""
+    return sorted(range(len(structure_topics)), key=lambda i: (
+        structure_topics[i].get('day', 1),
+        0 if structure_topics[i].get('type', 'theory') == 'theory' else 1,
+    ))
+
+
+def curriculum_masks(topics: List[dict]) -> dict:
+    """Маски тем по дням, типам и неделям (бит i — topics[i])"""
+    day_masks: Dict[int, int] = {}
+    type_masks: Dict[str, int] = {}
+    week_masks = [0, 0]
+    for index, topic in enumerate(topics):
+        bit = 1 << index
+        day = topic.get('day', 1)
+        day_masks[day] = day_masks.get(day, 0) | bit
+        topic_type = topic.get('type', 'theory')
+        type_masks[topic_type] = type_masks.get(topic_type, 0) | bit
+        week_masks[0 if day <= 7 else 1] |= bit
+    return {'count': len(topics), 'day_masks': day_masks, 'type_masks': type_masks,
+            'week_masks': week_masks}
+
+
+class MarathonCurriculum:
+    """Темы марафона, разложенные по битовым маскам"""
+
+    def __init__(self, topics: List[dict], days: int = MARATHON_DAYS,
+                 masks: Optional[dict] = None):
+        """
+        Args:
+            topics: темы в порядке марафона
+            days: длительность марафона
+            masks: готовые маски из пакета контента (curriculum_masks);
+                не подходят по числу тем — считаются заново
+        """
+        self.topics = topics
+        self.days = days
+        self.full = (1 << len(topics)) - 1
+
+        if not masks or masks.get('count') != len(topics):
+            masks = curriculum_masks(topics)
+        self.day_masks: Dict[int, int] = dict(masks['day_masks'])
+        self.type_masks: Dict[str, int] = dict(masks['type_masks'])
+        self.week_masks = list(masks['week_masks'])
+
+        self.lessons = self.type_masks.get('theory', 0)
+        self.tasks = self.full & ~self.lessons
+
+        # Маска «темы до дня N включительно» по отсортированным дням
+        self._days_sorted = sorted(self.day_masks)
+        self._unlocked = []
+        acc = 0
+        for day in self._days_sorted:
+            acc |= self.day_masks[day]
+            self._unlocked.append(acc)
+
+        logger.debug(f"MarathonCurriculum: {len(topics)} тем, {len(self.day_masks)} дней")
+
+    def __len__(self) -> int:
+        return len(self.topics)
+
+    # =========================================================================
+    # ПРОГРЕСС
+    # =========================================================================
+
+    def mask(self, completed: Iterable[int]) -> int:
+        """Битсет пройденных тем (индексы вне программы отбрасываются)"""
+        mask = 0
+        for index in completed or ():
+            if isinstance(index, int) and 0 <= index < len(self.topics):
+                mask |= 1 << index
+        return mask
+
+    def day_mask(self, day: int) -> int:
+        return self.day_masks.get(day, 0)
+
+    def unlocked(self, day: int) -> int:
+        """Темы дней с 1 по day включительно"""
+        pos = bisect_right(self._days_sorted, day)
+        return self._unlocked[pos - 1] if pos else 0
+
+    def available(self, done: int, day: int) -> int:
+        """Открытые к дню day и ещё не пройденные темы"""
+        return self.unlocked(day) & ~done
+
+    def pending(self, done: int, day: int, topic_type: str) -> Optional[int]:
+        """Индекс первой непройденной темы типа topic_type в день day"""
+        return lowest_bit(self.day_mask(day) & self.type_masks.get(topic_type, 0) & ~done)
+
+    def day_completed(self, done: int, day: int) -> int:
+        """Сколько тем дня day пройдено"""
+        return (self.day_mask(day) & done).bit_count()
+
+    def items(self, mask: int) -> List[Tuple[int, dict]]:
+        """(индекс, тема) для установленных битов"""
+        return [(index, self.topics[index]) for index in iter_bits(mask)]
+
+    # =========================================================================
+    # СВОДКИ
+    # =========================================================================
+
+    def sections_progress(self, done: int) -> List[dict]:
+        """Прогресс по неделям"""
+        return [
+            {'total': mask.bit_count(), 'completed': (mask & done).bit_count(), 'name': name}
+            for mask, name in zip(self.week_masks, WEEK_NAMES)
+        ]
+
+    def lessons_tasks_progress(self, done: int) -> dict:
+        """Прогресс по Урокам (теория) и Заданиям (остальное)"""
+        return {
+            'lessons': {'total': self.lessons.bit_count(), 'completed': (self.lessons & done).bit_count()},
+            'tasks': {'total': self.tasks.bit_count(), 'completed': (self.tasks & done).bit_count()},
+        }
+
+    def days_progress(self, done: int, marathon_day: int) -> List[dict]:
+        """Прогресс и статус (locked/available/in_progress/completed) по дням"""
+        days = []
+        for day in range(1, self.days + 1):
+            total = self.day_mask(day).bit_count()
+            completed = self.day_completed(done, day)
+
+            status = 'locked'
+            if day <= marathon_day:
+                if completed == total:
+                    status = 'completed'
+                elif completed > 0:
+                    status = 'in_progress'
+                else:
+                    status = 'available'
+
+            days.append({'day': day, 'total': total, 'completed': completed, 'status': status})
+        return days
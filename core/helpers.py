@@ -2,46 +2,32 @@
 Вспомогательные функции для генерации контента.
 
 Содержит:
-- load_topic_metadata: загрузка метаданных темы из YAML
+- load_topic_metadata: метаданные темы из реестра тем
 - get_search_keys: получение ключей поиска для MCP
 - get_bloom_questions: настройки вопросов по уровню Блума
 - get_personalization_prompt: промпт для персонализации контента
+- get_example_rules: правила для примеров с ротацией по дню марафона
 """
 
-from pathlib import Path
 from typing import Optional, List
-import yaml
 
-from config import get_logger, STUDY_DURATIONS, TOPICS_DIR
+from config import get_logger, STUDY_DURATIONS
+from .topics import get_topic_registry
+from .prompts import register_template, get_prompt_registry, profile_hash
 
 logger = get_logger(__name__)
 
 
 def load_topic_metadata(topic_id: str) -> Optional[dict]:
-    """Загружает метаданные темы из YAML файла
+    """Метаданные темы из реестра тем (core/topics.py)
 
     Args:
-        topic_id: ID темы (например, "1-1-three-states")
+        topic_id: ID темы (например, "day-1-theory")
 
     Returns:
-        Словарь с метаданными или None если файл не найден
+        Словарь с метаданными или None если тема не найдена
     """
-    if not TOPICS_DIR.exists():
-        return None
-
-    # Пробуем найти файл по ID
-    for yaml_file in TOPICS_DIR.glob("*.yaml"):
-        if yaml_file.name.startswith("_"):  # Пропускаем служебные файлы
-            continue
-        try:
-            with open(yaml_file, 'r', encoding='utf-8') as f:
-                data = yaml.safe_load(f)
-                if data and data.get('id') == topic_id:
-                    return data
-        except Exception as e:
-            logger.error(f"Ошибка загрузки метаданных {yaml_file}: {e}")
-
-    return None
+    return get_topic_registry().get(topic_id)
 
 
 def get_bloom_questions(metadata: dict, bloom_level: int, study_duration: int) -> dict:
@@ -85,40 +71,132 @@ def get_search_keys(metadata: dict, mcp_type: str = "guides_mcp") -> List[str]:
     return search_keys.get(mcp_type, [])
 
 
-def get_personalization_prompt(intern: dict) -> str:
-    """Генерирует промпт для персонализации на основе профиля стажера
+# =============================================================================
+# ПЕРСОНАЛИЗАЦИЯ
+# =============================================================================
 
-    Args:
-        intern: словарь с профилем стажера
+# Шаблоны форматов примеров для ротации
+EXAMPLE_TEMPLATES = [
+    ("аналогия", "Используй аналогию — перенеси структуру или принцип из одной области в другую"),
+    ("мини-кейс", "Используй мини-кейс — опиши ситуацию → выбор → последствия"),
+    ("контрпример", "Используй контрпример — покажи как НЕ работает, чтобы подчеркнуть как работает правильно"),
+    ("сравнение", "Используй сравнение двух подходов — правильный vs неправильный"),
+    ("ошибка-мастерство", "Покажи типичную ошибку новичка и приём мастера"),
+    ("наблюдение", "Предложи наблюдательный эксперимент — что можно заметить в повседневной жизни"),
+]
 
-    Returns:
-        Строка с инструкциями для персонализации
-    """
-    duration = STUDY_DURATIONS.get(str(intern['study_duration']), {"words": 1500})
+# Источники примеров для ротации
+EXAMPLE_SOURCES = ["работа", "близкая профессиональная сфера", "интерес/хобби", "далёкая сфера для контраста"]
 
-    interests = ', '.join(intern['interests']) if intern['interests'] else 'не указаны'
-    occupation = intern.get('occupation', '') or 'не указано'
-    motivation = intern.get('motivation', '') or 'не указано'
-    goals = intern.get('goals', '') or 'не указаны'
+# Поля профиля, от которых зависит персонализация (ключ кэша сегментов)
+PROFILE_FIELDS = ('name', 'occupation', 'interests', 'motivation', 'goals', 'study_duration')
 
-    return f"""
+PROFILE_TEMPLATE = register_template('profile', """
 ПРОФИЛЬ СТАЖЕРА:
-- Имя: {intern['name']}
+- Имя: {name}
 - Занятие: {occupation}
 - Интересы/хобби: {interests}
 - Что важно в жизни: {motivation}
 - Что хочет изменить: {goals}
-- Время на изучение: {intern['study_duration']} минут (~{duration.get('words', 1500)} слов)
+- Время на изучение: {study_duration} минут (~{words} слов)
 
 ИНСТРУКЦИИ ПО ПЕРСОНАЛИЗАЦИИ:
 1. Показывай, как тема помогает достичь того, что стажер хочет изменить: "{goals}"
 2. Добавляй мотивационный блок, опираясь на ценности стажера: "{motivation}"
-3. Объём текста должен быть рассчитан на {intern['study_duration']} минут чтения (~{duration.get('words', 1500)} слов)
-4. Пиши простым языком, избегай академического стиля
+3. Объём текста должен быть рассчитан на {study_duration} минут чтения (~{words} слов)
+4. Пиши простым языком, избегай академического стиля""")
+
+STATIC_EXAMPLES_TEMPLATE = register_template('examples_static', """
 
 ПРАВИЛА ДЛЯ ПРИМЕРОВ:
 - Первый пример — из рабочей сферы стажера ("{occupation}")
 - Второй пример — из близкой профессиональной сферы
 - Третий пример (если нужен) — из интересов/хобби ({interests}), НЕ БОЛЕЕ ОДНОГО примера из интересов
 - Четвёртый пример (если нужен) — из абсолютно далёкой сферы для контраста
-"""
+""")
+
+EXAMPLE_RULES_TEMPLATE = register_template('example_rules', """
+ПРАВИЛА ДЛЯ ПРИМЕРОВ (День {day}):
+
+Формат примеров сегодня: **{template_name}**
+{template_instruction}
+
+Порядок источников для примеров (от первого к последнему):
+{sources_text}
+
+Детали источников:
+- Работа/профессия: "{occupation}"
+- Интерес дня: {interest_text}{other_interests_text}
+- Близкая сфера: смежная с работой "{occupation}" область
+- Далёкая сфера: что-то неожиданное для контраста (спорт, искусство, природа, история)
+
+ВАЖНО: Используй интерес дня ({interest_text}), а НЕ всегда первый из списка!
+""")
+
+
+def get_example_rules(intern: dict, marathon_day: int) -> str:
+    """Правила для примеров с ротацией формата, интереса и источников по дню марафона"""
+    interests = intern.get('interests', [])
+    occupation = intern.get('occupation', '') or 'работа'
+
+    # Выбираем интерес по дню (циклически)
+    if interests:
+        interest_idx = (marathon_day - 1) % len(interests)
+        today_interest = interests[interest_idx]
+        other_interests = [i for idx, i in enumerate(interests) if idx != interest_idx]
+    else:
+        today_interest = None
+        other_interests = []
+
+    # Формат примеров и порядок источников — по дню
+    template_name, template_instruction = EXAMPLE_TEMPLATES[(marathon_day - 1) % len(EXAMPLE_TEMPLATES)]
+    shift = (marathon_day - 1) % len(EXAMPLE_SOURCES)
+    rotated_sources = EXAMPLE_SOURCES[shift:] + EXAMPLE_SOURCES[:shift]
+
+    return EXAMPLE_RULES_TEMPLATE.render(
+        day=marathon_day,
+        template_name=template_name,
+        template_instruction=template_instruction,
+        sources_text="\n".join(f"  {i+1}. {src}" for i, src in enumerate(rotated_sources)),
+        occupation=occupation,
+        interest_text=f'"{today_interest}"' if today_interest else "не указан",
+        other_interests_text=f" (другие интересы для разнообразия: {', '.join(other_interests)})" if other_interests else "",
+    )
+
+
+def _build_personalization(intern: dict, marathon_day: Optional[int]) -> str:
+    duration = STUDY_DURATIONS.get(str(intern['study_duration']), {"words": 1500})
+    interests = ', '.join(intern['interests']) if intern['interests'] else 'не указаны'
+    occupation = intern.get('occupation', '') or 'не указано'
+
+    profile = PROFILE_TEMPLATE.render(
+        name=intern['name'],
+        occupation=occupation,
+        interests=interests,
+        motivation=intern.get('motivation', '') or 'не указано',
+        goals=intern.get('goals', '') or 'не указаны',
+        study_duration=intern['study_duration'],
+        words=duration.get('words', 1500),
+    )
+    if marathon_day is None:
+        return profile + STATIC_EXAMPLES_TEMPLATE.render(occupation=occupation, interests=interests)
+    return profile + '\n' + get_example_rules(intern, marathon_day)
+
+
+def get_personalization_prompt(intern: dict, marathon_day: Optional[int] = None) -> str:
+    """Генерирует промпт для персонализации на основе профиля стажера
+
+    Сегмент запоминается по хэшу профиля и дню: повторные вызовы для
+    того же пользователя отдают готовую строку.
+
+    Args:
+        intern: словарь с профилем стажера
+        marathon_day: день марафона для ротации примеров (None — общие правила примеров)
+
+    Returns:
+        Строка с инструкциями для персонализации
+    """
+    key = profile_hash(intern, PROFILE_FIELDS, marathon_day)
+    return get_prompt_registry().segment(
+        'personalization', key, lambda: _build_personalization(intern, marathon_day)
+    )
@@ -7,10 +7,17 @@
 - topic_request: пользователь просит тему
 - command: встроенная команда (проще, глубже, примеры)
 - unknown: не удалось распознать
+
+Все словари шаблонов компилируются при импорте: команды — в префиксное
+дерево (PrefixTrie), вопросительные зачины и фразы — в регулярные
+выражения, построенные из такого же дерева (общие префиксы вынесены),
+запросы темы — в одно объединённое выражение. Текст сообщения приводится
+к нижнему регистру и делится на слова один раз, после чего каждый
+признак — одно обращение к словарю или одному выражению.
 """
 
 import re
-from typing import Optional, Tuple
+from typing import Optional, Tuple, Dict, List, Iterable
 from dataclasses import dataclass
 from enum import Enum
 
@@ -43,6 +50,127 @@ class Intent:
     original_text: str = ""
 
 
+# =============================================================================
+# СЛОВАРИ ШАБЛОНОВ
+# =============================================================================
+
+# Явные запросы темы
+TOPIC_REQUEST_REGEXES = [
+    r'дай\s+тему',
+    r'давай\s+тему',
+    r'следующ\w+\s+тем',
+    r'хочу\s+учиться',
+    r'хочу\s+изучать',
+    r'предложи\s+тем',
+    r'начать\s+марафон',
+    r'начать\s+ленту',
+    r'продолжить\s+марафон',
+    r'продолжить\s+ленту',
+]
+
+# Начало явного вопроса (все языки)
+QUESTION_STARTERS = [
+    # Русские
+    'можно ли', 'нельзя ли', 'не могли бы',
+    'а что если', 'а как', 'а почему', 'а зачем',
+    'скажи', 'расскажи', 'объясни', 'поясни',
+    'в чём', 'в чем',
+    # Английские
+    'can you', 'could you', 'would you', 'will you',
+    'tell me', 'explain', 'describe',
+    'what is', 'what are', 'what does', 'what do',
+    'how is', 'how are', 'how does', 'how do', 'how can',
+    'why is', 'why are', 'why does', 'why do',
+    'is it', 'is there', 'are there',
+    # Испанские
+    'puedes', 'podrías', 'dime', 'explica',
+    'qué es', 'cómo es', 'por qué',
+]
+
+# Вопросительные конструкции в любом месте текста (все языки)
+QUESTION_PHRASES = [
+    # Русские
+    'можно ли', 'как это', 'что значит', 'что такое',
+    'в чём разница', 'в чем разница', 'чем отличается',
+    'почему так', 'зачем нужен', 'как работает',
+    # Английские
+    'what is', 'what are', 'what does', 'how does', 'how to',
+    'why is', 'why are', 'can i', 'could you', 'tell me',
+    'difference between', 'how it works', 'is it possible',
+    # Испанские
+    'qué es', 'cómo funciona', 'por qué', 'cuál es',
+    'diferencia entre', 'es posible',
+]
+
+# Слова, без которых TOPIC_REQUEST_PATTERNS — не запрос темы ("хочу спросить")
+TOPIC_HINTS = ['тем', 'учи', 'изуч']
+
+
+# =============================================================================
+# КОМПИЛЯЦИЯ
+# =============================================================================
+
+class PrefixTrie:
+    """Префиксное дерево фраз: поиск ключа-префикса и сборка регулярки"""
+
+    __slots__ = ('children', 'value', 'order')
+
+    def __init__(self):
+        self.children: Dict[str, 'PrefixTrie'] = {}
+        self.value = None
+        self.order: Optional[int] = None
+
+    @classmethod
+    def build(cls, items: Iterable[Tuple[str, object]]) -> 'PrefixTrie':
+        """Дерево из пар (фраза, значение); при повторе остаётся первое"""
+        root = cls()
+        for order, (key, value) in enumerate(items):
+            node = root
+            for char in key:
+                node = node.children.setdefault(char, cls())
+            if node.order is None:
+                node.value, node.order = value, order
+        return root
+
+    def first_prefix(self, text: str):
+        """Значение ключа, которым начинается text (из нескольких — первого по порядку вставки)"""
+        node, best = self, None
+        for char in text:
+            node = node.children.get(char)
+            if node is None:
+                break
+            if node.order is not None and (best is None or node.order < best.order):
+                best = node
+        return best.value if best is not None else None
+
+    def pattern(self) -> str:
+        """Регулярное выражение того же множества фраз с вынесенными общими префиксами"""
+        alternatives = [re.escape(char) + child.pattern() for char, child in sorted(self.children.items())]
+        if not alternatives:
+            return ''
+        body = alternatives[0] if len(alternatives) == 1 else '(?:' + '|'.join(alternatives) + ')'
+        if self.order is not None:
+            body = '(?:' + body + ')?'
+        return body
+
+
+def _phrase_regex(phrases: List[str]) -> re.Pattern:
+    return re.compile(PrefixTrie.build((p, True) for p in phrases).pattern())
+
+
+_COMMANDS = PrefixTrie.build(COMMAND_WORDS.items())
+_QUESTION_WORDS = frozenset(QUESTION_WORDS)
+_TOPIC_WORDS = frozenset(TOPIC_REQUEST_PATTERNS)
+_TOPIC_REQUEST = re.compile('|'.join(f'(?:{p})' for p in TOPIC_REQUEST_REGEXES))
+_TOPIC_HINT = re.compile('|'.join(map(re.escape, TOPIC_HINTS)))
+_QUESTION_STARTER = _phrase_regex(QUESTION_STARTERS)
+_QUESTION_PHRASE = _phrase_regex(QUESTION_PHRASES)
+
+
+# =============================================================================
+# РАСПОЗНАВАНИЕ
+# =============================================================================
+
 def detect_intent(text: str, context: dict = None) -> Intent:
     """Определяет интент пользователя на основе текста сообщения
 
@@ -58,6 +186,7 @@ def detect_intent(text: str, context: dict = None) -> Intent:
     """
     context = context or {}
     text_lower = text.lower().strip()
+    words = text_lower.split()
     original = text
 
     # 1. Проверяем встроенные команды
@@ -72,7 +201,7 @@ def detect_intent(text: str, context: dict = None) -> Intent:
     # 2. Если ждём ответ на вопрос или рабочий продукт - это ответ
     if context.get('awaiting_answer') or context.get('awaiting_work_product'):
         # Но проверим, не задаёт ли пользователь вопрос вместо ответа
-        if is_clear_question(text_lower):
+        if _is_clear_question(text_lower, words):
             return Intent(
                 type=IntentType.QUESTION,
                 confidence=0.9,
@@ -84,7 +213,7 @@ def detect_intent(text: str, context: dict = None) -> Intent:
         )
 
     # 3. Проверяем запрос темы
-    if is_topic_request(text_lower):
+    if _is_topic_request(text_lower, words):
         return Intent(
             type=IntentType.TOPIC_REQUEST,
             confidence=0.9,
@@ -92,7 +221,7 @@ def detect_intent(text: str, context: dict = None) -> Intent:
         )
 
     # 4. Проверяем вопрос
-    question_score = question_likelihood(text_lower)
+    question_score = _question_likelihood(text_lower, words)
     if question_score >= 0.7:
         return Intent(
             type=IntentType.QUESTION,
@@ -139,12 +268,8 @@ def detect_command(text: str) -> Optional[str]:
     if text in COMMAND_WORDS:
         return COMMAND_WORDS[text]
 
-    # Проверяем начало строки
-    for word, cmd in COMMAND_WORDS.items():
-        if text.startswith(word):
-            return cmd
-
-    return None
+    # Команда в начале строки
+    return _COMMANDS.first_prefix(text)
 
 
 def is_topic_request(text: str) -> bool:
@@ -156,33 +281,16 @@ def is_topic_request(text: str) -> bool:
     Returns:
         True если это запрос темы
     """
+    return _is_topic_request(text, text.split())
+
+
+def _is_topic_request(text: str, words: List[str]) -> bool:
     # Явные паттерны
-    patterns = [
-        r'дай\s+тему',
-        r'давай\s+тему',
-        r'следующ\w+\s+тем',
-        r'хочу\s+учиться',
-        r'хочу\s+изучать',
-        r'предложи\s+тем',
-        r'начать\s+марафон',
-        r'начать\s+ленту',
-        r'продолжить\s+марафон',
-        r'продолжить\s+ленту',
-    ]
-
-    for pattern in patterns:
-        if re.search(pattern, text):
-            return True
-
-    # Проверяем TOPIC_REQUEST_PATTERNS как слова
-    words = set(text.split())
-    for pattern_word in TOPIC_REQUEST_PATTERNS:
-        if pattern_word in words:
-            # Проверяем что это не просто "хочу спросить"
-            if 'тем' in text or 'учи' in text or 'изуч' in text:
-                return True
-
-    return False
+    if _TOPIC_REQUEST.search(text):
+        return True
+
+    # TOPIC_REQUEST_PATTERNS как слова, но не просто "хочу спросить"
+    return not _TOPIC_WORDS.isdisjoint(words) and _TOPIC_HINT.search(text) is not None
 
 
 def is_clear_question(text: str) -> bool:
@@ -194,39 +302,18 @@ def is_clear_question(text: str) -> bool:
     Returns:
         True если это явный вопрос
     """
+    return _is_clear_question(text, text.split())
+
+
+def _is_clear_question(text: str, words: List[str]) -> bool:
     # Заканчивается на вопросительный знак
     if text.rstrip().endswith('?'):
         return True
 
-    # Начинается с вопросительного слова
-    first_word = text.split()[0] if text.split() else ''
-    if first_word in QUESTION_WORDS:
+    # Начинается с вопросительного слова или вопросительной конструкции
+    if words and words[0] in _QUESTION_WORDS:
         return True
-
-    # Проверяем начало с вопросительных конструкций (все языки)
-    question_starters = [
-        # Русские
-        'можно ли', 'нельзя ли', 'не могли бы',
-        'а что если', 'а как', 'а почему', 'а зачем',
-        'скажи', 'расскажи', 'объясни', 'поясни',
-        'в чём', 'в чем',
-        # Английские
-        'can you', 'could you', 'would you', 'will you',
-        'tell me', 'explain', 'describe',
-        'what is', 'what are', 'what does', 'what do',
-        'how is', 'how are', 'how does', 'how do', 'how can',
-        'why is', 'why are', 'why does', 'why do',
-        'is it', 'is there', 'are there',
-        # Испанские
-        'puedes', 'podrías', 'dime', 'explica',
-        'qué es', 'cómo es', 'por qué',
-    ]
-
-    for starter in question_starters:
-        if text.startswith(starter):
-            return True
-
-    return False
+    return _QUESTION_STARTER.match(text) is not None
 
 
 def question_likelihood(text: str) -> float:
@@ -238,6 +325,10 @@ def question_likelihood(text: str) -> float:
     Returns:
         Вероятность от 0 до 1
     """
+    return _question_likelihood(text, text.split())
+
+
+def _question_likelihood(text: str, words: List[str]) -> float:
     score = 0.0
 
     # Вопросительный знак
@@ -245,34 +336,16 @@ def question_likelihood(text: str) -> float:
         score += 0.5
 
     # Начинается с вопросительного слова
-    words = text.split()
-    if words and words[0] in QUESTION_WORDS:
+    if words and words[0] in _QUESTION_WORDS:
         score += 0.3
 
-    # Содержит вопросительные слова внутри
-    for word in QUESTION_WORDS:
-        if word in words:
-            score += 0.1
-            break  # Только один раз
-
-    # Вопросительные конструкции (все языки)
-    question_phrases = [
-        # Русские
-        'можно ли', 'как это', 'что значит', 'что такое',
-        'в чём разница', 'в чем разница', 'чем отличается',
-        'почему так', 'зачем нужен', 'как работает',
-        # Английские
-        'what is', 'what are', 'what does', 'how does', 'how to',
-        'why is', 'why are', 'can i', 'could you', 'tell me',
-        'difference between', 'how it works', 'is it possible',
-        # Испанские
-        'qué es', 'cómo funciona', 'por qué', 'cuál es',
-        'diferencia entre', 'es posible',
-    ]
-    for phrase in question_phrases:
-        if phrase in text:
-            score += 0.3
-            break
+    # Содержит вопросительные слова внутри (один раз)
+    if not _QUESTION_WORDS.isdisjoint(words):
+        score += 0.1
+
+    # Вопросительные конструкции (один раз)
+    if _QUESTION_PHRASE.search(text):
+        score += 0.3
 
     # Длинный текст без вопросительных признаков - скорее не вопрос
     if len(text) > 200 and score < 0.3:
@@ -0,0 +1,50 @@
+"""
+Кэш inline-клавиатур.
+
+Большинство клавиатур зависит только от языка (и пары флагов состояния),
+а собирались заново на каждый ответ: десятки вызовов t() и создание
+pydantic-моделей кнопок. Построитель, обёрнутый в cached_keyboard,
+вызывается один раз на набор аргументов, дальше отдаётся готовый
+InlineKeyboardMarkup — один и тот же объект во все чаты.
+
+Модели aiogram 3 не заморожены, поэтому результат построителя нельзя
+изменять: добавлять ряды, менять кнопки или их текст. Нужна изменённая
+клавиатура — соберите новую или возьмите копию
+(markup.model_copy(deep=True)). Тест test_locales проверяет вызовы.
+
+Аргументы построителя должны быть хешируемыми и полностью определять
+клавиатуру (например, дату передаём явно, а не берём внутри).
+"""
+
+from functools import lru_cache
+from typing import Callable, Dict, List
+
+from config import get_logger, KEYBOARD_CACHE_SIZE
+
+logger = get_logger(__name__)
+
+_builders: List[Callable] = []
+
+
+def cached_keyboard(builder: Callable) -> Callable:
+    """Декоратор: клавиатура строится один раз на набор аргументов"""
+    cached = lru_cache(maxsize=KEYBOARD_CACHE_SIZE)(builder)
+    _builders.append(cached)
+    return cached
+
+
+def get_keyboard_cache_stats() -> Dict[str, dict]:
+    """Попадания и промахи по построителям"""
+    stats = {}
+    for cached in _builders:
+        info = cached.cache_info()
+        stats[f"{cached.__module__}.{cached.__name__}"] = {
+            'hits': info.hits, 'misses': info.misses, 'size': info.currsize,
+        }
+    return stats
+
+
+def clear_keyboard_cache():
+    """Сбросить все закэшированные клавиатуры (например, после смены переводов)"""
+    for cached in _builders:
+        cached.cache_clear()
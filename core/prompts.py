@@ -0,0 +1,252 @@
+"""
+Шаблоны промптов.
+
+Промпт собирается из именованных версионированных шаблонов (PromptTemplate).
+Текст шаблона разбирается один раз при регистрации: он заранее разрезан
+на литералы и поля, поэтому рендер — это подстановка значений и join.
+Синтаксис полей как у str.format: {name}, литеральные скобки — {{ и }}.
+
+Сегменты, зависящие только от профиля (персонализация, правила примеров),
+запоминаются по хэшу профиля (LRU на PROMPT_SEGMENT_CACHE_SIZE записей):
+для того же пользователя и дня они не пересобираются, а итоговый промпт
+получается побайтно одинаковым.
+
+По каждому шаблону копится размер промптов (символы и оценка токенов),
+а отпечаток name@version:hash показывает в логах и статистике, что
+текст шаблона поменялся.
+"""
+
+import hashlib
+import json
+from collections import OrderedDict
+from string import Formatter
+from typing import Optional, Dict, List, Tuple, Callable
+
+from config import get_logger, PROMPT_SEGMENT_CACHE_SIZE
+from .context_packer import estimate_tokens
+
+logger = get_logger(__name__)
+
+DEFAULT_LANG = 'ru'
+
+
+# =============================================================================
+# ЯЗЫКОВЫЕ ИНСТРУКЦИИ
+# =============================================================================
+
+LANG_INSTRUCTIONS: Dict[str, Dict[str, str]] = {
+    'write': {
+        'ru': "ВАЖНО: Пиши ВСЁ на русском языке.",
+        'en': "IMPORTANT: Write EVERYTHING in English.",
+        'es': "IMPORTANTE: Escribe TODO en español.",
+    },
+    'question': {
+        'ru': "ВАЖНО: Пиши вопрос на русском языке.",
+        'en': "IMPORTANT: Write the question in English.",
+        'es': "IMPORTANTE: Escribe la pregunta en español.",
+    },
+    'ask': {
+        'ru': "ВАЖНО: Задай вопрос на русском языке.",
+        'en': "IMPORTANT: Ask the question in English.",
+        'es': "IMPORTANTE: Haz la pregunta en español.",
+    },
+    'answer': {
+        'ru': "ВАЖНО: Отвечай на русском языке.",
+        'en': "IMPORTANT: Answer in English.",
+        'es': "IMPORTANTE: Responde en español.",
+    },
+}
+
+LANG_REMINDERS: Dict[str, Dict[str, str]] = {
+    'write': {
+        'ru': "НАПОМИНАНИЕ: Весь текст должен быть на РУССКОМ языке!",
+        'en': "REMINDER: All text must be in ENGLISH!",
+        'es': "RECORDATORIO: ¡Todo el texto debe estar en ESPAÑOL!",
+    },
+    'question': {
+        'ru': "НАПОМИНАНИЕ: Вопрос должен быть на РУССКОМ языке!",
+        'en': "REMINDER: The question must be in ENGLISH!",
+        'es': "RECORDATORIO: ¡La pregunta debe estar en ESPAÑOL!",
+    },
+    'answer': {
+        'ru': "НАПОМИНАНИЕ: Весь ответ должен быть на РУССКОМ языке!",
+        'en': "REMINDER: The entire answer must be in ENGLISH!",
+        'es': "RECORDATORIO: ¡Toda la respuesta debe estar en ESPAÑOL!",
+    },
+    'feed_topics': {
+        'ru': "НАПОМИНАНИЕ: Весь текст (title, why) должен быть на РУССКОМ языке!",
+        'en': "REMINDER: All text (title, why) must be in ENGLISH!",
+        'es': "RECORDATORIO: ¡Todo el texto (title, why) debe estar en ESPAÑOL!",
+    },
+    'digest': {
+        'ru': "НАПОМИНАНИЕ: Весь текст (intro, main_content, reflection_prompt) должен быть на РУССКОМ языке!",
+        'en': "REMINDER: All text (intro, main_content, reflection_prompt) must be in ENGLISH!",
+        'es': "RECORDATORIO: ¡Todo el texto (intro, main_content, reflection_prompt) debe estar en ESPAÑOL!",
+    },
+}
+
+
+def lang_instruction(kind: str, lang: Optional[str]) -> str:
+    """Инструкция о языке ответа (write / question / ask / answer)"""
+    variants = LANG_INSTRUCTIONS[kind]
+    return variants.get(lang or DEFAULT_LANG, variants[DEFAULT_LANG])
+
+
+def lang_reminder(kind: str, lang: Optional[str]) -> str:
+    """Напоминание о языке в конце промпта (write / question / answer / feed_topics / digest)"""
+    variants = LANG_REMINDERS[kind]
+    return variants.get(lang or DEFAULT_LANG, variants[DEFAULT_LANG])
+
+
+# =============================================================================
+# ШАБЛОНЫ
+# =============================================================================
+
+class PromptTemplate:
+    """Именованный версионированный шаблон, разобранный один раз"""
+
+    def __init__(self, name: str, text: str, version: int = 1):
+        self.name = name
+        self.version = version
+        self.text = text
+        self.digest = hashlib.blake2b(text.encode('utf-8'), digest_size=6).hexdigest()
+
+        self._parts: List[Tuple[str, Optional[str]]] = []
+        fields = []
+        for literal, field, spec, conversion in Formatter().parse(text):
+            if spec or conversion:
+                raise ValueError(f"Шаблон {name}: формат и конверсии не поддерживаются ({{{field}}})")
+            if field is not None and not field.isidentifier():
+                raise ValueError(f"Шаблон {name}: поле должно быть именем, а не выражением ({{{field}}})")
+            self._parts.append((literal, field))
+            if field and field not in fields:
+                fields.append(field)
+        self.fields = tuple(fields)
+
+        self.renders = 0
+        self.total_chars = 0
+        self.max_chars = 0
+        self.total_tokens = 0
+
+    @property
+    def fingerprint(self) -> str:
+        return f"{self.name}@{self.version}:{self.digest}"
+
+    def render(self, **values) -> str:
+        """Подставляет значения полей (KeyError, если поля не хватает)"""
+        chunks = []
+        for literal, field in self._parts:
+            chunks.append(literal)
+            if field is not None:
+                chunks.append(str(values[field]))
+        text = ''.join(chunks)
+
+        self.renders += 1
+        self.total_chars += len(text)
+        self.max_chars = max(self.max_chars, len(text))
+        self.total_tokens += estimate_tokens(text)
+        return text
+
+    def get_stats(self) -> dict:
+        renders = self.renders or 1
+        return {
+            'fingerprint': self.fingerprint,
+            'renders': self.renders,
+            'avg_chars': self.total_chars // renders,
+            'max_chars': self.max_chars,
+            'avg_tokens': self.total_tokens // renders,
+        }
+
+
+class PromptRegistry:
+    """Реестр шаблонов и кэш профильных сегментов"""
+
+    def __init__(self, segment_cache_size: int = PROMPT_SEGMENT_CACHE_SIZE):
+        self.templates: Dict[str, PromptTemplate] = {}
+        self.segment_cache_size = segment_cache_size
+        self._segments: OrderedDict = OrderedDict()
+        self.segment_hits = 0
+        self.segment_misses = 0
+
+    def register(self, name: str, text: str, version: int = 1) -> PromptTemplate:
+        """Зарегистрировать шаблон (повторная регистрация с новым текстом требует новой версии)"""
+        existing = self.templates.get(name)
+        template = PromptTemplate(name, text, version)
+        if existing and existing.version == version:
+            if existing.digest == template.digest:
+                return existing
+            logger.warning(f"PromptRegistry: шаблон {name} изменён без смены версии "
+                           f"({existing.fingerprint} → {template.fingerprint})")
+        self.templates[name] = template
+        self._drop_segments(name)
+        return template
+
+    def get(self, name: str) -> PromptTemplate:
+        return self.templates[name]
+
+    def render(self, name: str, **values) -> str:
+        return self.templates[name].render(**values)
+
+    def segment(self, name: str, key: str, build: Callable[[], str]) -> str:
+        """Профильный сегмент из кэша по (name, key) или собранный build()
+
+        Args:
+            name: имя сегмента (обычно имя шаблона)
+            key: хэш всего, от чего сегмент зависит (см. profile_hash)
+            build: сборка сегмента при промахе
+        """
+        cache_key = (name, key)
+        text = self._segments.get(cache_key)
+        if text is not None:
+            self._segments.move_to_end(cache_key)
+            self.segment_hits += 1
+            return text
+
+        self.segment_misses += 1
+        text = build()
+        self._segments[cache_key] = text
+        while len(self._segments) > self.segment_cache_size:
+            self._segments.popitem(last=False)
+        return text
+
+    def _drop_segments(self, name: str):
+        for cache_key in [k for k in self._segments if k[0] == name]:
+            del self._segments[cache_key]
+
+    def clear_segments(self):
+        self._segments.clear()
+
+    def get_stats(self) -> dict:
+        """Размеры промптов по шаблонам и попадания в кэш сегментов"""
+        return {
+            'templates': {name: t.get_stats() for name, t in sorted(self.templates.items())},
+            'segments': {
+                'size': len(self._segments),
+                'hits': self.segment_hits,
+                'misses': self.segment_misses,
+            },
+        }
+
+
+def profile_hash(intern: dict, fields: Tuple[str, ...], *extra) -> str:
+    """Хэш значений полей профиля (и дополнительных параметров) для ключа кэша"""
+    payload = json.dumps([[intern.get(f) for f in fields], list(extra)],
+                         ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.blake2b(payload.encode('utf-8'), digest_size=12).hexdigest()
+
+
+# Singleton
+_registry: Optional[PromptRegistry] = None
+
+
+def get_prompt_registry() -> PromptRegistry:
+    """Получить глобальный реестр шаблонов"""
+    global _registry
+    if _registry is None:
+        _registry = PromptRegistry()
+    return _registry
+
+
+def register_template(name: str, text: str, version: int = 1) -> PromptTemplate:
+    """Зарегистрировать шаблон в глобальном реестре"""
+    return get_prompt_registry().register(name, text, version)
@@ -0,0 +1,263 @@
+"""
+Реестр тем марафона (topics/*.yaml).
+
+Все файлы тем читаются один раз (C-загрузчиком YAML, если он есть),
+проверяются по topics/_schema.yaml и индексируются по id и по дню.
+Поиск темы — обращение к словарю. Изменения файлов подхватываются
+на лету: не чаще раза в TOPICS_RELOAD_INTERVAL секунд сверяются mtime,
+и перечитываются только изменённые файлы.
+
+Если собран пакет контента (core/content.py), темы при старте берутся
+из него без разбора YAML.
+
+Файл, не прошедший разбор или проверку, в реестр не попадает;
+причина видна в TopicRegistry.errors и в логе.
+"""
+
+import os
+import time
+from pathlib import Path
+from typing import Optional, List, Dict, Tuple, Any
+
+import yaml
+
+from config import get_logger, TOPICS_DIR, TOPICS_RELOAD_INTERVAL
+
+logger = get_logger(__name__)
+
+# C-загрузчик в разы быстрее; без libyaml — чистый Python
+YamlLoader = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+
+SCHEMA_FILE = "_schema.yaml"
+
+# Обязательные поля (остальные поля схемы проверяются, если заданы)
+REQUIRED_FIELDS = ('id', 'title', 'type')
+
+# Поля, которых нет в схеме, но на которые опирается индекс
+EXTRA_FIELDS = {'day': 0, 'order': 0}
+
+
+def load_yaml(path: Path) -> Any:
+    """Разбор YAML-файла"""
+    with open(path, 'r', encoding='utf-8') as f:
+        return yaml.load(f, Loader=YamlLoader)
+
+
+# =============================================================================
+# ПРОВЕРКА ПО СХЕМЕ
+# =============================================================================
+
+def validate(data: Any, schema: Any, path: str = '') -> List[str]:
+    """Проверка значения по образцу из _schema.yaml
+
+    Образец "string" — строка, "a|b" — одно из значений, число — число,
+    список — список (элементы по первому образцу), словарь — поля,
+    которые есть и в данных, и в образце. Лишние поля допустимы.
+
+    Returns:
+        Список ошибок (пустой — всё в порядке)
+    """
+    where = path or 'тема'
+    if isinstance(schema, dict):
+        if not isinstance(data, dict):
+            return [f"{where}: ожидался словарь"]
+        errors = []
+        for key, sample in schema.items():
+            if key in data:
+                errors += validate(data[key], sample, f"{path}.{key}" if path else str(key))
+        return errors
+    if isinstance(schema, list):
+        if not isinstance(data, list):
+            return [f"{where}: ожидался список"]
+        if not schema:
+            return []
+        return [e for i, item in enumerate(data) for e in validate(item, schema[0], f"{where}[{i}]")]
+    if isinstance(schema, bool):
+        return [] if isinstance(data, bool) else [f"{where}: ожидалось true/false"]
+    if isinstance(schema, (int, float)):
+        return [] if isinstance(data, (int, float)) and not isinstance(data, bool) else [f"{where}: ожидалось число"]
+    if isinstance(schema, str):
+        if not isinstance(data, str):
+            return [f"{where}: ожидалась строка"]
+        if '|' in schema and data not in schema.split('|'):
+            return [f"{where}: '{data}' не из {schema}"]
+    return []
+
+
+def validate_topic(data: Any, schema: dict) -> List[str]:
+    """Проверка файла темы: обязательные поля + схема"""
+    if not isinstance(data, dict):
+        return ["файл не содержит словарь"]
+    errors = [f"{name}: обязательное поле" for name in REQUIRED_FIELDS if not data.get(name)]
+    errors += validate(data, schema)
+    errors += validate({k: data[k] for k in EXTRA_FIELDS if k in data}, EXTRA_FIELDS)
+    return errors
+
+
+# =============================================================================
+# РЕЕСТР
+# =============================================================================
+
+class TopicRegistry:
+    """Темы марафона, индексированные по id и по дню"""
+
+    def __init__(self, topics_dir: Path = TOPICS_DIR,
+                 reload_interval: float = TOPICS_RELOAD_INTERVAL,
+                 clock=time.monotonic,
+                 preloaded: Optional[Dict[str, dict]] = None,
+                 preloaded_index: Optional[dict] = None):
+        """
+        Args:
+            topics_dir: каталог тем
+            reload_interval: как часто сверять mtime (сек)
+            clock: источник времени
+            preloaded: уже разобранные и проверенные темы (имя файла → тема),
+                используются при первой загрузке вместо разбора YAML
+            preloaded_index: индексы пакета (topic_file_by_id, topic_files_by_day)
+                для тех же тем — при первой загрузке не перестраиваются
+        """
+        self.topics_dir = Path(topics_dir)
+        self.reload_interval = reload_interval
+        self._clock = clock
+        self._schema: dict = {}
+        self._files: Dict[str, Tuple[float, Optional[dict]]] = {}  # имя файла → (mtime, тема)
+        self._by_id: Dict[str, dict] = {}
+        self._by_day: Dict[int, List[dict]] = {}
+        self.errors: Dict[str, str] = {}  # имя файла → причина
+        self._checked_at = 0.0
+        self._preloaded = dict(preloaded or {})
+        self._preloaded_index = preloaded_index or {}
+        self.reload()
+        self._preloaded = {}
+        self._preloaded_index = {}
+
+    def _scan(self) -> Dict[str, float]:
+        """mtime всех файлов каталога (имя → mtime)"""
+        if not self.topics_dir.exists():
+            return {}
+        with os.scandir(self.topics_dir) as entries:
+            return {e.name: e.stat().st_mtime for e in entries
+                    if e.name.endswith('.yaml') and e.is_file()}
+
+    def reload(self) -> bool:
+        """Перечитать изменённые файлы и перестроить индексы
+
+        Returns:
+            True, если что-то изменилось
+        """
+        self._checked_at = self._clock()
+        mtimes = self._scan()
+        schema_changed = mtimes.get(SCHEMA_FILE) != self._files.get(SCHEMA_FILE, (None,))[0]
+        changed = [name for name, mtime in mtimes.items()
+                   if schema_changed or self._files.get(name, (None,))[0] != mtime]
+        removed = [name for name in self._files if name not in mtimes]
+        if not changed and not removed:
+            return False
+
+        if schema_changed:
+            self._schema = self._load_schema()
+            self._files[SCHEMA_FILE] = (mtimes.get(SCHEMA_FILE), None)
+
+        for name in removed:
+            self._files.pop(name, None)
+            self.errors.pop(name, None)
+
+        for name in changed:
+            if name.startswith('_'):  # Служебные файлы
+                continue
+            topic = self._preloaded.get(name) or self._load_topic(name)
+            self._files[name] = (mtimes[name], topic)
+
+        if not self._use_preloaded_index():
+            self._rebuild()
+        logger.info(f"TopicRegistry: {len(self._by_id)} тем, перечитано {len(changed)} файлов"
+                    + (f", ошибок {len(self.errors)}" if self.errors else ""))
+        return True
+
+    def _load_schema(self) -> dict:
+        path = self.topics_dir / SCHEMA_FILE
+        if not path.exists():
+            return {}
+        try:
+            return (load_yaml(path) or {}).get('schema', {})
+        except Exception as e:
+            logger.error(f"TopicRegistry: ошибка загрузки схемы {path}: {e}")
+            return {}
+
+    def _load_topic(self, name: str) -> Optional[dict]:
+        """Разбор и проверка одного файла темы"""
+        self.errors.pop(name, None)
+        try:
+            data = load_yaml(self.topics_dir / name)
+        except Exception as e:
+            self.errors[name] = f"ошибка разбора: {e}"
+            logger.error(f"TopicRegistry: {name}: {self.errors[name]}")
+            return None
+        problems = validate_topic(data, self._schema)
+        if problems:
+            self.errors[name] = "; ".join(problems[:5])
+            logger.error(f"TopicRegistry: {name} не соответствует схеме: {self.errors[name]}")
+            return None
+        return data
+
+    def _use_preloaded_index(self) -> bool:
+        """Взять индексы из пакета, если он описывает ровно загруженные темы"""
+        by_id = self._preloaded_index.get('topic_file_by_id')
+        by_day = self._preloaded_index.get('topic_files_by_day')
+        if by_id is None or by_day is None:
+            return False
+        loaded = {name: topic for name, (_, topic) in self._files.items() if topic is not None}
+        if {name for names in by_day.values() for name in names} != loaded.keys():
+            return False
+        self._by_id = {topic_id: loaded[name] for topic_id, name in by_id.items()}
+        self._by_day = {day: [loaded[name] for name in names] for day, names in by_day.items()}
+        return True
+
+    def _rebuild(self):
+        by_id: Dict[str, dict] = {}
+        by_day: Dict[int, List[dict]] = {}
+        for name, (_, topic) in sorted(self._files.items()):
+            if topic is None:
+                continue
+            if topic['id'] in by_id:
+                logger.warning(f"TopicRegistry: повтор id '{topic['id']}' в {name}")
+            by_id[topic['id']] = topic
+            by_day.setdefault(topic.get('day', 0), []).append(topic)
+        for topics in by_day.values():
+            topics.sort(key=lambda t: t.get('order', 0))
+        self._by_id, self._by_day = by_id, by_day
+
+    def _maybe_reload(self):
+        if self._clock() - self._checked_at >= self.reload_interval:
+            self.reload()
+
+    def get(self, topic_id: str) -> Optional[dict]:
+        """Тема по id"""
+        self._maybe_reload()
+        return self._by_id.get(topic_id)
+
+    def by_day(self, day: int) -> List[dict]:
+        """Темы дня в порядке order"""
+        self._maybe_reload()
+        return list(self._by_day.get(day, []))
+
+    def all(self) -> List[dict]:
+        """Все темы по дням и порядку"""
+        self._maybe_reload()
+        return [t for day in sorted(self._by_day) for t in self._by_day[day]]
+
+    def __len__(self) -> int:
+        return len(self._by_id)
+
+
+# Singleton
+_registry: Optional[TopicRegistry] = None
+
+
+def get_topic_registry() -> TopicRegistry:
+    """Получить глобальный реестр тем"""
+    global _registry
+    if _registry is None:
+        from .content import get_bundled_topics, get_content_indexes
+        _registry = TopicRegistry(preloaded=get_bundled_topics(), preloaded_index=get_content_indexes())
+    return _registry
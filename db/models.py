@@ -197,6 +197,8 @@ async def create_tables(pool: asyncpg.Pool):
         # Миграции для feed_weeks
         feed_week_migrations = [
             'ALTER TABLE feed_weeks ADD COLUMN IF NOT EXISTS ended_at TIMESTAMP',
+            # Ключ предложений тем (ISO-неделя + профиль), suggested_topics — их кэш
+            'ALTER TABLE feed_weeks ADD COLUMN IF NOT EXISTS suggestions_key TEXT',
         ]
         for migration in feed_week_migrations:
             try:
@@ -231,6 +233,8 @@ async def create_tables(pool: asyncpg.Pool):
             'ALTER TABLE feed_sessions ADD COLUMN IF NOT EXISTS session_date DATE',
             'ALTER TABLE feed_sessions ADD COLUMN IF NOT EXISTS status TEXT DEFAULT \'active\'',
             'ALTER TABLE feed_sessions ADD COLUMN IF NOT EXISTS fixation_text TEXT',
+            # Ключ плана (темы, глубина, профиль) предгенерированного дайджеста
+            'ALTER TABLE feed_sessions ADD COLUMN IF NOT EXISTS plan_key TEXT',
         ]
         for migration in feed_session_migrations:
             try:
@@ -238,6 +242,25 @@ async def create_tables(pool: asyncpg.Pool):
             except Exception:
                 pass
 
+        # Общие базовые тексты дайджеста (тема, глубина, язык, длительность)
+        await conn.execute('''
+            CREATE TABLE IF NOT EXISTS feed_base_digests (
+                cache_key TEXT PRIMARY KEY,
+                topic TEXT,
+                depth_level INTEGER,
+                language TEXT,
+                duration_bucket INTEGER,
+
+                content TEXT,
+                tokens INTEGER DEFAULT 0,
+                hits INTEGER DEFAULT 0,
+                tokens_saved BIGINT DEFAULT 0,
+
+                created_at TIMESTAMP DEFAULT NOW(),
+                last_used_at TIMESTAMP DEFAULT NOW()
+            )
+        ''')
+
         # ═══════════════════════════════════════════════════════════
         # ЛОГ АКТИВНОСТИ (NEW)
         # ═══════════════════════════════════════════════════════════
@@ -282,4 +305,52 @@ async def create_tables(pool: asyncpg.Pool):
             )
         ''')
 
+        await conn.execute('''
+            CREATE INDEX IF NOT EXISTS idx_qa_history_chat
+            ON qa_history(chat_id, id)
+        ''')
+
+        # Скользящий конспект вопросов: покрывает qa_history до last_qa_id
+        await conn.execute('''
+            CREATE TABLE IF NOT EXISTS qa_summaries (
+                chat_id BIGINT PRIMARY KEY,
+                summary TEXT DEFAULT '',
+                last_qa_id INTEGER DEFAULT 0,
+                turns INTEGER DEFAULT 0,
+                updated_at TIMESTAMP DEFAULT NOW()
+            )
+        ''')
+
+        # ═══════════════════════════════════════════════════════════
+        # УЧЁТ ВЫЗОВОВ LLM И MCP
+        # ═══════════════════════════════════════════════════════════
+        await conn.execute('''
+            CREATE TABLE IF NOT EXISTS llm_calls (
+                id SERIAL PRIMARY KEY,
+                kind TEXT,
+                call_site TEXT,
+                target TEXT,
+                chat_hash TEXT,
+                profile TEXT,
+
+                input_tokens INTEGER DEFAULT 0,
+                output_tokens INTEGER DEFAULT 0,
+                cache_creation_tokens INTEGER DEFAULT 0,
+                cache_read_tokens INTEGER DEFAULT 0,
+                cost_usd REAL DEFAULT 0,
+
+                latency_ms INTEGER DEFAULT 0,
+                outcome TEXT,
+
+                created_at TIMESTAMP DEFAULT NOW()
+            )
+        ''')
+
+        await conn.execute('''
+            CREATE INDEX IF NOT EXISTS idx_llm_calls_site
+            ON llm_calls(call_site, created_at)
+        ''')
+        # Повторов у вызовов нет — колонка всегда была 0
+        await conn.execute('ALTER TABLE llm_calls DROP COLUMN IF EXISTS retries')
+
     logger.info("✅ Все таблицы созданы/обновлены")
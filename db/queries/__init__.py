@@ -4,9 +4,10 @@
 Модули:
 - users.py: работа с таблицей interns
 - answers.py: работа с таблицей answers
-- feed.py: работа с Лентой (feed_weeks, feed_sessions)
+- feed.py: работа с Лентой (feed_weeks, feed_sessions, feed_base_digests)
 - activity.py: отслеживание активности и систематичности
 - qa.py: история вопросов и ответов
+- llm_calls.py: учёт вызовов LLM и MCP
 """
 
 from .users import (
@@ -39,12 +40,30 @@ from .feed import (
     update_feed_session,
     get_feed_session,
     get_feed_history,
+    get_feed_snapshot,
+    complete_feed_fixation,
+    save_prepared_feed_session,
+    claim_prepared_feed_session,
+    discard_prepared_feed_sessions,
+    get_feed_prefetch_candidates,
+    get_cached_feed_suggestions,
+    get_base_digests,
+    save_base_digest,
+    get_base_digest_report,
 )
 
 from .qa import (
     save_qa,
     get_qa_history,
     get_qa_count,
+    get_qa_since,
+    get_qa_summary,
+    save_qa_summary,
+)
+
+from .llm_calls import (
+    save_llm_calls,
+    get_llm_calls_report,
 )
 
 __all__ = [
@@ -75,9 +94,26 @@ __all__ = [
     'update_feed_session',
     'get_feed_session',
     'get_feed_history',
+    'get_feed_snapshot',
+    'complete_feed_fixation',
+    'save_prepared_feed_session',
+    'claim_prepared_feed_session',
+    'discard_prepared_feed_sessions',
+    'get_feed_prefetch_candidates',
+    'get_cached_feed_suggestions',
+    'get_base_digests',
+    'save_base_digest',
+    'get_base_digest_report',
 
     # qa
     'save_qa',
     'get_qa_history',
     'get_qa_count',
+    'get_qa_since',
+    'get_qa_summary',
+    'save_qa_summary',
+
+    # llm_calls
+    'save_llm_calls',
+    'get_llm_calls_report',
 ]
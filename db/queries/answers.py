@@ -296,6 +296,7 @@ async def get_total_stats(chat_id: int) -> dict:
             WHERE week_id IN (
                 SELECT id FROM feed_weeks WHERE chat_id = $1
             )
+            AND status != 'prepared'
         ''', chat_id)
 
         # Всего фиксаций
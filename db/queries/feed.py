@@ -1,20 +1,78 @@
 """
 Запросы для режима Лента.
+
+Состояние Ленты пользователя читается одним запросом (get_feed_snapshot),
+фиксация дня записывается одним атомарным запросом (complete_feed_fixation).
+
+Сессия со статусом 'prepared' — дайджест, сгенерированный заранее: без даты,
+с ключом плана (plan_key). При открытии дайджеста она забирается
+(claim_prepared_feed_session) и становится обычной активной сессией.
+
+feed_base_digests — общие для всех пользователей базовые тексты тем
+дайджеста; чтение сразу отмечает попадание и сэкономленные токены.
 """
 
 import json
-from datetime import date, timedelta
-from typing import List, Optional
+from datetime import date, datetime, timedelta
+from typing import List, Optional, Dict
 
-from config import get_logger, FeedWeekStatus
+from config import get_logger, FeedStatus, FeedWeekStatus
 from db.connection import get_pool
 
 logger = get_logger(__name__)
 
+WEEK_COLUMNS = ('id', 'chat_id', 'week_number', 'week_start', 'suggested_topics',
+                'suggestions_key', 'accepted_topics', 'current_day', 'status', 'created_at')
+SESSION_COLUMNS = ('id', 'week_id', 'day_number', 'topic_title', 'content',
+                   'fixation_text', 'session_date', 'status', 'completed_at')
+PREPARED_COLUMNS = ('id', 'day_number', 'plan_key')
+
+
+def _week_to_dict(row, prefix: str = '') -> Optional[dict]:
+    """Строка feed_weeks (или её колонки с префиксом) → словарь"""
+    if row[f'{prefix}id'] is None:
+        return None
+    return {
+        'id': row[f'{prefix}id'],
+        'chat_id': row[f'{prefix}chat_id'],
+        'week_number': row[f'{prefix}week_number'],
+        'week_start': row[f'{prefix}week_start'],
+        'suggested_topics': json.loads(row[f'{prefix}suggested_topics']),
+        'suggestions_key': row[f'{prefix}suggestions_key'],
+        'accepted_topics': json.loads(row[f'{prefix}accepted_topics']),
+        'current_day': row[f'{prefix}current_day'],
+        'status': row[f'{prefix}status'],
+        'created_at': row[f'{prefix}created_at']
+    }
+
+
+def _session_to_dict(row, prefix: str = '') -> Optional[dict]:
+    """Строка feed_sessions (или её колонки с префиксом) → словарь"""
+    if row[f'{prefix}id'] is None:
+        return None
+    content = row[f'{prefix}content']
+    return {
+        'id': row[f'{prefix}id'],
+        'week_id': row[f'{prefix}week_id'],
+        'day_number': row[f'{prefix}day_number'],
+        'topic_title': row[f'{prefix}topic_title'],
+        'content': json.loads(content) if content else {},
+        'fixation_text': row[f'{prefix}fixation_text'],
+        'session_date': row[f'{prefix}session_date'],
+        'status': row[f'{prefix}status'],
+        'completed_at': row[f'{prefix}completed_at'],
+    }
+
+
+def _prefixed(alias: str, columns) -> str:
+    """Колонки подзапроса alias под именами alias_колонка"""
+    return ', '.join(f'{alias}.{c} AS {alias}_{c}' for c in columns)
+
 
-async def create_feed_week(chat_id: int, suggested_topics: List[str] = None,
+async def create_feed_week(chat_id: int, suggested_topics: List = None,
                           accepted_topics: List[str] = None,
-                          status: str = FeedWeekStatus.PLANNING) -> dict:
+                          status: str = FeedWeekStatus.PLANNING,
+                          suggestions_key: str = None) -> dict:
     """Создать новую неделю Ленты"""
     from .users import moscow_today
 
@@ -32,13 +90,13 @@ async def create_feed_week(chat_id: int, suggested_topics: List[str] = None,
 
         result = await conn.fetchrow('''
             INSERT INTO feed_weeks
-            (chat_id, week_number, week_start, suggested_topics, accepted_topics, status)
-            VALUES ($1, $2, $3, $4, $5, $6)
+            (chat_id, week_number, week_start, suggested_topics, accepted_topics, status, suggestions_key)
+            VALUES ($1, $2, $3, $4, $5, $6, $7)
             RETURNING id, week_number
         ''', chat_id, week_number, week_start,
             json.dumps(suggested_topics or []),
             json.dumps(accepted_topics or []),
-            status)
+            status, suggestions_key)
 
         return {'id': result['id'], 'week_number': result['week_number']}
 
@@ -54,19 +112,21 @@ async def get_current_feed_week(chat_id: int) -> Optional[dict]:
             LIMIT 1
         ''', chat_id, FeedWeekStatus.PLANNING, FeedWeekStatus.ACTIVE)
 
-        if row:
-            return {
-                'id': row['id'],
-                'chat_id': row['chat_id'],
-                'week_number': row['week_number'],
-                'week_start': row['week_start'],
-                'suggested_topics': json.loads(row['suggested_topics']),
-                'accepted_topics': json.loads(row['accepted_topics']),
-                'current_day': row['current_day'],
-                'status': row['status'],
-                'created_at': row['created_at']
-            }
-        return None
+        return _week_to_dict(row) if row else None
+
+
+async def get_cached_feed_suggestions(chat_id: int, suggestions_key: str) -> Optional[list]:
+    """Предложения тем, уже сгенерированные с этим ключом (None — нет)"""
+    pool = await get_pool()
+    async with pool.acquire() as conn:
+        value = await conn.fetchval('''
+            SELECT suggested_topics FROM feed_weeks
+            WHERE chat_id = $1 AND suggestions_key = $2
+            ORDER BY created_at DESC
+            LIMIT 1
+        ''', chat_id, suggestions_key)
+
+        return json.loads(value) if value else None
 
 
 async def update_feed_week(week_id: int, updates: dict):
@@ -130,47 +190,301 @@ async def get_feed_session(week_id: int, session_date: date) -> Optional[dict]:
             week_id, session_date
         )
 
-        if row:
-            return {
-                'id': row['id'],
-                'week_id': row['week_id'],
-                'day_number': row['day_number'],
-                'topic_title': row['topic_title'],
-                'content': json.loads(row['content']) if row['content'] else {},
-                'fixation_text': row.get('fixation_text', ''),
-                'session_date': row['session_date'],
-                'status': row['status'],
-                'completed_at': row.get('completed_at'),
-            }
-        return None
+        return _session_to_dict(row) if row else None
 
 
 async def get_incomplete_feed_session(week_id: int) -> Optional[dict]:
-    """Получить незавершённую сессию (status != 'completed') для недели"""
+    """Получить незавершённую сессию (не 'completed' и не 'prepared') для недели"""
     pool = await get_pool()
     async with pool.acquire() as conn:
         row = await conn.fetchrow(
             '''SELECT * FROM feed_sessions
-               WHERE week_id = $1 AND status != 'completed'
+               WHERE week_id = $1 AND status NOT IN ('completed', 'prepared')
                ORDER BY session_date DESC
                LIMIT 1''',
             week_id
         )
 
-        if row:
-            return {
-                'id': row['id'],
-                'week_id': row['week_id'],
-                'day_number': row['day_number'],
-                'topic_title': row['topic_title'],
-                'content': json.loads(row['content']) if row['content'] else {},
-                'fixation_text': row.get('fixation_text', ''),
-                'session_date': row['session_date'],
-                'status': row['status'],
-                'completed_at': row.get('completed_at'),
-            }
+        return _session_to_dict(row) if row else None
+
+
+# ==================== СНИМОК И ФИКСАЦИЯ ====================
+
+_SNAPSHOT_QUERY = f'''
+    SELECT i.*,
+           {_prefixed('w', WEEK_COLUMNS)},
+           {_prefixed('s', SESSION_COLUMNS)},
+           {_prefixed('p', SESSION_COLUMNS)},
+           {_prefixed('n', PREPARED_COLUMNS)},
+           (SELECT COUNT(DISTINCT a.activity_date) FROM activity_log a
+             WHERE a.chat_id = i.chat_id AND a.activity_date >= $3) AS days_active_this_week,
+           (SELECT COUNT(*) FROM feed_sessions c
+             WHERE c.week_id = w.id AND c.status = 'completed') AS sessions_completed
+    FROM interns i
+    LEFT JOIN LATERAL (
+        SELECT * FROM feed_weeks
+        WHERE chat_id = i.chat_id AND status IN ($4, $5)
+        ORDER BY created_at DESC
+        LIMIT 1
+    ) w ON TRUE
+    LEFT JOIN LATERAL (
+        SELECT * FROM feed_sessions
+        WHERE week_id = w.id AND session_date = $2
+        LIMIT 1
+    ) s ON TRUE
+    LEFT JOIN LATERAL (
+        SELECT * FROM feed_sessions
+        WHERE week_id = w.id AND status NOT IN ('completed', 'prepared')
+        ORDER BY session_date DESC
+        LIMIT 1
+    ) p ON TRUE
+    LEFT JOIN LATERAL (
+        SELECT id, day_number, plan_key FROM feed_sessions
+        WHERE week_id = w.id AND status = 'prepared'
+        ORDER BY created_at DESC
+        LIMIT 1
+    ) n ON TRUE
+    WHERE i.chat_id = $1
+'''
+
+
+async def get_feed_snapshot(chat_id: int, session_date: date) -> Optional[dict]:
+    """Всё состояние Ленты пользователя одним запросом
+
+    Возвращает профиль (как get_intern), текущую неделю (как
+    get_current_feed_week), сессию на session_date, последнюю незавершённую
+    сессию недели, заготовку следующего дайджеста (id, day_number, plan_key —
+    без контента) и недельные счётчики: days_active_this_week (дни
+    с активностью за 7 дней) и sessions_completed (завершённые сессии недели).
+
+    None — если пользователя ещё нет в interns.
+    """
+    from .users import moscow_today, _row_to_dict
+
+    pool = await get_pool()
+    week_ago = moscow_today() - timedelta(days=7)
+    async with pool.acquire() as conn:
+        row = await conn.fetchrow(
+            _SNAPSHOT_QUERY, chat_id, session_date, week_ago,
+            FeedWeekStatus.PLANNING, FeedWeekStatus.ACTIVE
+        )
+
+    if not row:
+        return None
+
+    return {
+        'intern': _row_to_dict(row),
+        'week': _week_to_dict(row, 'w_'),
+        'today_session': _session_to_dict(row, 's_'),
+        'incomplete_session': _session_to_dict(row, 'p_'),
+        'prepared_session': {c: row[f'n_{c}'] for c in PREPARED_COLUMNS} if row['n_id'] else None,
+        'days_active_this_week': row['days_active_this_week'],
+        'sessions_completed': row['sessions_completed'],
+    }
+
+
+# Фиксация — одна команда: закрыть сессию (если она ещё открыта), записать
+# активность, обновить счётчики активных дней и углубить неделю. Шаги после
+# первого выполняются, только если сессия действительно закрылась.
+_FIXATION_QUERY = '''
+    WITH fixed AS (
+        UPDATE feed_sessions
+        SET fixation_text = $4, status = 'completed', completed_at = $5
+        WHERE id = $3 AND status != 'completed'
+        RETURNING id
+    ), logged AS (
+        INSERT INTO activity_log (chat_id, activity_date, activity_type, mode, reference_id)
+        SELECT $1, $6, 'feed_fixation', 'feed', id FROM fixed
+        ON CONFLICT (chat_id, activity_date, activity_type) DO NOTHING
+    ), streak AS (
+        SELECT CASE WHEN last_active_date = $6::date - 1
+                    THEN COALESCE(active_days_streak, 0) + 1 ELSE 1 END AS value
+        FROM interns WHERE chat_id = $1
+    ), counted AS (
+        UPDATE interns
+        SET active_days_total = COALESCE(active_days_total, 0) + 1,
+            active_days_streak = streak.value,
+            longest_streak = GREATEST(COALESCE(longest_streak, 0), streak.value),
+            last_active_date = $6,
+            updated_at = NOW()
+        FROM streak
+        WHERE chat_id = $1
+          AND last_active_date IS DISTINCT FROM $6
+          AND EXISTS (SELECT 1 FROM fixed)
+        RETURNING active_days_total, active_days_streak
+    ), deepened AS (
+        UPDATE feed_weeks
+        SET current_day = COALESCE(current_day, 0) + 1
+        WHERE id = $2 AND EXISTS (SELECT 1 FROM fixed)
+        RETURNING current_day
+    )
+    SELECT (SELECT id FROM fixed) AS session_id,
+           (SELECT current_day FROM deepened) AS current_day,
+           EXISTS (SELECT 1 FROM counted) AS new_active_day,
+           COALESCE((SELECT active_days_total FROM counted), i.active_days_total) AS active_days_total,
+           COALESCE((SELECT active_days_streak FROM counted), i.active_days_streak) AS active_days_streak
+    FROM interns i
+    WHERE i.chat_id = $1
+'''
+
+
+async def complete_feed_fixation(chat_id: int, week_id: int, session_id: int,
+                                 fixation_text: str, completed_at: datetime,
+                                 activity_date: date) -> Optional[dict]:
+    """Фиксация дня Ленты одним атомарным запросом
+
+    Заменяет update_feed_session + record_active_day + update_feed_week:
+    изменения применяются все вместе или не применяются вовсе.
+
+    Returns:
+        {'current_day', 'new_active_day', 'active_days_total', 'active_days_streak'}
+        или None, если сессия уже была завершена
+    """
+    pool = await get_pool()
+    async with pool.acquire() as conn:
+        row = await conn.fetchrow(
+            _FIXATION_QUERY, chat_id, week_id, session_id,
+            fixation_text, completed_at, activity_date
+        )
+
+    if not row or row['session_id'] is None:
         return None
 
+    return {
+        'current_day': row['current_day'],
+        'new_active_day': row['new_active_day'],
+        'active_days_total': row['active_days_total'] or 0,
+        'active_days_streak': row['active_days_streak'] or 0,
+    }
+
+
+# ==================== ПРЕДГЕНЕРАЦИЯ ====================
+
+async def save_prepared_feed_session(week_id: int, day_number: int, topic_title: str,
+                                     content: dict, plan_key: str) -> dict:
+    """Сохранить заранее сгенерированный дайджест (прежние заготовки недели удаляются)"""
+    pool = await get_pool()
+    async with pool.acquire() as conn:
+        session_id = await conn.fetchval('''
+            WITH dropped AS (
+                DELETE FROM feed_sessions WHERE week_id = $1 AND status = 'prepared'
+            )
+            INSERT INTO feed_sessions
+            (week_id, day_number, topic_title, content, status, plan_key)
+            VALUES ($1, $2, $3, $4, 'prepared', $5)
+            RETURNING id
+        ''', week_id, day_number, topic_title, json.dumps(content), plan_key)
+
+    return {
+        'id': session_id,
+        'day_number': day_number,
+        'plan_key': plan_key,
+    }
+
+
+async def claim_prepared_feed_session(session_id: int, session_date: date) -> Optional[dict]:
+    """Превратить заготовку в сессию на session_date (None — её уже забрали или удалили)"""
+    pool = await get_pool()
+    async with pool.acquire() as conn:
+        row = await conn.fetchrow('''
+            UPDATE feed_sessions
+            SET status = 'active', session_date = $2
+            WHERE id = $1 AND status = 'prepared'
+            RETURNING *
+        ''', session_id, session_date)
+
+        return _session_to_dict(row) if row else None
+
+
+async def discard_prepared_feed_sessions(week_id: int) -> int:
+    """Удалить заготовки недели (план изменился). Возвращает число удалённых"""
+    pool = await get_pool()
+    async with pool.acquire() as conn:
+        result = await conn.execute(
+            "DELETE FROM feed_sessions WHERE week_id = $1 AND status = 'prepared'",
+            week_id
+        )
+    return int(result.split()[-1])
+
+
+async def get_feed_prefetch_candidates(schedule_time: str) -> List[int]:
+    """Пользователи Ленты с напоминанием в schedule_time, активной неделей и без заготовки"""
+    pool = await get_pool()
+    async with pool.acquire() as conn:
+        rows = await conn.fetch('''
+            SELECT i.chat_id
+            FROM interns i
+            JOIN LATERAL (
+                SELECT id, status FROM feed_weeks
+                WHERE chat_id = i.chat_id AND status IN ($3, $4)
+                ORDER BY created_at DESC
+                LIMIT 1
+            ) w ON TRUE
+            WHERE i.schedule_time = $1 AND i.feed_status = $2 AND w.status = $4
+              AND NOT EXISTS (
+                  SELECT 1 FROM feed_sessions s
+                  WHERE s.week_id = w.id AND s.status = 'prepared'
+              )
+        ''', schedule_time, FeedStatus.ACTIVE, FeedWeekStatus.PLANNING, FeedWeekStatus.ACTIVE)
+
+        return [row['chat_id'] for row in rows]
+
+
+# ==================== БАЗОВЫЕ ТЕКСТЫ ДАЙДЖЕСТА ====================
+
+async def get_base_digests(cache_keys: List[str], max_age_days: int) -> Dict[str, dict]:
+    """Базовые тексты по ключам, не старше max_age_days. Попадания учитываются
+
+    Returns:
+        {cache_key: {'cache_key', 'content', 'tokens'}} для найденных ключей
+    """
+    if not cache_keys:
+        return {}
+
+    pool = await get_pool()
+    async with pool.acquire() as conn:
+        rows = await conn.fetch('''
+            UPDATE feed_base_digests
+            SET hits = hits + 1, tokens_saved = tokens_saved + tokens, last_used_at = NOW()
+            WHERE cache_key = ANY($1::text[])
+              AND created_at > NOW() - $2 * INTERVAL '1 day'
+            RETURNING cache_key, content, tokens
+        ''', cache_keys, max_age_days)
+
+        return {row['cache_key']: dict(row) for row in rows}
+
+
+async def save_base_digest(cache_key: str, topic: str, depth_level: int, language: str,
+                           duration_bucket: int, content: str, tokens: int):
+    """Сохранить базовый текст (устаревший под тем же ключом заменяется)"""
+    pool = await get_pool()
+    async with pool.acquire() as conn:
+        await conn.execute('''
+            INSERT INTO feed_base_digests
+            (cache_key, topic, depth_level, language, duration_bucket, content, tokens)
+            VALUES ($1, $2, $3, $4, $5, $6, $7)
+            ON CONFLICT (cache_key) DO UPDATE SET
+                content = EXCLUDED.content,
+                tokens = EXCLUDED.tokens,
+                created_at = NOW(),
+                last_used_at = NOW()
+        ''', cache_key, topic, depth_level, language, duration_bucket, content, tokens)
+
+
+async def get_base_digest_report(limit: int = 20) -> List[dict]:
+    """Самые востребованные базовые тексты: попадания и сэкономленные токены"""
+    pool = await get_pool()
+    async with pool.acquire() as conn:
+        rows = await conn.fetch('''
+            SELECT topic, depth_level, language, duration_bucket,
+                   hits, tokens, tokens_saved, created_at, last_used_at
+            FROM feed_base_digests
+            ORDER BY tokens_saved DESC, hits DESC
+            LIMIT $1
+        ''', limit)
+
+        return [dict(row) for row in rows]
+
 
 async def get_feed_history(chat_id: int, limit: int = 20) -> List[dict]:
     """Получить историю сессий Ленты"""
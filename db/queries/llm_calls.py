@@ -0,0 +1,59 @@
+"""
+Запросы для учёта вызовов LLM и MCP (таблица llm_calls).
+"""
+
+from typing import List
+
+from config import get_logger
+from db.connection import get_pool
+
+logger = get_logger(__name__)
+
+
+async def save_llm_calls(records: List[dict]):
+    """Сохранить пачку записей о вызовах одним запросом"""
+    if not records:
+        return
+
+    pool = await get_pool()
+    async with pool.acquire() as conn:
+        await conn.executemany('''
+            INSERT INTO llm_calls
+            (kind, call_site, target, chat_hash, profile,
+             input_tokens, output_tokens, cache_creation_tokens, cache_read_tokens,
+             cost_usd, latency_ms, outcome, created_at)
+            VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10, $11, $12, $13)
+        ''', [(
+            r['kind'], r['call_site'], r['target'], r['chat_hash'], r['profile'],
+            r['input_tokens'], r['output_tokens'],
+            r['cache_creation_tokens'], r['cache_read_tokens'],
+            r['cost_usd'], r['latency_ms'], r['outcome'],
+            r['created_at'],
+        ) for r in records])
+
+
+async def get_llm_calls_report(days: int = 7) -> List[dict]:
+    """Сводка по call site за последние N дней
+
+    Returns:
+        Список строк: вызовы, ошибки, токены, стоимость, p50/p95 латентности
+    """
+    pool = await get_pool()
+    async with pool.acquire() as conn:
+        rows = await conn.fetch('''
+            SELECT kind, call_site,
+                   COUNT(*) as calls,
+                   COUNT(*) FILTER (WHERE outcome != 'ok') as errors,
+                   COALESCE(SUM(input_tokens), 0) as input_tokens,
+                   COALESCE(SUM(output_tokens), 0) as output_tokens,
+                   COALESCE(SUM(cache_read_tokens), 0) as cache_read_tokens,
+                   COALESCE(SUM(cost_usd), 0) as cost_usd,
+                   percentile_cont(0.5) WITHIN GROUP (ORDER BY latency_ms) as p50_ms,
+                   percentile_cont(0.95) WITHIN GROUP (ORDER BY latency_ms) as p95_ms
+            FROM llm_calls
+            WHERE created_at > NOW() - $1 * INTERVAL '1 day'
+            GROUP BY kind, call_site
+            ORDER BY cost_usd DESC, calls DESC
+        ''', days)
+
+        return [dict(row) for row in rows]
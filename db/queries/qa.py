@@ -12,14 +12,15 @@ logger = get_logger(__name__)
 
 
 async def save_qa(chat_id: int, mode: str, context_topic: str,
-                  question: str, answer: str, mcp_sources: List[str] = None):
-    """Сохранить вопрос и ответ"""
+                  question: str, answer: str, mcp_sources: List[str] = None) -> int:
+    """Сохранить вопрос и ответ (возвращает id записи)"""
     pool = await get_pool()
     async with pool.acquire() as conn:
-        await conn.execute('''
+        return await conn.fetchval('''
             INSERT INTO qa_history
             (chat_id, mode, context_topic, question, answer, mcp_sources)
             VALUES ($1, $2, $3, $4, $5, $6)
+            RETURNING id
         ''', chat_id, mode, context_topic, question, answer,
             json.dumps(mcp_sources or []))
 
@@ -46,6 +47,46 @@ async def get_qa_history(chat_id: int, limit: int = 50) -> List[dict]:
         } for row in rows]
 
 
+async def get_qa_since(chat_id: int, after_id: int = 0, limit: int = 20) -> List[dict]:
+    """Вопросы и ответы после after_id в хронологическом порядке"""
+    pool = await get_pool()
+    async with pool.acquire() as conn:
+        rows = await conn.fetch('''
+            SELECT id, context_topic, question, answer FROM qa_history
+            WHERE chat_id = $1 AND id > $2
+            ORDER BY id
+            LIMIT $3
+        ''', chat_id, after_id, limit)
+
+        return [dict(row) for row in rows]
+
+
+async def get_qa_summary(chat_id: int) -> Optional[dict]:
+    """Получить конспект предыдущих вопросов"""
+    pool = await get_pool()
+    async with pool.acquire() as conn:
+        row = await conn.fetchrow(
+            'SELECT summary, last_qa_id, turns FROM qa_summaries WHERE chat_id = $1',
+            chat_id
+        )
+        return dict(row) if row else None
+
+
+async def save_qa_summary(chat_id: int, summary: str, last_qa_id: int, turns: int):
+    """Сохранить конспект предыдущих вопросов"""
+    pool = await get_pool()
+    async with pool.acquire() as conn:
+        await conn.execute('''
+            INSERT INTO qa_summaries (chat_id, summary, last_qa_id, turns, updated_at)
+            VALUES ($1, $2, $3, $4, NOW())
+            ON CONFLICT (chat_id) DO UPDATE SET
+                summary = EXCLUDED.summary,
+                last_qa_id = EXCLUDED.last_qa_id,
+                turns = EXCLUDED.turns,
+                updated_at = NOW()
+        ''', chat_id, summary, last_qa_id, turns)
+
+
 async def get_qa_count(chat_id: int) -> int:
     """Получить количество заданных вопросов"""
     pool = await get_pool()
@@ -4,19 +4,30 @@
 Бесконечный режим расширения кругозора.
 
 Содержит:
-- engine.py: FeedEngine - основная логика
+- engine.py: FeedEngine - основная логика, FeedSnapshot - состояние за один запрос
 - handlers.py: обработчики Telegram + FSM
-- planner.py: планирование недельных тем
+- planner.py: планирование недельных тем, общий снимок актуальных тем
+- prefetch.py: фоновая предгенерация следующего дайджеста
+- base_digest.py: общие для всех пользователей базовые тексты тем дайджеста
 """
 
-from .engine import FeedEngine
+from .engine import FeedEngine, FeedSnapshot
 from .handlers import feed_router, FeedStates
-from .planner import suggest_weekly_topics, generate_topic_content
+from .planner import suggest_weekly_topics, generate_topic_content, TrendingSnapshot, get_trending_snapshot
+from .prefetch import DigestPrefetcher, get_digest_prefetcher
+from .base_digest import BaseDigestCache, get_base_digest_cache
 
 __all__ = [
     'FeedEngine',
+    'FeedSnapshot',
     'feed_router',
     'FeedStates',
     'suggest_weekly_topics',
     'generate_topic_content',
+    'TrendingSnapshot',
+    'get_trending_snapshot',
+    'DigestPrefetcher',
+    'get_digest_prefetcher',
+    'BaseDigestCache',
+    'get_base_digest_cache',
 ]
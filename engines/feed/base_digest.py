@@ -0,0 +1,177 @@
+"""
+Общие базовые тексты тем дайджеста.
+
+Дайджест собирается в два слоя:
+- базовый текст темы — без персонализации, один на (тема, глубина, язык,
+  длительность). Хранится в feed_base_digests и переиспользуется всеми,
+  кто выбрал ту же тему (популярные темы, темы по умолчанию);
+- персональный слой — короткий дешёвый вызов: введение, примеры из сферы
+  пользователя и вопрос для рефлексии (см. planner).
+
+Длительность на тему округляется до ближайшей из FEED_BASE_DIGEST_BUCKETS,
+чтобы ключей было немного. Одновременные промахи по одному ключу ждут
+одну генерацию. Попадания и сэкономленные токены копятся в get_stats()
+и в таблице (отчёт: python -m engines.feed.base_digest).
+"""
+
+import asyncio
+import hashlib
+import json
+from typing import Optional, Dict, List, Tuple, Callable, Awaitable
+
+from config import get_logger, FEED_BASE_DIGEST_TTL_DAYS, FEED_BASE_DIGEST_BUCKETS
+from db.queries.feed import get_base_digests, save_base_digest
+
+logger = get_logger(__name__)
+
+# Версия промпта базового текста: при изменении промпта старые тексты не используются
+BASE_DIGEST_VERSION = 1
+
+# Генерация базового текста: (текст, оценка токенов) или None
+BaseBuilder = Callable[[], Awaitable[Optional[Tuple[str, int]]]]
+
+
+def duration_bucket(minutes: int) -> int:
+    """Ближайшая корзина длительности на тему (минуты)"""
+    return min(FEED_BASE_DIGEST_BUCKETS, key=lambda bucket: (abs(bucket - minutes), bucket))
+
+
+def base_digest_key(topic: str, depth_level: int, lang: str, bucket: int) -> str:
+    """Ключ базового текста (регистр и лишние пробелы в теме не важны)"""
+    payload = json.dumps([" ".join(topic.split()).casefold(), depth_level, lang, bucket,
+                          BASE_DIGEST_VERSION], ensure_ascii=False)
+    return hashlib.blake2b(payload.encode('utf-8'), digest_size=12).hexdigest()
+
+
+class BaseDigestCache:
+    """Базовые тексты тем: чтение из БД, генерация при промахе, статистика"""
+
+    def __init__(self, ttl_days: int = FEED_BASE_DIGEST_TTL_DAYS):
+        self.ttl_days = ttl_days
+        self._inflight: Dict[str, asyncio.Task] = {}
+
+        self.hits = 0
+        self.misses = 0
+        self.joined = 0          # промах, дождавшийся чужой генерации того же ключа
+        self.generated = 0
+        self.failed = 0
+        self.tokens_spent = 0    # на генерацию базовых текстов
+        self.tokens_saved = 0    # не потрачено благодаря переиспользованию
+
+    async def lookup(self, keys: List[str]) -> Dict[str, str]:
+        """Найденные базовые тексты {ключ: текст}. Ошибка БД — как промах"""
+        keys = list(dict.fromkeys(keys))
+        try:
+            rows = await get_base_digests(keys, self.ttl_days)
+        except Exception as e:
+            logger.warning(f"BaseDigest: не удалось прочитать кэш: {e}")
+            rows = {}
+
+        self.hits += len(rows)
+        self.misses += len(keys) - len(rows)
+        self.tokens_saved += sum(row['tokens'] or 0 for row in rows.values())
+        return {key: row['content'] for key, row in rows.items()}
+
+    async def fill(self, key: str, build: BaseBuilder, topic: str, depth_level: int,
+                   lang: str, bucket: int) -> Optional[str]:
+        """Сгенерировать и сохранить базовый текст (одна генерация на ключ)"""
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._build(key, build, topic, depth_level, lang, bucket))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+            text, _ = await asyncio.shield(task)
+            return text
+
+        self.joined += 1
+        text, tokens = await asyncio.shield(task)
+        if text:
+            self.tokens_saved += tokens
+        return text
+
+    async def _build(self, key: str, build: BaseBuilder, topic: str, depth_level: int,
+                     lang: str, bucket: int) -> Tuple[Optional[str], int]:
+        try:
+            built = await build()
+        except Exception as e:
+            logger.error(f"BaseDigest: ошибка генерации «{topic}»: {e}")
+            built = None
+
+        if not built:
+            self.failed += 1
+            return None, 0
+
+        text, tokens = built
+        self.generated += 1
+        self.tokens_spent += tokens
+        try:
+            await save_base_digest(key, topic, depth_level, lang, bucket, text, tokens)
+        except Exception as e:
+            logger.warning(f"BaseDigest: не удалось сохранить «{topic}»: {e}")
+        return text, tokens
+
+    def get_stats(self) -> dict:
+        requests = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'joined': self.joined,
+            'hit_rate': round((self.hits + self.joined) / requests, 3) if requests else 0.0,
+            'generated': self.generated,
+            'failed': self.failed,
+            'tokens_spent': self.tokens_spent,
+            'tokens_saved': self.tokens_saved,
+        }
+
+
+# Singleton
+_cache: Optional[BaseDigestCache] = None
+
+
+def get_base_digest_cache() -> BaseDigestCache:
+    """Получить глобальный кэш базовых текстов"""
+    global _cache
+    if _cache is None:
+        _cache = BaseDigestCache()
+    return _cache
+
+
+# =============================================================================
+# CLI-ОТЧЁТ
+# =============================================================================
+
+def format_report(rows: List[dict]) -> str:
+    """Форматирует строки отчёта в текстовую таблицу"""
+    header = f"{'topic':<36} {'depth':>5} {'lang':>4} {'min':>4} {'hits':>6} {'tokens':>7} {'saved':>9}"
+    lines = [header, "-" * len(header)]
+    for row in rows:
+        lines.append(
+            f"{str(row['topic'])[:36]:<36} {row['depth_level']:>5} {row['language']:>4} "
+            f"{row['duration_bucket']:>4} {row['hits']:>6} {row['tokens']:>7} {row['tokens_saved']:>9}"
+        )
+    lines.append("-" * len(header))
+    lines.append(f"Итого: {sum(r['hits'] for r in rows)} попаданий, "
+                 f"~{sum(r['tokens_saved'] for r in rows)} токенов сэкономлено")
+    return "\n".join(lines)
+
+
+async def _print_report(limit: int):
+    from db.connection import close_pool
+    from db.queries.feed import get_base_digest_report
+
+    try:
+        rows = await get_base_digest_report(limit)
+        print(f"Базовые тексты дайджеста (топ-{limit} по экономии)\n")
+        print(format_report(rows))
+    finally:
+        await close_pool()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Отчёт по общим базовым текстам дайджеста")
+    parser.add_argument("--limit", type=int, default=20, help="сколько строк показать")
+    args = parser.parse_args()
+
+    asyncio.run(_print_report(args.limit))
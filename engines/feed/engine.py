@@ -7,8 +7,20 @@
 3. Ежедневные сессии
 4. Фиксация (закрытие дня)
 5. Завершение недели → статистика
+
+Состояние пользователя (профиль, неделя, сессии, счётчики) загружается
+одним запросом в FeedSnapshot и живёт, пока живёт движок (один хендлер).
+
+Следующий дайджест можно сгенерировать заранее (prepare_next_session,
+фоном — см. prefetch.py): он хранится как сессия 'prepared' с ключом плана
+и отдаётся сразу, если темы, глубина и профиль с тех пор не менялись.
+
+Предложения тем кэшируются по ISO-неделе и профилю (suggestions_key):
+хранятся в feed_weeks.suggested_topics и генерируются заново только
+по явному запросу (refresh).
 """
 
+from dataclasses import dataclass
 from datetime import datetime, date, timedelta
 from typing import Optional, Dict, List, Tuple
 import json
@@ -22,41 +34,106 @@ from config import (
     FEED_SESSION_DURATION_MIN,
     FEED_SESSION_DURATION_MAX,
 )
-from db.queries.users import get_intern, update_intern
+from db.queries.users import get_intern, update_intern, moscow_today
 from db.queries.feed import (
     create_feed_week,
-    get_current_feed_week,
     update_feed_week,
     create_feed_session,
     update_feed_session,
-    get_feed_session,
+    get_feed_snapshot,
+    complete_feed_fixation,
+    save_prepared_feed_session,
+    claim_prepared_feed_session,
+    discard_prepared_feed_sessions,
+    get_cached_feed_suggestions,
 )
-from db.queries.activity import record_active_day, get_activity_stats
+from clients.accounting import call_scope
+from core.prompts import profile_hash
 
-from .planner import suggest_weekly_topics, generate_multi_topic_digest
+from .planner import suggest_weekly_topics, generate_multi_topic_digest, SectionCallback
 
 logger = get_logger(__name__)
 
+# Поля профиля, которые попадают в промпт дайджеста
+DIGEST_PROFILE_FIELDS = ('name', 'occupation', 'goals', 'interests', 'language')
+
+
+# Поля профиля, от которых зависят предложения тем
+SUGGESTION_PROFILE_FIELDS = ('name', 'occupation', 'interests', 'goals', 'motivation', 'language')
+
+
+def suggestions_key(intern: dict, today: date) -> str:
+    """Ключ предложений тем: ISO-неделя и профиль (новая неделя или профиль — новые темы)"""
+    year, week, _ = today.isocalendar()
+    return f"{year}-W{week:02d}:{profile_hash(intern, SUGGESTION_PROFILE_FIELDS)}"
+
+
+def week_suggestions(week: Optional[dict]) -> List[Dict]:
+    """Предложения тем недели (в старых неделях — только названия)"""
+    if not week:
+        return []
+    return [
+        topic if isinstance(topic, dict) else {'title': topic, 'why': '', 'keywords': []}
+        for topic in week.get('suggested_topics') or []
+    ]
+
+
+def digest_duration(intern: dict) -> int:
+    """Длительность дайджеста из профиля (или дефолт)"""
+    duration = intern.get('feed_duration', FEED_SESSION_DURATION_MAX)
+    if not duration or duration < FEED_SESSION_DURATION_MIN:
+        duration = (FEED_SESSION_DURATION_MIN + FEED_SESSION_DURATION_MAX) // 2
+    return duration
+
+
+def digest_plan_key(intern: dict, topics: List[str], depth_level: int, duration: int) -> str:
+    """Ключ всего, от чего зависит дайджест: заготовка с другим ключом устарела"""
+    return profile_hash(intern, DIGEST_PROFILE_FIELDS, list(topics), depth_level, duration)
+
+
+@dataclass
+class FeedSnapshot:
+    """Состояние Ленты пользователя на момент загрузки"""
+    intern: dict
+    week: Optional[dict] = None
+    today_session: Optional[dict] = None        # сессия на session_date
+    incomplete_session: Optional[dict] = None   # последняя незавершённая сессия недели
+    prepared_session: Optional[dict] = None     # заготовка: id, day_number, plan_key
+    session_date: Optional[date] = None
+    days_active_this_week: int = 0
+    sessions_completed: int = 0
+
 
 class FeedEngine:
     """Движок режима Лента"""
 
     def __init__(self, chat_id: int):
         self.chat_id = chat_id
-        self._intern = None
-        self._current_week = None
+        self._snapshot: Optional[FeedSnapshot] = None
+
+    async def load(self, refresh: bool = False) -> FeedSnapshot:
+        """Загружает снимок состояния (один запрос, дальше — из памяти)"""
+        if self._snapshot is None or refresh:
+            today = date.today()
+            data = await get_feed_snapshot(self.chat_id, today)
+            if data:
+                self._snapshot = FeedSnapshot(session_date=today, **data)
+            else:
+                # Пользователя ещё нет — get_intern создаст профиль
+                self._snapshot = FeedSnapshot(intern=await get_intern(self.chat_id), session_date=today)
+        return self._snapshot
+
+    def invalidate(self):
+        """Сбрасывает снимок после изменений недели"""
+        self._snapshot = None
 
     async def get_intern(self) -> dict:
         """Получает профиль пользователя"""
-        if not self._intern:
-            self._intern = await get_intern(self.chat_id)
-        return self._intern
+        return (await self.load()).intern
 
     async def get_current_week(self) -> Optional[dict]:
         """Получает текущую неделю"""
-        if not self._current_week:
-            self._current_week = await get_current_feed_week(self.chat_id)
-        return self._current_week
+        return (await self.load()).week
 
     # ==================== СТАРТ И НАСТРОЙКА ====================
 
@@ -84,32 +161,74 @@ class FeedEngine:
 
         return True, "Режим Лента активирован! Сейчас предложу темы на неделю."
 
-    async def suggest_topics(self) -> Tuple[List[Dict], str]:
-        """Генерирует и возвращает предложения тем на неделю
+    async def get_topic_suggestions(self, refresh: bool = False) -> Tuple[List[Dict], Optional[str]]:
+        """Предложения тем: сгенерированные на этой неделе или новые
+
+        Args:
+            refresh: сгенерировать заново, даже если есть в кэше
 
         Returns:
-            (topics, message)
+            (topics, suggestions_key). Ключ None — запасные темы, их не кэшируем
         """
         intern = await self.get_intern()
+        key = suggestions_key(intern, moscow_today())
 
-        # Генерируем темы
-        topics = await suggest_weekly_topics(intern)
+        if not refresh:
+            cached = await get_cached_feed_suggestions(self.chat_id, key)
+            if cached:
+                logger.info(f"Предложения тем для {self.chat_id} из кэша недели")
+                return week_suggestions({'suggested_topics': cached}), key
+
+        with call_scope(chat_id=self.chat_id, profile=Mode.FEED):
+            topics = await suggest_weekly_topics(intern)
+
+        if any(topic.get('fallback') for topic in topics):
+            key = None
+        return topics, key
+
+    async def suggest_topics(self, refresh: bool = False) -> Tuple[List[Dict], str]:
+        """Возвращает предложения тем на неделю и открывает выбор тем
+
+        Неделя в статусе PLANNING переиспользуется, иначе создаётся новая.
+
+        Args:
+            refresh: сгенерировать темы заново (кнопка «Сгенерировать заново»)
+
+        Returns:
+            (topics, message)
+        """
+        topics, key = await self.get_topic_suggestions(refresh)
 
         if not topics:
             return [], "Не удалось сгенерировать темы. Попробуйте позже."
 
-        # Создаём неделю в статусе PLANNING
-        await create_feed_week(
-            chat_id=self.chat_id,
-            suggested_topics=[t['title'] for t in topics],
-            accepted_topics=[],
-        )
+        week = await self.get_current_week()
+        if week and week['status'] == FeedWeekStatus.PLANNING:
+            await update_feed_week(week['id'], {'suggested_topics': topics, 'suggestions_key': key})
+        else:
+            # Создаём неделю в статусе PLANNING
+            await create_feed_week(
+                chat_id=self.chat_id,
+                suggested_topics=topics,
+                accepted_topics=[],
+                suggestions_key=key,
+            )
 
         # Очищаем кеш
-        self._current_week = None
+        self.invalidate()
 
         return topics, "Выберите темы для изучения на этой неделе:"
 
+    async def get_alternative_topics(self) -> List[Dict]:
+        """Предложения тем для замены темы на завтра (из кэша недели, если есть)"""
+        topics, key = await self.get_topic_suggestions()
+
+        week = await self.get_current_week()
+        if week and key and week.get('suggestions_key') != key:
+            await update_feed_week(week['id'], {'suggested_topics': topics, 'suggestions_key': key})
+            week.update(suggested_topics=topics, suggestions_key=key)
+        return topics
+
     async def accept_topics(self, accepted_titles: List[str]) -> Tuple[bool, str]:
         """Принимает выбранные пользователем темы (максимум 3)
 
@@ -137,14 +256,14 @@ class FeedEngine:
         })
 
         # Очищаем кеш
-        self._current_week = None
+        self.invalidate()
 
         count = len(accepted_titles)
         return True, f"Отлично! Выбрано {count} тем. Начинаем!"
 
     # ==================== ЕЖЕДНЕВНЫЕ СЕССИИ ====================
 
-    async def get_today_session(self) -> Tuple[Optional[Dict], str]:
+    async def get_today_session(self, on_section: Optional[SectionCallback] = None) -> Tuple[Optional[Dict], str]:
         """Получает или создаёт дайджест на сегодня.
 
         Новая модель:
@@ -153,6 +272,9 @@ class FeedEngine:
         - Длительность из профиля, делится на все темы
         - Чем больше тем, тем меньше глубины на каждую
 
+        Args:
+            on_section: колбэк готовой секции при генерации (для прогресса)
+
         Returns:
             (session_data, message)
         """
@@ -166,16 +288,19 @@ class FeedEngine:
             return None, "Неделя завершена. Используйте /feed для новой."
 
         # Проверяем, есть ли сессия на сегодня
-        today = date.today()
-        existing = await get_feed_session(week['id'], today)
+        snapshot = await self.load()
+        today = snapshot.session_date
+        existing = snapshot.today_session
 
         if existing:
             if existing['status'] == 'completed':
                 return existing, "Сегодняшний дайджест уже завершён. До завтра!"
+            if existing['content'].get('partial'):
+                await self._complete_partial_session(existing, on_section)
             return existing, "Продолжаем дайджест..."
 
         # Проверяем, есть ли незавершённая сессия за предыдущие дни
-        previous_incomplete = await self._get_incomplete_session(week['id'])
+        previous_incomplete = snapshot.incomplete_session
         if previous_incomplete:
             return previous_incomplete, "У вас есть незавершённый дайджест. Напишите фиксацию, чтобы продолжить."
 
@@ -191,22 +316,38 @@ class FeedEngine:
             logger.warning(f"depth_level < 1: {depth_level}, resetting to 1")
             depth_level = 1
             await update_feed_week(week['id'], {'current_day': 1})
+            week['current_day'] = 1
 
         if not topics:
             return None, "Нет выбранных тем. Используйте /feed для выбора."
 
         # Длительность из профиля (или дефолт)
-        duration = intern.get('feed_duration', FEED_SESSION_DURATION_MAX)
-        if not duration or duration < FEED_SESSION_DURATION_MIN:
-            duration = (FEED_SESSION_DURATION_MIN + FEED_SESSION_DURATION_MAX) // 2
+        duration = digest_duration(intern)
+
+        # Заготовка из фоновой предгенерации — если план не менялся
+        prepared = snapshot.prepared_session
+        if prepared:
+            snapshot.prepared_session = None
+            if prepared['plan_key'] == digest_plan_key(intern, topics, depth_level, duration):
+                session = await claim_prepared_feed_session(prepared['id'], today)
+                if session:
+                    logger.info(f"get_today_session: заготовка {session['id']} для {self.chat_id}")
+                    snapshot.today_session = session
+                    snapshot.incomplete_session = session
+                    return session, session['content'].get('intro', 'Начинаем дайджест!')
+            else:
+                logger.info(f"get_today_session: заготовка {prepared['id']} устарела")
+                await discard_prepared_feed_sessions(week['id'])
 
         # Генерируем мульти-тематический дайджест
-        content = await generate_multi_topic_digest(
-            topics=topics,
-            intern=intern,
-            duration=duration,
-            depth_level=depth_level,
-        )
+        with call_scope(chat_id=self.chat_id, profile=Mode.FEED):
+            content = await generate_multi_topic_digest(
+                topics=topics,
+                intern=intern,
+                duration=duration,
+                depth_level=depth_level,
+                on_section=on_section,
+            )
 
         # Создаём сессию (topic_title = все темы через запятую)
         topics_title = ", ".join(topics)
@@ -217,17 +358,95 @@ class FeedEngine:
             content=content,
             session_date=today,
         )
+        snapshot.today_session = session
+        snapshot.incomplete_session = session
 
         return session, content.get('intro', 'Начинаем дайджест!')
 
+    async def _complete_partial_session(self, session: Dict,
+                                        on_section: Optional[SectionCallback] = None):
+        """Повторяет генерацию дайджеста, в котором не хватило тем
+
+        Сессия обновляется, только если новых пропусков меньше, чем было.
+        """
+        content = session['content']
+        topics = content.get('topics_list') or []
+        missing = content.get('missing_topics') or []
+        intern = await self.get_intern()
+
+        logger.info(f"get_today_session: дописываем дайджест {session['id']}, не хватало {missing}")
+        with call_scope(chat_id=self.chat_id, profile=Mode.FEED):
+            retried = await generate_multi_topic_digest(
+                topics=topics,
+                intern=intern,
+                duration=digest_duration(intern),
+                depth_level=content.get('depth_level') or session['day_number'],
+                on_section=on_section,
+            )
+        if retried.get('fallback') or len(retried.get('missing_topics', [])) >= len(missing):
+            return
+
+        await update_feed_session(session['id'], {'content': retried})
+        session['content'] = retried
+
+    async def prepare_next_session(self) -> Optional[Dict]:
+        """Генерирует следующий дайджест заранее и сохраняет как заготовку
+
+        Следующий — по принятым темам и текущему уровню глубины: после
+        фиксации current_day уже увеличен. Пока открыт незавершённый
+        дайджест, готовить нечего.
+
+        Returns:
+            Заготовка {'id', 'day_number', 'plan_key'} или None
+        """
+        snapshot = await self.load()
+        week = snapshot.week
+        if not week or week['status'] != FeedWeekStatus.ACTIVE:
+            return None
+        if snapshot.incomplete_session:
+            return None
+
+        topics = week.get('accepted_topics', [])
+        if not topics:
+            return None
+
+        intern = snapshot.intern
+        depth_level = max(week.get('current_day') or 1, 1)
+        duration = digest_duration(intern)
+        plan_key = digest_plan_key(intern, topics, depth_level, duration)
+
+        if snapshot.prepared_session and snapshot.prepared_session['plan_key'] == plan_key:
+            return None
+
+        with call_scope(chat_id=self.chat_id, profile=Mode.FEED):
+            content = await generate_multi_topic_digest(
+                topics=topics,
+                intern=intern,
+                duration=duration,
+                depth_level=depth_level,
+            )
+        if content.get('fallback') or content.get('partial'):
+            # Генерация не удалась (целиком или по части тем) — при открытии попробуем заново
+            return None
+
+        prepared = await save_prepared_feed_session(
+            week_id=week['id'],
+            day_number=depth_level,
+            topic_title=", ".join(topics),
+            content=content,
+            plan_key=plan_key,
+        )
+        snapshot.prepared_session = prepared
+        logger.info(f"prepare_next_session: {self.chat_id}, глубина {depth_level}, заготовка {prepared['id']}")
+        return prepared
+
     async def get_session_content(self, session_id: int) -> Optional[Dict]:
         """Получает контент сессии по ID"""
-        # Получаем сессию из БД
-        week = await self.get_current_week()
-        if not week:
+        snapshot = await self.load()
+        if not snapshot.week:
             return None
 
-        session = await get_feed_session(week['id'], date.today())
+        session = snapshot.today_session
         if session and session['id'] == session_id:
             return session.get('content', {})
 
@@ -247,12 +466,12 @@ class FeedEngine:
         Returns:
             (success, message)
         """
-        week = await self.get_current_week()
+        snapshot = await self.load()
+        week = snapshot.week
         if not week:
             return False, "Нет активной недели."
 
-        today = date.today()
-        session = await get_feed_session(week['id'], today)
+        session = snapshot.today_session
 
         if not session:
             return False, "Сначала начните дайджест на сегодня."
@@ -260,35 +479,35 @@ class FeedEngine:
         if session['status'] == 'completed':
             return False, "Сегодняшний дайджест уже завершён."
 
-        # Сохраняем фиксацию
-        await update_feed_session(session['id'], {
-            'fixation_text': text,
-            'status': 'completed',
-            'completed_at': datetime.utcnow(),
-        })
-
-        # Записываем активность
-        await record_active_day(
+        # Одним запросом: закрываем сессию, записываем активность,
+        # увеличиваем уровень глубины (depth_level = current_day)
+        completed_at = datetime.utcnow()
+        result = await complete_feed_fixation(
             chat_id=self.chat_id,
-            activity_type='feed_fixation',
-            mode='feed',
-            reference_id=session['id'],
+            week_id=week['id'],
+            session_id=session['id'],
+            fixation_text=text,
+            completed_at=completed_at,
+            activity_date=moscow_today(),
         )
+        if not result:
+            return False, "Сегодняшний дайджест уже завершён."
 
-        # Увеличиваем уровень глубины (depth_level = current_day)
-        new_depth = week.get('current_day', 1) + 1
-        await update_feed_week(week['id'], {'current_day': new_depth})
+        if result['new_active_day']:
+            logger.info(f"📅 Активный день для {self.chat_id}: streak={result['active_days_streak']}, "
+                        f"total={result['active_days_total']}")
 
-        # Очищаем кеш
-        self._current_week = None
+        # Обновляем снимок вместо повторной загрузки
+        session.update(fixation_text=text, status='completed', completed_at=completed_at)
+        if snapshot.incomplete_session and snapshot.incomplete_session['id'] == session['id']:
+            snapshot.incomplete_session = None
+        week['current_day'] = result['current_day']
+        snapshot.intern['active_days_total'] = result['active_days_total']
+        snapshot.intern['active_days_streak'] = result['active_days_streak']
+        snapshot.sessions_completed += 1
 
         return True, "Фиксация сохранена! До завтра."
 
-    async def _get_incomplete_session(self, week_id: int) -> Optional[Dict]:
-        """Находит незавершённую сессию за предыдущие дни"""
-        from db.queries.feed import get_incomplete_feed_session
-        return await get_incomplete_feed_session(week_id)
-
     async def update_tomorrow_topic(self, day_number: int, new_topic: str) -> bool:
         """Обновляет тему для указанного дня недели
 
@@ -314,9 +533,10 @@ class FeedEngine:
                 topics[day_number - 1] = new_topic
 
             await update_feed_week(week['id'], {'accepted_topics': topics})
+            await discard_prepared_feed_sessions(week['id'])
 
             # Очищаем кеш
-            self._current_week = None
+            self.invalidate()
 
             logger.info(f"Тема на день {day_number} обновлена: {new_topic}")
             return True
@@ -343,9 +563,10 @@ class FeedEngine:
             topics = topics[:3]
 
             await update_feed_week(week['id'], {'accepted_topics': topics})
+            await discard_prepared_feed_sessions(week['id'])
 
             # Очищаем кеш
-            self._current_week = None
+            self.invalidate()
 
             logger.info(f"Темы обновлены: {topics}")
             return True
@@ -368,32 +589,33 @@ class FeedEngine:
         })
 
         # Очищаем кеш
-        self._current_week = None
+        self.invalidate()
 
     async def get_week_summary(self) -> Dict:
         """Возвращает статистику недели"""
-        week = await self.get_current_week()
+        snapshot = await self.load()
+        week = snapshot.week
         if not week:
             return {'error': 'Нет активной недели'}
 
-        stats = await get_activity_stats(self.chat_id)
-
         return {
             'week_number': week.get('week_number', 1),
             'topics_count': len(week.get('accepted_topics', [])),
             'current_day': week.get('current_day', 1),
             'status': week.get('status'),
-            'total_active_days': stats.get('total', 0),
-            'current_streak': stats.get('streak', 0),
+            'total_active_days': snapshot.intern.get('active_days_total', 0),
+            'current_streak': snapshot.intern.get('active_days_streak', 0),
+            'days_active_this_week': snapshot.days_active_this_week,
+            'sessions_completed': snapshot.sessions_completed,
         }
 
     # ==================== СТАТУС И ИНФОРМАЦИЯ ====================
 
     async def get_status(self) -> Dict:
         """Возвращает текущий статус Ленты"""
-        intern = await self.get_intern()
-        week = await self.get_current_week()
-        stats = await get_activity_stats(self.chat_id)
+        snapshot = await self.load()
+        intern = snapshot.intern
+        week = snapshot.week
 
         return {
             'feed_active': intern.get('feed_status') == FeedStatus.ACTIVE,
@@ -401,6 +623,6 @@ class FeedEngine:
             'week_status': week.get('status') if week else None,
             'current_day': week.get('current_day', 0) if week else 0,
             'topics': week.get('accepted_topics', []) if week else [],
-            'active_days': stats.get('total', 0),
-            'streak': stats.get('streak', 0),
+            'active_days': intern.get('active_days_total', 0),
+            'streak': intern.get('active_days_streak', 0),
         }
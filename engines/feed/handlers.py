@@ -8,6 +8,8 @@
 - Приём фиксаций
 """
 
+import asyncio
+
 from aiogram import Router, F
 from aiogram.types import Message, CallbackQuery, InlineKeyboardMarkup, InlineKeyboardButton
 from aiogram.filters import Command
@@ -16,7 +18,8 @@ from aiogram.fsm.state import State, StatesGroup
 
 from config import get_logger
 from locales import t
-from .engine import FeedEngine
+from .engine import FeedEngine, week_suggestions
+from .prefetch import get_digest_prefetcher
 from db.queries.users import get_intern
 from engines.shared import handle_question
 
@@ -37,8 +40,8 @@ feed_router = Router(name="feed")
 async def show_feed_menu(message: Message, engine: FeedEngine, state: FSMContext):
     """Показывает главное меню режима Лента с двумя кнопками"""
     try:
-        chat_id = message.chat.id
-        lang = await get_user_lang(chat_id)
+        intern = await engine.get_intern()
+        lang = intern.get('language', 'ru') or 'ru'
 
         week = await engine.get_current_week()
         if not week:
@@ -96,12 +99,12 @@ async def cmd_feed(message: Message, state: FSMContext):
         chat_id = message.chat.id
         logger.info(f"cmd_feed вызван для {chat_id}")
 
+        engine = FeedEngine(chat_id)
+
         # Получаем язык пользователя
-        intern = await get_intern(chat_id)
+        intern = await engine.get_intern()
         lang = intern.get('language', 'ru') if intern else 'ru'
 
-        engine = FeedEngine(chat_id)
-
         # Получаем статус
         logger.info(f"Получаем статус для {chat_id}")
         status = await engine.get_status()
@@ -136,9 +139,7 @@ async def cmd_feed(message: Message, state: FSMContext):
             logger.info(f"Показываем выбор тем (planning) для {chat_id}")
             week = await engine.get_current_week()
             if week and week.get('suggested_topics'):
-                # Преобразуем названия тем в формат для отображения
-                topics = [{'title': topic_name, 'description': '', 'why': ''} for topic_name in week['suggested_topics']]
-                await show_topic_selection(message, topics, state)
+                await show_topic_selection(message, week_suggestions(week), state)
             else:
                 # Если тем нет, генерируем новые
                 topics, msg = await engine.suggest_topics()
@@ -603,7 +604,7 @@ async def feed_topics_menu(callback: CallbackQuery, state: FSMContext):
 
 @feed_router.callback_query(F.data == "feed_reset_topics")
 async def feed_reset_topics(callback: CallbackQuery, state: FSMContext):
-    """Начинает выбор тем заново — генерирует новые предложения"""
+    """Начинает выбор тем заново — генерирует новые предложения (мимо кэша недели)"""
     chat_id = callback.message.chat.id
     lang = await get_user_lang(chat_id)
 
@@ -614,7 +615,7 @@ async def feed_reset_topics(callback: CallbackQuery, state: FSMContext):
 
     # Генерируем новые темы
     engine = FeedEngine(chat_id)
-    topics, msg = await engine.suggest_topics()
+    topics, msg = await engine.suggest_topics(refresh=True)
 
     if not topics:
         await callback.message.edit_text(msg)
@@ -693,6 +694,9 @@ async def handle_topic_edit(message: Message, state: FSMContext):
         success = await engine.set_topics(new_topics)
 
         if success:
+            # Заготовка под старые темы удалена — готовим новую
+            get_digest_prefetcher().schedule(chat_id)
+
             # Показываем подтверждение
             confirm_text = f"✅ *Темы обновлены!*\n\n"
             for i, topic in enumerate(new_topics, 1):
@@ -746,7 +750,33 @@ async def show_today_session(message: Message, engine: FeedEngine, state: FSMCon
         # Показываем индикатор "печатает..." пока генерируем контент
         await message.bot.send_chat_action(chat_id=message.chat.id, action="typing")
 
-        session, intro_msg = await engine.get_today_session()
+        lang = await get_user_lang(message.chat.id)
+
+        # Прогресс генерации: готовые темы отмечаются по мере готовности секций.
+        # Секции завершаются параллельно — колбэк сериализован, чтобы сообщение
+        # прогресса было одно
+        progress = {'msg': None, 'done': []}
+        progress_lock = asyncio.Lock()
+
+        async def on_section(topic: str, text: str):
+            async with progress_lock:
+                progress['done'].append(topic)
+                progress_text = t('loading.generating_content', lang) + "\n\n" + "\n".join(
+                    f"✓ {done}" for done in progress['done']
+                )
+                if progress['msg']:
+                    await progress['msg'].edit_text(progress_text)
+                else:
+                    progress['msg'] = await message.answer(progress_text)
+
+        try:
+            session, intro_msg = await engine.get_today_session(on_section=on_section)
+        finally:
+            if progress['msg']:
+                try:
+                    await progress['msg'].delete()
+                except Exception:
+                    pass
 
         if not session:
             await message.answer(intro_msg)
@@ -781,12 +811,13 @@ async def show_today_session(message: Message, engine: FeedEngine, state: FSMCon
 
         text += content.get('main_content', 'Контент недоступен.')
 
+        if content.get('partial'):
+            missing = ", ".join(content.get('missing_topics', []))
+            text += f"\n\n⚠️ _{t('feed.digest_partial', lang, topics=missing)}_"
+
         if content.get('reflection_prompt'):
             text += f"\n\n💭 *{content['reflection_prompt']}*"
 
-        # Получаем язык для кнопок
-        lang = await get_user_lang(message.chat.id)
-
         # Добавляем подсказку о возможности задать вопрос
         text += f"\n\n—\n💡 _{t('feed.ask_details', lang)}_"
 
@@ -950,6 +981,9 @@ async def receive_fixation(message: Message, state: FSMContext):
     success, msg = await engine.submit_fixation(text)
 
     if success:
+        # Следующий дайджест готовим, пока пользователь отдыхает
+        get_digest_prefetcher().schedule(chat_id)
+
         # Показываем статистику
         stats = await engine.get_week_summary()
 
@@ -972,8 +1006,6 @@ async def receive_fixation(message: Message, state: FSMContext):
 
 async def show_tomorrow_topics(message: Message, engine: FeedEngine, state: FSMContext):
     """Показывает предложенные темы на завтра"""
-    from .planner import suggest_weekly_topics
-
     try:
         chat_id = message.chat.id
         lang = await get_user_lang(chat_id)
@@ -998,9 +1030,8 @@ async def show_tomorrow_topics(message: Message, engine: FeedEngine, state: FSMC
             await state.clear()
             return
 
-        # Генерируем альтернативные предложения
-        intern = await engine.get_intern()
-        suggested = await suggest_weekly_topics(intern)
+        # Альтернативные предложения (сгенерированные на этой неделе — из кэша)
+        suggested = await engine.get_alternative_topics()
 
         # Сохраняем в state для обработки
         await state.update_data(
@@ -1088,6 +1119,7 @@ async def handle_tomorrow_selection(message: Message, state: FSMContext):
         success = await engine.update_tomorrow_topic(tomorrow_day, new_topic)
 
         if success:
+            get_digest_prefetcher().schedule(chat_id)
             await message.answer(
                 f"✅ {t('feed.topic_changed', lang)}\n➡️ *{new_topic}*",
                 parse_mode="Markdown"
@@ -2,14 +2,37 @@
 Планировщик недельных тем для режима Лента.
 
 Генерирует персонализированные предложения тем на неделю
-на основе профиля пользователя и истории обучения.
+на основе профиля пользователя и истории обучения. Актуальные темы
+из материалов — общий для всех снимок (TrendingSnapshot), обновляемый
+по расписанию, а не поиск MCP на каждое предложение.
+
+Дайджест из нескольких тем (FEED_DIGEST_PARALLEL) пишется по частям:
+секция на каждую тему и короткая «рамка» (введение + вопрос для рефлексии)
+генерируются параллельно, поэтому время ответа — это самая долгая секция,
+а не сумма. Готовые секции отдаются через on_section по мере готовности.
+
+С FEED_BASE_DIGEST_ENABLED дайджест двухслойный: секции — общие базовые
+тексты тем из кэша (base_digest.py), генерируются только при промахе;
+поверх них один короткий персональный вызов пишет введение, примеры
+из сферы пользователя и вопрос для рефлексии.
 """
 
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Callable, Awaitable
+import asyncio
 import json
+import time
 
-from config import get_logger, FEED_TOPICS_TO_SUGGEST, ONTOLOGY_RULES, ONTOLOGY_RULES_TOPICS
+from config import (
+    get_logger, FEED_TOPICS_TO_SUGGEST, FEED_DIGEST_PARALLEL, FEED_BASE_DIGEST_ENABLED,
+    ONTOLOGY_RULES, ONTOLOGY_RULES_TOPICS,
+)
 from clients import claude, mcp_guides, mcp_knowledge
+from clients.accounting import call_scope
+from clients.context_gather import gather_context, SearchRequest, GatheredContext
+from core.context_packer import get_context_budget, estimate_tokens
+from core import prompts
+
+from .base_digest import get_base_digest_cache, base_digest_key, duration_bucket
 
 logger = get_logger(__name__)
 
@@ -33,25 +56,16 @@ async def suggest_weekly_topics(intern: dict) -> List[Dict]:
     goals = intern.get('goals', '')
     motivation = intern.get('motivation', '')
 
-    # Получаем контекст из MCP для актуальных тем
-    mcp_context = await get_trending_topics()
+    # Актуальные темы из материалов — общий снимок
+    mcp_context = await get_trending_snapshot().get()
 
     # Формируем профиль для промпта
     interests_str = ', '.join(interests) if interests else 'не указаны'
 
     # Определяем язык ответа
     lang = intern.get('language', 'ru')
-    lang_instruction = {
-        'ru': "ВАЖНО: Пиши ВСЁ на русском языке.",
-        'en': "IMPORTANT: Write EVERYTHING in English.",
-        'es': "IMPORTANTE: Escribe TODO en español."
-    }.get(lang, "ВАЖНО: Пиши ВСЁ на русском языке.")
-
-    lang_reminder = {
-        'ru': "НАПОМИНАНИЕ: Весь текст (title, why) должен быть на РУССКОМ языке!",
-        'en': "REMINDER: All text (title, why) must be in ENGLISH!",
-        'es': "RECORDATORIO: ¡Todo el texto (title, why) debe estar en ESPAÑOL!"
-    }.get(lang, "НАПОМИНАНИЕ: Весь текст должен быть на РУССКОМ языке!")
+    lang_instruction = prompts.lang_instruction('write', lang)
+    lang_reminder = prompts.lang_reminder('feed_topics', lang)
 
     system_prompt = f"""Ты — персональный наставник по системному мышлению.
 {lang_instruction}
@@ -101,7 +115,8 @@ async def suggest_weekly_topics(intern: dict) -> List[Dict]:
         'es': f"Sugiere {FEED_TOPICS_TO_SUGGEST} temas para estudiar esta semana."
     }.get(lang, f"Предложи {FEED_TOPICS_TO_SUGGEST} тем для изучения на неделю.")
 
-    response = await claude.generate(system_prompt, user_prompt)
+    with call_scope(call_site="feed.topics"):
+        response = await claude.generate(system_prompt, user_prompt)
 
     if not response:
         logger.error("Не удалось получить предложения тем от Claude")
@@ -143,6 +158,60 @@ async def get_trending_topics() -> str:
     return ""
 
 
+class TrendingSnapshot:
+    """Актуальные темы из материалов — один снимок на всех пользователей
+
+    Обновляется по расписанию (refresh раз в FEED_TRENDING_REFRESH_HOURS).
+    До первого обновления get() один раз загружает снимок сам. Если поиск
+    не удался, остаётся прежний снимок.
+    """
+
+    def __init__(self):
+        self.text = ""
+        self.refreshed_at: Optional[float] = None
+        self.refreshes = 0
+        self.failures = 0
+        self._attempted = False
+        self._lock = asyncio.Lock()
+
+    async def refresh(self) -> str:
+        text = await get_trending_topics()
+        self._attempted = True
+        if text:
+            self.text = text
+            self.refreshed_at = time.time()
+            self.refreshes += 1
+        else:
+            self.failures += 1
+        return self.text
+
+    async def get(self) -> str:
+        if not self._attempted:
+            async with self._lock:
+                if not self._attempted:
+                    await self.refresh()
+        return self.text
+
+    def get_stats(self) -> dict:
+        return {
+            'refreshes': self.refreshes,
+            'failures': self.failures,
+            'age_sec': int(time.time() - self.refreshed_at) if self.refreshed_at else None,
+        }
+
+
+# Singleton
+_trending: Optional[TrendingSnapshot] = None
+
+
+def get_trending_snapshot() -> TrendingSnapshot:
+    """Получить общий снимок актуальных тем"""
+    global _trending
+    if _trending is None:
+        _trending = TrendingSnapshot()
+    return _trending
+
+
 def parse_topics_response(response: str) -> List[Dict]:
     """Парсит JSON ответ с темами
 
@@ -188,41 +257,105 @@ def parse_topics_response(response: str) -> List[Dict]:
 
 
 def get_fallback_topics() -> List[Dict]:
-    """Возвращает базовые темы если генерация не удалась"""
+    """Возвращает базовые темы если генерация не удалась (помечены fallback — не кэшируются)"""
     return [
         {
             "title": "Три состояния внимания",
             "why": "Поможет концентрироваться на важном и меньше отвлекаться.",
             "keywords": ["внимание", "осознанность", "фокус"],
+            "fallback": True,
         },
         {
             "title": "Рабочий продукт практики",
             "why": "Научит превращать действия в конкретные результаты.",
             "keywords": ["продукт", "результат", "артефакт"],
+            "fallback": True,
         },
         {
             "title": "Мемы и убеждения",
             "why": "Поможет выявить ограничивающие установки в мышлении.",
             "keywords": ["убеждения", "мемы", "трансформация"],
+            "fallback": True,
         },
         {
             "title": "Инженерия себя",
             "why": "Даст методы для осознанного изменения привычек.",
             "keywords": ["саморазвитие", "методы", "привычки"],
+            "fallback": True,
         },
         {
             "title": "Роли и исполнители",
             "why": "Поможет разделять функции и конкретных людей.",
             "keywords": ["роли", "функции", "исполнители"],
+            "fallback": True,
         },
     ]
 
 
+# Описание уровня глубины
+DEPTH_DESCRIPTIONS = {
+    1: "базовое введение в тему, основные понятия",
+    2: "практические примеры и применение",
+    3: "связи между темами, нюансы",
+    4: "глубокий анализ, неочевидные аспекты",
+    5: "экспертный уровень, сложные случаи",
+}
+
+# Колбэк готовой секции дайджеста: (тема, текст секции)
+SectionCallback = Callable[[str, str], Awaitable[None]]
+
+
+def _depth_description(depth_level: int) -> str:
+    return DEPTH_DESCRIPTIONS.get(
+        min(depth_level, 5),
+        f"экспертный уровень (глубина {depth_level})"
+    )
+
+
+def _digest_user_prompt(topics_str: str, depth_level: int, lang: str) -> str:
+    return {
+        'ru': f"Темы: {topics_str}\nУровень глубины: {depth_level}",
+        'en': f"Topics: {topics_str}\nDepth level: {depth_level}",
+        'es': f"Temas: {topics_str}\nNivel de profundidad: {depth_level}"
+    }.get(lang, f"Темы: {topics_str}\nУровень глубины: {depth_level}")
+
+
+async def _notify_section(on_section: Optional[SectionCallback], topic: str, text: str):
+    if on_section:
+        try:
+            await on_section(topic, text)
+        except Exception as e:
+            logger.warning(f"on_section: {e}")
+
+
+def _digest_failed(topics: List[str], depth_level: int) -> Dict:
+    """Заглушка, если LLM не ответил (fallback — такой дайджест не сохраняется заранее)"""
+    return {
+        "intro": f"Сегодняшний дайджест: {', '.join(topics)}",
+        "main_content": "Контент не удалось сгенерировать. Попробуйте позже.",
+        "topics_list": topics,
+        "reflection_prompt": "Какие мысли вызвали эти темы?",
+        "depth_level": depth_level,
+        "fallback": True,
+    }
+
+
+def _mark_partial(content: Dict, topics: List[str], texts: List[Optional[str]]) -> Dict:
+    """Отмечает дайджест без части тем (partial — не сохраняется заранее, дописывается позже)"""
+    missing = [topic for topic, text in zip(topics, texts) if not text]
+    if missing:
+        logger.warning(f"Дайджест без тем: {missing}")
+        content["partial"] = True
+        content["missing_topics"] = missing
+    return content
+
+
 async def generate_multi_topic_digest(
     topics: List[str],
     intern: dict,
     duration: int = 10,
-    depth_level: int = 1
+    depth_level: int = 1,
+    on_section: Optional[SectionCallback] = None,
 ) -> Dict:
     """Генерирует дайджест по всем темам.
 
@@ -237,6 +370,7 @@ async def generate_multi_topic_digest(
         intern: профиль пользователя
         duration: общая длительность дайджеста в минутах
         depth_level: уровень глубины (1 = базовый, 2+ = глубже)
+        on_section: колбэк готовой секции (при параллельной генерации)
 
     Returns:
         {
@@ -264,58 +398,32 @@ async def generate_multi_topic_digest(
     time_per_topic = duration // topics_count
     words_per_topic = time_per_topic * 100  # ~100 слов в минуту чтения
 
-    # Получаем контекст из MCP для всех тем
-    mcp_context = ""
-    for topic in topics:
-        try:
-            # Ищем в руководствах
-            guides_results = await mcp_guides.semantic_search(topic, limit=1)
-            if guides_results:
-                for item in guides_results:
-                    if isinstance(item, dict):
-                        text = item.get('text', item.get('content', ''))[:500]
-                        if text:
-                            mcp_context += f"\n[{topic}]: {text}"
-
-            # Ищем в базе знаний
-            knowledge_results = await mcp_knowledge.search(topic, limit=1)
-            if knowledge_results:
-                for item in knowledge_results:
-                    if isinstance(item, dict):
-                        text = item.get('text', item.get('content', ''))[:500]
-                        if text:
-                            mcp_context += f"\n[{topic}]: {text}"
-        except Exception as e:
-            logger.error(f"MCP search error for '{topic}': {e}")
-
-    # Описание уровня глубины
-    depth_descriptions = {
-        1: "базовое введение в тему, основные понятия",
-        2: "практические примеры и применение",
-        3: "связи между темами, нюансы",
-        4: "глубокий анализ, неочевидные аспекты",
-        5: "экспертный уровень, сложные случаи",
-    }
-    depth_desc = depth_descriptions.get(
-        min(depth_level, 5),
-        f"экспертный уровень (глубина {depth_level})"
-    )
+    if FEED_BASE_DIGEST_ENABLED:
+        return await _generate_digest_layered(topics, intern, time_per_topic, depth_level, on_section)
+
+    # Контекст из MCP для всех тем: запросы параллельно, общий дедлайн
+    gathered = await gather_context([
+        SearchRequest(client, topic, source, limit=1, tag=topic)
+        for topic in topics
+        for client, source in ((mcp_guides, "guides"), (mcp_knowledge, "knowledge"))
+    ], max_chars=500)
+
+    if FEED_DIGEST_PARALLEL and topics_count > 1:
+        return await _generate_digest_parallel(
+            topics, intern, gathered, words_per_topic, depth_level, on_section
+        )
+
+    packed = gathered.pack(get_context_budget("digest"), max_parts=2 * len(topics), with_tag=True)
+    mcp_context = "".join(f"\n{text}" for text in packed.texts())
+
+    depth_desc = _depth_description(depth_level)
 
     topics_str = ", ".join(topics)
 
     # Определяем язык пользователя
     lang = intern.get('language', 'ru')
-    lang_instruction = {
-        'ru': "ВАЖНО: Пиши ВСЁ на русском языке.",
-        'en': "IMPORTANT: Write EVERYTHING in English.",
-        'es': "IMPORTANTE: Escribe TODO en español."
-    }.get(lang, "ВАЖНО: Пиши ВСЁ на русском языке.")
-
-    lang_reminder = {
-        'ru': "НАПОМИНАНИЕ: Весь текст (intro, main_content, reflection_prompt) должен быть на РУССКОМ языке!",
-        'en': "REMINDER: All text (intro, main_content, reflection_prompt) must be in ENGLISH!",
-        'es': "RECORDATORIO: ¡Todo el texto (intro, main_content, reflection_prompt) debe estar en ESPAÑOL!"
-    }.get(lang, "НАПОМИНАНИЕ: Весь текст должен быть на РУССКОМ языке!")
+    lang_instruction = prompts.lang_instruction('write', lang)
+    lang_reminder = prompts.lang_reminder('digest', lang)
 
     system_prompt = f"""Ты — персональный наставник по системному мышлению.
 Создай дайджест, объединяющий несколько тем для {name}.
@@ -336,7 +444,7 @@ async def generate_multi_topic_digest(
 3. Покажи связи между темами если они есть
 4. Один общий вопрос для рефлексии в конце
 
-{f"КОНТЕКСТ ИЗ МАТЕРИАЛОВ:{chr(10)}{mcp_context[:3000]}" if mcp_context else ""}
+{f"КОНТЕКСТ ИЗ МАТЕРИАЛОВ:{chr(10)}{mcp_context}" if mcp_context else ""}
 
 ВАЖНО:
 - Пиши просто и вовлекающе
@@ -354,22 +462,13 @@ async def generate_multi_topic_digest(
     "reflection_prompt": "один вопрос для рефлексии"
 }}"""
 
-    user_prompt = {
-        'ru': f"Темы: {topics_str}\nУровень глубины: {depth_level}",
-        'en': f"Topics: {topics_str}\nDepth level: {depth_level}",
-        'es': f"Temas: {topics_str}\nNivel de profundidad: {depth_level}"
-    }.get(lang, f"Темы: {topics_str}\nУровень глубины: {depth_level}")
+    user_prompt = _digest_user_prompt(topics_str, depth_level, lang)
 
-    response = await claude.generate(system_prompt, user_prompt)
+    with call_scope(call_site="feed.digest"):
+        response = await claude.generate(system_prompt, user_prompt)
 
     if not response:
-        return {
-            "intro": f"Сегодняшний дайджест: {topics_str}",
-            "main_content": "Контент не удалось сгенерировать. Попробуйте позже.",
-            "topics_list": topics,
-            "reflection_prompt": "Какие мысли вызвали эти темы?",
-            "depth_level": depth_level,
-        }
+        return _digest_failed(topics, depth_level)
 
     # Парсим JSON
     try:
@@ -397,6 +496,285 @@ async def generate_multi_topic_digest(
     }
 
 
+async def _generate_digest_parallel(
+    topics: List[str],
+    intern: dict,
+    gathered: GatheredContext,
+    words_per_topic: int,
+    depth_level: int,
+    on_section: Optional[SectionCallback] = None,
+) -> Dict:
+    """Секции по темам и рамка дайджеста — параллельными вызовами LLM
+
+    Бюджет контекста дайджеста делится между темами: каждая секция
+    получает только фрагменты своей темы.
+    """
+    name = intern.get('name', 'пользователь')
+    occupation = intern.get('occupation', '')
+    lang = intern.get('language', 'ru')
+    depth_desc = _depth_description(depth_level)
+    topics_str = ", ".join(topics)
+    budget = get_context_budget("digest") // len(topics)
+
+    async def digest_section(topic: str) -> Optional[str]:
+        fragments = [f for f in gathered.fragments if f.tag == topic]
+        packed = GatheredContext(fragments=fragments).pack(budget, max_parts=2)
+        mcp_context = "".join(f"\n{text}" for text in packed.texts())
+        others = ", ".join(t for t in topics if t != topic)
+
+        system_prompt = f"""Ты — персональный наставник по системному мышлению.
+Напиши для {name} фрагмент дайджеста по одной теме: «{topic}».
+{prompts.lang_instruction('write', lang)}
+
+ПРОФИЛЬ:
+- Занятие: {occupation or 'не указано'}
+
+Другие темы дайджеста (их раскроют отдельно): {others}
+
+УРОВЕНЬ ГЛУБИНЫ: {depth_level} — {depth_desc}
+(С каждым днём одни и те же темы раскрываются глубже)
+
+ФОРМАТ:
+- ~{words_per_topic} слов — раскрой тему на текущем уровне глубины
+- Если есть естественная связь с другими темами — покажи её одной фразой
+
+{f"КОНТЕКСТ ИЗ МАТЕРИАЛОВ:{chr(10)}{mcp_context}" if mcp_context else ""}
+
+ВАЖНО:
+- Пиши просто и вовлекающе
+- Используй примеры из сферы "{occupation}" если возможно
+- НЕ используй заголовки, подзаголовки и markdown-разметку
+- Без вступления и без вопроса в конце — их добавят отдельно
+
+{prompts.lang_reminder('write', lang)}
+
+Верни только текст фрагмента."""
+
+        with call_scope(call_site="feed.digest_section"):
+            text = await claude.generate(system_prompt, _digest_user_prompt(topic, depth_level, lang))
+        if not text:
+            logger.warning(f"Секция дайджеста не сгенерирована: {topic}")
+            return None
+        text = text.strip()
+
+        await _notify_section(on_section, topic, text)
+        return text
+
+    async def digest_frame() -> Dict:
+        system_prompt = f"""Ты — персональный наставник по системному мышлению.
+Для дайджеста {name} по темам ниже напиши короткое введение и один вопрос для рефлексии.
+{prompts.lang_instruction('write', lang)}
+
+ТЕМЫ ДАЙДЖЕСТА ({len(topics)} шт.):
+{chr(10).join(f'- {t}' for t in topics)}
+
+УРОВЕНЬ ГЛУБИНЫ: {depth_level} — {depth_desc}
+
+ФОРМАТ:
+1. intro — 1-2 предложения: зацепи внимание, объедини темы
+2. reflection_prompt — один общий вопрос для размышления, связывающий темы
+
+{prompts.lang_reminder('digest', lang)}
+
+Верни JSON:
+{{
+    "intro": "краткое введение (1-2 предложения)",
+    "reflection_prompt": "один вопрос для рефлексии"
+}}"""
+
+        with call_scope(call_site="feed.digest_frame"):
+            response = await claude.generate(system_prompt, _digest_user_prompt(topics_str, depth_level, lang))
+        if response:
+            try:
+                start = response.find('{')
+                end = response.rfind('}') + 1
+                if start >= 0 and end > start:
+                    return json.loads(response[start:end])
+            except Exception as e:
+                logger.error(f"Digest frame parse error: {e}")
+        return {}
+
+    frame, *sections = await asyncio.gather(
+        digest_frame(), *(digest_section(topic) for topic in topics)
+    )
+
+    if not any(sections):
+        return _digest_failed(topics, depth_level)
+
+    return _mark_partial({
+        "intro": frame.get('intro') or f"Дайджест: {topics_str}",
+        "main_content": "\n\n".join(text for text in sections if text),
+        "topics_list": topics,
+        "reflection_prompt": frame.get('reflection_prompt') or "Что вы вынесли из этого материала?",
+        "depth_level": depth_level,
+    }, topics, sections)
+
+
+async def _generate_base_section(topic: str, depth_level: int, lang: str,
+                                 words: int) -> Optional[tuple]:
+    """Базовый текст темы без персонализации (общий для всех пользователей)
+
+    Returns:
+        (текст, оценка токенов вызова) или None
+    """
+    gathered = await gather_context([
+        SearchRequest(mcp_guides, topic, "guides", limit=1, tag=topic),
+        SearchRequest(mcp_knowledge, topic, "knowledge", limit=1, tag=topic),
+    ], max_chars=500)
+    packed = gathered.pack(get_context_budget("digest"), max_parts=2)
+    mcp_context = "".join(f"\n{text}" for text in packed.texts())
+
+    system_prompt = f"""Ты — наставник по системному мышлению.
+Напиши фрагмент дайджеста по одной теме: «{topic}».
+{prompts.lang_instruction('write', lang)}
+
+УРОВЕНЬ ГЛУБИНЫ: {depth_level} — {_depth_description(depth_level)}
+(С каждым днём одни и те же темы раскрываются глубже)
+
+ФОРМАТ:
+- ~{words} слов — раскрой тему на текущем уровне глубины
+
+{f"КОНТЕКСТ ИЗ МАТЕРИАЛОВ:{chr(10)}{mcp_context}" if mcp_context else ""}
+
+ВАЖНО:
+- Пиши просто и вовлекающе, обращайся к читателю на «вы»
+- Примеры — из повседневной жизни и работы, без привязки к профессии
+  (персональные примеры добавят отдельно)
+- НЕ используй заголовки, подзаголовки и markdown-разметку
+- Без вступления и без вопроса в конце — их добавят отдельно
+
+{prompts.lang_reminder('write', lang)}
+
+Верни только текст фрагмента."""
+
+    user_prompt = _digest_user_prompt(topic, depth_level, lang)
+    with call_scope(call_site="feed.base_section"):
+        text = await claude.generate(system_prompt, user_prompt)
+    if not text:
+        return None
+    text = text.strip()
+    return text, estimate_tokens(system_prompt + user_prompt) + estimate_tokens(text)
+
+
+async def _personal_overlay(sections: List[tuple], intern: dict, depth_level: int) -> Dict:
+    """Персональный слой над базовыми текстами: введение, примеры, вопрос
+
+    Returns:
+        {"intro", "examples": [по примеру на секцию], "reflection_prompt"} или {}
+    """
+    name = intern.get('name', 'пользователь')
+    occupation = intern.get('occupation', '')
+    goals = intern.get('goals', '')
+    interests = intern.get('interests', [])
+    if isinstance(interests, str):
+        interests = [interests] if interests else []
+    lang = intern.get('language', 'ru')
+    topics = [topic for topic, _ in sections]
+
+    # Базовые тексты — только начало: для примеров достаточно понять, о чём секция
+    summaries = "\n\n".join(f"[{topic}]: {text[:600]}" for topic, text in sections)
+
+    system_prompt = f"""Ты — персональный наставник по системному мышлению.
+{name} читает дайджест по темам ниже. Тексты тем уже написаны — адаптируй их под человека.
+{prompts.lang_instruction('write', lang)}
+
+ПРОФИЛЬ:
+- Занятие: {occupation or 'не указано'}
+- Цели: {goals or 'не указаны'}
+- Интересы: {', '.join(interests) if interests else 'не указаны'}
+
+ТЕКСТЫ ТЕМ (начало):
+{summaries}
+
+УРОВЕНЬ ГЛУБИНЫ: {depth_level}
+
+ФОРМАТ:
+1. intro — 1-2 предложения: зацепи внимание, объедини темы
+2. examples — по одному примеру на каждую тему, в том же порядке ({len(topics)} шт.):
+   1-2 предложения, как это проявляется в сфере "{occupation}" или связано с целями
+3. reflection_prompt — один общий вопрос для размышления, связывающий темы
+
+ВАЖНО: без markdown-разметки.
+
+{prompts.lang_reminder('write', lang)}
+
+Верни JSON:
+{{
+    "intro": "краткое введение",
+    "examples": ["пример к первой теме", "..."],
+    "reflection_prompt": "один вопрос для рефлексии"
+}}"""
+
+    with call_scope(call_site="feed.overlay"):
+        response = await claude.generate(system_prompt, _digest_user_prompt(", ".join(topics), depth_level, lang))
+    if response:
+        try:
+            start = response.find('{')
+            end = response.rfind('}') + 1
+            if start >= 0 and end > start:
+                return json.loads(response[start:end])
+        except Exception as e:
+            logger.error(f"Digest overlay parse error: {e}")
+    return {}
+
+
+async def _generate_digest_layered(
+    topics: List[str],
+    intern: dict,
+    time_per_topic: int,
+    depth_level: int,
+    on_section: Optional[SectionCallback] = None,
+) -> Dict:
+    """Дайджест из общих базовых текстов тем и персонального слоя
+
+    Базовые тексты берутся из кэша, недостающие генерируются параллельно
+    (контекст MCP собирается только для них). Если персональный вызов
+    не удался, дайджест отдаётся без примеров.
+    """
+    lang = intern.get('language', 'ru')
+    topics_str = ", ".join(topics)
+    bucket = duration_bucket(time_per_topic)
+    cache = get_base_digest_cache()
+
+    keys = {topic: base_digest_key(topic, depth_level, lang, bucket) for topic in topics}
+    cached = await cache.lookup(list(keys.values()))
+
+    async def section(topic: str) -> Optional[str]:
+        text = cached.get(keys[topic])
+        if text is None:
+            text = await cache.fill(
+                keys[topic],
+                lambda: _generate_base_section(topic, depth_level, lang, bucket * 100),
+                topic, depth_level, lang, bucket,
+            )
+        if text:
+            await _notify_section(on_section, topic, text)
+        return text
+
+    texts = await asyncio.gather(*(section(topic) for topic in topics))
+    sections = [(topic, text) for topic, text in zip(topics, texts) if text]
+    logger.info(f"Дайджест: базовых текстов из кэша {len(cached)}/{len(topics)}")
+    if not sections:
+        return _digest_failed(topics, depth_level)
+
+    overlay = await _personal_overlay(sections, intern, depth_level)
+    examples = overlay.get('examples')
+    if not isinstance(examples, list) or len(examples) != len(sections):
+        examples = [None] * len(sections)
+
+    parts = []
+    for (topic, text), example in zip(sections, examples):
+        parts.append(f"{text}\n\n👉 {example}" if example else text)
+
+    return _mark_partial({
+        "intro": overlay.get('intro') or f"Дайджест: {topics_str}",
+        "main_content": "\n\n".join(parts),
+        "topics_list": topics,
+        "reflection_prompt": overlay.get('reflection_prompt') or "Что вы вынесли из этого материала?",
+        "depth_level": depth_level,
+    }, topics, texts)
+
+
 async def generate_topic_content(
     topic: Dict,
     intern: dict,
@@ -425,44 +803,20 @@ async def generate_topic_content(
     keywords = topic.get('keywords', [])
     search_query = ' '.join(keywords) if keywords else topic.get('title', '')
 
-    mcp_context = ""
-    try:
-        # Ищем в руководствах
-        guides_results = await mcp_guides.semantic_search(search_query, limit=2)
-        if guides_results:
-            for item in guides_results:
-                if isinstance(item, dict):
-                    text = item.get('text', item.get('content', ''))[:1000]
-                    if text:
-                        mcp_context += f"\n\n{text}"
-
-        # Ищем в базе знаний
-        knowledge_results = await mcp_knowledge.search(search_query, limit=2)
-        if knowledge_results:
-            for item in knowledge_results:
-                if isinstance(item, dict):
-                    text = item.get('text', item.get('content', ''))[:1000]
-                    if text:
-                        mcp_context += f"\n\n{text}"
-    except Exception as e:
-        logger.error(f"MCP search error: {e}")
+    gathered = await gather_context([
+        SearchRequest(mcp_guides, search_query, "guides", limit=2),
+        SearchRequest(mcp_knowledge, search_query, "knowledge", limit=2),
+    ], max_chars=1000)
+    packed = gathered.pack(get_context_budget("digest"))
+    mcp_context = "".join(f"\n\n{text}" for text in packed.texts())
 
     # Рассчитываем объём текста
     words = session_duration * 100  # ~100 слов в минуту чтения
 
     # Определяем язык ответа
     lang = intern.get('language', 'ru')
-    lang_instruction = {
-        'ru': "ВАЖНО: Пиши ВСЁ на русском языке.",
-        'en': "IMPORTANT: Write EVERYTHING in English.",
-        'es': "IMPORTANTE: Escribe TODO en español."
-    }.get(lang, "ВАЖНО: Пиши ВСЁ на русском языке.")
-
-    lang_reminder = {
-        'ru': "НАПОМИНАНИЕ: Весь текст (intro, main_content, reflection_prompt) должен быть на РУССКОМ языке!",
-        'en': "REMINDER: All text (intro, main_content, reflection_prompt) must be in ENGLISH!",
-        'es': "RECORDATORIO: ¡Todo el texto (intro, main_content, reflection_prompt) debe estar en ESPAÑOL!"
-    }.get(lang, "НАПОМИНАНИЕ: Весь текст должен быть на РУССКОМ языке!")
+    lang_instruction = prompts.lang_instruction('write', lang)
+    lang_reminder = prompts.lang_reminder('digest', lang)
 
     system_prompt = f"""Ты — персональный наставник по системному мышлению.
 {lang_instruction}
@@ -477,7 +831,7 @@ async def generate_topic_content(
 2. Основной контент (~{words} слов) — раскрой тему простым языком с примерами
 3. Вопрос для рефлексии — один открытый вопрос
 
-{f"КОНТЕКСТ ИЗ МАТЕРИАЛОВ:{chr(10)}{mcp_context[:3000]}" if mcp_context else ""}
+{f"КОНТЕКСТ ИЗ МАТЕРИАЛОВ:{chr(10)}{mcp_context}" if mcp_context else ""}
 
 ВАЖНО:
 - Пиши просто и вовлекающе
@@ -502,7 +856,8 @@ async def generate_topic_content(
         'es': f"Tema: {topic.get('title')}\nDescripción: {topic.get('description', '')}"
     }.get(lang, f"Тема: {topic.get('title')}\nОписание: {topic.get('description', '')}")
 
-    response = await claude.generate(system_prompt, user_prompt)
+    with call_scope(call_site="feed.topic_content"):
+        response = await claude.generate(system_prompt, user_prompt)
 
     if not response:
         return {
@@ -0,0 +1,114 @@
+"""
+Фоновая предгенерация дайджестов Ленты.
+
+Дайджест генерируется заранее, чтобы «Получить дайджест» открывался сразу:
+- после фиксации — следующий уровень глубины (schedule из хендлера);
+- за FEED_PREFETCH_LEAD_MINUTES до schedule_time — для тех, у кого
+  заготовки ещё нет (prepare_due из планировщика, раз в минуту).
+
+Одновременно идёт не больше FEED_PREFETCH_CONCURRENCY генераций
+и не больше одной на пользователя; вызовы LLM идут с фоновым приоритетом.
+"""
+
+import asyncio
+from datetime import datetime, timedelta
+from typing import Optional, Set
+
+from config import (
+    get_logger,
+    FEED_PREFETCH_ENABLED,
+    FEED_PREFETCH_LEAD_MINUTES,
+    FEED_PREFETCH_CONCURRENCY,
+)
+from clients.llm_limiter import llm_priority, PRIORITY_BACKGROUND
+from db.queries.users import moscow_now
+from db.queries.feed import get_feed_prefetch_candidates
+
+from .engine import FeedEngine
+
+logger = get_logger(__name__)
+
+
+class DigestPrefetcher:
+    """Фоновая подготовка следующего дайджеста"""
+
+    def __init__(self, concurrency: int = FEED_PREFETCH_CONCURRENCY,
+                 lead_minutes: int = FEED_PREFETCH_LEAD_MINUTES,
+                 enabled: bool = FEED_PREFETCH_ENABLED):
+        self.lead_minutes = lead_minutes
+        self.enabled = enabled
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._running: Set[int] = set()
+        self._tasks: Set[asyncio.Task] = set()
+        self.prepared = 0
+        self.skipped = 0
+        self.failed = 0
+
+    def schedule(self, chat_id: int):
+        """Запустить подготовку в фоне (не больше одной на чат одновременно)"""
+        if not self.enabled or chat_id in self._running:
+            return
+        task = asyncio.create_task(self.prepare(chat_id))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def prepare(self, chat_id: int) -> Optional[dict]:
+        """Сгенерировать и сохранить заготовку
+
+        Returns:
+            Заготовка или None (готовить нечего / уже готова / ошибка)
+        """
+        if chat_id in self._running:
+            return None
+        self._running.add(chat_id)
+        try:
+            async with self._semaphore:
+                with llm_priority(PRIORITY_BACKGROUND):
+                    prepared = await FeedEngine(chat_id).prepare_next_session()
+            if prepared:
+                self.prepared += 1
+            else:
+                self.skipped += 1
+            return prepared
+        except Exception as e:
+            self.failed += 1
+            logger.error(f"DigestPrefetcher: ошибка для {chat_id}: {e}")
+            return None
+        finally:
+            self._running.discard(chat_id)
+
+    async def prepare_due(self, now: Optional[datetime] = None) -> int:
+        """Запланировать подготовку для тех, чьё напоминание через lead_minutes
+
+        Returns:
+            Сколько пользователей поставлено в очередь
+        """
+        if not self.enabled:
+            return 0
+        target = (now or moscow_now()) + timedelta(minutes=self.lead_minutes)
+        chat_ids = await get_feed_prefetch_candidates(f"{target.hour:02d}:{target.minute:02d}")
+        for chat_id in chat_ids:
+            self.schedule(chat_id)
+        if chat_ids:
+            logger.info(f"DigestPrefetcher: {len(chat_ids)} дайджестов к {target:%H:%M}")
+        return len(chat_ids)
+
+    def get_stats(self) -> dict:
+        return {
+            'prepared': self.prepared,
+            'skipped': self.skipped,
+            'failed': self.failed,
+            'running': len(self._running),
+        }
+
+
+# Singleton
+_prefetcher: Optional[DigestPrefetcher] = None
+
+
+def get_digest_prefetcher() -> DigestPrefetcher:
+    """Получить глобальный экземпляр предгенерации"""
+    global _prefetcher
+    if _prefetcher is None:
+        _prefetcher = DigestPrefetcher()
+    return _prefetcher
@@ -14,6 +14,7 @@ from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
 
 from config import get_logger, Mode, MarathonStatus, FeedStatus
+from core.keyboards import cached_keyboard
 from db.queries.users import get_intern, update_intern
 from locales import t
 
@@ -28,6 +29,101 @@ logger = get_logger(__name__)
 mode_router = Router(name="mode_selector")
 
 
+# ==================== КЛАВИАТУРЫ ====================
+
+@cached_keyboard
+def kb_mode_select(current_mode: str) -> InlineKeyboardMarkup:
+    """Выбор режима с отметкой текущего"""
+    buttons = [
+        [InlineKeyboardButton(
+            text="📚 Марафон" + (" ✓" if current_mode == Mode.MARATHON else ""),
+            callback_data="mode_marathon"
+        )],
+        [InlineKeyboardButton(
+            text="🌊 Лента" + (" ✓" if current_mode == Mode.FEED else ""),
+            callback_data="mode_feed"
+        )],
+    ]
+
+    # Если оба режима активны, показываем статус "Оба"
+    if current_mode == Mode.BOTH:
+        buttons.append([InlineKeyboardButton(
+            text="📚🌊 Оба режима ✓",
+            callback_data="mode_both"
+        )])
+
+    return InlineKeyboardMarkup(inline_keyboard=buttons)
+
+
+@cached_keyboard
+def kb_marathon_actions(lang: str) -> InlineKeyboardMarkup:
+    """Действия в активном Марафоне"""
+    return InlineKeyboardMarkup(inline_keyboard=[
+        [InlineKeyboardButton(text=f"📚 {t('buttons.continue_learning', lang)}", callback_data="learn")],
+        [InlineKeyboardButton(text="📝 Обновить данные", callback_data="marathon_go_update")],
+        [InlineKeyboardButton(text="⏰ Напоминания", callback_data="marathon_reminders_input")],
+        [InlineKeyboardButton(text="🔄 Сбросить марафон", callback_data="marathon_reset_confirm")],
+    ])
+
+
+@cached_keyboard
+def kb_feed_actions(lang: str, has_active_week: bool) -> InlineKeyboardMarkup:
+    """Действия в активной Ленте (зависят от наличия активной недели)"""
+    buttons = []
+
+    if has_active_week:
+        buttons.append([InlineKeyboardButton(
+            text=f"📖 {t('buttons.get_digest', lang)}",
+            callback_data="feed_get_digest"
+        )])
+        buttons.append([InlineKeyboardButton(
+            text=f"📋 {t('buttons.topics_menu', lang)}",
+            callback_data="feed_topics_menu"
+        )])
+    else:
+        # Нет активной недели — кнопка для выбора тем
+        buttons.append([InlineKeyboardButton(
+            text=f"📚 {t('buttons.select_topics', lang)}",
+            callback_data="feed_start_topics"
+        )])
+
+    # Общие кнопки настроек
+    buttons.append([InlineKeyboardButton(text="📝 Обновить данные", callback_data="feed_go_update")])
+    buttons.append([InlineKeyboardButton(text="⏰ Напоминания", callback_data="feed_reminders_input")])
+
+    return InlineKeyboardMarkup(inline_keyboard=buttons)
+
+
+@cached_keyboard
+def kb_marathon_reset() -> InlineKeyboardMarkup:
+    """Подтверждение сброса марафона"""
+    return InlineKeyboardMarkup(inline_keyboard=[
+        [
+            InlineKeyboardButton(text="🔄 Да, сбросить", callback_data="marathon_reset_do"),
+            InlineKeyboardButton(text="❌ Отмена", callback_data="marathon_settings_back")
+        ]
+    ])
+
+
+@cached_keyboard
+def kb_marathon_difficulty() -> InlineKeyboardMarkup:
+    """Выбор сложности марафона"""
+    return InlineKeyboardMarkup(inline_keyboard=[
+        [InlineKeyboardButton(text="1️⃣ Базовый", callback_data="marathon_diff_1")],
+        [InlineKeyboardButton(text="2️⃣ Средний", callback_data="marathon_diff_2")],
+        [InlineKeyboardButton(text="3️⃣ Продвинутый", callback_data="marathon_diff_3")],
+        [InlineKeyboardButton(text="« Назад", callback_data="marathon_settings_back")]
+    ])
+
+
+@cached_keyboard
+def kb_back(callback_data: str) -> InlineKeyboardMarkup:
+    """Одна кнопка «Назад»"""
+    return InlineKeyboardMarkup(inline_keyboard=[
+        [InlineKeyboardButton(text="« Назад", callback_data=callback_data)]
+    ])
+
+
 @mode_router.message(Command("mode"))
 async def cmd_mode(message: Message):
     """Команда /mode - выбор режима работы"""
@@ -62,25 +158,7 @@ async def cmd_mode(message: Message):
     )
 
     # Кнопки выбора режима
-    buttons = [
-        [InlineKeyboardButton(
-            text="📚 Марафон" + (" ✓" if current_mode == Mode.MARATHON else ""),
-            callback_data="mode_marathon"
-        )],
-        [InlineKeyboardButton(
-            text="🌊 Лента" + (" ✓" if current_mode == Mode.FEED else ""),
-            callback_data="mode_feed"
-        )],
-    ]
-
-    # Если оба режима активны, показываем статус "Оба"
-    if current_mode == Mode.BOTH:
-        buttons.append([InlineKeyboardButton(
-            text="📚🌊 Оба режима ✓",
-            callback_data="mode_both"
-        )])
-
-    keyboard = InlineKeyboardMarkup(inline_keyboard=buttons)
+    keyboard = kb_mode_select(current_mode)
 
     await message.answer(text, reply_markup=keyboard, parse_mode="Markdown")
 
@@ -165,14 +243,7 @@ async def show_marathon_activated(message, intern: dict, feed_paused: bool = Fal
 
     # Кнопки
     lang = intern.get('language', 'ru') or 'ru'
-    buttons = [
-        [InlineKeyboardButton(text=f"📚 {t('buttons.continue_learning', lang)}", callback_data="learn")],
-        [InlineKeyboardButton(text="📝 Обновить данные", callback_data="marathon_go_update")],
-        [InlineKeyboardButton(text="⏰ Напоминания", callback_data="marathon_reminders_input")],
-        [InlineKeyboardButton(text="🔄 Сбросить марафон", callback_data="marathon_reset_confirm")],
-    ]
-
-    keyboard = InlineKeyboardMarkup(inline_keyboard=buttons)
+    keyboard = kb_marathon_actions(lang)
 
     if edit:
         await message.edit_text(text, reply_markup=keyboard, parse_mode="Markdown")
@@ -215,27 +286,7 @@ async def show_feed_activated(message, intern: dict, marathon_paused: bool = Fal
         text += "\n_Марафон на паузе. Вернуться: /mode_"
 
     # Кнопки
-    buttons = []
-
-    if has_active_week:
-        buttons.append([InlineKeyboardButton(
-            text=f"📖 {t('buttons.get_digest', lang)}",
-            callback_data="feed_get_digest"
-        )])
-        buttons.append([InlineKeyboardButton(
-            text=f"📋 {t('buttons.topics_menu', lang)}",
-            callback_data="feed_topics_menu"
-        )])
-    else:
-        buttons.append([InlineKeyboardButton(
-            text=f"📚 {t('buttons.select_topics', lang)}",
-            callback_data="feed_start_topics"
-        )])
-
-    buttons.append([InlineKeyboardButton(text="📝 Обновить данные", callback_data="feed_go_update")])
-    buttons.append([InlineKeyboardButton(text="⏰ Напоминания", callback_data="feed_reminders_input")])
-
-    keyboard = InlineKeyboardMarkup(inline_keyboard=buttons)
+    keyboard = kb_feed_actions(lang, bool(has_active_week))
 
     if edit:
         await message.edit_text(text, reply_markup=keyboard, parse_mode="Markdown")
@@ -377,14 +428,7 @@ async def marathon_reset_confirm(callback: CallbackQuery):
         text += "• Весь прогресс по дням\n\n"
         text += "_Статистика Ленты сохранится._"
 
-        buttons = [
-            [
-                InlineKeyboardButton(text="🔄 Да, сбросить", callback_data="marathon_reset_do"),
-                InlineKeyboardButton(text="❌ Отмена", callback_data="marathon_settings_back")
-            ]
-        ]
-
-        keyboard = InlineKeyboardMarkup(inline_keyboard=buttons)
+        keyboard = kb_marathon_reset()
         await callback.message.edit_text(text, reply_markup=keyboard, parse_mode="Markdown")
         await callback.answer()
 
@@ -502,8 +546,7 @@ async def marathon_reminders_input(callback: CallbackQuery, state: FSMContext):
     # Устанавливаем FSM-состояние ожидания ввода времени
     await state.set_state(MarathonSettingsStates.waiting_for_time)
 
-    buttons = [[InlineKeyboardButton(text="« Назад", callback_data="marathon_cancel_input")]]
-    keyboard = InlineKeyboardMarkup(inline_keyboard=buttons)
+    keyboard = kb_back("marathon_cancel_input")
 
     await callback.message.edit_text(text, reply_markup=keyboard, parse_mode="Markdown")
     await callback.answer()
@@ -730,14 +773,7 @@ async def marathon_set_difficulty(callback: CallbackQuery):
 
     text += f"\nСейчас: *{current_name}*"
 
-    buttons = [
-        [InlineKeyboardButton(text="1️⃣ Базовый", callback_data="marathon_diff_1")],
-        [InlineKeyboardButton(text="2️⃣ Средний", callback_data="marathon_diff_2")],
-        [InlineKeyboardButton(text="3️⃣ Продвинутый", callback_data="marathon_diff_3")],
-        [InlineKeyboardButton(text="« Назад", callback_data="marathon_settings_back")]
-    ]
-
-    keyboard = InlineKeyboardMarkup(inline_keyboard=buttons)
+    keyboard = kb_marathon_difficulty()
     await callback.message.edit_text(text, reply_markup=keyboard, parse_mode="Markdown")
     await callback.answer()
 
@@ -808,29 +844,7 @@ async def select_feed(callback: CallbackQuery):
             )
 
         # Кнопки в зависимости от наличия активной недели
-        buttons = []
-
-        if has_active_week:
-            buttons.append([InlineKeyboardButton(
-                text=f"📖 {t('buttons.get_digest', lang)}",
-                callback_data="feed_get_digest"
-            )])
-            buttons.append([InlineKeyboardButton(
-                text=f"📋 {t('buttons.topics_menu', lang)}",
-                callback_data="feed_topics_menu"
-            )])
-        else:
-            # Нет активной недели — кнопка для выбора тем
-            buttons.append([InlineKeyboardButton(
-                text=f"📚 {t('buttons.select_topics', lang)}",
-                callback_data="feed_start_topics"
-            )])
-
-        # Общие кнопки настроек
-        buttons.append([InlineKeyboardButton(text="📝 Обновить данные", callback_data="feed_go_update")])
-        buttons.append([InlineKeyboardButton(text="⏰ Напоминания", callback_data="feed_reminders_input")])
-
-        keyboard = InlineKeyboardMarkup(inline_keyboard=buttons)
+        keyboard = kb_feed_actions(lang, bool(has_active_week))
 
         await callback.message.edit_text(text, reply_markup=keyboard, parse_mode="Markdown")
         await callback.answer()
@@ -917,8 +931,7 @@ async def feed_reminders_input(callback: CallbackQuery, state: FSMContext):
     # Сохраняем что это для ленты
     await state.update_data(return_to='feed')
 
-    buttons = [[InlineKeyboardButton(text="« Назад", callback_data="feed_cancel_input")]]
-    keyboard = InlineKeyboardMarkup(inline_keyboard=buttons)
+    keyboard = kb_back("feed_cancel_input")
 
     await callback.message.edit_text(text, reply_markup=keyboard, parse_mode="Markdown")
     await callback.answer()
@@ -9,6 +9,10 @@
   - Relevance Scoring (оценка релевантности)
   - Semantic Deduplication (умная дедупликация)
   - Fallback Strategy (стратегия при пустых результатах)
+- term_matcher.py: поиск терминов словаря за один проход (Aho–Corasick)
+- reranker.py: BM25-ранжирование кандидатов (IDF по накопленному корпусу)
+- expansion_stats.py: полезность расширений запроса (адаптивный fan-out в MCP)
+- conversation_summary.py: скользящий конспект вопросов пользователя
 - context.py: динамический контекст для улучшения поиска и генерации:
   - UserProgressContext: прогресс пользователя
   - ConversationMemory: история диалога
@@ -38,6 +42,28 @@ from .retrieval import (
     SYNONYMS,
 )
 
+from .term_matcher import (
+    TermMatcher,
+    TermHits,
+    load_structure_relations,
+)
+
+from .reranker import (
+    BM25Reranker,
+    CorpusStats,
+    get_corpus_stats,
+)
+
+from .expansion_stats import (
+    ExpansionStats,
+    get_expansion_stats,
+)
+
+from .conversation_summary import (
+    ConversationSummarizer,
+    get_summarizer,
+)
+
 from .context import (
     DynamicContext,
     DynamicContextBuilder,
@@ -71,6 +97,19 @@ __all__ = [
     'get_retrieval',
     'TERM_RELATIONS',
     'SYNONYMS',
+    # Term Matcher
+    'TermMatcher',
+    'TermHits',
+    'load_structure_relations',
+    # Reranker
+    'BM25Reranker',
+    'CorpusStats',
+    'get_corpus_stats',
+    'ExpansionStats',
+    'get_expansion_stats',
+    # Conversation Summary
+    'ConversationSummarizer',
+    'get_summarizer',
     # Dynamic Context
     'DynamicContext',
     'DynamicContextBuilder',
@@ -3,17 +3,25 @@
 
 Компоненты:
 - UserProgressContext: контекст прогресса пользователя (день марафона, пройденные темы)
-- ConversationMemory: память о предыдущих вопросах в сессии
+- ConversationMemory: память о предыдущих вопросах (LRU + TTL, write-through)
 - TopicMetadataContext: контекст из метаданных темы (related_concepts, pain_point)
 - DynamicContextBuilder: объединяет все контексты
 """
 
 import json
+import time
+from collections import OrderedDict
 from datetime import datetime, date
-from typing import Optional, List, Dict, Set
+from typing import Optional, List, Dict, Set, Tuple
 from dataclasses import dataclass, field
 
-from config import get_logger
+from config import (
+    get_logger,
+    CONVERSATION_MEMORY_MAX_CHATS,
+    CONVERSATION_MEMORY_MAX_BYTES,
+    CONVERSATION_MEMORY_TTL,
+    QA_RECENT_TURNS,
+)
 
 logger = get_logger(__name__)
 
@@ -48,6 +56,7 @@ class ConversationItem:
     context_topic: str
     timestamp: datetime
     mcp_sources: List[str] = field(default_factory=list)
+    qa_id: int = 0  # id в qa_history (0 — неизвестен)
 
 
 @dataclass
@@ -68,6 +77,8 @@ class DynamicContext:
     """Полный динамический контекст для retrieval и генерации"""
     user_progress: Optional[UserProgress] = None
     conversation_history: List[ConversationItem] = field(default_factory=list)
+    conversation_summary: str = ""  # конспект вопросов старше conversation_history
+    summary_last_qa_id: int = 0  # последний ход, вошедший в конспект
     topic_metadata: Optional[TopicMetadata] = None
 
     # Дополнительные сигналы для retrieval
@@ -195,26 +206,101 @@ class UserProgressContext:
 # =============================================================================
 
 class ConversationMemory:
-    """Управляет памятью о предыдущих вопросах"""
+    """Управляет памятью о предыдущих вопросах
 
-    def __init__(self, max_items: int = 5):
+    Истории чатов хранятся в LRU с TTL: не больше max_chats историй и
+    max_bytes текста, история без обращений дольше ttl вытесняется.
+    Новые Q&A дописываются в уже загруженную историю (remember_qa),
+    поэтому она не устаревает и не перечитывается из БД. Рядом с
+    историей хранится конспект более ранних вопросов (qa_summaries).
+    """
+
+    # Ответы в памяти сокращаем — для промпта нужны только вопросы и темы
+    ANSWER_CHARS = 500
+
+    def __init__(self, max_items: int = 5,
+                 max_chats: int = CONVERSATION_MEMORY_MAX_CHATS,
+                 max_bytes: int = CONVERSATION_MEMORY_MAX_BYTES,
+                 ttl: float = CONVERSATION_MEMORY_TTL,
+                 clock=time.monotonic):
         self.max_items = max_items
-        self._cache: Dict[int, List[ConversationItem]] = {}  # chat_id -> history
+        self.max_chats = max_chats
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._clock = clock
+        self._cache: "OrderedDict[int, List[ConversationItem]]" = OrderedDict()  # chat_id -> history
+        self._summaries: Dict[int, str] = {}
+        self._summary_ids: Dict[int, int] = {}  # chat_id -> id последнего свёрнутого хода
+        self._sizes: Dict[int, int] = {}
+        self._expires: Dict[int, float] = {}
+        self._bytes = 0
+        self._stats = {'hits': 0, 'misses': 0, 'writes': 0, 'evictions': 0, 'expirations': 0}
+
+    @staticmethod
+    def _item_size(item: ConversationItem) -> int:
+        """Оценка размера элемента (символы текста ≈ байты в памяти)"""
+        return (len(item.question) + len(item.answer) + len(item.context_topic or '')
+                + sum(len(s) for s in item.mcp_sources))
+
+    def _get(self, chat_id: int) -> Optional[List[ConversationItem]]:
+        """История из кэша с учётом TTL (обращение продлевает TTL)"""
+        history = self._cache.get(chat_id)
+        if history is None:
+            return None
+        now = self._clock()
+        if now >= self._expires[chat_id]:
+            self._remove(chat_id)
+            self._stats['expirations'] += 1
+            return None
+        self._cache.move_to_end(chat_id)
+        self._expires[chat_id] = now + self.ttl
+        return history
+
+    def _put(self, chat_id: int, history: List[ConversationItem], summary: str = '',
+             summary_qa_id: int = 0):
+        """Сохранить историю и вытеснить лишнее"""
+        history = history[-self.max_items:]
+        size = sum(self._item_size(item) for item in history) + len(summary)
+        self._remove(chat_id)
+        self._cache[chat_id] = history
+        if summary:
+            self._summaries[chat_id] = summary
+            self._summary_ids[chat_id] = summary_qa_id
+        self._sizes[chat_id] = size
+        self._expires[chat_id] = self._clock() + self.ttl
+        self._bytes += size
+
+        while self._cache and (len(self._cache) > self.max_chats or self._bytes > self.max_bytes):
+            evicted = next(iter(self._cache))
+            self._remove(evicted)
+            self._stats['evictions'] += 1
+
+    def _remove(self, chat_id: int):
+        if self._cache.pop(chat_id, None) is not None:
+            self._bytes -= self._sizes.pop(chat_id)
+            self._expires.pop(chat_id, None)
+            self._summaries.pop(chat_id, None)
+            self._summary_ids.pop(chat_id, None)
 
     async def load_history(self, chat_id: int,
-                          qa_history_loader=None) -> List[ConversationItem]:
+                          qa_history_loader=None,
+                          qa_summary_loader=None) -> List[ConversationItem]:
         """Загружает историю из БД или кэша
 
         Args:
             chat_id: ID чата
             qa_history_loader: функция для загрузки из БД (get_qa_history)
+            qa_summary_loader: функция загрузки конспекта (get_qa_summary)
 
         Returns:
             Список последних вопросов
         """
         # Проверяем кэш
-        if chat_id in self._cache:
-            return self._cache[chat_id]
+        history = self._get(chat_id)
+        if history is not None:
+            self._stats['hits'] += 1
+            return history
+        self._stats['misses'] += 1
 
         # Загружаем из БД
         if qa_history_loader:
@@ -223,41 +309,86 @@ class ConversationMemory:
                 history = [
                     ConversationItem(
                         question=item['question'],
-                        answer=item['answer'][:500],  # Сокращаем ответы
+                        answer=item['answer'][:self.ANSWER_CHARS],  # Сокращаем ответы
                         context_topic=item.get('context_topic', ''),
                         timestamp=item.get('created_at', datetime.now()),
-                        mcp_sources=item.get('mcp_sources', [])
+                        mcp_sources=item.get('mcp_sources', []),
+                        qa_id=item.get('id') or 0,
                     )
                     for item in raw_history
                 ]
                 # Разворачиваем — нужен хронологический порядок
                 history.reverse()
-                self._cache[chat_id] = history
-                return history
+                self._put(chat_id, history, *await self._load_summary(chat_id, qa_summary_loader))
+                return self._cache[chat_id]
             except Exception as e:
                 logger.error(f"ConversationMemory: ошибка загрузки истории: {e}")
 
         return []
 
+    async def _load_summary(self, chat_id: int, qa_summary_loader) -> Tuple[str, int]:
+        """(конспект, id последнего свёрнутого хода)"""
+        if not qa_summary_loader:
+            return '', 0
+        try:
+            row = await qa_summary_loader(chat_id) or {}
+            return row.get('summary') or '', row.get('last_qa_id') or 0
+        except Exception as e:
+            logger.error(f"ConversationMemory: ошибка загрузки конспекта: {e}")
+            return '', 0
+
     def add_item(self, chat_id: int, item: ConversationItem):
         """Добавляет элемент в историю"""
-        if chat_id not in self._cache:
-            self._cache[chat_id] = []
-
-        self._cache[chat_id].append(item)
-
-        # Ограничиваем размер
-        if len(self._cache[chat_id]) > self.max_items:
-            self._cache[chat_id] = self._cache[chat_id][-self.max_items:]
+        history = self._get(chat_id) or []
+        self._put(chat_id, history + [item], self._summaries.get(chat_id, ''),
+                  self._summary_ids.get(chat_id, 0))
+        self._stats['writes'] += 1
+
+    def get_summary(self, chat_id: int) -> str:
+        """Конспект вопросов старше загруженной истории"""
+        if self._get(chat_id) is None:
+            return ''
+        return self._summaries.get(chat_id, '')
+
+    def get_summary_last_id(self, chat_id: int) -> int:
+        """id последнего хода, вошедшего в конспект (0 — конспекта нет)"""
+        if self._get(chat_id) is None:
+            return 0
+        return self._summary_ids.get(chat_id, 0)
+
+    def set_summary(self, chat_id: int, summary: str, last_qa_id: int = 0):
+        """Write-through обновлённого конспекта (только для загруженной истории)"""
+        history = self._get(chat_id)
+        if history is not None:
+            self._put(chat_id, history, summary, last_qa_id)
+
+    def remember_qa(self, chat_id: int, question: str, answer: str,
+                    context_topic: str = '', mcp_sources: List[str] = None,
+                    qa_id: int = 0):
+        """Write-through после сохранения Q&A в БД
+
+        Дописывает только в уже загруженную историю: неполную историю
+        не создаём, при следующем обращении она загрузится из БД целиком.
+        """
+        if self._get(chat_id) is None:
+            return
+        self.add_item(chat_id, ConversationItem(
+            question=question,
+            answer=answer[:self.ANSWER_CHARS],
+            context_topic=context_topic or '',
+            timestamp=datetime.now(),
+            mcp_sources=list(mcp_sources or []),
+            qa_id=qa_id or 0,
+        ))
 
     def get_recent_topics(self, chat_id: int) -> Set[str]:
         """Возвращает темы недавних вопросов"""
-        history = self._cache.get(chat_id, [])
+        history = self._get(chat_id) or []
         return {item.context_topic for item in history if item.context_topic}
 
     def get_conversation_context(self, chat_id: int) -> str:
         """Форматирует историю для промпта"""
-        history = self._cache.get(chat_id, [])
+        history = self._get(chat_id) or []
         if not history:
             return ""
 
@@ -274,9 +405,18 @@ class ConversationMemory:
     def clear(self, chat_id: int = None):
         """Очищает кэш"""
         if chat_id:
-            self._cache.pop(chat_id, None)
+            self._remove(chat_id)
         else:
             self._cache.clear()
+            self._summaries.clear()
+            self._summary_ids.clear()
+            self._sizes.clear()
+            self._expires.clear()
+            self._bytes = 0
+
+    def get_stats(self) -> Dict[str, int]:
+        """Счётчики: записей, байт, попаданий/промахов, вытеснений"""
+        return {'entries': len(self._cache), 'bytes': self._bytes, **self._stats}
 
 
 # =============================================================================
@@ -352,13 +492,15 @@ class DynamicContextBuilder:
     async def build(self,
                    intern: dict,
                    topic_id: Optional[str] = None,
-                   qa_history_loader=None) -> DynamicContext:
+                   qa_history_loader=None,
+                   qa_summary_loader=None) -> DynamicContext:
         """Строит полный динамический контекст
 
         Args:
             intern: профиль пользователя
             topic_id: ID текущей темы (опционально)
             qa_history_loader: функция загрузки истории Q&A
+            qa_summary_loader: функция загрузки конспекта Q&A
 
         Returns:
             DynamicContext со всеми компонентами
@@ -372,8 +514,10 @@ class DynamicContextBuilder:
         # 2. История диалога
         if chat_id and qa_history_loader:
             context.conversation_history = await self.conversation_memory.load_history(
-                chat_id, qa_history_loader
+                chat_id, qa_history_loader, qa_summary_loader
             )
+            context.conversation_summary = self.conversation_memory.get_summary(chat_id)
+            context.summary_last_qa_id = self.conversation_memory.get_summary_last_id(chat_id)
 
         # 3. Метаданные темы
         if topic_id and self._knowledge_structure:
@@ -430,15 +574,24 @@ class DynamicContextBuilder:
             if parts:
                 additions['topic_context'] = "КОНТЕКСТ ТЕМЫ:\n" + "\n".join(parts)
 
-        # История диалога
-        if context.conversation_history:
-            chat_id = context.user_progress.current_day if context.user_progress else 0
-            # Форматируем последние вопросы
-            recent = context.conversation_history[-3:]
-            lines = ["НЕДАВНИЕ ВОПРОСЫ:"]
+        # История диалога: конспект + ходы, ещё не свёрнутые в него. Их не
+        # меньше QA_RECENT_TURNS (пока конспект отстаёт — больше, но не
+        # длиннее загруженной истории), поэтому размер не растёт с историей
+        if context.conversation_history or context.conversation_summary:
+            lines = []
+            if context.conversation_summary:
+                lines.append("КРАТКО О ПРЕДЫДУЩИХ ВОПРОСАХ:")
+                lines.append(context.conversation_summary)
+            history = context.conversation_history
+            unsummarized = sum(1 for item in history if item.qa_id > context.summary_last_qa_id)
+            recent = history[-max(QA_RECENT_TURNS, unsummarized):]
+            if recent:
+                lines.append("НЕДАВНИЕ ВОПРОСЫ:")
             for item in recent:
                 q_short = item.question[:80] + "..." if len(item.question) > 80 else item.question
+                a_short = item.answer[:200] + "..." if len(item.answer) > 200 else item.answer
                 lines.append(f"- {q_short}")
+                lines.append(f"  Ответ: {a_short}")
             additions['conversation_history'] = "\n".join(lines)
 
         return additions
@@ -462,7 +615,8 @@ def get_context_builder() -> DynamicContextBuilder:
 async def build_dynamic_context(intern: dict,
                                 topic_id: Optional[str] = None,
                                 qa_history_loader=None,
-                                knowledge_structure: dict = None) -> DynamicContext:
+                                knowledge_structure: dict = None,
+                                qa_summary_loader=None) -> DynamicContext:
     """Удобная функция для построения динамического контекста
 
     Args:
@@ -470,6 +624,7 @@ async def build_dynamic_context(intern: dict,
         topic_id: ID текущей темы
         qa_history_loader: функция загрузки истории
         knowledge_structure: структура знаний (если не установлена глобально)
+        qa_summary_loader: функция загрузки конспекта предыдущих вопросов
 
     Returns:
         DynamicContext
@@ -479,4 +634,4 @@ async def build_dynamic_context(intern: dict,
     if knowledge_structure:
         builder.set_knowledge_structure(knowledge_structure)
 
-    return await builder.build(intern, topic_id, qa_history_loader)
+    return await builder.build(intern, topic_id, qa_history_loader, qa_summary_loader)
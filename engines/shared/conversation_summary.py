@@ -0,0 +1,124 @@
+"""
+Скользящий конспект вопросов пользователя.
+
+После каждого ответа в фоне сворачиваем в конспект ходы qa_history,
+которые старше последних QA_RECENT_TURNS: LLM получает прежний
+конспект и новые ходы и возвращает обновлённый конспект. Конспект
+хранится в qa_summaries вместе с id последнего свёрнутого хода.
+
+В промпт ответа идут конспект и все ходы новее него как есть (не меньше
+последних QA_RECENT_TURNS), поэтому размер контекста истории не зависит
+от длины диалога, а ходы между конспектом и последними не теряются.
+"""
+
+import asyncio
+from typing import Optional, List, Set
+
+from config import (
+    get_logger,
+    QA_RECENT_TURNS,
+    QA_SUMMARY_BATCH,
+    QA_SUMMARY_MAX_CHARS,
+)
+from core.context_packer import trim_to_chars
+from clients import claude
+from clients.accounting import call_scope
+from db.queries.qa import get_qa_since, get_qa_summary, save_qa_summary
+from .context import get_context_builder
+
+logger = get_logger(__name__)
+
+# Сколько ходов сворачивать за один вызов LLM
+MAX_TURNS_PER_UPDATE = 20
+ANSWER_CHARS_IN_PROMPT = 400
+
+
+class ConversationSummarizer:
+    """Фоновое обновление конспекта вопросов"""
+
+    def __init__(self, recent_turns: int = QA_RECENT_TURNS,
+                 batch: int = QA_SUMMARY_BATCH,
+                 max_chars: int = QA_SUMMARY_MAX_CHARS):
+        self.recent_turns = recent_turns
+        self.batch = batch
+        self.max_chars = max_chars
+        self._running: Set[int] = set()
+        self._tasks: Set[asyncio.Task] = set()
+
+    def schedule(self, chat_id: int):
+        """Запустить обновление в фоне (не больше одного на чат одновременно)"""
+        if chat_id in self._running:
+            return
+        task = asyncio.create_task(self.update(chat_id))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def update(self, chat_id: int) -> Optional[str]:
+        """Свернуть накопившиеся ходы в конспект
+
+        Returns:
+            Новый конспект или None (нечего сворачивать / ошибка)
+        """
+        if chat_id in self._running:
+            return None
+        self._running.add(chat_id)
+        try:
+            current = await self._load_summary(chat_id) or {}
+            turns = await self._load_turns(chat_id, current.get('last_qa_id', 0))
+            fold = turns[:len(turns) - self.recent_turns] if self.recent_turns else turns
+            if len(fold) < self.batch:
+                return None
+
+            summary = await self._generate(current.get('summary', ''), fold)
+            if not summary:
+                return None
+            summary = trim_to_chars(summary.strip(), self.max_chars)
+
+            await self._save_summary(chat_id, summary, fold[-1]['id'], current.get('turns', 0) + len(fold))
+            get_context_builder().conversation_memory.set_summary(chat_id, summary, fold[-1]['id'])
+            logger.info(f"ConversationSummarizer: chat_id={chat_id}, свёрнуто {len(fold)} ходов, "
+                        f"конспект {len(summary)} символов")
+            return summary
+        except Exception as e:
+            logger.error(f"ConversationSummarizer: ошибка обновления конспекта: {e}")
+            return None
+        finally:
+            self._running.discard(chat_id)
+
+    async def _load_summary(self, chat_id: int) -> Optional[dict]:
+        return await get_qa_summary(chat_id)
+
+    async def _load_turns(self, chat_id: int, after_id: int) -> List[dict]:
+        return await get_qa_since(chat_id, after_id, limit=MAX_TURNS_PER_UPDATE + self.recent_turns)
+
+    async def _save_summary(self, chat_id: int, summary: str, last_qa_id: int, turns: int):
+        await save_qa_summary(chat_id, summary, last_qa_id, turns)
+
+    async def _generate(self, summary: str, turns: List[dict]) -> Optional[str]:
+        """Обновлённый конспект через LLM"""
+        system_prompt = f"""Ты ведёшь краткий конспект диалога пользователя с наставником.
+Обнови конспект: добавь новые вопросы и сохрани важное из прежнего —
+какие темы пользователь уже спрашивал, что ему объяснили, с чем у него трудности.
+Пиши пунктами, без вступлений, не больше {self.max_chars} символов."""
+
+        lines = ["ТЕКУЩИЙ КОНСПЕКТ:", summary or "(пусто)", "", "НОВЫЕ ВОПРОСЫ И ОТВЕТЫ:"]
+        for turn in turns:
+            topic = f" (тема: {turn['context_topic']})" if turn.get('context_topic') else ""
+            answer = (turn.get('answer') or '')[:ANSWER_CHARS_IN_PROMPT]
+            lines.append(f"Вопрос{topic}: {turn['question']}")
+            lines.append(f"Ответ: {answer}")
+
+        with call_scope(call_site="qa_summary", profile="qa_summary"):
+            return await claude.generate(system_prompt, "\n".join(lines))
+
+
+# Singleton
+_summarizer: Optional[ConversationSummarizer] = None
+
+
+def get_summarizer() -> ConversationSummarizer:
+    """Получить глобальный ConversationSummarizer"""
+    global _summarizer
+    if _summarizer is None:
+        _summarizer = ConversationSummarizer()
+    return _summarizer
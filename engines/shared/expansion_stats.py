@@ -0,0 +1,134 @@
+"""
+Статистика полезности расширений запроса.
+
+Расширение — пара (концепция, добавленный термин) из QueryExpander.
+После каждого поиска отмечаем, принесло ли расширение хотя бы один
+новый результат в итоговый контекст. Полезность оценивается со
+сглаживанием Лапласа: (useful + 1) / (attempts + 2). Расширения
+сортируются по ней, а заведомо бесполезные (после EXPANSION_MIN_ATTEMPTS
+попыток ниже EXPANSION_MIN_USEFULNESS) не отправляются в MCP.
+
+Поиск только обновляет статистику в памяти; в JSON (EXPANSION_STATS_PATH)
+её пишет задача планировщика (flush) и остановка бота (save).
+"""
+
+import asyncio
+import json
+from pathlib import Path
+from typing import List, Dict, Tuple
+
+from config import (
+    get_logger,
+    EXPANSION_STATS_PATH,
+    EXPANSION_MIN_ATTEMPTS,
+    EXPANSION_MIN_USEFULNESS,
+)
+
+logger = get_logger(__name__)
+
+
+class ExpansionStats:
+    """Сколько раз расширение пробовали и сколько раз оно пригодилось"""
+
+    def __init__(self, path: Path = EXPANSION_STATS_PATH,
+                 min_attempts: int = EXPANSION_MIN_ATTEMPTS,
+                 min_usefulness: float = EXPANSION_MIN_USEFULNESS):
+        self.path = Path(path)
+        self.min_attempts = min_attempts
+        self.min_usefulness = min_usefulness
+        self.stats: Dict[str, List[int]] = {}  # "концепция → термин" → [attempts, useful]
+        self._dirty = 0
+        self._load()
+
+    @staticmethod
+    def key(concept: str, term: str) -> str:
+        return f"{concept} → {term}"
+
+    def _load(self):
+        if not self.path.exists():
+            return
+        try:
+            self.stats = json.loads(self.path.read_text(encoding='utf-8'))
+        except Exception as e:
+            logger.warning(f"ExpansionStats: не удалось загрузить {self.path}: {e}")
+
+    def usefulness(self, concept: str, term: str) -> float:
+        """Сглаженная доля полезных попыток (0.5 для нового расширения)"""
+        attempts, useful = self.stats.get(self.key(concept, term), (0, 0))
+        return (useful + 1) / (attempts + 2)
+
+    def is_useless(self, concept: str, term: str) -> bool:
+        attempts, _ = self.stats.get(self.key(concept, term), (0, 0))
+        return attempts >= self.min_attempts and self.usefulness(concept, term) < self.min_usefulness
+
+    def select(self, candidates: List[Tuple[str, str, str]], limit: int) -> List[Tuple[str, str, str]]:
+        """Лучшие расширения по полезности
+
+        Args:
+            candidates: (расширенный запрос, концепция, термин) в порядке словаря
+            limit: сколько оставить
+
+        Returns:
+            Не больше limit кандидатов, бесполезные отброшены
+        """
+        ranked = sorted(
+            (c for c in candidates if not self.is_useless(c[1], c[2])),
+            key=lambda c: self.usefulness(c[1], c[2]),
+            reverse=True,
+        )
+        return ranked[:limit]
+
+    def record(self, concept: str, term: str, useful: bool):
+        """Учесть исход одной попытки"""
+        entry = self.stats.setdefault(self.key(concept, term), [0, 0])
+        entry[0] += 1
+        entry[1] += int(useful)
+        self._dirty += 1
+
+    @property
+    def pending(self) -> int:
+        """Сколько исходов учтено с последнего сохранения"""
+        return self._dirty
+
+    def _snapshot(self) -> Dict[str, List[int]]:
+        return {key: list(entry) for key, entry in self.stats.items()}
+
+    def _write(self, data: Dict[str, List[int]]):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix('.tmp')
+        tmp.write_text(json.dumps(data, ensure_ascii=False, indent=1), encoding='utf-8')
+        tmp.replace(self.path)
+
+    def save(self):
+        """Сохранить статистику синхронно (при остановке, если были изменения)"""
+        if not self._dirty:
+            return
+        try:
+            self._write(self._snapshot())
+            self._dirty = 0
+        except Exception as e:
+            logger.error(f"ExpansionStats: не удалось сохранить {self.path}: {e}")
+
+    async def flush(self):
+        """Сохранить статистику в фоне (задача планировщика): запись файла — в потоке"""
+        if not self._dirty:
+            return
+        pending = self._dirty
+        try:
+            await asyncio.to_thread(self._write, self._snapshot())
+            # Исходы, учтённые во время записи, сохранятся в следующий раз
+            self._dirty -= pending
+        except Exception as e:
+            logger.error(f"ExpansionStats: не удалось сохранить {self.path}: {e}")
+
+
+# Singleton
+_stats = None
+
+
+def get_expansion_stats() -> ExpansionStats:
+    """Получить глобальную статистику расширений"""
+    global _stats
+    if _stats is None:
+        _stats = ExpansionStats()
+    return _stats
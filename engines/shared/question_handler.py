@@ -14,20 +14,75 @@
 import json
 from typing import Optional, List, Tuple, Dict, Callable, Awaitable
 
-from config import get_logger, ONTOLOGY_RULES
+from config import get_logger, ONTOLOGY_RULES, QA_SUMMARY_ENABLED
 from core.intent import get_question_keywords
+from core.context_packer import pack_texts, get_context_budget
+from core.prompts import register_template, lang_instruction, lang_reminder
 from clients import claude, mcp_guides, mcp_knowledge
-from db.queries.qa import save_qa, get_qa_history
+from clients.accounting import call_scope
+from db.queries.qa import save_qa, get_qa_history, get_qa_summary
 from .retrieval import enhanced_search, get_retrieval
 from .context import (
     build_dynamic_context,
     get_context_builder,
     DynamicContext,
 )
+from .conversation_summary import get_summarizer
 
 logger = get_logger(__name__)
 
 
+# =============================================================================
+# ШАБЛОНЫ ПРОМПТОВ
+# =============================================================================
+
+ANSWER_SYSTEM = register_template('answer_system', """Ты — дружелюбный наставник по системному мышлению и личному развитию.
+Отвечаешь на вопросы пользователя {name}.{occupation_info}{context_info}{dynamic_sections}
+
+{lang_instruction}
+
+ПРАВИЛА:
+1. Отвечай кратко и по существу (3-5 абзацев максимум)
+2. Используй простой язык, избегай академического стиля
+3. Если вопрос связан с материалами Aisystant - опирайся на контекст
+4. Если контекста недостаточно - честно скажи об этом
+5. Если вопрос не по теме системного мышления - вежливо перенаправь
+{sources_instruction}
+
+{ontology_rules}
+{mcp_section}
+
+{lang_reminder}""")
+
+SOURCES_INSTRUCTION = register_template('answer_sources', """
+6. НАУЧНЫЕ ИСТОЧНИКИ (опционально, максимум {max_sources}):
+   - Если вопрос касается научно обоснованных тем, можешь привести ссылки на SoTA исследования
+   - Указывай только проверенные источники: научные статьи, книги признанных авторов
+   - Формат: "Согласно исследованию [Автор, Год]..." или в конце ответа
+   - НЕ выдумывай источники — лучше не указывать, чем указать несуществующий
+   - Приводи источники только если они ТОЧНО релевантны вопросу""")
+
+MCP_SECTION = register_template('answer_mcp_section', """
+
+ИНФОРМАЦИЯ ИЗ МАТЕРИАЛОВ AISYSTANT:
+{mcp_context}
+
+Используй эту информацию для ответа, но адаптируй под вопрос пользователя.""")
+
+ANSWER_BRIEF_SYSTEM = register_template('answer_brief_system', """Ты — дружелюбный наставник по системному мышлению.
+Отвечаешь на вопрос пользователя {name}.{occupation_info}
+{lang_instruction}
+
+Отвечай кратко и по существу.
+
+{ontology_rules}
+{context_section}
+
+{lang_reminder}""")
+
+QUESTION_LABELS = {'ru': 'Вопрос', 'en': 'Question', 'es': 'Pregunta'}
+
+
 # Типы для progress callback
 ProgressCallback = Callable[[str, int], Awaitable[None]]
 """Callback для отображения прогресса: (stage_name, percent) -> None"""
@@ -98,7 +153,8 @@ async def handle_question(
                 intern=intern,
                 topic_id=topic_id,
                 qa_history_loader=get_qa_history,
-                knowledge_structure=knowledge_structure
+                knowledge_structure=knowledge_structure,
+                qa_summary_loader=get_qa_summary if QA_SUMMARY_ENABLED else None,
             )
             logger.info(f"QuestionHandler: динамический контекст построен, "
                        f"boost_concepts={len(dynamic_context.boost_concepts)}")
@@ -107,39 +163,42 @@ async def handle_question(
 
     await report_progress(ProcessingStage.ANALYZING, 20)
 
-    # === ЭТАП 2: Поиск в базе знаний (20-60%) ===
-    await report_progress(ProcessingStage.SEARCHING, 30)
-
-    # Ищем информацию через MCP (улучшенный или базовый retrieval)
-    if use_enhanced_retrieval:
-        logger.info("QuestionHandler: используем EnhancedRetrieval")
-        mcp_context, sources = await enhanced_search(
-            query=search_query,
-            keywords=keywords,
-            context_topic=context_topic,
-            dynamic_context=dynamic_context
+    # Учёт вызовов LLM/MCP привязываем к пользователю и режиму
+    with call_scope(chat_id=chat_id, profile=mode):
+        # === ЭТАП 2: Поиск в базе знаний (20-60%) ===
+        await report_progress(ProcessingStage.SEARCHING, 30)
+
+        # Ищем информацию через MCP (улучшенный или базовый retrieval)
+        if use_enhanced_retrieval:
+            logger.info("QuestionHandler: используем EnhancedRetrieval")
+            mcp_context, sources = await enhanced_search(
+                query=search_query,
+                keywords=keywords,
+                context_topic=context_topic,
+                dynamic_context=dynamic_context,
+                budget_tokens=get_context_budget(mode),
+            )
+        else:
+            # Fallback на старый метод
+            if context_topic:
+                search_query = f"{context_topic} {search_query}"
+            logger.info(f"QuestionHandler: итоговый поисковый запрос: '{search_query}'")
+            mcp_context, sources = await search_mcp_context(search_query, get_context_budget(mode))
+
+        await report_progress(ProcessingStage.SEARCHING, 60)
+
+        # === ЭТАП 3: Генерация ответа (60-95%) ===
+        await report_progress(ProcessingStage.GENERATING, 70)
+        answer = await generate_answer(
+            question, intern, mcp_context, context_topic, dynamic_context
         )
-    else:
-        # Fallback на старый метод
-        if context_topic:
-            search_query = f"{context_topic} {search_query}"
-        logger.info(f"QuestionHandler: итоговый поисковый запрос: '{search_query}'")
-        mcp_context, sources = await search_mcp_context(search_query)
-
-    await report_progress(ProcessingStage.SEARCHING, 60)
-
-    # === ЭТАП 3: Генерация ответа (60-95%) ===
-    await report_progress(ProcessingStage.GENERATING, 70)
-    answer = await generate_answer(
-        question, intern, mcp_context, context_topic, dynamic_context
-    )
 
     await report_progress(ProcessingStage.DONE, 100)
 
     # Сохраняем в историю
     if chat_id:
         try:
-            await save_qa(
+            qa_id = await save_qa(
                 chat_id=chat_id,
                 mode=mode,
                 context_topic=context_topic or '',
@@ -147,13 +206,20 @@ async def handle_question(
                 answer=answer,
                 mcp_sources=sources
             )
+            # Write-through: загруженная история не устаревает
+            get_context_builder().conversation_memory.remember_qa(
+                chat_id, question, answer, context_topic or '', sources, qa_id=qa_id
+            )
+            # Старые ходы сворачиваются в конспект в фоне
+            if QA_SUMMARY_ENABLED:
+                get_summarizer().schedule(chat_id)
         except Exception as e:
             logger.error(f"Ошибка сохранения Q&A: {e}")
 
     return answer, sources
 
 
-async def search_mcp_context(query: str) -> Tuple[str, List[str]]:
+async def search_mcp_context(query: str, budget_tokens: Optional[int] = None) -> Tuple[str, List[str]]:
     """Ищет релевантную информацию через MCP серверы (DEPRECATED)
 
     DEPRECATED: Используйте enhanced_search() из retrieval.py для улучшенного поиска
@@ -161,6 +227,7 @@ async def search_mcp_context(query: str) -> Tuple[str, List[str]]:
 
     Args:
         query: поисковый запрос
+        budget_tokens: бюджет токенов контекста (по умолчанию — профиль default)
 
     Returns:
         Tuple[context, sources] - контекст и список источников
@@ -189,7 +256,7 @@ async def search_mcp_context(query: str) -> Tuple[str, List[str]]:
                 text = extract_text(item)
                 if text and text[:100] not in seen_texts:
                     seen_texts.add(text[:100])
-                    context_parts.append(text[:1500])
+                    context_parts.append(text)
                     # Добавляем источник если есть
                     if isinstance(item, dict):
                         source = item.get('source', item.get('guide', ''))
@@ -228,7 +295,7 @@ async def search_mcp_context(query: str) -> Tuple[str, List[str]]:
                         source = item.get('source', item.get('title', ''))
                         if source and source not in sources:
                             sources.append(f"База знаний: {source}")
-                    context_parts.append(text[:1500])
+                    context_parts.append(text)
         else:
             logger.warning(f"MCP-Knowledge: пустой результат для запроса '{query}'")
     except Exception as e:
@@ -236,7 +303,9 @@ async def search_mcp_context(query: str) -> Tuple[str, List[str]]:
 
     # Объединяем контекст
     if context_parts:
-        context = "\n\n---\n\n".join(context_parts[:5])
+        # Упаковка в бюджет токенов с обрезкой по предложениям
+        context_parts = pack_texts(context_parts[:5], budget_tokens or get_context_budget(None))
+        context = "\n\n---\n\n".join(context_parts)
         logger.info(f"MCP итого: {len(context_parts)} фрагментов, {len(context)} символов контекста")
         logger.info(f"MCP источники: {sources}")
     else:
@@ -286,19 +355,6 @@ async def generate_answer(
     complexity = intern.get('complexity_level', intern.get('bloom_level', 1))
     lang = intern.get('language', 'ru')
 
-    # Определяем язык ответа
-    lang_instruction = {
-        'ru': "ВАЖНО: Отвечай на русском языке.",
-        'en': "IMPORTANT: Answer in English.",
-        'es': "IMPORTANTE: Responde en español."
-    }.get(lang, "ВАЖНО: Отвечай на русском языке.")
-
-    lang_reminder = {
-        'ru': "НАПОМИНАНИЕ: Весь ответ должен быть на РУССКОМ языке!",
-        'en': "REMINDER: The entire answer must be in ENGLISH!",
-        'es': "RECORDATORIO: ¡Toda la respuesta debe estar en ESPAÑOL!"
-    }.get(lang, "НАПОМИНАНИЕ: Весь ответ должен быть на РУССКОМ языке!")
-
     # Формируем системный промпт
     context_info = ""
     if context_topic:
@@ -323,53 +379,23 @@ async def generate_answer(
         if additions.get('conversation_history'):
             dynamic_sections += f"\n\n{additions['conversation_history']}"
 
-    mcp_section = ""
-    if mcp_context:
-        mcp_section = f"""
-
-ИНФОРМАЦИЯ ИЗ МАТЕРИАЛОВ AISYSTANT:
-{mcp_context}
-
-Используй эту информацию для ответа, но адаптируй под вопрос пользователя."""
-
-    # Инструкция по научным источникам в зависимости от сложности
-    max_sources = min(complexity, 3)  # 1, 2 или 3 источника
-    sources_instruction = f"""
-6. НАУЧНЫЕ ИСТОЧНИКИ (опционально, максимум {max_sources}):
-   - Если вопрос касается научно обоснованных тем, можешь привести ссылки на SoTA исследования
-   - Указывай только проверенные источники: научные статьи, книги признанных авторов
-   - Формат: "Согласно исследованию [Автор, Год]..." или в конце ответа
-   - НЕ выдумывай источники — лучше не указывать, чем указать несуществующий
-   - Приводи источники только если они ТОЧНО релевантны вопросу"""
-
-    system_prompt = f"""Ты — дружелюбный наставник по системному мышлению и личному развитию.
-Отвечаешь на вопросы пользователя {name}.{occupation_info}{context_info}{dynamic_sections}
-
-{lang_instruction}
-
-ПРАВИЛА:
-1. Отвечай кратко и по существу (3-5 абзацев максимум)
-2. Используй простой язык, избегай академического стиля
-3. Если вопрос связан с материалами Aisystant - опирайся на контекст
-4. Если контекста недостаточно - честно скажи об этом
-5. Если вопрос не по теме системного мышления - вежливо перенаправь
-{sources_instruction}
-
-{ONTOLOGY_RULES}
-{mcp_section}
-
-{lang_reminder}"""
-
-    # Локализуем промпт
-    user_prompts = {
-        'ru': f"Вопрос: {question}",
-        'en': f"Question: {question}",
-        'es': f"Pregunta: {question}"
-    }
-    user_prompt = user_prompts.get(lang, user_prompts['ru'])
+    system_prompt = ANSWER_SYSTEM.render(
+        name=name,
+        occupation_info=occupation_info,
+        context_info=context_info,
+        dynamic_sections=dynamic_sections,
+        lang_instruction=lang_instruction('answer', lang),
+        # Научные источники — не больше уровня сложности (1, 2 или 3)
+        sources_instruction=SOURCES_INSTRUCTION.render(max_sources=min(complexity, 3)),
+        ontology_rules=ONTOLOGY_RULES,
+        mcp_section=MCP_SECTION.render(mcp_context=mcp_context) if mcp_context else "",
+        lang_reminder=lang_reminder('answer', lang),
+    )
+    user_prompt = f"{QUESTION_LABELS.get(lang, QUESTION_LABELS['ru'])}: {question}"
 
     # Генерируем ответ
-    answer = await claude.generate(system_prompt, user_prompt)
+    with call_scope(call_site="qa.answer"):
+        answer = await claude.generate(system_prompt, user_prompt)
 
     if not answer:
         answer = f"К сожалению, {name}, не удалось получить ответ. Попробуйте переформулировать вопрос или спросить позже."
@@ -397,41 +423,17 @@ async def answer_with_context(
     name = intern.get('name', 'пользователь')
     occupation = intern.get('occupation', '')
 
-    # Определяем язык пользователя
     lang = intern.get('language', 'ru')
-    lang_instruction = {
-        'ru': "ВАЖНО: Отвечай на русском языке.",
-        'en': "IMPORTANT: Answer in English.",
-        'es': "IMPORTANTE: Responde en español."
-    }.get(lang, "ВАЖНО: Отвечай на русском языке.")
-
-    lang_reminder = {
-        'ru': "НАПОМИНАНИЕ: Весь ответ должен быть на РУССКОМ языке!",
-        'en': "REMINDER: The entire answer must be in ENGLISH!",
-        'es': "RECORDATORIO: ¡Toda la respuesta debe estar en ESPAÑOL!"
-    }.get(lang, "НАПОМИНАНИЕ: Весь ответ должен быть на РУССКОМ языке!")
-
-    occupation_info = f"\nПрофессия: {occupation}" if occupation else ""
-    context_section = f"\n\nКОНТЕКСТ:\n{additional_context}" if additional_context else ""
-
-    system_prompt = f"""Ты — дружелюбный наставник по системному мышлению.
-Отвечаешь на вопрос пользователя {name}.{occupation_info}
-{lang_instruction}
-
-Отвечай кратко и по существу.
-
-{ONTOLOGY_RULES}
-{context_section}
-
-{lang_reminder}"""
-
-    # Локализуем промпт
-    user_prompts = {
-        'ru': f"Вопрос: {question}",
-        'en': f"Question: {question}",
-        'es': f"Pregunta: {question}"
-    }
-    user_prompt = user_prompts.get(lang, user_prompts['ru'])
+    system_prompt = ANSWER_BRIEF_SYSTEM.render(
+        name=name,
+        occupation_info=f"\nПрофессия: {occupation}" if occupation else "",
+        lang_instruction=lang_instruction('answer', lang),
+        ontology_rules=ONTOLOGY_RULES,
+        context_section=f"\n\nКОНТЕКСТ:\n{additional_context}" if additional_context else "",
+        lang_reminder=lang_reminder('answer', lang),
+    )
+    user_prompt = f"{QUESTION_LABELS.get(lang, QUESTION_LABELS['ru'])}: {question}"
 
-    answer = await claude.generate(system_prompt, user_prompt)
+    with call_scope(call_site="qa.answer_with_context"):
+        answer = await claude.generate(system_prompt, user_prompt)
     return answer or "Не удалось получить ответ. Попробуйте позже."
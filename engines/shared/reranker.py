@@ -0,0 +1,246 @@
+"""
+Локальный BM25-реранкер результатов MCP.
+
+Вместо эвристики по ключевым словам и длине кандидаты ранжируются
+по BM25 относительно расширенного запроса. Частоты терминов каждого
+результата считаются один раз при разборе (RetrievalResult.term_freqs),
+поэтому ранжирование — это только словарные обращения: 50+ кандидатов
+укладываются примерно в миллисекунду без NumPy.
+
+IDF берётся из набора кандидатов или, если включено, из статистики
+корпуса (CorpusStats), накопленной по ранее виденным фрагментам.
+Ранжирование только обновляет её в памяти; в JSON (RERANK_IDF_PATH)
+статистику пишет задача планировщика (flush) и остановка бота (save).
+"""
+
+import asyncio
+import json
+import math
+import re
+from collections import Counter
+from pathlib import Path
+from typing import Optional, List, Dict, Iterable, Set
+
+from config import get_logger, RERANK_IDF_PATH, RERANK_IDF_MAX_DOCS
+
+logger = get_logger(__name__)
+
+_WORD = re.compile(r'[а-яёa-z0-9]{3,}')
+
+
+# Падежные и родовые окончания, длинные — первыми
+_ENDINGS = sorted({
+    "иями", "ями", "ами", "ого", "его", "ому", "ему", "ыми", "ими", "ией",
+    "ия", "ию", "ии", "ие", "ий", "ый", "ой", "ая", "яя", "ое", "ее", "ые",
+    "ов", "ев", "ей", "ам", "ям", "ах", "ях", "ом", "ем", "ую", "юю", "ть",
+    "а", "я", "о", "е", "ы", "и", "у", "ю", "ь", "й",
+}, key=len, reverse=True)
+
+
+def stem(word: str) -> str:
+    """Грубая основа слова: отрезаем окончание, оставляя не меньше 3 букв"""
+    for ending in _ENDINGS:
+        if word.endswith(ending) and len(word) - len(ending) >= 3:
+            return word[:-len(ending)]
+    return word
+
+
+def tokenize(text: str) -> List[str]:
+    """Основы слов текста (текст в нижнем регистре)"""
+    return [stem(word) for word in _WORD.findall(text)]
+
+
+def term_frequencies(text: str) -> Dict[str, int]:
+    """Частоты основ слов"""
+    return dict(Counter(tokenize(text)))
+
+
+# =============================================================================
+# СТАТИСТИКА КОРПУСА
+# =============================================================================
+
+class CorpusStats:
+    """Документные частоты по ранее виденным фрагментам (для IDF)"""
+
+    def __init__(self, path: Path = RERANK_IDF_PATH, max_docs: int = RERANK_IDF_MAX_DOCS):
+        self.path = Path(path)
+        self.max_docs = max_docs
+        self.doc_count = 0
+        self.doc_freq: Counter = Counter()
+        self._seen: Set[str] = set()
+        self._dirty = 0
+        self._load()
+
+    def _load(self):
+        if not self.path.exists():
+            return
+        try:
+            data = json.loads(self.path.read_text(encoding='utf-8'))
+            self.doc_count = data.get('doc_count', 0)
+            self.doc_freq = Counter(data.get('doc_freq', {}))
+            self._seen = set(data.get('seen', []))
+        except Exception as e:
+            logger.warning(f"CorpusStats: не удалось загрузить {self.path}: {e}")
+
+    def observe(self, results: Iterable) -> int:
+        """Учесть новые фрагменты (по text_hash, каждый один раз)
+
+        Returns:
+            Сколько фрагментов добавлено
+        """
+        added = 0
+        for result in results:
+            if result.text_hash in self._seen or len(self._seen) >= self.max_docs:
+                continue
+            self._seen.add(result.text_hash)
+            self.doc_count += 1
+            self.doc_freq.update(result.term_freqs.keys())
+            added += 1
+        self._dirty += added
+        return added
+
+    @property
+    def pending(self) -> int:
+        """Сколько фрагментов добавлено с последнего сохранения"""
+        return self._dirty
+
+    def _snapshot(self) -> dict:
+        return {
+            'doc_count': self.doc_count,
+            'doc_freq': dict(self.doc_freq),
+            'seen': list(self._seen),
+        }
+
+    def _write(self, data: dict):
+        data['seen'].sort()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix('.tmp')
+        tmp.write_text(json.dumps(data, ensure_ascii=False), encoding='utf-8')
+        tmp.replace(self.path)
+
+    def save(self, force: bool = False):
+        """Сохранить статистику синхронно (при остановке, если накопились изменения)"""
+        if not self._dirty and not force:
+            return
+        try:
+            self._write(self._snapshot())
+            self._dirty = 0
+        except Exception as e:
+            logger.error(f"CorpusStats: не удалось сохранить {self.path}: {e}")
+
+    async def flush(self):
+        """Сохранить статистику в фоне (задача планировщика): запись файла — в потоке"""
+        if not self._dirty:
+            return
+        pending = self._dirty
+        try:
+            await asyncio.to_thread(self._write, self._snapshot())
+            # Фрагменты, учтённые во время записи, сохранятся в следующий раз
+            self._dirty -= pending
+        except Exception as e:
+            logger.error(f"CorpusStats: не удалось сохранить {self.path}: {e}")
+
+
+# =============================================================================
+# BM25
+# =============================================================================
+
+class BM25Reranker:
+    """BM25 по кандидатам относительно расширенного запроса"""
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75,
+                 expansion_weight: float = 0.5,
+                 corpus: Optional[CorpusStats] = None):
+        """
+        Args:
+            k1, b: параметры BM25
+            expansion_weight: вес терминов из расширений запроса (исходный — 1.0)
+            corpus: статистика корпуса для IDF (None — IDF по кандидатам)
+        """
+        self.k1 = k1
+        self.b = b
+        self.expansion_weight = expansion_weight
+        self.corpus = corpus
+
+    def query_weights(self, queries: List[str]) -> Dict[str, float]:
+        """Веса терминов запроса: исходный запрос — 1.0, расширения — expansion_weight"""
+        weights: Dict[str, float] = {}
+        for index, query in enumerate(queries):
+            weight = 1.0 if index == 0 else self.expansion_weight
+            for term in tokenize(query.lower()):
+                weights[term] = max(weights.get(term, 0.0), weight)
+        return weights
+
+    def _idf(self, terms: Iterable[str], results: List) -> Dict[str, float]:
+        if self.corpus is not None and self.corpus.doc_count:
+            total, doc_freq = self.corpus.doc_count, self.corpus.doc_freq
+        else:
+            total, doc_freq = len(results), Counter()
+            for result in results:
+                doc_freq.update(result.term_freqs.keys())
+        return {
+            term: math.log(1 + (total - doc_freq.get(term, 0) + 0.5) / (doc_freq.get(term, 0) + 0.5))
+            for term in terms
+        }
+
+    def coverage(self, results: List, query: str) -> List[float]:
+        """Доля IDF-массы терминов запроса, встретившихся в каждом результате (0..1)"""
+        terms = set(tokenize(query.lower()))
+        if not terms or not results:
+            return [0.0] * len(results)
+        idf = self._idf(terms, results)
+        total = sum(idf.values()) or 1.0
+        return [sum(idf[t] for t in terms if t in r.term_freqs) / total for r in results]
+
+    def rank(self, results: List, queries: List[str]) -> List:
+        """Ранжирует результаты; relevance_score — доля от лучшего BM25 (0..1)
+
+        Args:
+            results: RetrievalResult (с term_freqs и length)
+            queries: исходный запрос первым, затем расширения
+
+        Returns:
+            Результаты по убыванию relevance_score
+        """
+        if not results:
+            return []
+
+        if self.corpus is not None:
+            self.corpus.observe(results)
+
+        weights = self.query_weights(queries)
+        idf = self._idf(weights, results)
+        avg_length = sum(r.length for r in results) / len(results) or 1.0
+        k1, b = self.k1, self.b
+        terms = [(term, weight * idf[term]) for term, weight in weights.items()]
+
+        best = 0.0
+        for result in results:
+            tf = result.term_freqs
+            norm = k1 * (1 - b + b * result.length / avg_length)
+            score = 0.0
+            for term, term_weight in terms:
+                freq = tf.get(term)
+                if freq:
+                    score += term_weight * freq * (k1 + 1) / (freq + norm)
+            result.relevance_score = score
+            best = max(best, score)
+
+        for result in results:
+            result.relevance_score = result.relevance_score / best if best else 0.0
+
+        ranked = sorted(results, key=lambda r: r.relevance_score, reverse=True)
+        logger.info(f"BM25Reranker: ранжировано {len(ranked)} результатов по {len(terms)} терминам")
+        return ranked
+
+
+# Singleton статистики корпуса
+_corpus: Optional[CorpusStats] = None
+
+
+def get_corpus_stats() -> CorpusStats:
+    """Получить глобальную статистику корпуса"""
+    global _corpus
+    if _corpus is None:
+        _corpus = CorpusStats()
+    return _corpus
@@ -3,20 +3,32 @@
 
 Компоненты:
 - QueryExpander: расширение запросов синонимами и связанными терминами
-- RelevanceScorer: оценка релевантности результатов
-- SemanticDeduplicator: умная дедупликация
+- RelevanceScorer: эвристическая оценка релевантности результатов
+- BM25Reranker (reranker.py): ранжирование кандидатов по BM25
+- SemanticDeduplicator: умная дедупликация (MinHash + LSH)
 - FallbackStrategy: стратегия при пустых результатах
 - EnhancedRetrieval: основной класс, объединяющий всё
 """
 
 import re
+import time
+import zlib
+import random
 import hashlib
 import asyncio
-from typing import Optional, List, Tuple, Dict, Set
+from contextlib import contextmanager
+from typing import Optional, List, Tuple, Dict, Set, FrozenSet
 from dataclasses import dataclass, field
 
-from config import get_logger
+from config import get_logger, RERANK_IDF_ENABLED
 from clients import mcp_guides, mcp_knowledge
+from .term_matcher import TermMatcher, load_structure_relations, merge_relations
+from .reranker import BM25Reranker, term_frequencies, get_corpus_stats
+from .expansion_stats import get_expansion_stats
+from core.context_packer import PackItem, pack
+
+# Заголовки секций и разделители в отформатированном контексте
+FORMAT_OVERHEAD_TOKENS = 30
 
 logger = get_logger(__name__)
 
@@ -79,34 +91,80 @@ SYNONYMS: Dict[str, str] = {
 }
 
 
+# =============================================================================
+# MINHASH / LSH
+# =============================================================================
+
+# 16 хеш-функций = 8 полос × 2 строки. Вероятность попасть в кандидаты
+# при Jaccard 0.6 — около 97%, при 0.8 — 99.8%; кандидаты затем
+# проверяются точным Jaccard, так что ложных срабатываний нет.
+MINHASH_PERMUTATIONS = 16
+LSH_BANDS = 8
+LSH_ROWS = MINHASH_PERMUTATIONS // LSH_BANDS
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_rng = random.Random(42)  # фиксированное зерно — сигнатуры воспроизводимы между запусками
+_PERMUTATIONS: Tuple[Tuple[int, int], ...] = tuple(
+    (_rng.randrange(1, _MERSENNE_PRIME), _rng.randrange(0, _MERSENNE_PRIME))
+    for _ in range(MINHASH_PERMUTATIONS)
+)
+
+_WHITESPACE = re.compile(r'\s+')
+_KEY_WORD = re.compile(r'\b[а-яёa-z]{4,}\b')
+
+
+def minhash_signature(tokens: FrozenSet[str]) -> Tuple[int, ...]:
+    """MinHash-сигнатура множества токенов (пустое множество → пустая сигнатура)"""
+    if not tokens:
+        return ()
+    hashes = [zlib.crc32(token.encode()) for token in tokens]
+    return tuple(
+        min((a * h + b) % _MERSENNE_PRIME for h in hashes)
+        for a, b in _PERMUTATIONS
+    )
+
+
+def lsh_bands(signature: Tuple[int, ...]) -> List[Tuple[int, Tuple[int, ...]]]:
+    """Ключи LSH-корзин: (номер полосы, значения полосы)"""
+    return [
+        (band, signature[band * LSH_ROWS:(band + 1) * LSH_ROWS])
+        for band in range(len(signature) // LSH_ROWS)
+    ]
+
+
 # =============================================================================
 # DATA CLASSES
 # =============================================================================
 
-@dataclass
+@dataclass(slots=True)
 class RetrievalResult:
-    """Результат поиска с метаданными"""
+    """Результат поиска с метаданными
+
+    Признаки для скоринга и дедупликации (нормализованный текст, хеш,
+    ключевые слова, MinHash) вычисляются один раз при создании.
+    """
     text: str
     source: str
     source_type: str  # "guides" или "knowledge"
     relevance_score: float = 0.0
     date: Optional[str] = None
     original_item: dict = field(default_factory=dict)
+    query: Optional[str] = None  # запрос, по которому найден результат
 
-    @property
-    def text_hash(self) -> str:
-        """Хеш для сравнения похожести"""
-        # Нормализуем текст для сравнения
-        normalized = re.sub(r'\s+', ' ', self.text.lower().strip())
-        return hashlib.md5(normalized[:500].encode()).hexdigest()
+    normalized: str = field(init=False, repr=False)           # lower + схлопнутые пробелы
+    text_hash: str = field(init=False, repr=False)            # хеш для точных дублей
+    key_phrases: FrozenSet[str] = field(init=False, repr=False)  # слова от 4 букв
+    minhash: Tuple[int, ...] = field(init=False, repr=False)
+    term_freqs: Dict[str, int] = field(init=False, repr=False)  # основы слов → частота (BM25)
+    length: int = field(init=False, repr=False)                 # число основ
 
-    @property
-    def key_phrases(self) -> Set[str]:
-        """Извлекаем ключевые фразы для семантического сравнения"""
-        text_lower = self.text.lower()
-        # Извлекаем слова длиннее 4 символов
-        words = set(re.findall(r'\b[а-яёa-z]{4,}\b', text_lower))
-        return words
+    def __post_init__(self):
+        self.normalized = _WHITESPACE.sub(' ', self.text.lower().strip())
+        self.text_hash = hashlib.md5(self.normalized[:500].encode()).hexdigest()
+        self.key_phrases = frozenset(_KEY_WORD.findall(self.normalized))
+        self.minhash = minhash_signature(self.key_phrases)
+        self.term_freqs = term_frequencies(self.normalized)
+        self.length = sum(self.term_freqs.values())
 
 
 @dataclass
@@ -117,7 +175,12 @@ class RetrievalConfig:
     knowledge_limit: int = 5
     max_results: int = 7
 
-    # Фильтрация по релевантности
+    # Ранжирование: "bm25" (BM25Reranker) или "heuristic" (RelevanceScorer)
+    reranker: str = "bm25"
+    bm25_k1: float = 1.2
+    bm25_b: float = 0.75
+
+    # Фильтрация по релевантности (для bm25 — доля от лучшего результата)
     min_relevance_score: float = 0.3
 
     # Размеры текста
@@ -130,18 +193,33 @@ class RetrievalConfig:
     enable_fallback: bool = True
     fallback_broader_query: bool = True
 
+    # Адаптивное расширение: сначала только базовый запрос, расширения —
+    # если среди результатов меньше expansion_min_good «хороших»
+    # (покрывающих не меньше expansion_coverage терминов вопроса)
+    adaptive_expansion: bool = True
+    max_expansions: int = 2
+    expansion_min_good: int = 3
+    expansion_coverage: float = 0.4
+
+    # Словарь терминов: дополнить связями из knowledge_structure.yaml
+    load_structure_terms: bool = False
+
 
 # =============================================================================
 # QUERY EXPANDER
 # =============================================================================
 
 class QueryExpander:
-    """Расширяет поисковые запросы связанными терминами"""
+    """Расширяет поисковые запросы связанными терминами
+
+    Термины ищутся скомпилированным автоматом (TermMatcher) за один проход.
+    """
 
     def __init__(self, term_relations: Dict[str, List[str]] = None,
                  synonyms: Dict[str, str] = None):
         self.term_relations = term_relations or TERM_RELATIONS
         self.synonyms = synonyms or SYNONYMS
+        self.matcher = TermMatcher(self.term_relations, self.synonyms)
 
     def expand(self, query: str, max_expansions: int = 3) -> List[str]:
         """Расширяет запрос связанными терминами
@@ -153,47 +231,44 @@ class QueryExpander:
         Returns:
             Список запросов (оригинал + расширенные)
         """
+        queries = [query] + [expanded for expanded, _, _ in self.candidates(query)[:max_expansions]]
+        logger.info(f"QueryExpander: {len(queries)} запросов из '{query[:50]}...'")
+        return queries
+
+    def candidates(self, query: str) -> List[Tuple[str, str, str]]:
+        """Все возможные расширения запроса в порядке словаря
+
+        Returns:
+            Список (расширенный запрос, концепция/синоним, добавленный термин)
+        """
         queries = [query]
+        result = []
         query_lower = query.lower()
+        hits = self.matcher.match(query_lower)
 
-        expansions_added = 0
-
-        # 1. Ищем прямые связи с терминами
-        for term, related in self.term_relations.items():
-            if term in query_lower:
-                # Добавляем запросы с связанными терминами
-                for related_term in related[:2]:  # Максимум 2 связанных на термин
-                    if expansions_added >= max_expansions:
-                        break
-                    expanded = f"{query} {related_term}"
-                    if expanded not in queries:
-                        queries.append(expanded)
-                        expansions_added += 1
-                        logger.debug(f"QueryExpander: '{term}' → добавлен '{related_term}'")
-
-        # 2. Ищем синонимы
-        for original, synonym in self.synonyms.items():
-            if original in query_lower and expansions_added < max_expansions:
-                # Заменяем термин на синоним
-                expanded = query_lower.replace(original, synonym)
-                if expanded != query_lower and expanded not in [q.lower() for q in queries]:
+        # 1. Прямые связи с терминами
+        for term in hits.concepts:
+            for related_term in self.term_relations[term][:2]:  # Максимум 2 связанных на термин
+                expanded = f"{query} {related_term}"
+                if expanded not in queries:
                     queries.append(expanded)
-                    expansions_added += 1
-                    logger.debug(f"QueryExpander: синоним '{original}' → '{synonym}'")
+                    result.append((expanded, term, related_term))
+                    logger.debug(f"QueryExpander: '{term}' → добавлен '{related_term}'")
 
-        logger.info(f"QueryExpander: {len(queries)} запросов из '{query[:50]}...'")
-        return queries
+        # 2. Синонимы: заменяем термин на синоним
+        for original in hits.synonyms:
+            synonym = self.synonyms[original]
+            expanded = query_lower.replace(original, synonym)
+            if expanded != query_lower and expanded not in [q.lower() for q in queries]:
+                queries.append(expanded)
+                result.append((expanded, original, synonym))
+                logger.debug(f"QueryExpander: синоним '{original}' → '{synonym}'")
+
+        return result
 
     def extract_key_concepts(self, query: str) -> List[str]:
         """Извлекает ключевые концепции из запроса"""
-        query_lower = query.lower()
-        concepts = []
-
-        for term in self.term_relations.keys():
-            if term in query_lower:
-                concepts.append(term)
-
-        return concepts
+        return self.matcher.match(query).concepts
 
 
 # =============================================================================
@@ -207,19 +282,20 @@ class RelevanceScorer:
         self.expander = query_expander or QueryExpander()
 
     def score(self, result: RetrievalResult, query: str,
-              query_keywords: List[str] = None) -> float:
+              query_keywords: List[str] = None,
+              concepts: List[str] = None) -> float:
         """Вычисляет score релевантности
 
         Args:
             result: результат поиска
             query: исходный запрос
             query_keywords: ключевые слова запроса
+            concepts: концепции запроса (если уже извлечены)
 
         Returns:
             Score от 0.0 до 1.0
         """
-        text_lower = result.text.lower()
-        query_lower = query.lower()
+        text_lower = result.normalized
 
         score = 0.0
 
@@ -230,21 +306,18 @@ class RelevanceScorer:
             score += keyword_score * 0.4
 
         # 2. Совпадение ключевых концепций (30%)
-        concepts = self.expander.extract_key_concepts(query)
+        if concepts is None:
+            concepts = self.expander.extract_key_concepts(query)
         if concepts:
-            concept_matches = sum(1 for c in concepts if c in text_lower)
+            # Один проход автомата по тексту: концепции и связанные термины
+            hits = self.expander.matcher.match(text_lower)
+            found = set(hits.concepts)
+            concept_matches = sum(1 for c in concepts if c in found)
             concept_score = concept_matches / len(concepts)
             score += concept_score * 0.3
 
-        # 3. Наличие связанных терминов (20%)
-        related_found = 0
-        for concept in concepts:
-            related = self.expander.term_relations.get(concept, [])
-            for term in related:
-                if term in text_lower:
-                    related_found += 1
-                    break
-        if concepts:
+            # 3. Наличие связанных терминов (20%)
+            related_found = sum(1 for c in concepts if c in hits.related)
             related_score = min(related_found / len(concepts), 1.0)
             score += related_score * 0.2
 
@@ -264,8 +337,9 @@ class RelevanceScorer:
     def rank_results(self, results: List[RetrievalResult], query: str,
                      query_keywords: List[str] = None) -> List[RetrievalResult]:
         """Ранжирует результаты по релевантности"""
+        concepts = self.expander.extract_key_concepts(query)
         for result in results:
-            result.relevance_score = self.score(result, query, query_keywords)
+            result.relevance_score = self.score(result, query, query_keywords, concepts)
 
         # Сортируем по score (убывание)
         ranked = sorted(results, key=lambda r: r.relevance_score, reverse=True)
@@ -281,7 +355,12 @@ class RelevanceScorer:
 # =============================================================================
 
 class SemanticDeduplicator:
-    """Умная дедупликация на основе семантического сходства"""
+    """Умная дедупликация на основе семантического сходства
+
+    Кандидаты в дубли ищутся через LSH-корзины MinHash-сигнатур, точный
+    Jaccard считается только для них — стоимость почти не растёт
+    с числом результатов.
+    """
 
     def __init__(self, similarity_threshold: float = 0.6):
         self.similarity_threshold = similarity_threshold
@@ -320,19 +399,30 @@ class SemanticDeduplicator:
         sorted_results = sorted(results, key=lambda r: r.relevance_score, reverse=True)
 
         unique_results = []
+        seen_hashes = set()
+        buckets: Dict[Tuple[int, Tuple[int, ...]], List[RetrievalResult]] = {}
 
         for result in sorted_results:
-            # Проверяем, похож ли на уже добавленные
-            is_duplicate = False
-            for existing in unique_results:
-                if self.are_similar(result, existing):
-                    is_duplicate = True
-                    logger.debug(f"Deduplicator: пропущен дубль "
-                               f"(similarity >= {self.similarity_threshold})")
-                    break
-
-            if not is_duplicate:
-                unique_results.append(result)
+            # 1. Идентичный текст
+            if result.text_hash in seen_hashes:
+                logger.debug("Deduplicator: пропущен точный дубль")
+                continue
+
+            # 2. Похожие среди кандидатов из тех же LSH-корзин
+            bands = lsh_bands(result.minhash)
+            candidates = {id(c): c for key in bands for c in buckets.get(key, ())}
+            if any(
+                self.jaccard_similarity(result.key_phrases, c.key_phrases) >= self.similarity_threshold
+                for c in candidates.values()
+            ):
+                logger.debug(f"Deduplicator: пропущен дубль "
+                           f"(similarity >= {self.similarity_threshold})")
+                continue
+
+            unique_results.append(result)
+            seen_hashes.add(result.text_hash)
+            for key in bands:
+                buckets.setdefault(key, []).append(result)
 
         removed = len(results) - len(unique_results)
         if removed > 0:
@@ -395,17 +485,49 @@ class FallbackStrategy:
 class EnhancedRetrieval:
     """Улучшенный Knowledge Retrieval с полным pipeline"""
 
-    def __init__(self, config: RetrievalConfig = None):
+    # Этапы pipeline, для которых копится процессорное время (stage_cpu)
+    STAGES = ("expand", "parse", "score", "dedup", "format")
+
+    def __init__(self, config: RetrievalConfig = None,
+                 guides_client=None, knowledge_client=None):
+        """
+        Args:
+            config: конфигурация pipeline
+            guides_client, knowledge_client: MCP-клиенты (по умолчанию глобальные;
+                подменяются при офлайн-оценке, см. tests/retrieval_eval)
+        """
         self.config = config or RetrievalConfig()
-        self.expander = QueryExpander()
+        self.guides_client = guides_client or mcp_guides
+        self.knowledge_client = knowledge_client or mcp_knowledge
+        self.stage_cpu: Dict[str, float] = dict.fromkeys(self.STAGES, 0.0)  # этап → мс CPU
+        term_relations = TERM_RELATIONS
+        if self.config.load_structure_terms:
+            term_relations = merge_relations(TERM_RELATIONS, load_structure_relations())
+        self.expander = QueryExpander(term_relations)
+        logger.debug(f"EnhancedRetrieval: словарь терминов {len(self.expander.matcher)} паттернов")
         self.scorer = RelevanceScorer(self.expander)
+        self.reranker = BM25Reranker(
+            k1=self.config.bm25_k1, b=self.config.bm25_b,
+            corpus=get_corpus_stats() if RERANK_IDF_ENABLED else None,
+        )
         self.deduplicator = SemanticDeduplicator(self.config.similarity_threshold)
         self.fallback = FallbackStrategy(self.expander)
+        self.expansion_stats = get_expansion_stats()
+
+    @contextmanager
+    def _stage(self, name: str):
+        """Учёт процессорного времени этапа (ожидание MCP не считается)"""
+        started = time.process_time()
+        try:
+            yield
+        finally:
+            self.stage_cpu[name] = self.stage_cpu.get(name, 0.0) + (time.process_time() - started) * 1000
 
     async def search(self, query: str,
                      keywords: List[str] = None,
                      context_topic: Optional[str] = None,
-                     dynamic_context: "DynamicContext" = None) -> Tuple[str, List[str]]:
+                     dynamic_context: "DynamicContext" = None,
+                     budget_tokens: Optional[int] = None) -> Tuple[str, List[str]]:
         """Выполняет улучшенный поиск по MCP
 
         Args:
@@ -413,10 +535,31 @@ class EnhancedRetrieval:
             keywords: ключевые слова (если уже извлечены)
             context_topic: контекст текущей темы
             dynamic_context: динамический контекст (прогресс, история, метаданные)
+            budget_tokens: бюджет токенов контекста (None — без ограничения)
 
         Returns:
             Tuple[context, sources] - контекст для LLM и список источников
         """
+        final_results = await self.retrieve(query, keywords, context_topic, dynamic_context)
+
+        # Формируем контекст и источники
+        with self._stage("format"):
+            context, sources = self._format_results(final_results, budget_tokens)
+
+        logger.info(f"EnhancedRetrieval: итого {len(final_results)} результатов, "
+                   f"{len(context)} символов контекста")
+
+        return context, sources
+
+    async def retrieve(self, query: str,
+                       keywords: List[str] = None,
+                       context_topic: Optional[str] = None,
+                       dynamic_context: "DynamicContext" = None) -> List[RetrievalResult]:
+        """Поиск, ранжирование и дедупликация без форматирования
+
+        Returns:
+            Итоговые результаты по убыванию релевантности (не больше max_results)
+        """
         logger.info(f"EnhancedRetrieval: запрос '{query[:80]}...'")
 
         # 1. Формируем базовый запрос с контекстом
@@ -432,68 +575,112 @@ class EnhancedRetrieval:
                 base_query = f"{base_query} {boost_query}"
                 logger.info(f"EnhancedRetrieval: boost terms: {boost_terms[:3]}")
 
-        # 3. Расширяем запросы
-        expanded_queries = self.expander.expand(base_query, max_expansions=2)
-
-        # 3. Выполняем поиск по всем запросам
+        # 3. Поиск: базовый запрос + расширения (все сразу или адаптивно)
         all_results: List[RetrievalResult] = []
-        tried_queries = []
-
-        # Выполняем поиск по ВСЕМ expanded queries ПАРАЛЛЕЛЬНО
-        search_tasks = [self._search_both_sources(q) for q in expanded_queries]
-        search_results = await asyncio.gather(*search_tasks)
+        with self._stage("expand"):
+            candidates = self.expander.candidates(base_query)
+
+        if self.config.adaptive_expansion:
+            all_results.extend(await self._search_both_sources([base_query]))
+            with self._stage("expand"):
+                expansions = self._select_expansions(all_results, query, candidates)
+            if expansions:
+                all_results.extend(await self._search_both_sources([q for q, _, _ in expansions]))
+        else:
+            # Все запросы уходят одним batch-запросом на каждый сервер
+            expansions = candidates[:self.config.max_expansions]
+            all_results.extend(await self._search_both_sources([base_query] + [q for q, _, _ in expansions]))
 
-        for results in search_results:
-            all_results.extend(results)
-        tried_queries.extend(expanded_queries)
+        expanded_queries = [base_query] + [q for q, _, _ in expansions]
+        tried_queries = list(expanded_queries)
 
         # 4. Fallback только если совсем мало результатов (не 3, а 1)
         if len(all_results) < 2 and self.config.enable_fallback:
             logger.info("EnhancedRetrieval: очень мало результатов, пробуем fallback")
-            fallback_queries = self.fallback.generate_fallback_queries(
-                base_query, tried_queries
-            )[:2]  # Максимум 2 fallback запроса
+            with self._stage("expand"):
+                fallback_queries = self.fallback.generate_fallback_queries(
+                    base_query, tried_queries
+                )[:2]  # Максимум 2 fallback запроса
             if fallback_queries:
-                fallback_results = await asyncio.gather(
-                    *[self._search_both_sources(q) for q in fallback_queries]
-                )
-                for results in fallback_results:
-                    all_results.extend(results)
+                all_results.extend(await self._search_both_sources(fallback_queries))
 
         # 5. Scoring
-        all_results = self.scorer.rank_results(all_results, base_query, keywords)
+        with self._stage("score"):
+            if self.config.reranker == "bm25":
+                rerank_queries = expanded_queries + ([' '.join(keywords)] if keywords else [])
+                all_results = self.reranker.rank(all_results, rerank_queries)
+            else:
+                all_results = self.scorer.rank_results(all_results, base_query, keywords)
 
-        # 6. Фильтрация по минимальному score
-        filtered = [r for r in all_results
-                   if r.relevance_score >= self.config.min_relevance_score]
+            # 6. Фильтрация по минимальному score
+            filtered = [r for r in all_results
+                       if r.relevance_score >= self.config.min_relevance_score]
 
         if len(filtered) < len(all_results):
             logger.info(f"EnhancedRetrieval: отфильтровано {len(all_results) - len(filtered)} "
                        f"результатов с низкой релевантностью")
 
         # 7. Дедупликация
-        unique_results = self.deduplicator.deduplicate(filtered)
+        with self._stage("dedup"):
+            unique_results = self.deduplicator.deduplicate(filtered)
 
         # 8. Ограничиваем количество
         final_results = unique_results[:self.config.max_results]
 
-        # 9. Формируем контекст и источники
-        context, sources = self._format_results(final_results)
+        # 9. Учитываем, какие расширения принесли новые результаты
+        if self.config.adaptive_expansion and expansions:
+            self._record_expansions(expansions, base_query, all_results, final_results)
 
-        logger.info(f"EnhancedRetrieval: итого {len(final_results)} результатов, "
-                   f"{len(context)} символов контекста")
+        return final_results
 
-        return context, sources
+    def _select_expansions(self, results: List[RetrievalResult], question: str,
+                           candidates: List[Tuple[str, str, str]]) -> List[Tuple[str, str, str]]:
+        """Расширения для второго раунда: пусто, если базовый запрос уже дал достаточно
 
-    async def _search_both_sources(self, query: str) -> List[RetrievalResult]:
-        """Ищет в обоих MCP источниках ПАРАЛЛЕЛЬНО"""
-        results = []
+        Args:
+            results: результаты базового запроса
+            question: вопрос пользователя (по нему считается покрытие)
+            candidates: расширения от QueryExpander
+
+        Returns:
+            Выбранные расширения (по полезности из статистики)
+        """
+        if not candidates:
+            return []
+
+        good = {
+            result.text_hash
+            for result, coverage in zip(results, self.reranker.coverage(results, question))
+            if coverage >= self.config.expansion_coverage
+        }
+        if len(good) >= self.config.expansion_min_good:
+            logger.info(f"EnhancedRetrieval: базовый запрос дал {len(good)} хороших результатов, "
+                        f"расширения не нужны")
+            return []
+
+        selected = self.expansion_stats.select(candidates, self.config.max_expansions)
+        logger.info(f"EnhancedRetrieval: хороших результатов {len(good)}, "
+                    f"расширения: {[term for _, _, term in selected]}")
+        return selected
+
+    def _record_expansions(self, expansions: List[Tuple[str, str, str]], base_query: str,
+                           all_results: List[RetrievalResult], final_results: List[RetrievalResult]):
+        """Расширение полезно, если его результат, не найденный базовым запросом, попал в итог"""
+        base_hashes = {r.text_hash for r in all_results if r.query == base_query}
+        contributed = {r.query for r in final_results if r.text_hash not in base_hashes}
+        for expanded, concept, term in expansions:
+            self.expansion_stats.record(concept, term, expanded in contributed)
+
+    async def _search_both_sources(self, queries: List[str]) -> List[RetrievalResult]:
+        """Ищет в обоих MCP источниках ПАРАЛЛЕЛЬНО
 
+        Все запросы к одному серверу отправляются одним JSON-RPC batch.
+        """
         async def search_guides():
             """Поиск в MCP-Guides"""
             try:
-                return await mcp_guides.semantic_search(
-                    query, lang="ru", limit=self.config.guides_limit
+                return await self.guides_client.semantic_search_many(
+                    queries, lang="ru", limit=self.config.guides_limit
                 )
             except Exception as e:
                 logger.error(f"MCP-Guides error: {e}")
@@ -502,30 +689,42 @@ class EnhancedRetrieval:
         async def search_knowledge():
             """Поиск в MCP-Knowledge"""
             try:
-                return await mcp_knowledge.search(
-                    query, limit=self.config.knowledge_limit
+                return await self.knowledge_client.search_many(
+                    queries, limit=self.config.knowledge_limit
                 )
             except Exception as e:
                 logger.error(f"MCP-Knowledge error: {e}")
                 return []
 
         # Выполняем оба запроса ПАРАЛЛЕЛЬНО
-        guides_results, knowledge_results = await asyncio.gather(
+        guides_batches, knowledge_batches = await asyncio.gather(
             search_guides(),
             search_knowledge()
         )
 
+        # Парсим результаты (хеши, MinHash и частоты терминов считаются здесь)
+        with self._stage("parse"):
+            return self._parse_batches(queries, guides_batches, knowledge_batches)
+
+    def _parse_batches(self, queries: List[str], guides_batches, knowledge_batches) -> List[RetrievalResult]:
+        """Разбор ответов обоих источников в RetrievalResult"""
+        results = []
+
         # Парсим результаты Guides
-        for item in (guides_results or []):
-            result = self._parse_result(item, "guides")
-            if result:
-                results.append(result)
+        for query, batch in zip(queries, guides_batches or []):
+            for item in batch:
+                result = self._parse_result(item, "guides")
+                if result:
+                    result.query = query
+                    results.append(result)
 
         # Парсим результаты Knowledge
-        for item in (knowledge_results or []):
-            result = self._parse_result(item, "knowledge")
-            if result:
-                results.append(result)
+        for query, batch in zip(queries, knowledge_batches or []):
+            for item in batch:
+                result = self._parse_result(item, "knowledge")
+                if result:
+                    result.query = query
+                    results.append(result)
 
         return results
 
@@ -581,35 +780,56 @@ class EnhancedRetrieval:
             original_item=item if isinstance(item, dict) else {}
         )
 
-    def _format_results(self, results: List[RetrievalResult]) -> Tuple[str, List[str]]:
-        """Форматирует результаты в контекст для LLM"""
+    def _format_results(self, results: List[RetrievalResult],
+                        budget_tokens: Optional[int] = None) -> Tuple[str, List[str]]:
+        """Форматирует результаты в контекст для LLM
+
+        Args:
+            results: результаты по убыванию релевантности
+            budget_tokens: бюджет токенов контекста (None — без ограничения)
+        """
         if not results:
             return "", []
 
+        # Упаковка в бюджет: релевантность на токен, обрезка по предложениям
+        items = [
+            PackItem(
+                text=r.text, source=r.source, group=r.source_type,
+                score=max(r.relevance_score, 0.01),
+                prefix=f"[{r.date}] " if r.source_type == "knowledge" and r.date else "",
+            )
+            for r in results
+        ]
+        if budget_tokens:
+            packed = pack(items, max(budget_tokens - FORMAT_OVERHEAD_TOKENS, 0))
+            if packed.dropped or any(i.trimmed for i in packed.items):
+                logger.info(f"EnhancedRetrieval: контекст упакован в {packed.tokens}/{budget_tokens} токенов, "
+                            f"отброшено {packed.dropped}, обрезано {sum(i.trimmed for i in packed.items)}")
+            items = packed.items
+
         context_parts = []
         sources = []
 
         # Группируем по источникам
-        guides_results = [r for r in results if r.source_type == "guides"]
-        knowledge_results = [r for r in results if r.source_type == "knowledge"]
+        guides_items = [i for i in items if i.group == "guides"]
+        knowledge_items = [i for i in items if i.group == "knowledge"]
 
         # Knowledge имеет приоритет (свежие посты важнее)
-        if knowledge_results:
+        if knowledge_items:
             context_parts.append("📚 АКТУАЛЬНЫЕ МАТЕРИАЛЫ:")
-            for r in knowledge_results:
-                date_prefix = f"[{r.date}] " if r.date else ""
-                context_parts.append(f"{date_prefix}{r.text}")
-                if r.source and f"База знаний: {r.source}" not in sources:
-                    sources.append(f"База знаний: {r.source}")
-
-        if guides_results:
-            if knowledge_results:
+            for i in knowledge_items:
+                context_parts.append(f"{i.prefix}{i.text}")
+                if i.source and f"База знаний: {i.source}" not in sources:
+                    sources.append(f"База знаний: {i.source}")
+
+        if guides_items:
+            if knowledge_items:
                 context_parts.append("\n---\n")
             context_parts.append("📖 ИЗ РУКОВОДСТВ:")
-            for r in guides_results:
-                context_parts.append(r.text)
-                if r.source and f"Руководство: {r.source}" not in sources:
-                    sources.append(f"Руководство: {r.source}")
+            for i in guides_items:
+                context_parts.append(i.text)
+                if i.source and f"Руководство: {i.source}" not in sources:
+                    sources.append(f"Руководство: {i.source}")
 
         context = "\n\n".join(context_parts)
 
@@ -635,7 +855,8 @@ def get_retrieval() -> EnhancedRetrieval:
 async def enhanced_search(query: str,
                          keywords: List[str] = None,
                          context_topic: Optional[str] = None,
-                         dynamic_context: "DynamicContext" = None) -> Tuple[str, List[str]]:
+                         dynamic_context: "DynamicContext" = None,
+                         budget_tokens: Optional[int] = None) -> Tuple[str, List[str]]:
     """Удобная функция для поиска
 
     Args:
@@ -643,12 +864,13 @@ async def enhanced_search(query: str,
         keywords: ключевые слова
         context_topic: контекст темы
         dynamic_context: динамический контекст (опционально)
+        budget_tokens: бюджет токенов контекста (опционально)
 
     Returns:
         Tuple[context, sources]
     """
     retrieval = get_retrieval()
-    return await retrieval.search(query, keywords, context_topic, dynamic_context)
+    return await retrieval.search(query, keywords, context_topic, dynamic_context, budget_tokens)
 
 
 # Type hint import (в конце файла для избежания циклических импортов)
@@ -0,0 +1,159 @@
+"""
+Поиск терминов словаря в тексте за один проход (Aho–Corasick).
+
+TermMatcher компилирует концепции, связанные термины и синонимы
+в один автомат. match(text) за один проход по тексту возвращает:
+- concepts: найденные концепции (ключи term_relations);
+- related: концепции, чей связанный термин встретился в тексте;
+- synonyms: найденные ключи словаря синонимов.
+
+Семантика совпадает с проверкой `term in text.lower()` — ищутся
+подстроки, — но стоимость не зависит от размера словаря.
+
+Дополнительные термины можно загрузить из knowledge_structure.yaml:
+main_concept темы → её related_concepts (load_structure_relations).
+"""
+
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Set, Tuple
+
+import yaml
+
+from config import get_logger, KNOWLEDGE_STRUCTURE_PATH
+from core.content import get_knowledge_structure
+
+logger = get_logger(__name__)
+
+# Роли паттерна в автомате
+_CONCEPT = 0
+_RELATED = 1
+_SYNONYM = 2
+
+
+@dataclass
+class TermHits:
+    """Результат одного прохода по тексту"""
+    concepts: List[str] = field(default_factory=list)   # в порядке словаря
+    related: Set[str] = field(default_factory=set)      # концепции с найденным связанным термином
+    synonyms: List[str] = field(default_factory=list)   # в порядке словаря
+
+
+class TermMatcher:
+    """Автомат Aho–Corasick над словарями терминов"""
+
+    def __init__(self, term_relations: Dict[str, List[str]], synonyms: Dict[str, str] = None):
+        self._concept_order = {term: i for i, term in enumerate(term_relations)}
+        self._synonym_order = {term: i for i, term in enumerate(synonyms or {})}
+
+        # паттерн → [(роль, концепция/синоним)]
+        roles: Dict[str, List[Tuple[int, str]]] = {}
+        for concept, related in term_relations.items():
+            roles.setdefault(concept.lower(), []).append((_CONCEPT, concept))
+            for term in related:
+                roles.setdefault(term.lower(), []).append((_RELATED, concept))
+        for original in (synonyms or {}):
+            roles.setdefault(original.lower(), []).append((_SYNONYM, original))
+
+        self._patterns = list(roles)
+        self._roles = [tuple(roles[p]) for p in self._patterns]
+        self._build()
+
+    def _build(self):
+        """Бор + суффиксные ссылки; выходы сливаются по цепочке ссылок"""
+        goto: List[Dict[str, int]] = [{}]
+        out: List[Tuple[int, ...]] = [()]
+
+        for index, pattern in enumerate(self._patterns):
+            node = 0
+            for ch in pattern:
+                if ch not in goto[node]:
+                    goto.append({})
+                    out.append(())
+                    goto[node][ch] = len(goto) - 1
+                node = goto[node][ch]
+            out[node] = out[node] + (index,)
+
+        fail = [0] * len(goto)
+        queue = list(goto[0].values())
+        for node in queue:  # BFS: список растёт по ходу обхода
+            for ch, child in goto[node].items():
+                queue.append(child)
+                state = fail[node]
+                while state and ch not in goto[state]:
+                    state = fail[state]
+                fail[child] = goto[state].get(ch, 0)
+                out[child] = out[child] + out[fail[child]]
+
+        self._goto, self._fail, self._out = goto, fail, out
+
+    def __len__(self) -> int:
+        return len(self._patterns)
+
+    def find(self, text: str) -> Set[int]:
+        """Индексы паттернов, встретившихся в тексте (текст в нижнем регистре)"""
+        goto, fail, out = self._goto, self._fail, self._out
+        found: Set[int] = set()
+        node = 0
+        for ch in text:
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            if out[node]:
+                found.update(out[node])
+        return found
+
+    def match(self, text: str) -> TermHits:
+        """Все концепции, связанные термины и синонимы в тексте за один проход"""
+        concepts, related, synonyms = set(), set(), set()
+        for index in self.find(text.lower()):
+            for role, key in self._roles[index]:
+                if role == _CONCEPT:
+                    concepts.add(key)
+                elif role == _RELATED:
+                    related.add(key)
+                else:
+                    synonyms.add(key)
+        return TermHits(
+            concepts=sorted(concepts, key=self._concept_order.__getitem__),
+            related=related,
+            synonyms=sorted(synonyms, key=self._synonym_order.__getitem__),
+        )
+
+
+def load_structure_relations(path: Path = KNOWLEDGE_STRUCTURE_PATH) -> Dict[str, List[str]]:
+    """Связи из knowledge_structure.yaml: main_concept → related_concepts
+
+    Returns:
+        Словарь связей или {} при ошибке
+    """
+    try:
+        if Path(path) == KNOWLEDGE_STRUCTURE_PATH:
+            structure = get_knowledge_structure()
+        else:
+            with open(path, 'r', encoding='utf-8') as f:
+                structure = yaml.safe_load(f) or {}
+    except Exception as e:
+        logger.error(f"TermMatcher: не удалось загрузить {path}: {e}")
+        return {}
+
+    relations: Dict[str, List[str]] = {}
+    for topic in structure.get('topics', []):
+        concept = (topic.get('main_concept') or '').strip().lower()
+        if not concept:
+            continue
+        related = relations.setdefault(concept, [])
+        for term in topic.get('related_concepts', []):
+            term = str(term).strip().lower()
+            if term and term != concept and term not in related:
+                related.append(term)
+    return relations
+
+
+def merge_relations(base: Dict[str, List[str]], extra: Dict[str, List[str]]) -> Dict[str, List[str]]:
+    """Дополняет словарь связей: новые концепции — в конец, у известных — новые термины"""
+    merged = {term: list(related) for term, related in base.items()}
+    for term, related in extra.items():
+        target = merged.setdefault(term, [])
+        target.extend(t for t in related if t not in target)
+    return merged
@@ -2,9 +2,15 @@
 Модуль локализации для бота AI System Track
 
 Поддерживаемые языки: RU, EN, ES
+
+Запуск `python locales.py` печатает непереведённые и неиспользуемые ключи.
 """
 
-from typing import Optional
+import re
+from collections import Counter
+from pathlib import Path
+from string import Formatter
+from typing import Optional, Dict, List, Tuple
 
 SUPPORTED_LANGUAGES = ['ru', 'en', 'es']
 
@@ -278,6 +284,7 @@ TRANSLATIONS = {
         'feed.enter_new_topic': 'Введите новую тему для дня {day}:',
         'feed.topic_updated': 'Тема для дня {day} обновлена:',
         'feed.ask_details': 'Хотите узнать подробнее? Задайте вопрос!',
+        'feed.digest_partial': 'Не удалось подготовить: {topics}. Откройте дайджест позже — допишем.',
         'buttons.keep_topic': 'Оставить как есть',
         'buttons.write_fixation': 'Написать фиксацию',
         'buttons.get_digest': 'Получить дайджест',
@@ -556,6 +563,7 @@ TRANSLATIONS = {
         'feed.enter_new_topic': 'Enter new topic for day {day}:',
         'feed.topic_updated': 'Topic for day {day} updated:',
         'feed.ask_details': 'Want to learn more? Ask a question!',
+        'feed.digest_partial': "Couldn't prepare: {topics}. Open the digest later and we'll add it.",
         'buttons.keep_topic': 'Keep as is',
         'buttons.write_fixation': 'Write fixation',
         'buttons.get_digest': 'Get digest',
@@ -834,6 +842,7 @@ TRANSLATIONS = {
         'feed.enter_new_topic': 'Ingresa nuevo tema para el día {day}:',
         'feed.topic_updated': 'Tema para el día {day} actualizado:',
         'feed.ask_details': '¿Quieres saber más? ¡Haz una pregunta!',
+        'feed.digest_partial': 'No se pudo preparar: {topics}. Abre el resumen más tarde y lo completaremos.',
         'buttons.keep_topic': 'Mantener así',
         'buttons.write_fixation': 'Escribir fijación',
         'buttons.get_digest': 'Obtener resumen',
@@ -879,6 +888,58 @@ def get_language_name(lang: str) -> str:
     return LANGUAGE_NAMES.get(lang, lang)
 
 
+# ============= СКОМПИЛИРОВАННЫЕ КАТАЛОГИ =============
+# Каталоги разворачиваются один раз при импорте: для каждого языка —
+# плоский словарь ключ → текст, где отсутствующие переводы уже заменены
+# русскими. Поля строк с параметрами разобраны заранее (_FIELDS), так что
+# t() — одно обращение к словарю, а форматирование запускается, только
+# если в строке есть поля и переданы все нужные параметры.
+
+DEFAULT_LANGUAGE = 'ru'
+
+# Строка без полей: форматирование не нужно
+_PLAIN = object()
+
+
+def _parse_fields(text: str) -> Optional[frozenset]:
+    """Имена полей строки; None — формат сложнее {name}, оставляем str.format"""
+    try:
+        parsed = list(Formatter().parse(text))
+    except ValueError:
+        return None
+    fields = set()
+    for _, field, spec, conversion in parsed:
+        if field is None:
+            continue
+        if spec or conversion or not field.isidentifier():
+            return None
+        fields.add(field)
+    return frozenset(fields)
+
+
+def _compile_catalogs() -> Tuple[Dict[str, Dict[str, str]], Dict[str, List[str]]]:
+    default = TRANSLATIONS[DEFAULT_LANGUAGE]
+    catalogs = {DEFAULT_LANGUAGE: dict(default)}
+    untranslated = {DEFAULT_LANGUAGE: []}
+    for lang, translations in TRANSLATIONS.items():
+        if lang != DEFAULT_LANGUAGE:
+            catalogs[lang] = {**default, **translations}
+            untranslated[lang] = sorted(set(default) - set(translations))
+    return catalogs, untranslated
+
+
+_CATALOGS, UNTRANSLATED_KEYS = _compile_catalogs()
+_DEFAULT_CATALOG = _CATALOGS[DEFAULT_LANGUAGE]
+_FIELDS: Dict[str, Optional[frozenset]] = {
+    text: _parse_fields(text)
+    for catalog in _CATALOGS.values() for text in catalog.values()
+    if '{' in text or '}' in text
+}
+
+# Запрошенные, но отсутствующие во всех каталогах ключи (ключ → число обращений)
+_unknown_keys: Counter = Counter()
+
+
 def t(key: str, lang: str = 'ru', **kwargs) -> str:
     """
     Получить перевод по ключу
@@ -891,25 +952,67 @@ def t(key: str, lang: str = 'ru', **kwargs) -> str:
     Returns:
         Переведённая строка или ключ если перевод не найден
     """
-    # Получаем словарь переводов для языка
-    translations = TRANSLATIONS.get(lang, TRANSLATIONS['ru'])
-
-    # Получаем перевод
-    text = translations.get(key)
-
-    # Если не найден — пробуем русский
-    if text is None:
-        text = TRANSLATIONS['ru'].get(key)
-
-    # Если всё ещё не найден — возвращаем ключ
+    text = _CATALOGS.get(lang, _DEFAULT_CATALOG).get(key)
     if text is None:
+        _unknown_keys[key] += 1
         return key
 
-    # Форматируем с параметрами
-    if kwargs:
+    if not kwargs:
+        return text
+
+    # Форматируем с параметрами (не хватает параметра — строка как есть)
+    fields = _FIELDS.get(text, _PLAIN)
+    if fields is _PLAIN:
+        return text
+    if fields is None:
         try:
-            text = text.format(**kwargs)
+            return text.format(**kwargs)
         except KeyError:
-            pass
+            return text
+    return text.format_map(kwargs) if fields <= kwargs.keys() else text
 
-    return text
+
+# ============= ОТЧЁТЫ О КЛЮЧАХ =============
+
+_KEY_LITERAL = re.compile(r"""['"]([a-z_]+(?:\.[a-z0-9_]+)+)['"]""")
+_KEY_PREFIX = re.compile(r"""\bf['"]([a-z_]+\.[a-z0-9_.]*)\{""")
+
+
+def missing_keys_report() -> dict:
+    """Непереведённые ключи по языкам (подставлен русский) и запрошенные несуществующие ключи"""
+    return {
+        'untranslated': {lang: keys for lang, keys in UNTRANSLATED_KEYS.items() if keys},
+        'unknown': dict(_unknown_keys.most_common()),
+    }
+
+
+def unused_keys(root: Optional[Path] = None) -> List[str]:
+    """Ключи каталога, которые не встречаются в коде
+
+    Ключ считается использованным, если встречается строковым литералом
+    или начинается с префикса f-строки вида t(f'bloom.level_{k}_short').
+    """
+    root = Path(root) if root else Path(__file__).resolve().parent
+    used, prefixes = set(), set()
+    for path in root.rglob('*.py'):
+        if path.name == 'locales.py' or 'tests' in path.parts:
+            continue
+        try:
+            source = path.read_text(encoding='utf-8')
+        except (OSError, UnicodeDecodeError):
+            continue
+        used.update(_KEY_LITERAL.findall(source))
+        prefixes.update(_KEY_PREFIX.findall(source))
+    prefixes = tuple(prefixes)
+    return sorted(key for key in _DEFAULT_CATALOG
+                  if key not in used and not key.startswith(prefixes))
+
+
+if __name__ == '__main__':
+    report = missing_keys_report()
+    for lang, keys in report['untranslated'].items():
+        print(f"[{lang}] без перевода ({len(keys)}): {', '.join(keys)}")
+    unused = unused_keys()
+    print(f"Не используются в коде ({len(unused)}):")
+    for key in unused:
+        print(f"  {key}")
@@ -0,0 +1,13 @@
+"""
+Общие заглушки для тестов.
+"""
+
+
+class FakeClock:
+    """Ручные часы: подставляются вместо time.monotonic, время двигают через now"""
+
+    def __init__(self, now: float = 0.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
@@ -0,0 +1 @@
+# tests/retrieval_eval package
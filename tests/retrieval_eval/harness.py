@@ -0,0 +1,287 @@
+#!/usr/bin/env python3
+"""
+Офлайн-оценка retrieval: качество и скорость на записанных ответах MCP.
+
+Набор вопросов (questions.yaml) размечен релевантными источниками.
+Команда record один раз прогоняет по сети все запросы, которые pipeline
+может отправить для вопроса (базовый, все расширения, fallback), и
+сохраняет ответы MCP в fixtures/. Команда replay (по умолчанию) гоняет
+вопросы через EnhancedRetrieval с клиентами, отвечающими из фикстур,
+— без сети, поэтому работает в CI.
+
+Отчёт:
+- recall@k — доля размеченных источников в первых k результатах
+- число MCP-вызовов (HTTP-запросов) и запросов в них
+- процессорное время по этапам: expand, parse, score, dedup, format
+
+Использование:
+    python -m tests.retrieval_eval.harness              # replay
+    python -m tests.retrieval_eval.harness record       # запись (нужна сеть)
+
+Опции:
+    --k             Глубина для recall@k (по умолчанию 5)
+    --repeat        Повторов на вопрос для устойчивого замера CPU
+    --json          Вывод в JSON формате
+
+После изменения TERM_RELATIONS или RetrievalConfig запросы, которых нет
+в фикстурах, отвечаются пустым списком и попадают в отчёт как missing —
+тогда фикстуры нужно перезаписать.
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+import tempfile
+from dataclasses import dataclass, field, asdict
+from datetime import datetime
+from pathlib import Path
+from typing import List, Dict
+
+import yaml
+
+EVAL_DIR = Path(__file__).parent
+QUESTIONS_PATH = EVAL_DIR / "questions.yaml"
+FIXTURES_PATH = EVAL_DIR / "fixtures" / "mcp_responses.json"
+
+
+# =============================================================================
+# КЛИЕНТЫ: ЗАПИСЬ И ВОСПРОИЗВЕДЕНИЕ
+# =============================================================================
+
+class ReplayClient:
+    """MCP-клиент, отвечающий из фикстур (интерфейс как у MCPClient)"""
+
+    def __init__(self, name: str, responses: Dict[str, list]):
+        self.name = name
+        self.responses = responses
+        self.calls = 0          # HTTP-запросов (batch — один запрос)
+        self.queries = 0        # поисковых запросов внутри них
+        self.missing: List[str] = []
+
+    def _replay(self, queries: List[str]) -> List[list]:
+        self.calls += 1
+        self.queries += len(queries)
+        batches = []
+        for query in queries:
+            if query not in self.responses:
+                self.missing.append(query)
+            batches.append(self.responses.get(query, []))
+        return batches
+
+    async def semantic_search_many(self, queries: List[str], lang: str = "ru", limit: int = 5,
+                                   sort_by: str = None) -> List[list]:
+        return [batch[:limit] for batch in self._replay(queries)]
+
+    async def search_many(self, queries: List[str], limit: int = 5) -> List[list]:
+        return [batch[:limit] for batch in self._replay(queries)]
+
+    def reset(self):
+        self.calls = self.queries = 0
+        self.missing = []
+
+
+def load_questions(path: Path = QUESTIONS_PATH) -> List[dict]:
+    """Вопросы с разметкой: id, question, relevant (подстроки имён источников)"""
+    with open(path, 'r', encoding='utf-8') as f:
+        return yaml.safe_load(f)['questions']
+
+
+def load_fixtures(path: Path = FIXTURES_PATH) -> dict:
+    """Записанные ответы: {"guides": {запрос: [...]}, "knowledge": {...}}"""
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def all_queries(retrieval, question: str) -> List[str]:
+    """Все запросы, которые pipeline может отправить по вопросу"""
+    queries = [question] + [q for q, _, _ in retrieval.expander.candidates(question)]
+    queries += retrieval.fallback.generate_fallback_queries(question, [question])
+    return list(dict.fromkeys(queries))
+
+
+async def record(questions: List[dict], path: Path = FIXTURES_PATH) -> dict:
+    """Записать ответы живых MCP-серверов для всех запросов набора"""
+    from clients import mcp_guides, mcp_knowledge, close_mcp_clients
+    from engines.shared.retrieval import EnhancedRetrieval
+
+    retrieval = EnhancedRetrieval()
+    config = retrieval.config
+    queries = list(dict.fromkeys(q for item in questions for q in all_queries(retrieval, item['question'])))
+
+    try:
+        guides, knowledge = await asyncio.gather(
+            mcp_guides.semantic_search_many(queries, lang="ru", limit=config.guides_limit),
+            mcp_knowledge.search_many(queries, limit=config.knowledge_limit),
+        )
+    finally:
+        await close_mcp_clients()
+
+    fixtures = {
+        "recorded_at": datetime.now().isoformat(timespec='seconds'),
+        "guides": dict(zip(queries, guides)),
+        "knowledge": dict(zip(queries, knowledge)),
+    }
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(fixtures, ensure_ascii=False, indent=1), encoding='utf-8')
+    return fixtures
+
+
+# =============================================================================
+# ОЦЕНКА
+# =============================================================================
+
+@dataclass
+class QuestionResult:
+    """Результат по одному вопросу"""
+    id: str
+    recall: float
+    found: List[str]
+    sources: List[str]
+    mcp_calls: int
+    mcp_queries: int
+    missing: List[str] = field(default_factory=list)
+
+
+@dataclass
+class EvalReport:
+    """Сводный отчёт"""
+    k: int
+    questions: List[QuestionResult] = field(default_factory=list)
+    stage_cpu_ms: Dict[str, float] = field(default_factory=dict)   # на один прогон вопроса
+
+    @property
+    def recall_at_k(self) -> float:
+        return sum(q.recall for q in self.questions) / len(self.questions) if self.questions else 0.0
+
+    @property
+    def mcp_calls(self) -> int:
+        return sum(q.mcp_calls for q in self.questions)
+
+    @property
+    def missing(self) -> int:
+        return sum(len(q.missing) for q in self.questions)
+
+    def to_dict(self) -> dict:
+        return {
+            "k": self.k,
+            "recall_at_k": round(self.recall_at_k, 3),
+            "mcp_calls": self.mcp_calls,
+            "missing": self.missing,
+            "stage_cpu_ms": {s: round(ms, 3) for s, ms in self.stage_cpu_ms.items()},
+            "questions": [asdict(q) for q in self.questions],
+        }
+
+    def format(self) -> str:
+        lines = [f"recall@{self.k}: {self.recall_at_k:.2f}   MCP-вызовов: {self.mcp_calls}   "
+                 f"нет в фикстурах: {self.missing}", ""]
+        for q in self.questions:
+            mark = "✅" if q.recall == 1.0 else "⚠️"
+            lines.append(f"{mark} {q.id}: recall {q.recall:.2f}, вызовов {q.mcp_calls} "
+                         f"({q.mcp_queries} запросов)")
+            for query in q.missing:
+                lines.append(f"     нет в фикстурах: {query}")
+        lines.append("")
+        lines.append("CPU на вопрос, мс: " + ", ".join(
+            f"{stage} {ms:.3f}" for stage, ms in self.stage_cpu_ms.items()))
+        return "\n".join(lines)
+
+
+def recall_at_k(sources: List[str], relevant: List[str], k: int) -> List[str]:
+    """Размеченные источники, найденные среди первых k (подстрока, без учёта регистра)"""
+    top = [s.lower() for s in sources[:k]]
+    return [label for label in relevant if any(label.lower() in s for s in top)]
+
+
+async def evaluate(questions: List[dict], fixtures: dict, k: int = 5,
+                   config=None, repeat: int = 1) -> EvalReport:
+    """Прогон вопросов через EnhancedRetrieval на записанных ответах
+
+    Статистика корпуса для IDF отключена, статистика расширений —
+    временная, поэтому результат детерминирован и не трогает data/.
+
+    Args:
+        questions: вопросы с разметкой
+        fixtures: записанные ответы MCP
+        k: глубина recall@k
+        config: RetrievalConfig (None — по умолчанию)
+        repeat: повторов на вопрос (для замера CPU)
+    """
+    from engines.shared.retrieval import EnhancedRetrieval
+    from engines.shared.expansion_stats import ExpansionStats
+
+    report = EvalReport(k=k)
+    guides = ReplayClient("guides", fixtures.get("guides", {}))
+    knowledge = ReplayClient("knowledge", fixtures.get("knowledge", {}))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        stats_path = Path(tmp) / "expansion_stats.json"
+        runs = 0
+        total_cpu: Dict[str, float] = {}
+
+        for item in questions:
+            for attempt in range(repeat):
+                retrieval = EnhancedRetrieval(config, guides_client=guides, knowledge_client=knowledge)
+                retrieval.reranker.corpus = None
+                retrieval.expansion_stats = ExpansionStats(stats_path)
+                guides.reset()
+                knowledge.reset()
+
+                results = await retrieval.retrieve(item['question'])
+                with retrieval._stage("format"):
+                    retrieval._format_results(results)
+
+                runs += 1
+                for stage, ms in retrieval.stage_cpu.items():
+                    total_cpu[stage] = total_cpu.get(stage, 0.0) + ms
+
+            sources = [r.source for r in results]
+            found = recall_at_k(sources, item['relevant'], k)
+            report.questions.append(QuestionResult(
+                id=item['id'],
+                recall=len(found) / len(item['relevant']) if item['relevant'] else 1.0,
+                found=found,
+                sources=sources,
+                mcp_calls=guides.calls + knowledge.calls,
+                mcp_queries=guides.queries + knowledge.queries,
+                missing=sorted(set(guides.missing) | set(knowledge.missing)),
+            ))
+
+        report.stage_cpu_ms = {stage: ms / runs for stage, ms in total_cpu.items()} if runs else {}
+    return report
+
+
+def main():
+    """Точка входа."""
+    parser = argparse.ArgumentParser(
+        description='Офлайн-оценка retrieval на записанных ответах MCP'
+    )
+    parser.add_argument(
+        'command',
+        nargs='?',
+        choices=['replay', 'record'],
+        default='replay',
+        help='replay — оценка по фикстурам, record — запись ответов MCP'
+    )
+    parser.add_argument('--k', type=int, default=5, help='Глубина recall@k')
+    parser.add_argument('--repeat', type=int, default=1, help='Повторов на вопрос')
+    parser.add_argument('--json', action='store_true', help='Вывод в JSON формате')
+    args = parser.parse_args()
+
+    questions = load_questions()
+
+    if args.command == 'record':
+        fixtures = asyncio.run(record(questions))
+        print(f"Записано {len(fixtures['guides'])} запросов в {FIXTURES_PATH}")
+        return
+
+    report = asyncio.run(evaluate(questions, load_fixtures(), k=args.k, repeat=args.repeat))
+    if args.json:
+        print(json.dumps(report.to_dict(), ensure_ascii=False, indent=2))
+    else:
+        print(report.format())
+    sys.exit(0 if report.missing == 0 else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+"""
+Тест учёта вызовов LLM/MCP без БД.
+
+Запуск: python -m pytest tests/test_accounting.py -v
+"""
+
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def test_call_scope_and_aggregate():
+    """Тест привязки вызова к контексту и скользящего агрегата"""
+    from clients.accounting import CallAccounting, call_scope, hash_chat_id
+
+    accounting = CallAccounting(batch_size=1000)
+
+    with call_scope(chat_id=42, profile="feed"):
+        with call_scope("feed.digest"):
+            record = accounting.record(
+                "llm", "claude-sonnet-4-20250514", default_site="generate_content",
+                latency_ms=1200,
+                usage={"input_tokens": 1000, "output_tokens": 500, "cache_read_input_tokens": 200},
+            )
+
+    assert record.call_site == "feed.digest"
+    assert record.profile == "feed"
+    assert record.chat_hash == hash_chat_id(42)
+    assert record.chat_hash != "42"
+    # 1000*3 + 500*15 + 200*0.3 = 10560 → $0.01056
+    assert abs(record.cost_usd - 0.01056) < 1e-9
+    print("✅ Контекст вызова и стоимость корректны")
+
+    # Без scope — call site по умолчанию
+    accounting.record("mcp", "MCP-Guides:semantic_search", default_site="semantic_search",
+                      latency_ms=300, outcome="timeout")
+    accounting.record("mcp", "MCP-Guides:semantic_search", default_site="semantic_search",
+                      latency_ms=100)
+
+    # Без scope и без call site по умолчанию — "unknown"
+    assert accounting.record("llm", "claude-sonnet-4-20250514").call_site == "unknown"
+
+    stats = accounting.get_stats()
+    assert stats["llm:feed.digest"]["calls"] == 1
+    assert stats["mcp:semantic_search"]["calls"] == 2
+    assert stats["mcp:semantic_search"]["errors"] == 1
+    assert stats["mcp:semantic_search"]["p95_ms"] == 300
+    print("✅ Агрегат по call site корректен")
+
+
+def test_format_report():
+    """Тест форматирования CLI-отчёта"""
+    from clients.accounting import format_report
+
+    report = format_report([{
+        "kind": "llm", "call_site": "generate_multi_topic_digest", "calls": 10, "errors": 1,
+        "input_tokens": 20000, "output_tokens": 15000, "cache_read_tokens": 0,
+        "cost_usd": 0.285, "p50_ms": 8000.0, "p95_ms": 15000.0,
+    }])
+    assert "generate_multi_topic_digest" in report
+    assert "$0.28" in report or "$0.29" in report
+    print("✅ Отчёт сформирован")
+
+
+if __name__ == "__main__":
+    test_call_scope_and_aggregate()
+    test_format_report()
+    print("\n✅ Все тесты пройдены!")
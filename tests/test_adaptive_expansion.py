@@ -0,0 +1,90 @@
+"""
+Тест адаптивного расширения запросов (без сети).
+
+Запуск: python -m pytest tests/test_adaptive_expansion.py -v
+"""
+
+import sys
+import os
+import asyncio
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def make_retrieval(tmp, corpus):
+    """EnhancedRetrieval, у которого MCP заменён словарём запрос → тексты"""
+    from engines.shared.retrieval import EnhancedRetrieval, RetrievalResult
+    from engines.shared.expansion_stats import ExpansionStats
+
+    class FakeRetrieval(EnhancedRetrieval):
+        def __init__(self):
+            super().__init__()
+            self.rounds = []
+            self.reranker.corpus = None
+            self.expansion_stats = ExpansionStats(Path(tmp) / "expansion.json", min_attempts=3)
+
+        async def _search_both_sources(self, queries):
+            self.rounds.append(list(queries))
+            results = []
+            for query in queries:
+                for text in corpus(query):
+                    results.append(RetrievalResult(text=text, source=query, source_type="guides", query=query))
+            return results
+
+    return FakeRetrieval()
+
+
+FILLER = " Это подробный фрагмент руководства с примерами и пояснениями для практики."
+
+
+def test_early_exit_when_base_query_is_enough():
+    """Базовый запрос покрыл вопрос — расширения в MCP не уходят"""
+    def corpus(query):
+        return [f"Прокрастинация {i}: откладывание дел и как с ним работать.{FILLER}" for i in range(4)]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        retrieval = make_retrieval(tmp, corpus)
+        context, _ = asyncio.run(retrieval.search("прокрастинация откладывание"))
+
+        assert len(retrieval.rounds) == 1 and len(retrieval.rounds[0]) == 1
+        assert "Прокрастинация" in context
+    print("✅ Достаточный базовый запрос — один раунд, один запрос")
+
+
+def test_expansions_learn_usefulness():
+    """Слабый базовый запрос — расширения; бесполезное расширение со временем отключается"""
+    def corpus(query):
+        if query.endswith("избегание"):
+            return [f"Избегание как форма прокрастинации: почему мы тянем время.{FILLER}",
+                    f"Избегание трудных задач и прокрастинация: что делать с тревогой.{FILLER}"]
+        return []
+
+    with tempfile.TemporaryDirectory() as tmp:
+        retrieval = make_retrieval(tmp, corpus)
+        question = "прокрастинация"
+
+        asyncio.run(retrieval.search(question))
+        assert len(retrieval.rounds) == 2, "Слабое покрытие — второй раунд с расширениями"
+        assert retrieval.rounds[1] == ["прокрастинация откладывание", "прокрастинация избегание"]
+
+        stats = retrieval.expansion_stats
+        assert stats.usefulness("прокрастинация", "избегание") > stats.usefulness("прокрастинация", "откладывание")
+
+        for _ in range(5):
+            asyncio.run(retrieval.search(question))
+        assert stats.is_useless("прокрастинация", "откладывание")
+        assert "прокрастинация откладывание" not in retrieval.rounds[-1]
+        assert "прокрастинация избегание" in retrieval.rounds[-1]
+
+        assert stats.pending and not (Path(tmp) / "expansion.json").exists(), "Поиск не пишет на диск"
+        asyncio.run(stats.flush())
+        assert (Path(tmp) / "expansion.json").exists() and not stats.pending
+    print("✅ Полезность расширений учится по исходам")
+
+
+if __name__ == "__main__":
+    test_early_exit_when_base_query_is_enough()
+    test_expansions_learn_usefulness()
+    print("\n✅ Все тесты пройдены!")
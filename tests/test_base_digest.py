@@ -0,0 +1,177 @@
+"""
+Тест двухслойного дайджеста: общие базовые тексты тем и персональный слой.
+
+Запуск: python -m pytest tests/test_base_digest.py -v
+"""
+
+import sys
+import os
+import asyncio
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class FakeBaseDigestDB:
+    """feed_base_digests в памяти"""
+
+    def __init__(self):
+        self.rows = {}
+        self.saved = 0
+
+    async def get_base_digests(self, cache_keys, max_age_days):
+        found = {}
+        for key in cache_keys:
+            row = self.rows.get(key)
+            if row:
+                row['hits'] += 1
+                found[key] = {'cache_key': key, 'content': row['content'], 'tokens': row['tokens']}
+        return found
+
+    async def save_base_digest(self, cache_key, topic, depth_level, language, duration_bucket, content, tokens):
+        self.saved += 1
+        self.rows[cache_key] = {'topic': topic, 'content': content, 'tokens': tokens, 'hits': 0}
+
+
+def use_fake_db(module, db):
+    original = module.get_base_digests, module.save_base_digest
+    module.get_base_digests = db.get_base_digests
+    module.save_base_digest = db.save_base_digest
+    return original
+
+
+def test_keys_and_single_flight():
+    """Ключ не зависит от регистра темы; одновременные промахи ждут одну генерацию"""
+    from engines.feed import base_digest
+    from engines.feed.base_digest import BaseDigestCache, base_digest_key, duration_bucket
+
+    assert duration_bucket(5) == 4 and duration_bucket(1) == 2 and duration_bucket(30) == 12
+    key = base_digest_key("Роли  и должности", 2, 'ru', 4)
+    assert key == base_digest_key("роли и должности", 2, 'ru', 4)
+    assert key != base_digest_key("роли и должности", 2, 'en', 4)
+    assert key != base_digest_key("роли и должности", 3, 'ru', 4)
+
+    db = FakeBaseDigestDB()
+    original = use_fake_db(base_digest, db)
+    try:
+        cache = BaseDigestCache()
+        builds = []
+
+        async def build():
+            builds.append(1)
+            await asyncio.sleep(0.01)
+            return "Базовый текст", 500
+
+        async def run():
+            assert await cache.lookup([key]) == {}
+            texts = await asyncio.gather(*(cache.fill(key, build, "Роли", 2, 'ru', 4) for _ in range(3)))
+            assert texts == ["Базовый текст"] * 3
+            assert await cache.lookup([key, key]) == {key: "Базовый текст"}
+
+        asyncio.run(run())
+    finally:
+        base_digest.get_base_digests, base_digest.save_base_digest = original
+
+    assert len(builds) == 1 and db.saved == 1
+    stats = cache.get_stats()
+    assert stats['generated'] == 1 and stats['joined'] == 2 and stats['hits'] == 1
+    assert stats['tokens_spent'] == 500 and stats['tokens_saved'] == 1500
+    print("✅ Один базовый текст на ключ, экономия учитывается")
+
+
+def test_second_reader_pays_only_overlay():
+    """Второй читатель тех же тем получает базовые тексты из кэша и свои примеры"""
+    from engines.feed import planner, base_digest
+    from clients.context_gather import GatheredContext
+
+    db = FakeBaseDigestDB()
+    calls = []
+
+    async def fake_generate(system_prompt, user_prompt):
+        if 'Верни JSON' in system_prompt:
+            calls.append('overlay')
+            occupation = 'врач' if 'врач' in system_prompt else 'аналитик'
+            return ('{"intro": "Привет", "examples": ["Пример для %s", "Ещё для %s"], '
+                    '"reflection_prompt": "Что дальше?"}' % (occupation, occupation))
+        topic = next(t for t in ('Роли', 'Метод') if f"«{t}»" in system_prompt)
+        assert 'аналитик' not in system_prompt and 'врач' not in system_prompt
+        calls.append(topic)
+        return f"Про {topic}"
+
+    async def fake_gather(requests, max_chars=None):
+        return GatheredContext()
+
+    original_db = use_fake_db(base_digest, db)
+    original = (planner.claude.generate, planner.gather_context,
+                planner.FEED_BASE_DIGEST_ENABLED, base_digest._cache)
+    planner.claude.generate = fake_generate
+    planner.gather_context = fake_gather
+    planner.FEED_BASE_DIGEST_ENABLED = True
+    base_digest._cache = None
+    try:
+        async def run():
+            first = await planner.generate_multi_topic_digest(
+                ['Роли', 'Метод'], {'name': 'Аня', 'occupation': 'аналитик', 'language': 'ru'},
+                duration=10, depth_level=2,
+            )
+            second = await planner.generate_multi_topic_digest(
+                ['Роли', 'метод'], {'name': 'Олег', 'occupation': 'врач', 'language': 'ru'},
+                duration=10, depth_level=2,
+            )
+            return first, second
+
+        first, second = asyncio.run(run())
+        stats = base_digest.get_base_digest_cache().get_stats()
+    finally:
+        base_digest.get_base_digests, base_digest.save_base_digest = original_db
+        (planner.claude.generate, planner.gather_context,
+         planner.FEED_BASE_DIGEST_ENABLED, base_digest._cache) = original
+
+    assert sorted(calls[:2]) == ['Метод', 'Роли'] and calls[2:] == ['overlay', 'overlay']
+    assert first['main_content'] == "Про Роли\n\n👉 Пример для аналитик\n\nПро Метод\n\n👉 Ещё для аналитик"
+    assert second['main_content'] == "Про Роли\n\n👉 Пример для врач\n\nПро Метод\n\n👉 Ещё для врач"
+    assert second['intro'] == "Привет" and second['reflection_prompt'] == "Что дальше?"
+    assert stats['hits'] == 2 and stats['misses'] == 2 and stats['hit_rate'] == 0.5
+    assert stats['tokens_saved'] == stats['tokens_spent'] > 0
+    print(f"✅ Второй читатель: только персональный слой, сэкономлено ~{stats['tokens_saved']} токенов")
+
+
+def test_failed_base_text_marks_partial():
+    """Тема без базового текста не теряется молча: дайджест помечен как неполный"""
+    from engines.feed import planner, base_digest
+    from clients.context_gather import GatheredContext
+
+    async def fake_generate(system_prompt, user_prompt):
+        if 'Верни JSON' in system_prompt:
+            return '{"intro": "Привет", "examples": ["Пример"]}'
+        return "Про Роли" if "«Роли»" in system_prompt else None
+
+    async def fake_gather(requests, max_chars=None):
+        return GatheredContext()
+
+    original_db = use_fake_db(base_digest, FakeBaseDigestDB())
+    original = (planner.claude.generate, planner.gather_context,
+                planner.FEED_BASE_DIGEST_ENABLED, base_digest._cache)
+    planner.claude.generate = fake_generate
+    planner.gather_context = fake_gather
+    planner.FEED_BASE_DIGEST_ENABLED = True
+    base_digest._cache = None
+    try:
+        content = asyncio.run(planner.generate_multi_topic_digest(
+            ['Роли', 'Метод'], {'name': 'Аня', 'occupation': 'аналитик', 'language': 'ru'},
+            duration=10, depth_level=2,
+        ))
+    finally:
+        base_digest.get_base_digests, base_digest.save_base_digest = original_db
+        (planner.claude.generate, planner.gather_context,
+         planner.FEED_BASE_DIGEST_ENABLED, base_digest._cache) = original
+
+    assert content['main_content'] == "Про Роли\n\n👉 Пример"
+    assert content['partial'] is True and content['missing_topics'] == ['Метод']
+    print("✅ Неполный двухслойный дайджест помечается")
+
+
+if __name__ == "__main__":
+    test_keys_and_single_flight()
+    test_second_reader_pays_only_overlay()
+    test_failed_base_text_marks_partial()
+    print("\n✅ Все тесты пройдены!")
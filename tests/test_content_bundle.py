@@ -0,0 +1,118 @@
+"""
+Тест пакета контента (knowledge_structure.yaml + topics/*.yaml).
+
+Запуск: python -m pytest tests/test_content_bundle.py -v
+"""
+
+import sys
+import os
+import shutil
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+ROOT = Path(__file__).parent.parent
+
+
+def copy_sources(tmp: Path):
+    shutil.copy(ROOT / "knowledge_structure.yaml", tmp)
+    shutil.copytree(ROOT / "topics", tmp / "topics")
+    return {'structure_path': tmp / "knowledge_structure.yaml", 'topics_dir': tmp / "topics"}
+
+
+def test_bundle_roundtrip_and_staleness():
+    """Пакет совпадает с YAML, а после правки исходника считается устаревшим"""
+    from core.content import build_bundle, load_bundle
+    from core.topics import load_yaml
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        sources = copy_sources(tmp)
+        bundle_path = tmp / "content.bundle"
+
+        built = build_bundle(bundle_path, **sources)
+        loaded = load_bundle(bundle_path, **sources)
+
+        assert loaded['knowledge_structure'] == load_yaml(sources['structure_path'])
+        assert loaded['topics']["1-1-four-states.yaml"]['id'] == "day-1-theory"
+        assert {t['id'] for t in loaded['topics'].values() if t['day'] == 1} == {"day-1-theory", "day-1-practice"}
+        assert set(built['topic_errors']) | set(built['topics']) == {
+            p.name for p in sources['topics_dir'].glob("[!_]*.yaml")}
+
+        topic = sources['topics_dir'] / "2-1-ease-trap.yaml"
+        topic.write_text(topic.read_text(encoding='utf-8') + "\n# правка\n", encoding='utf-8')
+        assert load_bundle(bundle_path, **sources) is None
+    print("✅ Пакет совпадает с YAML и отслеживает изменения исходников")
+
+
+def test_registry_uses_preloaded_topics():
+    """Реестр берёт темы из пакета без разбора YAML"""
+    from core.topics import TopicRegistry
+
+    class CountingRegistry(TopicRegistry):
+        parsed = 0
+
+        def _load_topic(self, name):
+            CountingRegistry.parsed += 1
+            return super()._load_topic(name)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        sources = copy_sources(Path(tmp))
+        from core.content import compile_content
+        content = compile_content(**sources)
+
+        registry = CountingRegistry(sources['topics_dir'], preloaded=content['topics'])
+        assert len(registry) == len(content['topics'])
+        assert CountingRegistry.parsed == len(content['topic_errors'])
+    print("✅ Реестр тем заполняется из пакета")
+
+
+def test_indexes_match_rebuilt():
+    """Индексы пакета совпадают с тем, что реестр и марафон строят сами"""
+    from core.topics import TopicRegistry
+    from core.curriculum import MarathonCurriculum, marathon_order, curriculum_masks
+
+    class NoRebuildRegistry(TopicRegistry):
+        rebuilt = 0
+
+        def _rebuild(self):
+            NoRebuildRegistry.rebuilt += 1
+            super()._rebuild()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        sources = copy_sources(Path(tmp))
+        from core.content import compile_content
+        content = compile_content(**sources)
+        indexes = content['indexes']
+
+        indexed = NoRebuildRegistry(sources['topics_dir'], preloaded=content['topics'],
+                                    preloaded_index=indexes)
+        assert NoRebuildRegistry.rebuilt == 0
+        rebuilt = TopicRegistry(sources['topics_dir'])
+        for day in range(0, 16):
+            assert [t['id'] for t in indexed.by_day(day)] == [t['id'] for t in rebuilt.by_day(day)]
+        for topic in rebuilt.all():
+            assert indexed.get(topic['id']) == topic
+
+        structure_topics = content['knowledge_structure']['topics']
+        assert indexes['marathon_order'] == marathon_order(structure_topics)
+        topics = [structure_topics[i] for i in indexes['marathon_order']]
+        from_bundle = MarathonCurriculum(topics, masks=indexes['curriculum'])
+        computed = MarathonCurriculum(topics)
+        assert from_bundle.day_masks == computed.day_masks == curriculum_masks(topics)['day_masks']
+        assert from_bundle.type_masks == computed.type_masks
+        assert from_bundle.week_masks == computed.week_masks
+
+        # Индекс от другого набора тем не применяется
+        NoRebuildRegistry(sources['topics_dir'], preloaded_index={
+            'topic_file_by_id': {}, 'topic_files_by_day': {1: ["1-1-four-states.yaml"]}})
+        assert NoRebuildRegistry.rebuilt == 1
+    print("✅ Индексы пакета совпадают с перестроенными")
+
+
+if __name__ == "__main__":
+    test_bundle_roundtrip_and_staleness()
+    test_registry_uses_preloaded_topics()
+    test_indexes_match_rebuilt()
+    print("\n✅ Все тесты пройдены!")
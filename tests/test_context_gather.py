@@ -0,0 +1,80 @@
+"""
+Тест параллельного сбора контекста с дедлайном (без сети).
+
+Запуск: python -m pytest tests/test_context_gather.py -v
+"""
+
+import sys
+import os
+import json
+import asyncio
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class FakeSearchClient:
+    """Клиент с заданной задержкой ответа"""
+
+    def __init__(self, delay: float, texts):
+        self.delay = delay
+        self.texts = texts
+
+    async def semantic_search(self, query, lang="ru", limit=5, sort_by=None):
+        await asyncio.sleep(self.delay)
+        return [{"text": t, "created_at": "2026-01-01"} for t in self.texts[:limit]]
+
+
+def test_deadline_returns_partial_context():
+    """Медленный источник отсекается дедлайном, быстрые запросы идут параллельно"""
+    from clients.context_gather import gather_context, SearchRequest
+
+    fast = FakeSearchClient(0.05, ["Роль — функциональное место в системе.", "Метод — способ действия."])
+    slow = FakeSearchClient(1.0, ["Пост, который не успеет."])
+
+    requests = [SearchRequest(fast, f"запрос {i}", "guides", limit=2) for i in range(3)]
+    requests.append(SearchRequest(slow, "свежие посты", "knowledge", limit=1))
+
+    started = time.perf_counter()
+    gathered = asyncio.run(gather_context(requests, deadline=0.3))
+    elapsed = time.perf_counter() - started
+
+    assert elapsed < 0.6, f"Сбор должен уложиться в дедлайн, занял {elapsed:.2f}с"
+    # 3 запроса × 2 одинаковых текста → 2 уникальных фрагмента
+    assert [f.text for f in gathered.fragments] == fast.texts
+    assert gathered.completed == {"guides": 3}
+    assert gathered.timed_out == {"knowledge": 1}
+    assert 0 < gathered.timings["guides"] < 300
+    print("✅ Дедлайн отсекает медленный источник, дубликаты убраны")
+
+
+def test_late_response_warms_cache():
+    """Запрос, опоздавший к дедлайну, всё равно попадает в кеш MCPClient"""
+    from clients.context_gather import gather_context, SearchRequest
+    from clients.mcp import MCPClient
+    from clients.mcp_cache import MCPCache
+
+    class SlowClient(MCPClient):
+        async def _call_remote(self, tool_name, arguments):
+            await asyncio.sleep(0.2)
+            text = json.dumps([{"text": "Поздний ответ про системное мышление"}], ensure_ascii=False)
+            return {"content": [{"type": "text", "text": text}]}
+
+    client = SlowClient("http://stub", "Stub-Slow", cache=MCPCache(ttl={"semantic_search": 60}))
+
+    async def scenario():
+        gathered = await gather_context([SearchRequest(client, "системное мышление", "guides")], deadline=0.05)
+        assert not gathered.fragments
+        await asyncio.sleep(0.3)
+        # Следующий урок получает результат из кеша мгновенно
+        gathered = await gather_context([SearchRequest(client, "системное мышление", "guides")], deadline=0.05)
+        assert gathered.fragments and gathered.fragments[0].text.startswith("Поздний ответ")
+
+    asyncio.run(scenario())
+    print("✅ Опоздавший ответ прогревает кеш")
+
+
+if __name__ == "__main__":
+    test_deadline_returns_partial_context()
+    test_late_response_warms_cache()
+    print("\n✅ Все тесты пройдены!")
@@ -0,0 +1,65 @@
+"""
+Тест упаковки контекста в бюджет токенов (без сети).
+
+Запуск: python -m pytest tests/test_context_packer.py -v
+"""
+
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+SENTENCE = "Системное мышление помогает видеть роли и связи между ними. "
+
+
+def test_pack_respects_budget_and_order():
+    """Упаковка не превышает бюджет и сохраняет исходный порядок и источники"""
+    from core.context_packer import PackItem, pack
+
+    items = [
+        PackItem(text=SENTENCE * 10, source="a", group="guides", score=1.0),
+        PackItem(text=SENTENCE, source="b", group="knowledge", score=0.9, prefix="[2026-01-01] "),
+        PackItem(text=SENTENCE * 30, source="c", group="guides", score=0.2),
+    ]
+    packed = pack(items, budget=250)
+
+    assert packed.tokens <= 250
+    assert [i.source for i in packed.items][:2] == ["a", "b"]
+    assert packed.texts("knowledge") == ["[2026-01-01] " + SENTENCE]
+    print(f"✅ {packed.tokens}/{packed.budget} токенов, отброшено {packed.dropped}")
+
+
+def test_trim_at_sentence_boundary():
+    """Не влезающий фрагмент режется по концу предложения"""
+    from core.context_packer import PackItem, pack, trim_to_chars, estimate_tokens
+
+    text = SENTENCE * 20
+    packed = pack([PackItem(text=text, score=1.0)], budget=estimate_tokens(SENTENCE * 5))
+    item = packed.items[0]
+
+    assert item.trimmed and item.text.endswith(".")
+    assert len(item.text) < len(text)
+
+    trimmed = trim_to_chars(text, 150)
+    assert len(trimmed) <= 150 and trimmed.endswith(".")
+    print("✅ Обрезка по границе предложения")
+
+
+def test_dense_fragments_win():
+    """При нехватке бюджета выигрывают фрагменты с лучшей релевантностью на токен"""
+    from core.context_packer import pack_texts, estimate_tokens
+
+    texts = [SENTENCE * 40, "Короткий, но точный ответ про роли.", SENTENCE]
+    packed = pack_texts(texts, budget=estimate_tokens(SENTENCE) * 3)
+
+    assert texts[1] in packed and texts[2] in packed
+    assert texts[0] not in packed
+    print("✅ Плотные фрагменты отбираются первыми")
+
+
+if __name__ == "__main__":
+    test_pack_respects_budget_and_order()
+    test_trim_at_sentence_boundary()
+    test_dense_fragments_win()
+    print("\n✅ Все тесты пройдены!")
@@ -0,0 +1,75 @@
+"""
+Тест ограниченной памяти диалога (LRU + TTL, write-through).
+
+Запуск: python -m pytest tests/test_conversation_memory.py -v
+"""
+
+import sys
+import os
+import asyncio
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tests.helpers import FakeClock
+
+
+def make_loader(calls):
+    async def loader(chat_id, limit=5):
+        calls.append(chat_id)
+        return [{'question': f"Вопрос {chat_id}", 'answer': "Ответ " * 10, 'context_topic': "Тема"}]
+    return loader
+
+
+def test_write_through_without_db_reads():
+    """Новый Q&A дописывается в загруженную историю, БД не перечитывается"""
+    from engines.shared.context import ConversationMemory
+
+    calls = []
+    memory = ConversationMemory(max_items=3)
+    loader = make_loader(calls)
+
+    asyncio.run(memory.load_history(1, loader))
+    memory.remember_qa(1, "Что такое собранность?", "Ответ", "Собранность")
+    memory.remember_qa(2, "Чужой вопрос", "Ответ")  # история не загружена — не создаём
+    history = asyncio.run(memory.load_history(1, loader))
+
+    assert calls == [1]
+    assert [i.question for i in history] == ["Вопрос 1", "Что такое собранность?"]
+    assert memory.get_stats()['entries'] == 1 and memory.get_stats()['hits'] == 1
+
+    memory.set_summary(1, "- собранность", 7)
+    memory.clear()
+    asyncio.run(memory.load_history(1, loader))
+    assert memory.get_summary(1) == '' and memory.get_summary_last_id(1) == 0
+    print("✅ Write-through без повторного чтения из БД")
+
+
+def test_lru_ttl_and_memory_cap():
+    """Старые и давно не используемые истории вытесняются, память ограничена"""
+    from engines.shared.context import ConversationMemory
+
+    calls = []
+    clock = FakeClock()
+    memory = ConversationMemory(max_chats=2, max_bytes=10_000, ttl=60, clock=clock)
+    loader = make_loader(calls)
+
+    for chat_id in (1, 2, 3):
+        asyncio.run(memory.load_history(chat_id, loader))
+    stats = memory.get_stats()
+    assert stats['entries'] == 2 and stats['evictions'] == 1
+
+    clock.now = 61
+    asyncio.run(memory.load_history(3, loader))
+    assert memory.get_stats()['expirations'] == 1 and calls == [1, 2, 3, 3]
+
+    small = ConversationMemory(max_bytes=100, clock=clock)
+    for chat_id in range(10):
+        asyncio.run(small.load_history(chat_id, loader))
+    assert small.get_stats()['bytes'] <= 100
+    print(f"✅ LRU + TTL, счётчики: {memory.get_stats()}")
+
+
+if __name__ == "__main__":
+    test_write_through_without_db_reads()
+    test_lru_ttl_and_memory_cap()
+    print("\n✅ Все тесты пройдены!")
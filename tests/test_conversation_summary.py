@@ -0,0 +1,113 @@
+"""
+Тест скользящего конспекта вопросов (без БД и LLM).
+
+Запуск: python -m pytest tests/test_conversation_summary.py -v
+"""
+
+import sys
+import os
+import asyncio
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def make_summarizer(turns, store):
+    from engines.shared.conversation_summary import ConversationSummarizer
+
+    class FakeSummarizer(ConversationSummarizer):
+        def __init__(self):
+            super().__init__(recent_turns=2, batch=2, max_chars=300)
+            self.prompts = []
+
+        async def _load_summary(self, chat_id):
+            return store.get(chat_id)
+
+        async def _load_turns(self, chat_id, after_id):
+            return [t for t in turns if t['id'] > after_id]
+
+        async def _save_summary(self, chat_id, summary, last_qa_id, count):
+            store[chat_id] = {'summary': summary, 'last_qa_id': last_qa_id, 'turns': count}
+
+        async def _generate(self, summary, fold):
+            self.prompts.append([t['id'] for t in fold])
+            return (summary + " " if summary else "") + "; ".join(t['question'] for t in fold)
+
+    return FakeSummarizer()
+
+
+def turn(i):
+    return {'id': i, 'question': f"Вопрос {i}", 'answer': f"Ответ {i}", 'context_topic': ''}
+
+
+def test_rolling_summary_folds_old_turns():
+    """В конспект уходят ходы старше двух последних, каждый один раз"""
+    turns, store = [turn(i) for i in range(1, 4)], {}
+    summarizer = make_summarizer(turns, store)
+
+    assert asyncio.run(summarizer.update(1)) is None, "Один старый ход — ещё рано сворачивать"
+
+    turns.append(turn(4))
+    assert asyncio.run(summarizer.update(1)) == "Вопрос 1; Вопрос 2"
+    assert store[1]['last_qa_id'] == 2 and store[1]['turns'] == 2
+
+    turns.extend([turn(5), turn(6)])
+    summary = asyncio.run(summarizer.update(1))
+    assert summarizer.prompts == [[1, 2], [3, 4]]
+    assert summary == "Вопрос 1; Вопрос 2 Вопрос 3; Вопрос 4"
+    print("✅ Конспект копится инкрементально")
+
+
+def test_prompt_size_is_constant():
+    """В промпт идут конспект и последние ходы, сколько бы ни было вопросов"""
+    from engines.shared.context import (
+        DynamicContext, DynamicContextBuilder, ConversationItem, QA_RECENT_TURNS,
+    )
+    from datetime import datetime
+
+    builder = DynamicContextBuilder()
+    sizes = []
+    for total in (3, 30, 300):
+        history = [ConversationItem(f"Вопрос {i % 10}", "Ответ " * 50, "", datetime.now()) for i in range(total)]
+        context = DynamicContext(conversation_history=history[-5:], conversation_summary="- тема: собранность")
+        section = builder.get_prompt_additions(context)['conversation_history']
+        assert "собранность" in section and section.count("Ответ:") == QA_RECENT_TURNS
+        sizes.append(len(section))
+
+    assert len(set(sizes)) == 1
+    print(f"✅ Размер секции истории постоянный: {sizes}")
+
+
+def test_unsummarized_turns_not_lost():
+    """Ходы между конспектом и последними попадают в промпт, пока конспект отстаёт"""
+    from engines.shared.context import ConversationMemory, DynamicContext, DynamicContextBuilder
+
+    async def history_loader(chat_id, limit=5):
+        return [turn(i) for i in range(5, 0, -1)][:limit]
+
+    async def summary_loader(chat_id):
+        return {'summary': "- Вопросы 1-2", 'last_qa_id': 2, 'turns': 2}
+
+    memory = ConversationMemory()
+    history = asyncio.run(memory.load_history(1, history_loader, summary_loader))
+
+    def shown():
+        context = DynamicContext(conversation_history=memory._get(1),
+                                 conversation_summary=memory.get_summary(1),
+                                 summary_last_qa_id=memory.get_summary_last_id(1))
+        section = DynamicContextBuilder().get_prompt_additions(context)['conversation_history']
+        return [i for i in range(1, 7) if f"- Вопрос {i}\n" in section + "\n"]
+
+    assert [item.qa_id for item in history] == [1, 2, 3, 4, 5]
+    assert shown() == [3, 4, 5], "Ход 3 не свёрнут и не среди двух последних — не теряется"
+
+    memory.remember_qa(1, "Вопрос 6", "Ответ 6", qa_id=6)
+    memory.set_summary(1, "- Вопросы 1-4", 4)
+    assert shown() == [5, 6]
+    print("✅ Несвёрнутые ходы не выпадают из промпта")
+
+
+if __name__ == "__main__":
+    test_rolling_summary_folds_old_turns()
+    test_prompt_size_is_constant()
+    test_unsummarized_turns_not_lost()
+    print("\n✅ Все тесты пройдены!")
@@ -0,0 +1,68 @@
+"""
+Тест индекса программы марафона (битовые маски прогресса).
+
+Запуск: python -m pytest tests/test_curriculum.py -v
+"""
+
+import sys
+import os
+import random
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def make_topics(days=14):
+    """По теории и практике на каждый день, как в knowledge_structure"""
+    return [{'id': f'{day}-{kind}', 'day': day, 'type': kind}
+            for day in range(1, days + 1) for kind in ('theory', 'practice')]
+
+
+def test_matches_linear_scans():
+    """Маски дают те же ответы, что проход по TOPICS"""
+    from core.curriculum import MarathonCurriculum, lowest_bit
+
+    topics = make_topics()
+    curriculum = MarathonCurriculum(topics, days=14)
+    rng = random.Random(7)
+
+    for _ in range(200):
+        completed = rng.sample(range(len(topics)), rng.randint(0, len(topics))) + [999]
+        day = rng.randint(1, 14)
+        done = curriculum.mask(completed)
+
+        available = [(i, t) for i, t in enumerate(topics) if i not in completed and t['day'] <= day]
+        assert curriculum.items(curriculum.available(done, day)) == available
+        assert lowest_bit(curriculum.available(done, day)) == (available[0][0] if available else None)
+
+        practice = next((i for i, t in enumerate(topics)
+                         if t['day'] == day and t['type'] == 'practice' and i not in completed), None)
+        assert curriculum.pending(done, day, 'practice') == practice
+
+        for entry in curriculum.days_progress(done, day):
+            expected = sum(1 for i, t in enumerate(topics) if t['day'] == entry['day'] and i in completed)
+            assert entry['completed'] == expected and entry['total'] == 2
+
+        weeks = curriculum.sections_progress(done)
+        assert weeks[0]['completed'] == sum(1 for i in completed if i < 14)
+        lessons = curriculum.lessons_tasks_progress(done)['lessons']
+        assert lessons['completed'] == sum(1 for i in completed if i < len(topics) and i % 2 == 0)
+    print("✅ Битовые маски совпадают с линейными проходами")
+
+
+def test_day_statuses():
+    """Статусы дней: пройден / в процессе / доступен / закрыт"""
+    from core.curriculum import MarathonCurriculum
+
+    curriculum = MarathonCurriculum(make_topics(), days=14)
+    done = curriculum.mask([0, 1, 2])
+    statuses = [d['status'] for d in curriculum.days_progress(done, 3)]
+
+    assert statuses[:4] == ['completed', 'in_progress', 'available', 'locked']
+    assert curriculum.unlocked(0) == 0 and curriculum.unlocked(99) == curriculum.full
+    print("✅ Статусы дней считаются по маскам")
+
+
+if __name__ == "__main__":
+    test_matches_linear_scans()
+    test_day_statuses()
+    print("\n✅ Все тесты пройдены!")
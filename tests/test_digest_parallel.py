@@ -0,0 +1,140 @@
+"""
+Тест параллельной генерации дайджеста и приоритетного лимитера LLM.
+
+Запуск: python -m pytest tests/test_digest_parallel.py -v
+"""
+
+import sys
+import os
+import asyncio
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def test_limiter_serves_interactive_first():
+    """Освободившийся слот получает интерактивный вызов, а не фоновый"""
+    from clients.llm_limiter import (
+        PriorityLimiter, llm_priority, PRIORITY_BACKGROUND, PRIORITY_INTERACTIVE,
+    )
+
+    async def run():
+        limiter = PriorityLimiter(concurrency=1)
+        order = []
+
+        async def call(name):
+            async with limiter.slot():
+                order.append(name)
+                await asyncio.sleep(0.01)
+
+        async def background(name):
+            with llm_priority(PRIORITY_BACKGROUND):
+                await call(name)
+
+        await limiter.acquire(PRIORITY_INTERACTIVE)
+        tasks = [asyncio.create_task(background('bg1')),
+                 asyncio.create_task(background('bg2'))]
+        await asyncio.sleep(0)
+        tasks.append(asyncio.create_task(call('user')))
+        await asyncio.sleep(0)
+        assert limiter.get_stats()['waiting'] == 3
+        limiter.release()
+        await asyncio.gather(*tasks)
+
+        assert order == ['user', 'bg1', 'bg2']
+        stats = limiter.get_stats()
+        assert stats['active'] == 0 and stats['queued'] == 3 and stats['max_queue'] == 3
+
+    asyncio.run(run())
+    print("✅ Интерактивные вызовы обгоняют фоновые")
+
+
+def test_parallel_digest_assembly():
+    """Секции идут параллельно, собираются в порядке тем, прогресс — по готовности"""
+    from engines.feed import planner
+    from clients.context_gather import GatheredContext
+
+    delays = {'Роли': 0.15, 'Метод': 0.05, 'Внимание': 0.1}
+
+    async def fake_generate(system_prompt, user_prompt):
+        if 'Верни JSON' in system_prompt:
+            await asyncio.sleep(0.02)
+            return '{"intro": "Три темы", "reflection_prompt": "Что общего?"}'
+        topic = next(t for t in delays if f"«{t}»" in system_prompt)
+        await asyncio.sleep(delays[topic])
+        return f"Текст про {topic}"
+
+    async def fake_gather(requests, max_chars=None):
+        return GatheredContext()
+
+    original = (planner.claude.generate, planner.gather_context,
+                planner.FEED_DIGEST_PARALLEL, planner.FEED_BASE_DIGEST_ENABLED)
+    planner.claude.generate = fake_generate
+    planner.gather_context = fake_gather
+    planner.FEED_DIGEST_PARALLEL = True
+    planner.FEED_BASE_DIGEST_ENABLED = False
+    try:
+        streamed = []
+
+        async def on_section(topic, text):
+            streamed.append(topic)
+
+        intern = {'name': 'Аня', 'occupation': 'аналитик', 'language': 'ru'}
+        started = time.perf_counter()
+        content = asyncio.run(planner.generate_multi_topic_digest(
+            list(delays), intern, duration=15, depth_level=2, on_section=on_section,
+        ))
+        elapsed = time.perf_counter() - started
+    finally:
+        (planner.claude.generate, planner.gather_context,
+         planner.FEED_DIGEST_PARALLEL, planner.FEED_BASE_DIGEST_ENABLED) = original
+
+    assert content['main_content'] == "Текст про Роли\n\nТекст про Метод\n\nТекст про Внимание"
+    assert content['intro'] == "Три темы" and content['reflection_prompt'] == "Что общего?"
+    assert content['topics_list'] == list(delays) and content['depth_level'] == 2
+    # Секции приходят в порядке готовности, а не в порядке тем — значит, шли параллельно.
+    # Время только печатаем: на загруженной машине оно ничего не доказывает
+    assert streamed == ['Метод', 'Внимание', 'Роли']
+    print(f"✅ Дайджест из 3 тем за {elapsed:.2f}с (последовательно — {sum(delays.values()):.2f}с)")
+
+
+def test_parallel_digest_marks_missing_topics():
+    """Упавшая секция не теряется молча: дайджест помечен как неполный"""
+    from engines.feed import planner
+    from clients.context_gather import GatheredContext
+
+    async def fake_generate(system_prompt, user_prompt):
+        if 'Верни JSON' in system_prompt:
+            return '{"intro": "Две темы"}'
+        if "«Метод»" in system_prompt:
+            return None
+        return "Текст про Роли"
+
+    async def fake_gather(requests, max_chars=None):
+        return GatheredContext()
+
+    original = (planner.claude.generate, planner.gather_context,
+                planner.FEED_DIGEST_PARALLEL, planner.FEED_BASE_DIGEST_ENABLED)
+    planner.claude.generate = fake_generate
+    planner.gather_context = fake_gather
+    planner.FEED_DIGEST_PARALLEL = True
+    planner.FEED_BASE_DIGEST_ENABLED = False
+    try:
+        content = asyncio.run(planner.generate_multi_topic_digest(
+            ['Роли', 'Метод'], {'name': 'Аня', 'language': 'ru'}, duration=10, depth_level=1,
+        ))
+    finally:
+        (planner.claude.generate, planner.gather_context,
+         planner.FEED_DIGEST_PARALLEL, planner.FEED_BASE_DIGEST_ENABLED) = original
+
+    assert content['main_content'] == "Текст про Роли"
+    assert content['partial'] is True and content['missing_topics'] == ['Метод']
+    assert not content.get('fallback')
+    print("✅ Неполный дайджест помечается")
+
+
+if __name__ == "__main__":
+    test_limiter_serves_interactive_first()
+    test_parallel_digest_assembly()
+    test_parallel_digest_marks_missing_topics()
+    print("\n✅ Все тесты пройдены!")
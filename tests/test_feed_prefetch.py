@@ -0,0 +1,174 @@
+"""
+Тест предгенерации дайджестов Ленты: заготовка отдаётся без генерации,
+устаревшая (план изменился) удаляется, неполный дайджест дописывается.
+
+Запуск: python -m pytest tests/test_feed_prefetch.py -v
+"""
+
+import sys
+import os
+import asyncio
+from datetime import date
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class FakeFeedDB:
+    """Неделя и сессии Ленты одного пользователя в памяти"""
+
+    def __init__(self, topics):
+        self.week = {'id': 7, 'status': 'active', 'current_day': 3, 'accepted_topics': list(topics)}
+        self.intern = {'chat_id': 1, 'name': 'Аня', 'occupation': 'аналитик', 'language': 'ru'}
+        self.sessions = []
+        self.generated = []
+        self.missing = []
+
+    def install(self, module):
+        names = ('get_feed_snapshot', 'save_prepared_feed_session', 'claim_prepared_feed_session',
+                 'discard_prepared_feed_sessions', 'create_feed_session', 'update_feed_session',
+                 'generate_multi_topic_digest')
+        original = {name: getattr(module, name) for name in names}
+        for name in names:
+            setattr(module, name, getattr(self, name))
+        return lambda: [setattr(module, name, fn) for name, fn in original.items()]
+
+    async def get_feed_snapshot(self, chat_id, session_date):
+        prepared = next((s for s in self.sessions if s['status'] == 'prepared'), None)
+        return {
+            'intern': dict(self.intern),
+            'week': dict(self.week, accepted_topics=list(self.week['accepted_topics'])),
+            'today_session': next((s for s in self.sessions if s['session_date'] == session_date), None),
+            'incomplete_session': next((s for s in self.sessions if s['status'] == 'active'), None),
+            'prepared_session': {k: prepared[k] for k in ('id', 'day_number', 'plan_key')} if prepared else None,
+            'days_active_this_week': 0,
+            'sessions_completed': 0,
+        }
+
+    async def save_prepared_feed_session(self, week_id, day_number, topic_title, content, plan_key):
+        self.sessions = [s for s in self.sessions if s['status'] != 'prepared']
+        session = {'id': len(self.sessions) + 100, 'day_number': day_number, 'content': content,
+                   'plan_key': plan_key, 'status': 'prepared', 'session_date': None}
+        self.sessions.append(session)
+        return {'id': session['id'], 'day_number': day_number, 'plan_key': plan_key}
+
+    async def claim_prepared_feed_session(self, session_id, session_date):
+        for session in self.sessions:
+            if session['id'] == session_id and session['status'] == 'prepared':
+                session.update(status='active', session_date=session_date)
+                return dict(session)
+        return None
+
+    async def discard_prepared_feed_sessions(self, week_id):
+        before = len(self.sessions)
+        self.sessions = [s for s in self.sessions if s['status'] != 'prepared']
+        return before - len(self.sessions)
+
+    async def create_feed_session(self, week_id, day_number, topic_title, content, session_date):
+        session = {'id': len(self.sessions) + 200, 'day_number': day_number, 'content': content,
+                   'status': 'active', 'session_date': session_date}
+        self.sessions.append(session)
+        return dict(session)
+
+    async def update_feed_session(self, session_id, updates):
+        next(s for s in self.sessions if s['id'] == session_id).update(updates)
+
+    async def generate_multi_topic_digest(self, topics, intern, duration, depth_level, on_section=None):
+        self.generated.append((tuple(topics), depth_level))
+        content = {'intro': f"Глубина {depth_level}: {', '.join(topics)}", 'main_content': '...',
+                   'topics_list': list(topics), 'depth_level': depth_level}
+        missing = [topic for topic in topics if topic in self.missing]
+        if missing:
+            content.update(partial=True, missing_topics=missing)
+        return content
+
+
+def test_prepared_digest_is_instant():
+    """Заготовка забирается при открытии, повторная подготовка не генерирует"""
+    from engines.feed import engine as feed_engine
+    from engines.feed.engine import FeedEngine
+    from engines.feed.prefetch import DigestPrefetcher
+
+    db = FakeFeedDB(['Роли', 'Внимание'])
+    restore = db.install(feed_engine)
+    try:
+        async def scenario():
+            prefetcher = DigestPrefetcher(concurrency=1)
+            prepared = await prefetcher.prepare(1)
+            assert prepared and prepared['day_number'] == 3
+            assert await prefetcher.prepare(1) is None, "Заготовка уже есть"
+            assert db.generated == [(('Роли', 'Внимание'), 3)]
+
+            session, intro = await FeedEngine(1).get_today_session()
+            assert session['id'] == prepared['id'] and session['session_date'] == date.today()
+            assert intro == "Глубина 3: Роли, Внимание"
+            assert len(db.generated) == 1, "Открытие без генерации"
+
+            assert await prefetcher.prepare(1) is None, "Пока дайджест открыт, готовить нечего"
+            assert prefetcher.get_stats() == {'prepared': 1, 'skipped': 2, 'failed': 0, 'running': 0}
+
+        asyncio.run(scenario())
+    finally:
+        restore()
+    print("✅ Заготовленный дайджест отдаётся без генерации")
+
+
+def test_stale_prepared_digest_discarded():
+    """Смена тем удаляет заготовку, дайджест генерируется по новому плану"""
+    from engines.feed import engine as feed_engine
+    from engines.feed.engine import FeedEngine
+
+    db = FakeFeedDB(['Роли', 'Внимание'])
+    restore = db.install(feed_engine)
+    try:
+        async def scenario():
+            await FeedEngine(1).prepare_next_session()
+
+            # План поменялся в обход set_topics — ключ не совпадёт
+            db.week['accepted_topics'] = ['Роли', 'Метод']
+            session, intro = await FeedEngine(1).get_today_session()
+            assert intro == "Глубина 3: Роли, Метод"
+            assert not [s for s in db.sessions if s['status'] == 'prepared']
+            assert db.generated[-1] == (('Роли', 'Метод'), 3)
+
+        asyncio.run(scenario())
+    finally:
+        restore()
+    print("✅ Устаревшая заготовка удаляется")
+
+
+def test_partial_digest_retried():
+    """Дайджест без части тем не заготавливается и дописывается при следующем открытии"""
+    from engines.feed import engine as feed_engine
+    from engines.feed.engine import FeedEngine
+
+    db = FakeFeedDB(['Роли', 'Внимание'])
+    db.missing = ['Внимание']
+    restore = db.install(feed_engine)
+    try:
+        async def scenario():
+            assert await FeedEngine(1).prepare_next_session() is None
+            assert not db.sessions, "Неполный дайджест не сохраняется заранее"
+
+            session, _ = await FeedEngine(1).get_today_session()
+            assert session['content']['missing_topics'] == ['Внимание']
+
+            session, _ = await FeedEngine(1).get_today_session()
+            assert session['content']['missing_topics'] == ['Внимание'], "Снова не вышло — без изменений"
+
+            db.missing = []
+            session, _ = await FeedEngine(1).get_today_session()
+            assert not session['content'].get('partial')
+            assert not db.sessions[0]['content'].get('partial') and len(db.sessions) == 1
+            assert len(db.generated) == 4
+
+        asyncio.run(scenario())
+    finally:
+        restore()
+    print("✅ Неполный дайджест дописывается")
+
+
+if __name__ == "__main__":
+    test_prepared_digest_is_instant()
+    test_stale_prepared_digest_discarded()
+    test_partial_digest_retried()
+    print("\n✅ Все тесты пройдены!")
@@ -0,0 +1,103 @@
+"""
+Тест снимка состояния Ленты: одна загрузка на хендлер, фиксация одним запросом.
+
+Запуск: python -m pytest tests/test_feed_snapshot.py -v
+"""
+
+import sys
+import os
+import json
+import asyncio
+from datetime import date
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def make_session(session_id, status='active', prefix=''):
+    return {
+        f'{prefix}id': session_id, f'{prefix}week_id': 7, f'{prefix}day_number': 2,
+        f'{prefix}topic_title': 'Роли, Внимание', f'{prefix}content': json.dumps({'intro': 'Привет'}),
+        f'{prefix}fixation_text': None, f'{prefix}session_date': date(2026, 3, 2),
+        f'{prefix}status': status, f'{prefix}completed_at': None,
+    }
+
+
+def test_row_mapping():
+    """Колонки с префиксом разворачиваются в те же словари, что и отдельные запросы"""
+    from db.queries.feed import _week_to_dict, _session_to_dict, SESSION_COLUMNS
+
+    row = {
+        'w_id': 7, 'w_chat_id': 1, 'w_week_number': 3, 'w_week_start': date(2026, 3, 2),
+        'w_suggested_topics': '["Роли", "Внимание", "Метод"]', 'w_suggestions_key': None,
+        'w_accepted_topics': '["Роли", "Внимание"]',
+        'w_current_day': 2, 'w_status': 'active', 'w_created_at': None,
+        **make_session(11, prefix='s_'),
+        **{f'p_{c}': None for c in SESSION_COLUMNS},
+    }
+
+    week = _week_to_dict(row, 'w_')
+    assert week['accepted_topics'] == ['Роли', 'Внимание'] and week['current_day'] == 2
+
+    session = _session_to_dict(row, 's_')
+    assert session == _session_to_dict(make_session(11))
+    assert session['content'] == {'intro': 'Привет'}
+
+    assert _session_to_dict(row, 'p_') is None, "LEFT JOIN без строки — нет сессии"
+    print("✅ Снимок разворачивается в неделю и сессии")
+
+
+def test_engine_round_trips():
+    """Статус, дайджест, фиксация и сводка — один снимок и один запрос фиксации"""
+    from engines.feed import engine as feed_engine
+    from engines.feed.engine import FeedEngine
+
+    calls = []
+
+    async def fake_snapshot(chat_id, session_date):
+        calls.append('snapshot')
+        return {
+            'intern': {'chat_id': chat_id, 'feed_status': 'active', 'language': 'ru',
+                       'active_days_total': 4, 'active_days_streak': 1},
+            'week': {'id': 7, 'status': 'active', 'current_day': 2, 'accepted_topics': ['Роли', 'Внимание']},
+            'today_session': {'id': 11, 'status': 'active', 'content': {'intro': 'Привет'}},
+            'incomplete_session': {'id': 11, 'status': 'active', 'content': {'intro': 'Привет'}},
+            'days_active_this_week': 2,
+            'sessions_completed': 1,
+        }
+
+    async def fake_fixation(**kwargs):
+        calls.append('fixation')
+        assert kwargs['week_id'] == 7 and kwargs['session_id'] == 11
+        return {'current_day': 3, 'new_active_day': True, 'active_days_total': 5, 'active_days_streak': 2}
+
+    original = feed_engine.get_feed_snapshot, feed_engine.complete_feed_fixation
+    feed_engine.get_feed_snapshot, feed_engine.complete_feed_fixation = fake_snapshot, fake_fixation
+    try:
+        async def scenario():
+            engine = FeedEngine(1)
+            status = await engine.get_status()
+            assert status['has_week'] and status['active_days'] == 4
+
+            session, _ = await engine.get_today_session()
+            assert session['id'] == 11 and await engine.get_session_content(11) == {'intro': 'Привет'}
+
+            assert await engine.submit_fixation("Понял, что роль — это не должность") == (True, "Фиксация сохранена! До завтра.")
+            assert (await engine.submit_fixation("Ещё раз"))[0] is False
+
+            summary = await engine.get_week_summary()
+            assert summary['current_day'] == 3 and summary['current_streak'] == 2
+            assert summary['sessions_completed'] == 2
+            assert (await engine.get_current_week())['current_day'] == 3
+
+        asyncio.run(scenario())
+    finally:
+        feed_engine.get_feed_snapshot, feed_engine.complete_feed_fixation = original
+
+    assert calls == ['snapshot', 'fixation']
+    print("✅ Взаимодействие с Лентой — два запроса к БД")
+
+
+if __name__ == "__main__":
+    test_row_mapping()
+    test_engine_round_trips()
+    print("\n✅ Все тесты пройдены!")
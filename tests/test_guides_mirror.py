@@ -0,0 +1,155 @@
+"""
+Тест локального зеркала руководств (SQLite FTS5, без сети).
+
+Запуск: python -m pytest tests/test_guides_mirror.py -v
+"""
+
+import sys
+import os
+import asyncio
+import tempfile
+import threading
+from pathlib import Path
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class FakeGuidesServer:
+    """Имитация MCP-Guides: список руководств, разделы, содержимое"""
+
+    def __init__(self):
+        self.content_calls = 0
+        self.cached_calls = 0
+        self.failing = set()
+        self.guides = {
+            "systems-thinking": {
+                "title": "Системное мышление",
+                "sections": {
+                    "roles": "Роль — это функциональное место в системе.\n\n"
+                             "Ролями называют то, что выполняет агент в проекте.",
+                    "attention": "Внимание удерживается на объектах, которые важны для системы.",
+                },
+            },
+            "self-development": {
+                "title": "Саморазвитие",
+                "sections": {
+                    "habits": "Привычки формируются через регулярную практику и слот времени.",
+                },
+            },
+        }
+
+    async def get_guides_list(self, lang="ru", use_cache=True):
+        self.cached_calls += use_cache
+        return [{"slug": slug, "title": g["title"]} for slug, g in self.guides.items()]
+
+    async def get_guide_sections(self, guide_slug, lang="ru", use_cache=True):
+        self.cached_calls += use_cache
+        return [{"slug": s, "title": s.title()} for s in self.guides[guide_slug]["sections"]]
+
+    async def get_section_content(self, guide_slug, section_slug, lang="ru", use_cache=True):
+        self.cached_calls += use_cache
+        self.content_calls += 1
+        if section_slug in self.failing:
+            return ""
+        return self.guides[guide_slug]["sections"][section_slug]
+
+
+def test_sync_and_search():
+    """Синхронизация, BM25-поиск с учётом словоформ, инкрементальное обновление"""
+    from clients.guides_mirror import GuidesMirror
+
+    server = FakeGuidesServer()
+    with tempfile.TemporaryDirectory() as tmp:
+        mirror = GuidesMirror(Path(tmp) / "mirror.sqlite3")
+        assert not mirror.is_ready("ru")
+
+        stats = asyncio.run(mirror.sync(server, lang="ru"))
+        assert stats["guides"] == 2 and stats["sections"] == 3
+        assert mirror.is_ready("ru")
+        print("✅ Зеркало синхронизировано")
+
+        # "роли" и "ролями" находят раздел про роль
+        results = mirror.search("какие бывают роли", lang="ru", limit=3)
+        assert results, "Ожидались результаты"
+        assert results[0]["section_slug"] == "roles"
+        assert results[0]["source"].startswith("Системное мышление")
+        assert mirror.search("привычка", lang="ru")[0]["guide_slug"] == "self-development"
+        print("✅ BM25-поиск находит словоформы")
+
+        # Повторная синхронизация без изменений — разделы не скачиваются
+        calls_before = server.content_calls
+        stats = asyncio.run(mirror.sync(server, lang="ru"))
+        assert stats["skipped"] == 2 and server.content_calls == calls_before
+
+        # Изменился список разделов одного руководства — перекачиваем только его
+        server.guides["self-development"]["sections"]["slots"] = "Слот — выделенное время для практики."
+        stats = asyncio.run(mirror.sync(server, lang="ru"))
+        assert stats["guides"] == 1 and stats["skipped"] == 1
+        assert mirror.search("слоты", lang="ru")
+        assert server.cached_calls == 0, "Синхронизация идёт мимо кеша MCP"
+        print("✅ Инкрементальное обновление работает")
+
+
+def test_partial_failure_retried():
+    """Не скачавшийся раздел сохраняет старую копию и докачивается следующей синхронизацией"""
+    from clients.guides_mirror import GuidesMirror
+
+    server = FakeGuidesServer()
+    with tempfile.TemporaryDirectory() as tmp:
+        mirror = GuidesMirror(Path(tmp) / "mirror.sqlite3")
+        asyncio.run(mirror.sync(server, lang="ru"))
+
+        # Раздел изменился, новый раздел добавлен, но "roles" сейчас не отдаётся
+        server.guides["systems-thinking"]["sections"]["methods"] = "Метод — способ действия."
+        server.failing = {"roles", "methods"}
+        stats = asyncio.run(mirror.sync(server, lang="ru"))
+        assert stats["guides"] == 1
+        assert mirror.search("роли", lang="ru")[0]["section_slug"] == "roles", "Старая копия раздела осталась"
+        assert not mirror.search("метод", lang="ru")
+
+        server.failing = set()
+        stats = asyncio.run(mirror.sync(server, lang="ru"))
+        assert stats["guides"] == 1 and stats["skipped"] == 1, "Руководство докачивается"
+        assert mirror.search("метод", lang="ru")[0]["section_slug"] == "methods"
+
+        stats = asyncio.run(mirror.sync(server, lang="ru"))
+        assert stats["skipped"] == 2
+    print("✅ Частичный сбой докачивается при следующей синхронизации")
+
+
+def test_client_prefers_local_backend():
+    """MCPClient ищет сначала в зеркале, на сервер идёт только при промахе"""
+    from clients.guides_mirror import GuidesMirror
+    from clients.mcp import MCPClient
+
+    remote_queries = []
+
+    class RemoteCountingClient(MCPClient):
+        async def _call_remote(self, tool_name, arguments):
+            remote_queries.append(arguments["query"])
+            return None
+
+    class ThreadRecordingMirror(GuidesMirror):
+        def search(self, query, lang="ru", limit=5):
+            search_threads.add(threading.get_ident())
+            return super().search(query, lang=lang, limit=limit)
+
+    search_threads = set()
+    with tempfile.TemporaryDirectory() as tmp:
+        mirror = ThreadRecordingMirror(Path(tmp) / "mirror.sqlite3")
+        asyncio.run(mirror.sync(FakeGuidesServer(), lang="ru"))
+
+        client = RemoteCountingClient("http://stub", "Stub-Mirror", use_cache=False, local_backend=mirror)
+        batches = asyncio.run(client.semantic_search_many(["внимание", "квантовая физика"], limit=2))
+
+        assert batches[0] and batches[0][0]["section_slug"] == "attention"
+        assert remote_queries == ["квантовая физика"]
+        assert search_threads and threading.get_ident() not in search_threads, "SQLite — не в цикле событий"
+        print("✅ Удалённый MCP используется только как fallback")
+
+
+if __name__ == "__main__":
+    test_sync_and_search()
+    test_partial_failure_retried()
+    test_client_prefers_local_backend()
+    print("\n✅ Все тесты пройдены!")
@@ -0,0 +1,189 @@
+"""
+Дифференциальный тест скомпилированного классификатора интентов.
+
+Эталон — прежняя реализация (линейные проходы по словарям шаблонов),
+скопированная сюда как есть. На корпусе сообщений новая реализация
+обязана давать тот же результат.
+
+Запуск: python -m pytest tests/test_intent.py -v
+"""
+
+import sys
+import os
+import re
+import time
+import random
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import QUESTION_WORDS, TOPIC_REQUEST_PATTERNS, COMMAND_WORDS
+
+
+# =============================================================================
+# ЭТАЛОН (прежняя реализация)
+# =============================================================================
+
+def reference_detect_command(text):
+    text = text.strip()
+    if text in COMMAND_WORDS:
+        return COMMAND_WORDS[text]
+    for word, cmd in COMMAND_WORDS.items():
+        if text.startswith(word):
+            return cmd
+    return None
+
+
+def reference_is_topic_request(text):
+    from core.intent import TOPIC_REQUEST_REGEXES
+    for pattern in TOPIC_REQUEST_REGEXES:
+        if re.search(pattern, text):
+            return True
+    words = set(text.split())
+    for pattern_word in TOPIC_REQUEST_PATTERNS:
+        if pattern_word in words:
+            if 'тем' in text or 'учи' in text or 'изуч' in text:
+                return True
+    return False
+
+
+def reference_is_clear_question(text):
+    from core.intent import QUESTION_STARTERS
+    if text.rstrip().endswith('?'):
+        return True
+    first_word = text.split()[0] if text.split() else ''
+    if first_word in QUESTION_WORDS:
+        return True
+    for starter in QUESTION_STARTERS:
+        if text.startswith(starter):
+            return True
+    return False
+
+
+def reference_question_likelihood(text):
+    from core.intent import QUESTION_PHRASES
+    score = 0.0
+    if '?' in text:
+        score += 0.5
+    words = text.split()
+    if words and words[0] in QUESTION_WORDS:
+        score += 0.3
+    for word in QUESTION_WORDS:
+        if word in words:
+            score += 0.1
+            break
+    for phrase in QUESTION_PHRASES:
+        if phrase in text:
+            score += 0.3
+            break
+    if len(text) > 200 and score < 0.3:
+        score *= 0.5
+    return min(score, 1.0)
+
+
+def reference_detect_intent(text, context):
+    """Прежний detect_intent поверх эталонных признаков: (тип, уверенность, команда)"""
+    from core.intent import IntentType
+
+    text_lower = text.lower().strip()
+    command = reference_detect_command(text_lower)
+    if command:
+        return IntentType.COMMAND, 1.0, command
+    if context.get('awaiting_answer') or context.get('awaiting_work_product'):
+        if reference_is_clear_question(text_lower):
+            return IntentType.QUESTION, 0.9, None
+        return IntentType.ANSWER, 1.0, None
+    if reference_is_topic_request(text_lower):
+        return IntentType.TOPIC_REQUEST, 0.9, None
+    score = reference_question_likelihood(text_lower)
+    if score >= 0.7:
+        return IntentType.QUESTION, score, None
+    if len(text) < 20 and not context.get('mode'):
+        return IntentType.FEEDBACK, 0.6, None
+    if context.get('mode') and len(text) > 50:
+        return IntentType.ANSWER, 0.7, None
+    return IntentType.UNKNOWN, 0.5, None
+
+
+# =============================================================================
+# КОРПУС
+# =============================================================================
+
+MESSAGES = [
+    "Что такое системное мышление?", "как победить прокрастинацию", "Почему я всё откладываю",
+    "дай тему", "Давай тему посложнее", "следующая тема", "хочу учиться", "хочу спросить про роли",
+    "Хочу новую тему", "предложи темы на неделю", "начать марафон", "продолжить ленту",
+    "проще", "Глубже, пожалуйста", "примеры", "дальше", "пропустить", "next", "skip this",
+    "más simple", "más profundo por favor", "siguiente", "saltar", "ejemplos",
+    "What is a system?", "how does attention work", "Can you explain roles", "tell me more",
+    "is it possible to change habits", "difference between method and practice",
+    "¿Qué es un sistema?", "por qué procrastino", "cómo funciona el foco", "dame un tema",
+    "quiero estudiar", "можно ли учиться по вечерам", "в чём разница между ролью и должностью",
+    "Спасибо!", "ок", "", "   ", "?", "???", "а как это применить", "объясни ещё раз",
+    "Мой рабочий продукт — список из пяти ролей, которые я выполняю на работе каждый день.",
+    "Я думаю, что система — это то, что работает на меня, а не то, что я делаю. " * 4,
+]
+
+
+def build_corpus(seed=3, size=1500):
+    """Сообщения корпуса плюс случайные сборки из фраз всех словарей"""
+    from core.intent import QUESTION_STARTERS, QUESTION_PHRASES
+
+    rng = random.Random(seed)
+    pieces = (list(COMMAND_WORDS) + QUESTION_STARTERS + QUESTION_PHRASES + QUESTION_WORDS
+              + TOPIC_REQUEST_PATTERNS + ["тему", "учиться", "изучать", "марафон", "ленту", "следующую"]
+              + "систему роль метод практика внимание работа".split())
+    corpus = list(MESSAGES)
+    for _ in range(size):
+        text = " ".join(rng.choice(pieces) for _ in range(rng.randint(1, 6)))
+        text += rng.choice(["", "", "?", " ", ".", "!"])
+        if rng.random() < 0.05:
+            text = text + " длинный ответ без признаков" * 10
+        corpus.append(text)
+    return corpus
+
+
+def test_matches_reference():
+    """Скомпилированные признаки и detect_intent совпадают с эталоном на корпусе"""
+    from core import intent
+
+    contexts = [{}, {'mode': 'marathon'}, {'awaiting_answer': True}, {'awaiting_work_product': True, 'mode': 'feed'}]
+    for message in build_corpus():
+        text = message.lower().strip()
+        assert intent.detect_command(text) == reference_detect_command(text), message
+        assert intent.is_topic_request(text) == reference_is_topic_request(text), message
+        assert intent.is_clear_question(text) == reference_is_clear_question(text), message
+        assert intent.question_likelihood(text) == reference_question_likelihood(text), message
+
+        for context in contexts:
+            got = intent.detect_intent(message, context)
+            expected = reference_detect_intent(message, context)
+            assert (got.type, got.confidence, got.command) == expected, (message, context)
+    print("✅ Результаты совпадают с прежней реализацией")
+
+
+def test_classification_cost():
+    """Микро-бенчмарк: стоимость классификации одного сообщения"""
+    from core.intent import detect_intent
+
+    corpus = build_corpus(seed=5, size=500)
+
+    def per_message_us(classify):
+        started = time.perf_counter()
+        for _ in range(3):
+            for message in corpus:
+                classify(message)
+        return (time.perf_counter() - started) * 1e6 / (3 * len(corpus))
+
+    compiled = per_message_us(lambda m: detect_intent(m))
+    reference = per_message_us(lambda m: reference_detect_intent(m, {}))
+
+    # Абсолютное время зависит от машины — сравниваем с прежней реализацией
+    # в том же прогоне, с большим запасом на шум
+    assert compiled < reference * 1.5, f"Классификация: {compiled:.1f}мкс против {reference:.1f}мкс"
+    print(f"✅ Классификация: {compiled:.1f}мкс на сообщение (прежняя реализация: {reference:.1f}мкс)")
+
+
+if __name__ == "__main__":
+    test_matches_reference()
+    test_classification_cost()
+    print("\n✅ Все тесты пройдены!")
@@ -0,0 +1,165 @@
+"""
+Тест скомпилированных каталогов локализации и кэша клавиатур.
+
+Запуск: python -m pytest tests/test_locales.py -v
+"""
+
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def reference_t(key, lang='ru', **kwargs):
+    """Прежний t(): поиск в языке, затем в русском, затем ключ"""
+    from locales import TRANSLATIONS
+
+    translations = TRANSLATIONS.get(lang, TRANSLATIONS['ru'])
+    text = translations.get(key)
+    if text is None:
+        text = TRANSLATIONS['ru'].get(key)
+    if text is None:
+        return key
+    if kwargs:
+        try:
+            text = text.format(**kwargs)
+        except KeyError:
+            pass
+    return text
+
+
+def test_t_matches_reference():
+    """t() на каталогах совпадает с прежним поиском по TRANSLATIONS"""
+    from locales import t, TRANSLATIONS, missing_keys_report, unused_keys
+
+    keys = list(TRANSLATIONS['ru']) + ['no.such_key']
+    params = [{}, {'name': 'Аня', 'day': 3, 'total': 14, 'count': 2}, {'unrelated': 1}]
+    for lang in ('ru', 'en', 'es', 'de'):
+        for key in keys:
+            for kwargs in params:
+                assert t(key, lang, **kwargs) == reference_t(key, lang, **kwargs), (key, lang, kwargs)
+
+    report = missing_keys_report()
+    assert report['unknown'].get('no.such_key', 0) > 0
+    assert 'ru' not in report['untranslated']
+    assert 'buttons.get_digest' not in unused_keys()
+    print("✅ t() совпадает с прежней реализацией, отчёты собираются")
+
+
+def test_keyboard_cached():
+    """Клавиатура строится один раз на набор аргументов"""
+    from core.keyboards import cached_keyboard, get_keyboard_cache_stats, clear_keyboard_cache
+    from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
+
+    builds = []
+
+    @cached_keyboard
+    def kb_sample(lang: str, flag: bool) -> InlineKeyboardMarkup:
+        builds.append((lang, flag))
+        return InlineKeyboardMarkup(inline_keyboard=[
+            [InlineKeyboardButton(text=f"{lang}:{flag}", callback_data="sample")]
+        ])
+
+    first = kb_sample('ru', True)
+    assert kb_sample('ru', True) is first
+    assert kb_sample('en', True) is not first
+    assert builds == [('ru', True), ('en', True)]
+
+    stats = get_keyboard_cache_stats()[f"{__name__}.kb_sample"]
+    assert stats == {'hits': 1, 'misses': 2, 'size': 2}
+
+    clear_keyboard_cache()
+    kb_sample('ru', True)
+    assert len(builds) == 3
+    print("✅ Клавиатуры кэшируются по аргументам")
+
+
+# Методы, меняющие список рядов или кнопок на месте
+_MUTATORS = {'append', 'insert', 'extend', 'pop', 'remove', 'clear', 'sort', 'reverse'}
+
+
+def _mutated_keyboards(tree, builders):
+    """Места, где результат закэшированного построителя изменяется на месте"""
+    import ast
+
+    def is_builder_call(node):
+        if not isinstance(node, ast.Call):
+            return False
+        func = node.func
+        name = func.attr if isinstance(func, ast.Attribute) else getattr(func, 'id', None)
+        return name in builders
+
+    def is_markup(node, markups):
+        return is_builder_call(node) or (isinstance(node, ast.Name) and node.id in markups)
+
+    def touches_markup(node, markups):
+        """markup.attr, markup.inline_keyboard[i], markup.inline_keyboard[i][j].attr ..."""
+        while isinstance(node, (ast.Attribute, ast.Subscript)):
+            node = node.value
+            if is_markup(node, markups):
+                return True
+        return False
+
+    found = []
+    for func in ast.walk(tree):
+        if not isinstance(func, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            continue
+        markups = {
+            target.id
+            for node in ast.walk(func) if isinstance(node, ast.Assign) and is_builder_call(node.value)
+            for target in node.targets if isinstance(target, ast.Name)
+        }
+        for node in ast.walk(func):
+            targets = []
+            if isinstance(node, ast.Assign):
+                targets = node.targets
+            elif isinstance(node, (ast.AugAssign, ast.Delete)):
+                targets = [node.target] if isinstance(node, ast.AugAssign) else node.targets
+            elif (isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute)
+                  and node.func.attr in _MUTATORS):
+                targets = [node.func]
+            if any(touches_markup(target, markups) for target in targets):
+                found.append(f"{func.name}:{node.lineno}")
+    return found
+
+
+def test_cached_keyboards_not_mutated():
+    """Закэшированные клавиатуры общие для всех чатов — вызывающий код их не меняет"""
+    import ast
+    from pathlib import Path
+
+    root = Path(__file__).resolve().parent.parent
+    sources = {path: ast.parse(path.read_text(encoding='utf-8'))
+               for path in root.rglob("*.py")
+               if 'tests' not in path.parts and '.git' not in path.parts}
+
+    builders = {
+        node.name
+        for tree in sources.values() for node in ast.walk(tree)
+        if isinstance(node, ast.FunctionDef)
+        and any(getattr(d, 'id', None) == 'cached_keyboard' for d in node.decorator_list)
+    }
+    assert 'kb_learn' in builders and 'kb_mode_select' in builders
+
+    sample = ast.parse(
+        "def handler(lang):\n"
+        "    kb = kb_learn(lang)\n"
+        "    kb.inline_keyboard.append([])\n"
+        "    kb_learn(lang).inline_keyboard[0][0].text = 'x'\n"
+        "    fresh = kb_learn(lang).model_copy(deep=True)\n"
+        "    fresh.inline_keyboard.append([])\n"
+    )
+    assert sorted(_mutated_keyboards(sample, builders)) == ["handler:3", "handler:4"]
+
+    found = {str(path.relative_to(root)): _mutated_keyboards(tree, builders)
+             for path, tree in sources.items()}
+    found = {path: places for path, places in found.items() if places}
+    assert not found, f"Изменение закэшированных клавиатур: {found}"
+    print(f"✅ {len(builders)} закэшированных клавиатур не изменяются вызывающим кодом")
+
+
+if __name__ == "__main__":
+    test_t_matches_reference()
+    test_keyboard_cached()
+    test_cached_keyboards_not_mutated()
+    print("\n✅ Все тесты пройдены!")
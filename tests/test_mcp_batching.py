@@ -0,0 +1,126 @@
+"""
+Тест MCPClient против локального заглушечного MCP сервера.
+
+Проверяет JSON-RPC batch (несколько поисков за один HTTP-запрос),
+переиспользование соединения и откат на одиночные вызовы.
+
+Запуск: python -m pytest tests/test_mcp_batching.py -v
+"""
+
+import sys
+import os
+import json
+import asyncio
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from aiohttp import web
+
+
+class StubMCPServer:
+    """Заглушка MCP: отвечает на tools/call, считает HTTP-запросы и соединения"""
+
+    def __init__(self, support_batch: bool = True):
+        self.support_batch = support_batch
+        self.http_requests = 0
+        self.peers = set()
+        self.runner = None
+        self.url = None
+
+    def _answer(self, request: dict) -> dict:
+        args = request["params"]["arguments"]
+        items = [{"text": f"{args['query']} #{i}"} for i in range(args.get("limit", 1))]
+        return {
+            "jsonrpc": "2.0",
+            "id": request["id"],
+            "result": {"content": [{"type": "text", "text": json.dumps(items, ensure_ascii=False)}]},
+        }
+
+    async def handle(self, request: web.Request) -> web.Response:
+        self.http_requests += 1
+        self.peers.add(request.transport.get_extra_info("peername"))
+        payload = await request.json()
+
+        if isinstance(payload, list):
+            if not self.support_batch:
+                return web.json_response(
+                    {"jsonrpc": "2.0", "id": None, "error": {"code": -32600, "message": "Invalid Request"}}
+                )
+            # Отвечаем в обратном порядке — клиент должен сопоставить по id
+            return web.json_response([self._answer(r) for r in reversed(payload)])
+
+        return web.json_response(self._answer(payload))
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_post("/mcp", self.handle)
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        self.url = f"http://127.0.0.1:{port}/mcp"
+
+    async def stop(self):
+        await self.runner.cleanup()
+
+
+def test_batch_search_single_round_trip():
+    """Несколько запросов уходят одним HTTP-запросом, порядок сохраняется"""
+    from clients.mcp import MCPClient
+
+    async def scenario():
+        server = StubMCPServer()
+        await server.start()
+        client = MCPClient(server.url, "Stub-Guides")
+        try:
+            queries = ["системное мышление", "роль", "метод"]
+            batches = await client.semantic_search_many(queries, limit=2)
+
+            assert server.http_requests == 1, f"Ожидался 1 HTTP-запрос, было {server.http_requests}"
+            assert [b[0]["text"] for b in batches] == [f"{q} #0" for q in queries]
+            assert all(len(b) == 2 for b in batches)
+            print("✅ Batch: 3 запроса за один HTTP round trip")
+
+            # Одиночные вызовы переиспользуют то же keep-alive соединение
+            for q in queries:
+                await client.search(q, limit=1)
+            assert server.http_requests == 4
+            assert len(server.peers) == 1, f"Ожидалось 1 соединение, было {len(server.peers)}"
+            print("✅ Соединение переиспользуется между вызовами")
+        finally:
+            await client.close()
+            await server.stop()
+
+    asyncio.run(scenario())
+
+
+def test_batch_fallback_to_single_calls():
+    """Сервер без поддержки batch — клиент откатывается на одиночные вызовы"""
+    from clients.mcp import MCPClient
+
+    async def scenario():
+        server = StubMCPServer(support_batch=False)
+        await server.start()
+        client = MCPClient(server.url, "Stub-Knowledge", search_tool="search")
+        try:
+            batches = await client.search_many(["a", "b"], limit=1)
+            assert [b[0]["text"] for b in batches] == ["a #0", "b #0"]
+            assert not client._batch_supported
+            # 1 неудачный batch + 2 одиночных
+            assert server.http_requests == 3
+
+            await client.search_many(["c", "d"], limit=1)
+            assert server.http_requests == 5, "Повторный batch не должен отправляться"
+            print("✅ Откат на одиночные вызовы работает")
+        finally:
+            await client.close()
+            await server.stop()
+
+    asyncio.run(scenario())
+
+
+if __name__ == "__main__":
+    test_batch_search_single_round_trip()
+    test_batch_fallback_to_single_calls()
+    print("\n✅ Все тесты пройдены!")
@@ -0,0 +1,125 @@
+"""
+Тест кеша результатов MCP (без сети).
+
+Запуск: python -m pytest tests/test_mcp_cache.py -v
+"""
+
+import sys
+import os
+import json
+import asyncio
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tests.helpers import FakeClock
+
+
+def _result(items):
+    return {"content": [{"type": "text", "text": json.dumps(items, ensure_ascii=False)}]}
+
+
+def test_cache_key_normalisation():
+    """Разные написания одного запроса дают один ключ"""
+    from clients.mcp_cache import make_cache_key
+
+    a = make_cache_key("MCP-Guides", "semantic_search", {"query": "Системное  мышление?", "lang": "ru", "limit": 2})
+    b = make_cache_key("MCP-Guides", "semantic_search", {"query": "системное мышление", "lang": "ru", "limit": 2})
+    c = make_cache_key("MCP-Guides", "semantic_search", {"query": "системное мышление", "lang": "ru", "limit": 5})
+    assert a == b
+    assert a != c
+    print("✅ Нормализация ключа работает")
+
+
+def test_ttl_stale_negative_and_bound():
+    """TTL, stale-while-revalidate, негативный кеш и LRU-ограничение"""
+    from clients.mcp_cache import MCPCache, make_cache_key
+
+    clock = FakeClock(now=1000.0)
+    cache = MCPCache(ttl={"search": 100}, stale_ttl=50, negative_ttl=10,
+                     max_entries=2, max_bytes=10_000, clock=clock)
+    key = make_cache_key("K", "search", {"query": "a", "limit": 3})
+
+    cache.put(key, _result([{"text": "x"}]))
+    assert cache.get(key) == (_result([{"text": "x"}]), False)
+
+    clock.now += 120  # после TTL, но в окне stale
+    value, stale = cache.get(key)
+    assert value is not None and stale
+
+    clock.now += 100  # окно stale прошло
+    assert cache.get(key) == (None, False)
+    print("✅ TTL и stale-окно работают")
+
+    empty_key = make_cache_key("K", "search", {"query": "пусто", "limit": 3})
+    cache.put(empty_key, _result([]))
+    assert cache.get(empty_key)[0] is not None
+    clock.now += 11
+    assert cache.get(empty_key)[0] is None
+    print("✅ Пустые результаты кешируются коротко")
+
+    cache.put(key, None)  # ошибки не кешируются
+    assert cache.get(key)[0] is None
+
+    for q in ("1", "2", "3"):
+        cache.put(make_cache_key("K", "search", {"query": q, "limit": 3}), _result([{"text": q}]))
+    stats = cache.get_stats()
+    assert stats["entries"] == 2
+    assert stats["tools"]["search"]["evictions"] == 1
+    assert 0 < stats["hit_rate"] < 1
+    print("✅ Ограничение памяти и метрики работают")
+
+
+def test_client_uses_cache_and_refreshes_stale():
+    """MCPClient: повтор из кеша, фоновое обновление устаревшей записи, single-flight"""
+    from clients.mcp import MCPClient
+    from clients.mcp_cache import MCPCache
+
+    clock = FakeClock(now=1000.0)
+    remote_calls = []
+    failing = []
+
+    class CountingClient(MCPClient):
+        async def _call_remote(self, tool_name, arguments):
+            remote_calls.append(arguments["query"])
+            await asyncio.sleep(0)
+            if failing:
+                return None
+            return _result([{"text": f"{arguments['query']} v{len(remote_calls)}"}])
+
+    cache = MCPCache(ttl={"semantic_search": 100}, stale_ttl=100, clock=clock)
+    client = CountingClient("http://stub", "Stub", cache=cache)
+
+    async def scenario():
+        first, second = await asyncio.gather(
+            client.semantic_search("Роли", limit=2),
+            client.semantic_search("роли", limit=2),
+        )
+        assert first == second
+        assert remote_calls == ["Роли"], "Одинаковые промахи должны делить один запрос"
+
+        clock.now += 150
+        stale = await client.semantic_search("роли!", limit=2)
+        assert stale[0]["text"] == "Роли v1"
+        await asyncio.sleep(0.01)  # даём фоновому обновлению завершиться
+        fresh = await client.semantic_search("роли", limit=2)
+        assert fresh[0]["text"] == "роли! v2"
+        assert cache.get_stats()["tools"]["semantic_search"]["refreshes"] == 1
+
+        # Неудачное обновление не считается и оставляет прежнюю запись
+        failing.append(True)
+        clock.now += 150
+        assert (await client.semantic_search("роли", limit=2))[0]["text"] == "роли! v2"
+        assert client._refresh_tasks
+        await asyncio.sleep(0.01)
+        assert not client._refresh_tasks and len(remote_calls) == 3
+        assert cache.get_stats()["tools"]["semantic_search"]["refreshes"] == 1
+
+    asyncio.run(scenario())
+    print("✅ Клиент отдаёт кеш и обновляет устаревшее в фоне")
+
+
+if __name__ == "__main__":
+    test_cache_key_normalisation()
+    test_ttl_stale_negative_and_bound()
+    test_client_uses_cache_and_refreshes_stale()
+    print("\n✅ Все тесты пройдены!")
@@ -0,0 +1,175 @@
+"""
+Тест здоровья MCP эндпоинтов: адаптивный таймаут и circuit breaker (без сети).
+
+Запуск: python -m pytest tests/test_mcp_health.py -v
+"""
+
+import sys
+import os
+import json
+import asyncio
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from aiohttp import web
+
+from tests.helpers import FakeClock
+
+
+class FlakyMCPServer:
+    """Заглушка MCP: отвечает 503, пока healthy=False"""
+
+    def __init__(self):
+        self.healthy = False
+        self.http_requests = 0
+        self.runner = None
+        self.url = None
+
+    async def handle(self, request: web.Request) -> web.Response:
+        self.http_requests += 1
+        payload = await request.json()
+        if not self.healthy:
+            return web.Response(status=503, text="Service Unavailable")
+        if payload.get("method") == "tools/list":
+            return web.json_response({"jsonrpc": "2.0", "id": payload["id"], "result": {"tools": []}})
+        text = json.dumps([{"text": "Роль — функциональное место"}], ensure_ascii=False)
+        return web.json_response({"jsonrpc": "2.0", "id": payload["id"],
+                                  "result": {"content": [{"type": "text", "text": text}]}})
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_post("/mcp", self.handle)
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        self.url = f"http://127.0.0.1:{port}/mcp"
+
+    async def stop(self):
+        await self.runner.cleanup()
+
+
+def test_adaptive_timeout_and_breaker_states():
+    """Таймаут следует за p99, breaker: closed → open → half_open → closed"""
+    from clients.mcp_health import EndpointHealth, BreakerState
+    from config import MCP_TIMEOUT, MCP_TIMEOUT_MIN
+
+    clock = FakeClock(now=1000.0)
+    health = EndpointHealth("Test-Endpoint", failure_threshold=3, cooldown=30, clock=clock)
+
+    # Пока замеров мало — консервативный таймаут
+    assert health.timeout() == MCP_TIMEOUT
+    for _ in range(50):
+        health.record_success(150)
+    assert health.timeout() == MCP_TIMEOUT_MIN  # 0.15с × множитель меньше нижней границы
+    for _ in range(50):
+        health.record_success(4000)
+    assert MCP_TIMEOUT_MIN < health.timeout() <= MCP_TIMEOUT
+    print("✅ Таймаут адаптируется по p99")
+
+    for _ in range(3):
+        health.record_failure("timeout")
+    assert health.state == BreakerState.OPEN
+    assert not health.allow_request()
+
+    clock.now += 31
+    assert health.allow_request(), "После cooldown пропускается пробный запрос"
+    assert health.state == BreakerState.HALF_OPEN
+    assert not health.allow_request(), "Пока проба в полёте, остальные пропускаются"
+
+    health.record_failure("http_503")
+    assert health.state == BreakerState.OPEN, "Неудачная проба снова открывает breaker"
+
+    clock.now += 31
+    assert health.allow_request()
+    health.record_success(200)
+    assert health.state == BreakerState.CLOSED
+
+    snapshot = health.snapshot()
+    assert snapshot["state"] == "closed" and snapshot["skipped"] == 2 and snapshot["failures"] == 4
+    print("✅ Circuit breaker переходит между состояниями")
+
+
+def test_timeout_follows_slowdown_and_ping_keeps_failures():
+    """Сервер замедлился сверх таймаута — таймаут растёт; пинг не обнуляет сбои в CLOSED"""
+    from clients.mcp_health import EndpointHealth, BreakerState
+
+    clock = FakeClock(now=1000.0)
+    health = EndpointHealth("Test-Slow", window=200, failure_threshold=5, cooldown=30, clock=clock)
+    for _ in range(200):
+        health.record_success(1500)
+    assert health.timeout() == 3.0
+
+    # Теперь каждый запрос длится 5с
+    successes = 0
+    for _ in range(30):
+        if not health.allow_request():
+            clock.now += 31
+            continue
+        timeout = health.timeout()
+        if timeout < 5.0:
+            health.record_failure("timeout", timeout * 1000)
+        else:
+            health.record_success(5000)
+            successes += 1
+    assert successes > 0 and health.timeout() >= 5.0
+    assert health.state == BreakerState.CLOSED, "Breaker не должен хлопать бесконечно"
+    print(f"✅ Таймаут вырос до {health.timeout()}с вслед за латентностью")
+
+    health = EndpointHealth("Test-Search", failure_threshold=3, clock=clock)
+    for _ in range(2):
+        health.record_failure("http_503")
+        health.record_probe_success()
+    assert health.consecutive_failures == 2 and health.state == BreakerState.CLOSED
+    health.record_failure("http_503")
+    assert health.state == BreakerState.OPEN, "Живой tools/list не скрывает сбои поиска"
+
+    clock.now += 31
+    health.record_probe_success()
+    assert health.state == BreakerState.CLOSED and health.consecutive_failures == 0
+    print("✅ Пинг закрывает только открытый breaker")
+
+
+def test_sick_source_is_skipped_and_recovers():
+    """Больной сервер пропускается без HTTP-запроса, фоновая проверка его возвращает"""
+    from clients.mcp import MCPClient
+    from clients.mcp_health import EndpointHealth, BreakerState, check_mcp_health
+
+    async def scenario():
+        server = FlakyMCPServer()
+        await server.start()
+        clock = FakeClock(now=1000.0)
+        client = MCPClient(server.url, "Stub-Flaky", search_tool="search", use_cache=False)
+        client.health = EndpointHealth("Stub-Flaky", failure_threshold=2, cooldown=30, clock=clock)
+        try:
+            assert await client.search("роль") == []
+            assert await client.search("роль") == []
+            assert client.health.state == BreakerState.OPEN
+            requests_before = server.http_requests
+
+            assert await client.search("роль") == []
+            assert server.http_requests == requests_before, "Открытый breaker не шлёт запрос"
+
+            # До cooldown фоновая проверка больной источник не трогает
+            server.healthy = True
+            await check_mcp_health([client])
+            assert server.http_requests == requests_before
+
+            clock.now += 31
+            await check_mcp_health([client])
+            assert client.health.state == BreakerState.CLOSED
+            assert await client.search("роль")
+        finally:
+            await client.close()
+            await server.stop()
+
+    asyncio.run(scenario())
+    print("✅ Больной источник пропускается и возвращается после пинга")
+
+
+if __name__ == "__main__":
+    test_adaptive_timeout_and_breaker_states()
+    test_timeout_follows_slowdown_and_ping_keeps_failures()
+    test_sick_source_is_skipped_and_recovers()
+    print("\n✅ Все тесты пройдены!")
@@ -0,0 +1,67 @@
+"""
+Тест шаблонов промптов и кэша профильных сегментов.
+
+Запуск: python -m pytest tests/test_prompts.py -v
+"""
+
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def test_template_render_and_stats():
+    """Шаблон разбирается один раз, рендер совпадает с str.format, размер учитывается"""
+    from core.prompts import PromptRegistry
+
+    registry = PromptRegistry()
+    text = "Привет, {name}!\nФормат: {{\"title\": ...}}\n{lang_instruction}\n{name}"
+    template = registry.register('greeting', text)
+    values = dict(name='Аня', lang_instruction='ВАЖНО: Пиши ВСЁ на русском языке.')
+
+    assert template.fields == ('name', 'lang_instruction')
+    assert template.render(**values) == text.format(**values)
+    assert registry.register('greeting', text) is template
+
+    changed = registry.register('greeting', text + "!", version=2)
+    assert changed.fingerprint != template.fingerprint and changed.fingerprint.startswith('greeting@2:')
+
+    changed.render(**values)
+    stats = registry.get_stats()['templates']['greeting']
+    assert stats['renders'] == 1 and stats['max_chars'] == len(text.format(**values)) + 1
+
+    try:
+        registry.register('bad', "{intern['name']}")
+        assert False, "Выражения в полях не допускаются"
+    except ValueError:
+        pass
+    print("✅ Шаблон рендерится как str.format и считает размер")
+
+
+def test_personalization_memoised_by_profile():
+    """Персонализация собирается один раз на профиль и день, смена профиля — новый сегмент"""
+    from core.helpers import get_personalization_prompt
+    from core.prompts import get_prompt_registry, lang_instruction
+
+    registry = get_prompt_registry()
+    intern = dict(name='Аня', occupation='аналитик', interests=['шахматы', 'бег'],
+                  motivation='свобода', goals='порядок', study_duration=15)
+
+    first = get_personalization_prompt(intern, 2)
+    misses = registry.segment_misses
+    assert get_personalization_prompt(dict(intern), 2) == first
+    assert registry.segment_misses == misses, "Тот же профиль — из кэша"
+
+    assert '"бег"' in first and 'День 2' in first
+    assert get_personalization_prompt(dict(intern, goals='ясность'), 2) != first
+    assert 'ПРАВИЛА ДЛЯ ПРИМЕРОВ:\n' in get_personalization_prompt(intern)
+
+    assert lang_instruction('answer', 'en') == "IMPORTANT: Answer in English."
+    assert lang_instruction('answer', 'de') == lang_instruction('answer', 'ru')
+    print("✅ Персонализация кэшируется по хэшу профиля")
+
+
+if __name__ == "__main__":
+    test_template_render_and_stats()
+    test_personalization_memoised_by_profile()
+    print("\n✅ Все тесты пройдены!")
@@ -0,0 +1,89 @@
+"""
+Тест BM25-реранкера результатов MCP (без сети).
+
+Запуск: python -m pytest tests/test_reranker.py -v
+"""
+
+import sys
+import os
+import asyncio
+import time
+import random
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def make_result(text, source="s"):
+    from engines.shared.retrieval import RetrievalResult
+    return RetrievalResult(text=text, source=source, source_type="guides")
+
+
+def test_bm25_ranks_relevant_first():
+    """Текст про запрос выше шума, словоформы сопоставляются по основе"""
+    from engines.shared.reranker import BM25Reranker
+
+    results = [
+        make_result("Погода сегодня солнечная, в парке много людей и собак.", "noise"),
+        make_result("Прокрастинация — откладывание важных дел. Прокрастинацию снимает "
+                    "слот саморазвития: регулярное время для практики.", "target"),
+        make_result("Слоты времени помогают планировать неделю.", "partial"),
+    ]
+    ranked = BM25Reranker().rank(results, ["как победить прокрастинацию", "прокрастинация слоты"])
+
+    assert [r.source for r in ranked] == ["target", "partial", "noise"]
+    assert ranked[0].relevance_score == 1.0 and ranked[-1].relevance_score == 0.0
+    print("✅ BM25 ставит релевантный текст первым")
+
+
+def test_corpus_idf_persisted():
+    """Статистика корпуса копится, сохраняется и загружается обратно"""
+    from engines.shared.reranker import BM25Reranker, CorpusStats
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "idf.json"
+        corpus = CorpusStats(path)
+        reranker = BM25Reranker(corpus=corpus)
+        results = [make_result(f"Фрагмент номер {i} про системное мышление и роли") for i in range(3)]
+
+        reranker.rank(results, ["системное мышление"])
+        reranker.rank(results, ["системное мышление"])  # повтор не считается
+        assert corpus.doc_count == 3 and corpus.pending == 3
+        assert not path.exists(), "Ранжирование не пишет на диск"
+
+        asyncio.run(corpus.flush())
+        assert path.exists() and corpus.pending == 0
+
+        loaded = CorpusStats(path)
+        assert loaded.doc_count == 3
+        assert loaded.doc_freq["системн"] == 3
+    print("✅ IDF корпуса сохраняется между запусками")
+
+
+def test_rank_many_candidates_fast():
+    """Микро-бенчмарк: ранжирование 60 кандидатов (только печатает время)"""
+    from engines.shared.reranker import BM25Reranker
+
+    rng = random.Random(1)
+    words = ("система роль метод практика внимание собранность агентность мастерство "
+             "ясность трекер продукт мышление развитие тупик хаос поворот ритм слот").split()
+    results = [make_result(" ".join(rng.choices(words, k=300))) for _ in range(60)]
+    queries = ["как удержать внимание и собранность", "внимание фокус", "собранность концентрация"]
+    reranker = BM25Reranker()
+
+    reranker.rank(results, queries)
+    started = time.perf_counter()
+    for _ in range(20):
+        reranker.rank(results, queries)
+    elapsed_ms = (time.perf_counter() - started) * 1000 / 20
+
+    assert len(reranker.rank(results, queries)) == len(results)
+    print(f"✅ 60 кандидатов за {elapsed_ms:.3f}мс")
+
+
+if __name__ == "__main__":
+    test_bm25_ranks_relevant_first()
+    test_corpus_idf_persisted()
+    test_rank_many_candidates_fast()
+    print("\n✅ Все тесты пройдены!")
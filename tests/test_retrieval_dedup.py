@@ -0,0 +1,66 @@
+"""
+Тест дедупликации результатов retrieval (MinHash + LSH, без сети).
+
+Запуск: python -m pytest tests/test_retrieval_dedup.py -v
+"""
+
+import sys
+import os
+import random
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+BASE = ("Собранность — это способность удерживать внимание на важном, "
+        "не распыляясь на быстрые удовольствия и случайные задачи. "
+        "Практика слота саморазвития помогает выстроить ритм и регулярность, "
+        "а трекер показывает прогресс и фиксирует рабочие продукты недели.")
+
+
+def test_features_precomputed():
+    """Признаки вычисляются при создании, без __dict__"""
+    from engines.shared.retrieval import RetrievalResult
+
+    result = RetrievalResult(text="  Роль   и\nМетод  " + BASE, source="s", source_type="guides")
+    assert result.normalized.startswith("роль и метод")
+    assert "собранность" in result.key_phrases
+    assert len(result.minhash) == 16
+    assert not hasattr(result, "__dict__")
+    print("✅ Признаки посчитаны один раз, __slots__")
+
+
+def test_deduplicate_matches_pairwise():
+    """LSH-дедупликация совпадает с попарным сравнением"""
+    from engines.shared.retrieval import RetrievalResult, SemanticDeduplicator
+
+    rng = random.Random(7)
+    words = BASE.split()
+    results = []
+    for i in range(60):
+        variant = list(words)
+        # Часть результатов — слегка изменённые копии, часть — случайные тексты
+        if i % 3:
+            variant[rng.randrange(len(variant))] = "вставка"
+        else:
+            variant = rng.sample(["слово%d" % n for n in range(500)], 30)
+        results.append(RetrievalResult(text=" ".join(variant), source=str(i),
+                                       source_type="guides", relevance_score=rng.random()))
+
+    dedup = SemanticDeduplicator(0.6)
+    unique = dedup.deduplicate(results)
+
+    # Эталон: исходный попарный алгоритм
+    expected = []
+    for result in sorted(results, key=lambda r: r.relevance_score, reverse=True):
+        if not any(dedup.are_similar(result, kept) for kept in expected):
+            expected.append(result)
+
+    assert [r.source for r in unique] == [r.source for r in expected]
+    assert len(unique) < len(results)
+    print(f"✅ Дедупликация: {len(results)} → {len(unique)}, как у попарного сравнения")
+
+
+if __name__ == "__main__":
+    test_features_precomputed()
+    test_deduplicate_matches_pairwise()
+    print("\n✅ Все тесты пройдены!")
@@ -0,0 +1,54 @@
+"""
+Офлайн-оценка retrieval на записанных ответах MCP (без сети).
+
+Порог recall@k и число MCP-вызовов — регрессионные: изменение
+TERM_RELATIONS, весов или RetrievalConfig не должно их ухудшать.
+Воспроизведение фикстур детерминировано, поэтому пороги — базовые
+значения, снятые с закоммиченных фикстур (сейчас это образец,
+собранный вручную). После record перезакрепите их по отчёту.
+Подробный отчёт: python -m tests.retrieval_eval.harness
+
+Запуск: python -m pytest tests/test_retrieval_eval.py -v
+"""
+
+import sys
+import os
+import asyncio
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Базовые значения на tests/retrieval_eval/fixtures/mcp_responses.json
+MIN_RECALL_AT_5 = 1.0
+MAX_MCP_CALLS = 20
+
+
+def test_replay_quality_and_cost():
+    """recall@5 и число MCP-вызовов на фикстурах не хуже базовых"""
+    from tests.retrieval_eval.harness import load_questions, load_fixtures, evaluate
+
+    report = asyncio.run(evaluate(load_questions(), load_fixtures(), k=5))
+
+    assert report.missing == 0, "Фикстуры устарели: python -m tests.retrieval_eval.harness record"
+    assert set(report.stage_cpu_ms) == {"expand", "parse", "score", "dedup", "format"}
+    assert report.recall_at_k >= MIN_RECALL_AT_5, report.format()
+    assert report.mcp_calls <= MAX_MCP_CALLS, report.format()
+    print(f"✅ recall@5 {report.recall_at_k:.2f}, MCP-вызовов {report.mcp_calls}")
+
+
+def test_replay_client_reports_missing():
+    """Запрос, которого нет в фикстурах, отвечается пустым списком и учитывается"""
+    from tests.retrieval_eval.harness import ReplayClient
+
+    client = ReplayClient("guides", {"собранность": [{"text": "..."}]})
+    batches = asyncio.run(client.semantic_search_many(["собранность", "новый запрос"]))
+
+    assert batches == [[{"text": "..."}], []]
+    assert client.calls == 1 and client.queries == 2
+    assert client.missing == ["новый запрос"]
+    print("✅ Недостающие запросы видны в отчёте")
+
+
+if __name__ == "__main__":
+    test_replay_quality_and_cost()
+    test_replay_client_reports_missing()
+    print("\n✅ Все тесты пройдены!")
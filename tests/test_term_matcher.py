@@ -0,0 +1,63 @@
+"""
+Тест автомата терминов (Aho–Corasick) против наивного поиска подстрок.
+
+Запуск: python -m pytest tests/test_term_matcher.py -v
+"""
+
+import sys
+import os
+import random
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def naive_hits(text, term_relations, synonyms):
+    text = text.lower()
+    concepts = [t for t in term_relations if t in text]
+    related = {c for c, terms in term_relations.items() if any(t in text for t in terms)}
+    found_synonyms = [s for s in synonyms if s in text]
+    return concepts, related, found_synonyms
+
+
+def test_matches_naive_substring_search():
+    """На словаре ретривера и случайных текстах результат совпадает с `term in text`"""
+    from engines.shared.retrieval import TERM_RELATIONS, SYNONYMS
+    from engines.shared.term_matcher import TermMatcher
+
+    matcher = TermMatcher(TERM_RELATIONS, SYNONYMS)
+    vocabulary = list(TERM_RELATIONS) + [t for terms in TERM_RELATIONS.values() for t in terms]
+    vocabulary += list(SYNONYMS) + ["роль", "метод", "и", "не", "систем", "хао", "ученик"]
+
+    rng = random.Random(3)
+    texts = ["", "Хаос и ТУПИК", "стеклянный потолок мешает", "постановка целей и фокус"]
+    for _ in range(300):
+        words = rng.choices(vocabulary, k=rng.randint(1, 12))
+        texts.append(rng.choice([" ", "", ", "]).join(words))
+
+    for text in texts:
+        hits = matcher.match(text)
+        concepts, related, synonyms = naive_hits(text, TERM_RELATIONS, SYNONYMS)
+        assert hits.concepts == concepts, text
+        assert hits.related == related, text
+        assert hits.synonyms == synonyms, text
+    print(f"✅ Автомат совпадает с наивным поиском на {len(texts)} текстах")
+
+
+def test_structure_terms_extend_expander():
+    """Связи из knowledge_structure.yaml дополняют словарь"""
+    from engines.shared.retrieval import EnhancedRetrieval, RetrievalConfig, TERM_RELATIONS
+    from engines.shared.term_matcher import load_structure_relations
+
+    relations = load_structure_relations()
+    assert relations.get("диагностика состояния"), "Ожидались related_concepts первой темы"
+
+    retrieval = EnhancedRetrieval(RetrievalConfig(load_structure_terms=True))
+    assert len(retrieval.expander.term_relations) > len(TERM_RELATIONS)
+    assert "диагностика состояния" in retrieval.expander.extract_key_concepts("Как пройти диагностика состояния?")
+    print("✅ Термины из knowledge_structure.yaml подключаются")
+
+
+if __name__ == "__main__":
+    test_matches_naive_substring_search()
+    test_structure_terms_extend_expander()
+    print("\n✅ Все тесты пройдены!")
@@ -0,0 +1,63 @@
+"""
+Тест реестра тем (topics/*.yaml).
+
+Запуск: python -m pytest tests/test_topic_registry.py -v
+"""
+
+import sys
+import os
+import shutil
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tests.helpers import FakeClock
+
+TOPICS = Path(__file__).parent.parent / "topics"
+
+
+def test_registry_indexes_repo_topics():
+    """Все темы репозитория индексируются по id и дню"""
+    from core.topics import TopicRegistry
+
+    registry = TopicRegistry(TOPICS)
+
+    topic = registry.get("day-1-theory")
+    assert topic and topic['day'] == 1
+    assert [t['id'] for t in registry.by_day(1)] == ["day-1-theory", "day-1-practice"]
+    assert len(registry) + len(registry.errors) == len(list(TOPICS.glob("[!_]*.yaml")))
+    print(f"✅ {len(registry)} тем, ошибок: {list(registry.errors)}")
+
+
+def test_validation_and_hot_reload():
+    """Невалидный файл отбрасывается, изменения подхватываются по mtime"""
+    from core.topics import TopicRegistry
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        shutil.copy(TOPICS / "_schema.yaml", tmp)
+        shutil.copy(TOPICS / "1-1-four-states.yaml", tmp)
+        (tmp / "bad.yaml").write_text('id: "x"\ntitle: "X"\ntype: "lecture"\n', encoding='utf-8')
+
+        clock = FakeClock()
+        registry = TopicRegistry(tmp, reload_interval=5, clock=clock)
+        assert len(registry) == 1 and "type" in registry.errors["bad.yaml"]
+
+        new = tmp / "1-2-extra.yaml"
+        new.write_text('id: "day-1-extra"\ntitle: "Доп"\ntype: "practice"\nday: 1\norder: 3\n', encoding='utf-8')
+        assert registry.get("day-1-extra") is None, "До истечения интервала файлы не сверяются"
+
+        clock.now = 6
+        assert registry.get("day-1-extra")['title'] == "Доп"
+
+        new.unlink()
+        clock.now = 12
+        assert registry.get("day-1-extra") is None and len(registry) == 1
+    print("✅ Проверка по схеме и горячая перезагрузка")
+
+
+if __name__ == "__main__":
+    test_registry_indexes_repo_topics()
+    test_validation_and_hot_reload()
+    print("\n✅ Все тесты пройдены!")
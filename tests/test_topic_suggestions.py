@@ -0,0 +1,143 @@
+"""
+Тест кэша предложений тем Ленты и общего снимка актуальных тем.
+
+Запуск: python -m pytest tests/test_topic_suggestions.py -v
+"""
+
+import sys
+import os
+import asyncio
+from datetime import date
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class FakeWeeksDB:
+    """feed_weeks одного пользователя в памяти"""
+
+    def __init__(self):
+        self.intern = {'chat_id': 1, 'name': 'Аня', 'occupation': 'аналитик', 'language': 'ru'}
+        self.weeks = []
+        self.generated = 0
+        self.fail = False
+        self.today = date(2026, 3, 4)
+
+    def install(self, module):
+        names = ('get_feed_snapshot', 'get_cached_feed_suggestions', 'create_feed_week',
+                 'update_feed_week', 'suggest_weekly_topics', 'moscow_today')
+        original = {name: getattr(module, name) for name in names}
+        for name in names:
+            setattr(module, name, getattr(self, name))
+        return lambda: [setattr(module, name, fn) for name, fn in original.items()]
+
+    def moscow_today(self):
+        return self.today
+
+    async def get_feed_snapshot(self, chat_id, session_date):
+        week = self.weeks[-1] if self.weeks else None
+        return {
+            'intern': dict(self.intern), 'week': dict(week) if week else None,
+            'today_session': None, 'incomplete_session': None, 'prepared_session': None,
+            'days_active_this_week': 0, 'sessions_completed': 0,
+        }
+
+    async def get_cached_feed_suggestions(self, chat_id, suggestions_key):
+        for week in reversed(self.weeks):
+            if week['suggestions_key'] == suggestions_key:
+                return week['suggested_topics']
+        return None
+
+    async def create_feed_week(self, chat_id, suggested_topics, accepted_topics, suggestions_key=None):
+        self.weeks.append({'id': len(self.weeks) + 1, 'status': 'planning', 'suggested_topics': suggested_topics,
+                           'suggestions_key': suggestions_key, 'accepted_topics': accepted_topics})
+
+    async def update_feed_week(self, week_id, updates):
+        self.weeks[week_id - 1].update(updates)
+
+    async def suggest_weekly_topics(self, intern):
+        self.generated += 1
+        if self.fail:
+            from engines.feed.planner import get_fallback_topics
+            return get_fallback_topics()
+        return [{'title': f"Тема {self.generated}", 'why': 'Полезно', 'keywords': []}]
+
+
+def test_trending_snapshot_shared():
+    """Снимок загружается один раз на всех, неудачное обновление сохраняет прежний"""
+    from engines.feed import planner
+    from engines.feed.planner import TrendingSnapshot
+
+    responses = ["- Системное мышление на практике", ""]
+    calls = []
+
+    async def fake_trending():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return responses[len(calls) - 1]
+
+    original = planner.get_trending_topics
+    planner.get_trending_topics = fake_trending
+    try:
+        async def run():
+            snapshot = TrendingSnapshot()
+            texts = await asyncio.gather(*(snapshot.get() for _ in range(5)))
+            assert texts == ["- Системное мышление на практике"] * 5
+            assert await snapshot.refresh() == "- Системное мышление на практике"
+            return snapshot
+
+        snapshot = asyncio.run(run())
+    finally:
+        planner.get_trending_topics = original
+
+    assert len(calls) == 2
+    stats = snapshot.get_stats()
+    assert stats['refreshes'] == 1 and stats['failures'] == 1 and stats['age_sec'] == 0
+    print("✅ Актуальные темы — один снимок на всех")
+
+
+def test_suggestions_cached_per_week():
+    """Предложения генерируются раз в неделю на профиль; заново — только по refresh"""
+    from engines.feed import engine as feed_engine
+    from engines.feed.engine import FeedEngine, suggestions_key
+
+    intern = {'name': 'Аня', 'occupation': 'аналитик', 'language': 'ru'}
+    assert suggestions_key(intern, date(2026, 3, 2)) == suggestions_key(dict(intern), date(2026, 3, 8))
+    assert suggestions_key(intern, date(2026, 3, 2)) != suggestions_key(intern, date(2026, 3, 9))
+    assert suggestions_key(intern, date(2026, 3, 2)) != suggestions_key(dict(intern, goals='ясность'), date(2026, 3, 2))
+    assert suggestions_key(intern, date(2026, 3, 2)).startswith('2026-W10:')
+
+    db = FakeWeeksDB()
+    restore = db.install(feed_engine)
+    try:
+        async def scenario():
+            topics, _ = await FeedEngine(1).suggest_topics()
+            assert topics[0]['title'] == "Тема 1" and len(db.weeks) == 1
+
+            topics, _ = await FeedEngine(1).suggest_topics()
+            assert topics[0] == {'title': "Тема 1", 'why': 'Полезно', 'keywords': []}
+            assert db.generated == 1 and len(db.weeks) == 1, "Та же неделя и профиль — из кэша"
+            assert (await FeedEngine(1).get_alternative_topics())[0]['title'] == "Тема 1"
+
+            topics, _ = await FeedEngine(1).suggest_topics(refresh=True)
+            assert topics[0]['title'] == "Тема 2" and db.generated == 2
+
+            db.today = date(2026, 3, 9)
+            assert (await FeedEngine(1).get_alternative_topics())[0]['title'] == "Тема 3"
+            assert db.weeks[-1]['suggested_topics'][0]['title'] == "Тема 3"
+
+            db.fail = True
+            db.intern['goals'] = 'ясность'
+            await FeedEngine(1).get_alternative_topics()
+            await FeedEngine(1).get_alternative_topics()
+            assert db.generated == 5, "Запасные темы не кэшируются"
+
+        asyncio.run(scenario())
+    finally:
+        restore()
+    print("✅ Предложения тем кэшируются по неделе и профилю")
+
+
+if __name__ == "__main__":
+    test_trending_snapshot_shared()
+    test_suggestions_cached_per_week()
+    print("\n✅ Все тесты пройдены!")